@@ -3,18 +3,33 @@ from __future__ import annotations
 import datetime as dt
 import math
 import os
-import random
-import threading
-import time
-
-import requests
 
+import weather_http
+from tiered_cache import get_cache
 from weather_dwd import find_nearest_station, load_hourly_series
+from weather_coalescer import RequestCoalescer
+from weather_series import HourlySeries, as_series, bundle_from_compact, bundle_to_compact
+from weather_store import WEATHER_STORE, cell_for, get_store, store_stats
 
 
 TEN_MIN_S = 10 * 60
-_CACHE: dict[str, tuple[float, object]] = {}
-_CACHE_LOCK = threading.Lock()
+# Complete ranges ending before the live cutoff (ICON2D_CUTOFF_DAYS) are immutable and
+# cached without expiry; live/forecast ranges and incomplete answers use this TTL.
+WEATHER_LIVE_TTL_S = float(os.getenv("WEATHER_LIVE_TTL_S", str(TEN_MIN_S)) or TEN_MIN_S)
+_CACHE = get_cache(
+    "weather_batch",
+    ttl_s=WEATHER_LIVE_TTL_S,
+    max_items=int(os.getenv("WEATHER_CACHE_MAX_ITEMS", "512") or 512),
+    disk=True,
+)
+# Per host segment (historical / live) of an Open-Meteo fetch, so a mixed range only
+# refetches its live part once the TTL has passed.
+_SEGMENT_CACHE = get_cache(
+    "weather_segment",
+    ttl_s=WEATHER_LIVE_TTL_S,
+    max_items=int(os.getenv("WEATHER_CACHE_MAX_ITEMS", "512") or 512),
+    disk=True,
+)
 ICON2D_TIMEOUT_S = int(os.getenv("ICON2D_TIMEOUT_S", "45") or 45)
 HIST_HOST = "https://historical-forecast-api.open-meteo.com/v1/forecast"
 LIVE_HOST = "https://api.open-meteo.com/v1/forecast"
@@ -23,14 +38,7 @@ MIXED_CUTOFF_DAYS = int(os.getenv("ICON2D_CUTOFF_DAYS", "16") or 16)
 ICON2D_MAX_RETRIES = int(os.getenv("ICON2D_MAX_RETRIES", "5") or 5)
 ICON2D_BACKOFF_BASE_S = float(os.getenv("ICON2D_BACKOFF_BASE_S", "1.0") or 1.0)
 ICON2D_BACKOFF_CAP_S = float(os.getenv("ICON2D_BACKOFF_CAP_S", "20.0") or 20.0)
-ICON2D_USER_AGENT = (os.getenv("ICON2D_USER_AGENT", "hydrowatch-berlin/1.0") or "hydrowatch-berlin/1.0").strip()
-
-_SESSION = requests.Session()
-_SESSION.headers.update({"User-Agent": ICON2D_USER_AGENT})
-
 
-def _now_s() -> float:
-    return dt.datetime.now(tz=dt.timezone.utc).timestamp()
 
 
 def parse_points(points_str: str) -> list[tuple[float, float]]:
@@ -52,33 +60,69 @@ def parse_points(points_str: str) -> list[tuple[float, float]]:
     return pts
 
 
-def _cache_key(points: list[tuple[float, float]], start_iso: str, end_iso: str, agg: str) -> str:
-    # stable key: round to 3 decimals + hour-rounded window + count
-    def r(v: float) -> str:
-        return f"{round(v, 3):.3f}"
+def _hour_floor_iso(iso: str) -> str:
+    d = dt.datetime.fromisoformat(iso.replace("Z", "+00:00"))
+    if d.tzinfo is not None:
+        d = d.astimezone(dt.timezone.utc)
+    return d.replace(minute=0, second=0, microsecond=0, tzinfo=None).isoformat()
 
-    p0 = points[0]
-    rounded_start = dt.datetime.fromisoformat(start_iso.replace("Z", "+00:00")).replace(minute=0, second=0, microsecond=0)
-    rounded_end = dt.datetime.fromisoformat(end_iso.replace("Z", "+00:00")).replace(minute=0, second=0, microsecond=0)
-    return f"{r(p0[0])},{r(p0[1])}_{rounded_start.isoformat()}_{rounded_end.isoformat()}_{agg}_{len(points)}"
 
+def _cache_key(
+    points: list[tuple[float, float]],
+    start_iso: str,
+    end_iso: str,
+    agg: str,
+    *,
+    provider: str,
+    model: str = MODEL,
+    variables: tuple[str, ...] = ("precipitation",),
+    transport: str | None = None,
+) -> dict:
+    """
+    Full cache identity: every point (rounded to 5 decimals, ~1 m, in request order
+    because results are positional), provider/model, transport (proxy base URL or
+    open-meteo-direct), variables, aggregation and the hour-rounded window.
+    """
+    return {
+        "v": 3,
+        "provider": provider,
+        "transport": transport,
+        "model": model,
+        "variables": list(variables),
+        "agg": agg,
+        "start": _hour_floor_iso(start_iso),
+        "end": _hour_floor_iso(end_iso),
+        "points": [[round(float(lat), 5), round(float(lon), 5)] for lat, lon in points],
+    }
 
-def _cache_get(key: str) -> object | None:
-    now = _now_s()
-    with _CACHE_LOCK:
-        hit = _CACHE.get(key)
-        if not hit:
-            return None
-        ts, obj = hit
-        if now - ts > TEN_MIN_S:
-            _CACHE.pop(key, None)
-            return None
-        return obj
+
+def _live_cutoff() -> dt.datetime:
+    return (dt.datetime.now(tz=dt.timezone.utc) - dt.timedelta(days=MIXED_CUTOFF_DAYS)).replace(
+        hour=23, minute=59, second=59, microsecond=0
+    )
 
 
-def _cache_set(key: str, obj: object) -> None:
-    with _CACHE_LOCK:
-        _CACHE[key] = (_now_s(), obj)
+def _epoch_hour(iso: str) -> int:
+    d = dt.datetime.fromisoformat(iso.replace("Z", "+00:00"))
+    if d.tzinfo is None:
+        d = d.replace(tzinfo=dt.timezone.utc)
+    return int(d.timestamp() // 3600)
+
+
+def _range_ttl_s(start_iso: str, end_iso: str, data: list[dict], n_points: int) -> float | None:
+    """
+    None (no expiry) for ranges that end before the live cutoff and whose series cover
+    every hour of the window at every point, else WEATHER_LIVE_TTL_S. Incomplete
+    historical answers (upstream holes, empty series) are retried after the TTL.
+    """
+    end_dt = dt.datetime.fromisoformat(end_iso.replace("Z", "+00:00")).astimezone(dt.timezone.utc)
+    if end_dt > _live_cutoff() or len(data) < n_points:
+        return WEATHER_LIVE_TTL_S
+    h0, h1 = _epoch_hour(start_iso), _epoch_hour(end_iso)
+    for item in data:
+        if len(as_series(item.get("series")).slice_hours(h0, h1)) < h1 - h0 + 1:
+            return WEATHER_LIVE_TTL_S
+    return None
 
 
 def _provider_mode() -> str:
@@ -88,41 +132,17 @@ def _provider_mode() -> str:
     return mode
 
 
-def _retry_delay_s(attempt: int, retry_after_header: str | None = None) -> float:
-    if retry_after_header:
-        try:
-            ra = float(retry_after_header)
-            if math.isfinite(ra) and ra > 0:
-                return min(float(ra), ICON2D_BACKOFF_CAP_S)
-        except Exception:
-            pass
-    base = max(0.1, float(ICON2D_BACKOFF_BASE_S))
-    cap = max(base, float(ICON2D_BACKOFF_CAP_S))
-    # exponential backoff with bounded jitter
-    delay = min(cap, base * (2 ** max(0, attempt - 1)))
-    jitter = random.uniform(0.0, max(0.05, delay * 0.25))
-    return min(cap, delay + jitter)
-
-
 def _get_json_with_retry(url: str, *, params: dict, timeout_s: int) -> object:
-    attempts = max(1, int(ICON2D_MAX_RETRIES))
-    last_exc: Exception | None = None
-    for attempt in range(1, attempts + 1):
-        try:
-            resp = _SESSION.get(url, params=params, timeout=timeout_s)
-            if resp.status_code == 429 or resp.status_code >= 500:
-                if attempt < attempts:
-                    time.sleep(_retry_delay_s(attempt, resp.headers.get("Retry-After")))
-                    continue
-                resp.raise_for_status()
-            resp.raise_for_status()
-            return resp.json()
-        except requests.RequestException as exc:
-            last_exc = exc
-            if attempt >= attempts:
-                break
-            time.sleep(_retry_delay_s(attempt))
-    raise RuntimeError(str(last_exc) if last_exc else "ICON2D request fehlgeschlagen.")
+    """Open-Meteo GET via the shared weather HTTP client (token bucket, Retry-After aware)."""
+    return weather_http.get_json(
+        "open-meteo",
+        url,
+        params=params,
+        timeout_s=timeout_s,
+        retries=ICON2D_MAX_RETRIES,
+        backoff_base_s=ICON2D_BACKOFF_BASE_S,
+        backoff_cap_s=ICON2D_BACKOFF_CAP_S,
+    )
 
 
 def _icon2d_base_url() -> str | None:
@@ -171,10 +191,11 @@ def _as_precip_mm(row: dict) -> float | None:
     return None
 
 
-def _normalize_series(rows: object) -> list[dict]:
-    out: list[dict] = []
+def _normalize_series(rows: object) -> HourlySeries:
     if not isinstance(rows, list):
-        return out
+        return HourlySeries.empty()
+    times: list[str] = []
+    vals: list[float] = []
     for r in rows:
         if not isinstance(r, dict):
             continue
@@ -182,14 +203,15 @@ def _normalize_series(rows: object) -> list[dict]:
         p = _as_precip_mm(r)
         if not t or p is None:
             continue
-        out.append({"t": t, "precip_mm": float(p)})
-    return out
+        times.append(t)
+        vals.append(float(p))
+    return HourlySeries.from_iso(times, vals)
 
 
 def _normalize_icon2d_response(raw: object, points: list[tuple[float, float]]) -> list[dict]:
     """
     Normalize different possible icon2d response shapes to:
-      [{"point":"lat,lon","station":{...optional...},"series":[{"t","precip_mm"}]}]
+      [{"point":"lat,lon","station":{...optional...},"series":HourlySeries}]
     """
     if isinstance(raw, list):
         items = raw
@@ -276,28 +298,10 @@ def _fetch_batch_icon2d_proxy(points: list[tuple[float, float]], start_iso: str,
         "endISO": end_iso,
         "agg": agg,
     }
-    resp = requests.post(url, json=payload, timeout=ICON2D_TIMEOUT_S)
-    resp.raise_for_status()
-    return _normalize_icon2d_response(resp.json(), points)
-
-
-def _iso_from_open_meteo_time(t: object) -> str | None:
-    if t is None:
-        return None
-    s = str(t).strip()
-    if not s:
-        return None
-    if s.endswith("Z"):
-        return s
-    if len(s) == 16 and "T" in s:
-        s = s + ":00"
-    try:
-        d = dt.datetime.fromisoformat(s.replace("Z", "+00:00"))
-        if d.tzinfo is None:
-            d = d.replace(tzinfo=dt.timezone.utc)
-        return d.astimezone(dt.timezone.utc).isoformat().replace("+00:00", "Z")
-    except Exception:
-        return None
+    raw = weather_http.request(
+        "icon2d-proxy", "POST", url, json_body=payload, timeout_s=ICON2D_TIMEOUT_S, retries=1
+    )
+    return _normalize_icon2d_response(raw, points)
 
 
 def _to_yyyy_mm_dd(iso: str) -> str:
@@ -342,58 +346,26 @@ def _icon2d_fetch_batch_all_open_meteo(
                 {
                     "point": _normalize_point_key(lat, lon),
                     "station": {"source": "Open-Meteo ICON-D2", "model": MODEL, "host": host},
-                    "series": [],
+                    "series": HourlySeries.empty(),
                 }
             )
             continue
 
-        series: list[dict] = []
-        for i, t in enumerate(times):
-            tt = _iso_from_open_meteo_time(t)
-            if not tt:
-                continue
-            if i >= len(vals):
-                continue
-            try:
-                p = float(vals[i])
-            except Exception:
-                continue
-            if not math.isfinite(p):
-                continue
-            series.append({"t": tt, "precip_mm": p})
-
+        # Open-Meteo returns naive UTC times ("2024-06-01T13:00") and nulls for missing hours.
         out.append(
             {
                 "point": _normalize_point_key(lat, lon),
                 "station": {"source": "Open-Meteo ICON-D2", "model": MODEL, "host": host},
-                "series": series,
+                "series": HourlySeries.from_iso(times, vals),
             }
         )
     return out
 
 
-def _merge_point_series(a: list[dict], b: list[dict]) -> list[dict]:
-    by_t: dict[str, float] = {}
-    for src in (a, b):
-        for row in src:
-            t = row.get("t")
-            if not isinstance(t, str):
-                continue
-            try:
-                p = float(row.get("precip_mm", 0.0))
-            except Exception:
-                continue
-            if math.isfinite(p):
-                by_t[t] = p
-    return [{"t": t, "precip_mm": by_t[t]} for t in sorted(by_t.keys())]
-
-
 def _choose_icon2d_host_mode(start_iso: str, end_iso: str) -> str:
     start_dt = dt.datetime.fromisoformat(start_iso.replace("Z", "+00:00")).astimezone(dt.timezone.utc)
     end_dt = dt.datetime.fromisoformat(end_iso.replace("Z", "+00:00")).astimezone(dt.timezone.utc)
-    cutoff = (dt.datetime.now(tz=dt.timezone.utc) - dt.timedelta(days=MIXED_CUTOFF_DAYS)).replace(
-        hour=23, minute=59, second=59, microsecond=0
-    )
+    cutoff = _live_cutoff()
     if end_dt <= cutoff:
         return "historical"
     if start_dt >= cutoff:
@@ -401,51 +373,143 @@ def _choose_icon2d_host_mode(start_iso: str, end_iso: str) -> str:
     return "mixed"
 
 
+def _fetch_segment_cached(
+    points: list[tuple[float, float]],
+    start_iso: str,
+    end_iso: str,
+    *,
+    live: bool,
+) -> list[dict]:
+    # Complete historical-host segments end before the cutoff and never change: no expiry.
+    key = _cache_key(points, start_iso, end_iso, "hourly", provider="open-meteo-live" if live else "open-meteo-historical")
+    cached = _SEGMENT_CACHE.get(key)
+    if cached is not None:
+        return bundle_from_compact(cached)
+    data = _icon2d_fetch_batch_all_open_meteo(points, start_iso, end_iso, live=live)
+    ttl_s = WEATHER_LIVE_TTL_S if live else _range_ttl_s(start_iso, end_iso, data, len(points))
+    _SEGMENT_CACHE.set(key, bundle_to_compact(data), ttl_s=ttl_s)
+    return data
+
+
 def _icon2d_smart_fetch_open_meteo(points: list[tuple[float, float]], start_iso: str, end_iso: str) -> list[dict]:
     mode = _choose_icon2d_host_mode(start_iso, end_iso)
     if mode == "historical":
-        return _icon2d_fetch_batch_all_open_meteo(points, start_iso, end_iso, live=False)
+        return _fetch_segment_cached(points, start_iso, end_iso, live=False)
     if mode == "live":
-        return _icon2d_fetch_batch_all_open_meteo(points, start_iso, end_iso, live=True)
+        return _fetch_segment_cached(points, start_iso, end_iso, live=True)
 
-    cutoff = (dt.datetime.now(tz=dt.timezone.utc) - dt.timedelta(days=MIXED_CUTOFF_DAYS)).replace(
-        hour=23, minute=59, second=59, microsecond=0
-    )
-    cutoff_iso = cutoff.isoformat().replace("+00:00", "Z")
-    hist = _icon2d_fetch_batch_all_open_meteo(points, start_iso, cutoff_iso, live=False)
-    live = _icon2d_fetch_batch_all_open_meteo(points, cutoff_iso, end_iso, live=True)
+    cutoff_iso = _live_cutoff().isoformat().replace("+00:00", "Z")
+    hist = _fetch_segment_cached(points, start_iso, cutoff_iso, live=False)
+    live = _fetch_segment_cached(points, cutoff_iso, end_iso, live=True)
 
     out: list[dict] = []
     n = max(len(hist), len(live), len(points))
     for idx in range(n):
         lat, lon = points[idx] if idx < len(points) else (0.0, 0.0)
-        hp = hist[idx] if idx < len(hist) else {"series": [], "station": {}}
-        lp = live[idx] if idx < len(live) else {"series": [], "station": {}}
+        hp = hist[idx] if idx < len(hist) else {"series": HourlySeries.empty(), "station": {}}
+        lp = live[idx] if idx < len(live) else {"series": HourlySeries.empty(), "station": {}}
         out.append(
             {
                 "point": _normalize_point_key(lat, lon),
                 "station": lp.get("station") or hp.get("station") or {"source": "Open-Meteo ICON-D2", "model": MODEL},
-                "series": _merge_point_series(hp.get("series") or [], lp.get("series") or []),
+                "series": as_series(hp.get("series")).merge(as_series(lp.get("series"))),
             }
         )
     return out
 
 
-def _fetch_batch_icon2d(points: list[tuple[float, float]], start_iso: str, end_iso: str, agg: str = "hourly") -> list[dict]:
+def _open_meteo_upstream(points: list[tuple[float, float]], start_iso: str, end_iso: str, *, live: bool) -> list[dict]:
+    return _icon2d_fetch_batch_all_open_meteo(points, start_iso, end_iso, live=live)
+
+
+# Gap fetches of concurrent requests (API threads, batch look-ahead) share upstream calls.
+_COALESCER = RequestCoalescer(_open_meteo_upstream)
+
+
+def _icon2d_fetch_open_meteo(points: list[tuple[float, float]], start_iso: str, end_iso: str) -> list[dict]:
+    """Direct Open-Meteo fetch; via the local hourly store (gap-only fetch) unless WEATHER_STORE=0."""
+    if not WEATHER_STORE:
+        return _icon2d_smart_fetch_open_meteo(points, start_iso, end_iso)
+    return get_store(MODEL).fetch_hourly(
+        points,
+        start_iso,
+        end_iso,
+        fetch_fn=_COALESCER.fetch,
+        cutoff=_live_cutoff(),
+        live_ttl_s=WEATHER_LIVE_TTL_S,
+        station={"source": "Open-Meteo ICON-D2", "model": MODEL},
+        point_key=_normalize_point_key,
+    )
+
+
+def weather_fetch_stats() -> dict:
+    """Store/coalescer/HTTP client counters plus upstream Open-Meteo calls per 1,000 requested points (fields)."""
+    stores = store_stats()
+    coalescer = _COALESCER.stats()
+    points = sum(int(s.get("points_requested", 0)) for s in stores.values())
+    return {
+        "store": stores,
+        "coalescer": coalescer,
+        "http": weather_http.http_stats(),
+        "upstream_calls_per_1000_points": round(coalescer["upstream_calls"] * 1000.0 / points, 2) if points else None,
+    }
+
+
+def prefetch_hourly(points: list[tuple[float, float]], start_iso: str, end_iso: str) -> dict:
+    """
+    Fill the hourly store for many points at once (batch look-ahead).
+
+    Points are deduplicated by weather cell and missing hours are fetched in
+    multi-location calls; later per-field requests in the window are served locally.
+    """
+    if _provider_mode() == "dwd" or _icon2d_transport() == "proxy" or not WEATHER_STORE:
+        return {"status": "disabled", "points": len(points)}
+    before = _COALESCER.stats()["upstream_calls"]
+    _icon2d_fetch_open_meteo(points, start_iso, end_iso)
+    calls = _COALESCER.stats()["upstream_calls"] - before
+    return {
+        "status": "ok",
+        "points": len(points),
+        "cells": len({cell_for(lat, lon)[0] for lat, lon in points}),
+        "upstream_calls": calls,
+        "upstream_calls_per_1000_points": round(calls * 1000.0 / len(points), 2) if points else None,
+    }
+
+
+DIRECT_TRANSPORT = "open-meteo-direct"
+
+
+def _proxy_transport_id(base: str) -> str:
+    return f"proxy:{base}"
+
+
+def _preferred_transport_id() -> str:
+    """Transport _fetch_batch_icon2d tries first (cache lookups use this one only)."""
+    transport = _icon2d_transport()
+    base = _icon2d_base_url()
+    if transport == "proxy" or (transport == "auto" and base):
+        return _proxy_transport_id(base or "")
+    return DIRECT_TRANSPORT
+
+
+def _fetch_batch_icon2d(
+    points: list[tuple[float, float]], start_iso: str, end_iso: str, agg: str = "hourly"
+) -> tuple[list[dict], str]:
+    """Returns (bundle, transport id actually used: proxy:<base> or open-meteo-direct)."""
     transport = _icon2d_transport()
     base = _icon2d_base_url()
     if transport == "proxy":
-        return _fetch_batch_icon2d_proxy(points, start_iso, end_iso, agg)
+        return _fetch_batch_icon2d_proxy(points, start_iso, end_iso, agg), _proxy_transport_id(base or "")
     if transport == "direct":
-        return _icon2d_smart_fetch_open_meteo(points, start_iso, end_iso)
+        return _icon2d_fetch_open_meteo(points, start_iso, end_iso), DIRECT_TRANSPORT
 
     # auto: prefer local proxy when configured, fallback to direct Open-Meteo.
     if base:
         try:
-            return _fetch_batch_icon2d_proxy(points, start_iso, end_iso, agg)
+            return _fetch_batch_icon2d_proxy(points, start_iso, end_iso, agg), _proxy_transport_id(base)
         except Exception:
             pass
-    return _icon2d_smart_fetch_open_meteo(points, start_iso, end_iso)
+    return _icon2d_fetch_open_meteo(points, start_iso, end_iso), DIRECT_TRANSPORT
 
 
 def _fetch_batch_dwd(points: list[tuple[float, float]], start_iso: str, end_iso: str) -> list[dict]:
@@ -480,24 +544,40 @@ def _fetch_batch_dwd(points: list[tuple[float, float]], start_iso: str, end_iso:
 
 def fetch_batch(points: list[tuple[float, float]], start_iso: str, end_iso: str, agg: str = "hourly") -> list[dict]:
     """
-    Batch fetch a compact hourly precipitation series for each point.
+    Batch fetch a compact hourly precipitation series (HourlySeries) for each point.
 
     Provider strategy:
       - WEATHER_PROVIDER=icon2d: ICON-D2 (Open-Meteo / proxy)
       - WEATHER_PROVIDER=dwd: station-based DWD (legacy/explicit)
       - WEATHER_PROVIDER=auto: behaves like icon2d (no silent DWD fallback)
+
+    Results are cached in memory and on disk (tiered_cache) under the full request
+    identity; complete historical ranges without expiry, everything else (live ranges,
+    answers with missing hours, direct fetches through the hourly store) for
+    WEATHER_LIVE_TTL_S.
     """
     mode = _provider_mode()
-    key = f"{mode}:{_cache_key(points, start_iso, end_iso, agg)}"
-    cached = _cache_get(key)
+    model = "dwd_cdc_rr" if mode == "dwd" else MODEL
+    transport = "dwd-cdc" if mode == "dwd" else _preferred_transport_id()
+    key = _cache_key(points, start_iso, end_iso, agg, provider=mode, model=model, transport=transport)
+    cached = _CACHE.get(key)
     if cached is not None:
-        return cached  # type: ignore[return-value]
+        return bundle_from_compact(cached)  # type: ignore[arg-type]
 
     data: list[dict]
     if mode == "dwd":
         data = _fetch_batch_dwd(points, start_iso, end_iso)
     else:
-        data = _fetch_batch_icon2d(points, start_iso, end_iso, agg)
-
-    _cache_set(key, data)
+        data, used = _fetch_batch_icon2d(points, start_iso, end_iso, agg)
+        if used != transport:
+            # Silent proxy -> direct fallback: store under the transport that produced it,
+            # so it never answers later lookups for the proxy.
+            key = _cache_key(points, start_iso, end_iso, agg, provider=mode, model=model, transport=used)
+
+    if mode != "dwd" and used == DIRECT_TRANSPORT and WEATHER_STORE:
+        # The hourly store already keeps historical hours and refetches its holes.
+        ttl_s = WEATHER_LIVE_TTL_S
+    else:
+        ttl_s = _range_ttl_s(start_iso, end_iso, data, len(points))
+    _CACHE.set(key, bundle_to_compact(data), ttl_s=ttl_s)
     return data
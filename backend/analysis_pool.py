@@ -0,0 +1,278 @@
+"""
+Bounded worker process pool with admission control for CPU-heavy analyses.
+
+analyze_dem / delineate_catchment_dem are pysheds + NumPy bound. Running them in
+request threads inside the API process makes them compete under the GIL and puts
+no cap on parallel analyses (overload => OOM). This module runs them in a fixed
+number of worker processes and admits at most ANALYSIS_WORKERS + ANALYSIS_QUEUE_DEPTH
+requests at once; everything above that is rejected immediately (HTTP 429).
+
+Configuration:
+- ANALYSIS_WORKERS: worker processes (0 = run inline in the request thread, one at a time)
+- ANALYSIS_QUEUE_DEPTH: admitted requests allowed to wait for a free worker
+- ANALYSIS_RETRY_AFTER_S: Retry-After hint for rejected requests
+"""
+
+from __future__ import annotations
+
+import importlib
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable
+
+
+def _default_workers() -> int:
+    return max(1, min(4, (os.cpu_count() or 2) // 2))
+
+
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", str(_default_workers())) or 0)
+ANALYSIS_QUEUE_DEPTH = int(os.getenv("ANALYSIS_QUEUE_DEPTH", "8") or 0)
+ANALYSIS_RETRY_AFTER_S = int(os.getenv("ANALYSIS_RETRY_AFTER_S", "30") or 30)
+
+
+class PoolBusyError(RuntimeError):
+    """Raised when the admission limit (running + queued) is reached."""
+
+    def __init__(self, retry_after_s: int):
+        super().__init__("Analyse-Kapazitaet ausgeschoepft. Bitte spaeter erneut versuchen.")
+        self.retry_after_s = int(retry_after_s)
+
+
+class AnalysisTicket:
+    """Admission slot of one request. Must be released exactly once."""
+
+    def __init__(self, pool: "AnalysisPool"):
+        self._pool = pool
+        self.released = False
+        self.running = False
+
+    def release(self) -> None:
+        self._pool._release(self)
+
+
+def _resolve_target(fn: Callable | str) -> Callable:
+    # "module:attr" targets keep heavy modules (pysheds) out of the API process.
+    if isinstance(fn, str):
+        mod_name, _, attr = fn.partition(":")
+        return getattr(importlib.import_module(mod_name), attr)
+    return fn
+
+
+def _child_call(fn: Callable | str, args: tuple, kwargs: dict, progress_q) -> Any:
+    # Runs inside the worker process; progress events are relayed via a manager queue.
+    fn = _resolve_target(fn)
+    if progress_q is not None:
+        def progress_callback(step, total, msg):
+            try:
+                progress_q.put((step, total, msg))
+            except Exception:
+                pass
+
+        kwargs = dict(kwargs)
+        kwargs["progress_callback"] = progress_callback
+    return fn(*args, **kwargs)
+
+
+def _warm_call(fn: Callable | str, barrier, timeout_s: float) -> Any:
+    # Hold this worker until every warm task has started, so that each task runs in a
+    # different process (the executor would otherwise hand several to one idle worker).
+    result = _resolve_target(fn)()
+    try:
+        barrier.wait(timeout=timeout_s)
+    except threading.BrokenBarrierError:
+        pass
+    return result
+
+
+class AnalysisPool:
+    def __init__(self, workers: int, queue_depth: int, retry_after_s: int = ANALYSIS_RETRY_AFTER_S):
+        self.workers = max(0, int(workers))
+        self.slots = max(1, self.workers)
+        self.capacity = self.slots + max(0, int(queue_depth))
+        self.retry_after_s = int(retry_after_s)
+        self._cond = threading.Condition()
+        self._admitted: list[AnalysisTicket] = []
+        self._waiting: list[AnalysisTicket] = []
+        self._running = 0
+        self._executor: ProcessPoolExecutor | None = None
+        self._manager = None
+        self._stats = {"admitted": 0, "rejected": 0, "completed": 0, "failed": 0}
+
+    # -- admission ---------------------------------------------------------
+    def admit(self) -> AnalysisTicket:
+        """Reserve a place or raise PoolBusyError immediately."""
+        with self._cond:
+            if len(self._admitted) >= self.capacity:
+                self._stats["rejected"] += 1
+                raise PoolBusyError(self.retry_after_s)
+            ticket = AnalysisTicket(self)
+            self._admitted.append(ticket)
+            self._stats["admitted"] += 1
+            return ticket
+
+    def _release(self, ticket: AnalysisTicket) -> None:
+        with self._cond:
+            if ticket.released:
+                return
+            ticket.released = True
+            if ticket in self._waiting:
+                self._waiting.remove(ticket)
+            if ticket.running:
+                ticket.running = False
+                self._running -= 1
+            if ticket in self._admitted:
+                self._admitted.remove(ticket)
+            self._cond.notify_all()
+
+    def _acquire_slot(self, ticket: AnalysisTicket, on_queue: Callable[[int], None] | None) -> None:
+        # FIFO: a ticket starts when it is at the head of the waiting list and a slot is free.
+        last_pos = None
+        with self._cond:
+            self._waiting.append(ticket)
+            while True:
+                pos = self._waiting.index(ticket) + 1
+                if pos == 1 and self._running < self.slots:
+                    self._waiting.remove(ticket)
+                    ticket.running = True
+                    self._running += 1
+                    self._cond.notify_all()
+                    return
+                if on_queue and pos != last_pos:
+                    last_pos = pos
+                    self._cond.release()
+                    try:
+                        on_queue(pos)
+                    finally:
+                        self._cond.acquire()
+                    continue
+                self._cond.wait(timeout=1.0)
+
+    def _finish_slot(self, ticket: AnalysisTicket) -> None:
+        with self._cond:
+            if ticket.running:
+                ticket.running = False
+                self._running -= 1
+                self._cond.notify_all()
+
+    # -- execution ---------------------------------------------------------
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._cond:
+            if self._executor is None:
+                # spawn: forking a threaded server process is not safe.
+                ctx = mp.get_context("spawn")
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx)
+                self._manager = ctx.Manager()
+            return self._executor
+
+    def _reset_executor(self) -> None:
+        with self._cond:
+            ex, self._executor = self._executor, None
+        if ex is not None:
+            ex.shutdown(wait=False, cancel_futures=True)
+
+    def run(
+        self,
+        ticket: AnalysisTicket,
+        fn: Callable | str,
+        *args,
+        progress_callback: Callable | None = None,
+        on_queue: Callable[[int], None] | None = None,
+        **kwargs,
+    ) -> Any:
+        """
+        Wait for a free slot (reporting queue position via on_queue), then execute
+        fn(*args, **kwargs) in a worker process. Progress callbacks are relayed to the
+        caller thread. The ticket stays admitted; the caller releases it.
+        """
+        self._acquire_slot(ticket, on_queue)
+        try:
+            if self.workers <= 0:
+                result = _resolve_target(fn)(*args, progress_callback=progress_callback, **kwargs)
+            else:
+                result = self._run_in_pool(fn, args, kwargs, progress_callback)
+            with self._cond:
+                self._stats["completed"] += 1
+            return result
+        except Exception:
+            with self._cond:
+                self._stats["failed"] += 1
+            raise
+        finally:
+            self._finish_slot(ticket)
+
+    def _run_in_pool(self, fn: Callable | str, args: tuple, kwargs: dict, progress_callback: Callable | None) -> Any:
+        executor = self._get_executor()
+        progress_q = self._manager.Queue() if progress_callback else None
+        try:
+            future = executor.submit(_child_call, fn, args, kwargs, progress_q)
+        except BrokenProcessPool:
+            self._reset_executor()
+            executor = self._get_executor()
+            progress_q = self._manager.Queue() if progress_callback else None
+            future = executor.submit(_child_call, fn, args, kwargs, progress_q)
+
+        def drain(block_s: float) -> None:
+            if progress_q is None:
+                return
+            try:
+                item = progress_q.get(timeout=block_s) if block_s > 0 else progress_q.get_nowait()
+            except queue.Empty:
+                return
+            progress_callback(*item)
+            while True:
+                try:
+                    item = progress_q.get_nowait()
+                except queue.Empty:
+                    return
+                progress_callback(*item)
+
+        while not future.done():
+            if progress_q is None:
+                time.sleep(0.1)
+            else:
+                drain(0.2)
+        drain(0)
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            # A worker died (typically OOM). Recreate the pool for later requests.
+            self._reset_executor()
+            raise RuntimeError("Analyse-Worker unerwartet beendet (Speicherlimit?).")
+
+    def warm(self, fn: str, timeout_s: float = 300.0) -> list[Any]:
+        """Start all worker processes and run fn (a "module:attr" target) once in each."""
+        if self.workers <= 0:
+            return [_resolve_target(fn)()]
+        executor = self._get_executor()
+        barrier = self._manager.Barrier(self.workers)
+        futures = [executor.submit(_warm_call, fn, barrier, timeout_s) for _ in range(self.workers)]
+        return [f.result(timeout=timeout_s) for f in futures]
+
+    def stats(self) -> dict[str, Any]:
+        with self._cond:
+            return {
+                "workers": self.workers,
+                "queue_depth": self.capacity - self.slots,
+                "active": len(self._admitted),
+                "running": self._running,
+                "waiting": len(self._waiting),
+                **self._stats,
+            }
+
+    def shutdown(self) -> None:
+        self._reset_executor()
+        with self._cond:
+            mgr, self._manager = self._manager, None
+        if mgr is not None:
+            try:
+                mgr.shutdown()
+            except Exception:
+                pass
+
+
+ANALYSIS_POOL = AnalysisPool(ANALYSIS_WORKERS, ANALYSIS_QUEUE_DEPTH)
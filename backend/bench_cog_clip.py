@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import rasterio
+from pyproj import Transformer
+from rasterio.enums import Resampling
+from rasterio.transform import from_origin
+
+import st_cog_dem
+from dataset_pool import DATASET_POOL
+
+_X0, _Y0 = 700_000.0, 5_700_000.0
+
+
+def _build_cog_dir(root: str, grid: int, tile_px: int) -> None:
+    # Tiled GeoTIFFs with internal overviews, named like the ST DGM1 COG tiles.
+    for ix in range(grid):
+        for iy in range(grid):
+            x0 = _X0 + ix * tile_px
+            y0 = _Y0 + iy * tile_px
+            cols = np.arange(tile_px)[None, :] + ix * tile_px
+            rows = np.arange(tile_px)[:, None] - iy * tile_px
+            arr = (np.sin(cols / 90.0) * 25.0 + np.cos(rows / 60.0) * 10.0 + 80.0).astype("float32")
+            path = os.path.join(root, f"dgm1_{ix:03d}_{iy:03d}_cog.tif")
+            with rasterio.open(
+                path,
+                "w",
+                driver="GTiff",
+                width=tile_px,
+                height=tile_px,
+                count=1,
+                dtype="float32",
+                crs="EPSG:25832",
+                nodata=-9999.0,
+                transform=from_origin(x0, y0 + tile_px, 1.0, 1.0),
+                tiled=True,
+                blockxsize=256,
+                blockysize=256,
+            ) as dst:
+                dst.write(arr, 1)
+                dst.build_overviews([2, 4, 8, 16], Resampling.average)
+
+
+def _bbox_wgs84(side_m: float) -> tuple[float, float, float, float]:
+    to_wgs = Transformer.from_crs("EPSG:25832", "EPSG:4326", always_xy=True)
+    cx, cy = _X0 + 1_700.0, _Y0 + 1_900.0
+    west, south = to_wgs.transform(cx - side_m / 2, cy - side_m / 2)
+    east, north = to_wgs.transform(cx + side_m / 2, cy + side_m / 2)
+    return south, west, north, east
+
+
+def _time_ms(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    return round(float(np.median(samples)), 2)
+
+
+def run(args: argparse.Namespace) -> None:
+    cog_dir = tempfile.mkdtemp(prefix="bench_cog_")
+    cache_dir = tempfile.mkdtemp(prefix="bench_cog_cache_")
+    try:
+        _build_cog_dir(cog_dir, args.grid, args.tile_px)
+        st_cog_dem.cog_catalog_for_dir(cog_dir=cog_dir, cache_dir=cache_dir).refresh(force=True)
+
+        results = {}
+        for label, side_m in (("small", args.small_m), ("large", args.large_m)):
+            south, west, north, east = _bbox_wgs84(side_m)
+            bbox = {"south": south, "west": west, "north": north, "east": east, "cog_dir": cog_dir, "cache_dir": cache_dir}
+
+            def temp_clip_and_read_back():
+                # Previous flow: open datasets per request, write a temp GTiff, analysis reads it back.
+                path = st_cog_dem.fetch_dem_from_st_cog_dir(**bbox)
+                with rasterio.open(path) as src:
+                    src.read(1)
+                os.remove(path)
+
+            def pooled_in_memory():
+                st_cog_dem.read_dem_from_st_cog_dir(**bbox)
+
+            def pooled_overview():
+                st_cog_dem.read_dem_from_st_cog_dir(resolution_m=args.overview_res_m, **bbox)
+
+            DATASET_POOL.close_all()
+            DATASET_POOL.max_idle = 0
+            unpooled = _time_ms(temp_clip_and_read_back, args.repeat)
+            DATASET_POOL.max_idle = 64
+            pooled_in_memory()  # fill the pool
+            pooled = _time_ms(pooled_in_memory, args.repeat)
+            overview = _time_ms(pooled_overview, args.repeat)
+            results[label] = {
+                "side_m": side_m,
+                "temp_clip_unpooled_ms": unpooled,
+                "in_memory_pooled_ms": pooled,
+                f"in_memory_pooled_{args.overview_res_m:g}m_ms": overview,
+            }
+        results["dataset_pool"] = DATASET_POOL.stats()
+        print(json.dumps(results, indent=2))
+    finally:
+        DATASET_POOL.close_all()
+        shutil.rmtree(cog_dir, ignore_errors=True)
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Benchmark local COG clipping (temp GTiff vs pooled in-memory reads).")
+    p.add_argument("--grid", type=int, default=6, help="Tiles per side")
+    p.add_argument("--tile-px", type=int, default=1000, help="Pixels per tile side (1 m)")
+    p.add_argument("--small-m", type=float, default=500.0)
+    p.add_argument("--large-m", type=float, default=3000.0)
+    p.add_argument("--overview-res-m", type=float, default=4.0)
+    p.add_argument("--repeat", type=int, default=5)
+    return p
+
+
+if __name__ == "__main__":
+    run(build_parser().parse_args())
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+import starkregen_events
+from weather_series import HourlySeries, parse_hours
+
+HOURS_PER_YEAR = 24 * 365
+
+
+def _synthetic_matrix(points: int, years: float, seed: int) -> tuple[np.ndarray, np.ndarray]:
+    # Mostly dry hours, light rain and a few convective bursts per point and year.
+    rng = np.random.default_rng(seed)
+    n_hours = int(round(years * HOURS_PER_YEAR))
+    hours = np.arange(n_hours, dtype=np.int64) + 438_000
+    x = rng.random((points, n_hours))
+    mm = np.where(x < 0.004, rng.uniform(5.0, 45.0, x.shape), np.where(x < 0.12, rng.uniform(0.0, 3.0, x.shape), 0.0))
+    bursts = max(1, int(8 * years))
+    for p in range(points):
+        for k in rng.integers(0, max(1, n_hours - 8), bursts):
+            mm[p, k : k + int(rng.integers(1, 7))] += rng.uniform(2.0, 12.0)
+    return hours, np.round(mm, 1)
+
+
+def _legacy_detect(series: HourlySeries, source: str) -> list[dict]:
+    # Per-hour loop as used before the matrix engine (reference for speed and output).
+    mm = np.clip(np.nan_to_num(series.mm), 0.0, None).tolist()
+    iso = series.iso_times()
+    n = len(mm)
+
+    def r6(i: int) -> float:
+        return float(sum(mm[max(0, i - 5) : i + 1]))
+
+    trig = [(mm[i] >= 15.0) or (r6(i) >= 20.0) for i in range(n)]
+    events = []
+    i = 0
+    while i < n:
+        if not trig[i]:
+            i += 1
+            continue
+        s = e = i
+        while e + 1 < n and (trig[e + 1] or mm[e + 1] >= 0.2):
+            e += 1
+        max_1h = max(mm[s : e + 1])
+        peak = s + max(range(e - s + 1), key=lambda k: mm[s + k])
+        max_6h = max(r6(j) for j in range(s, e + 1))
+        level, severity = starkregen_events.event_level(max_1h, max_6h)
+        events.append(
+            {
+                "start": iso[s],
+                "end": iso[e],
+                "peak_ts": iso[peak],
+                "max_1h_mm": round(float(max_1h), 2),
+                "max_6h_mm": round(float(max_6h), 2),
+                "sum_mm": round(float(sum(mm[s : e + 1])), 2),
+                "warnstufe": level,
+                "severity": severity,
+                "source": source,
+            }
+        )
+        i = e + 1
+    events.sort(key=lambda ev: (ev["severity"], ev["max_1h_mm"], ev["max_6h_mm"]), reverse=True)
+    return events
+
+
+def run(args: argparse.Namespace) -> None:
+    hours, mm = _synthetic_matrix(args.points, args.years, args.seed)
+    series = [HourlySeries(hours, row, normalized=True) for row in mm]
+    point_years = args.points * args.years
+
+    results: dict = {"points": args.points, "years": args.years}
+    outputs: dict = {}
+    for mode in ("legacy", "matrix"):
+        if mode == "legacy" and args.points * args.years > args.legacy_max_point_years:
+            continue
+        timings = []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            if mode == "legacy":
+                outputs[mode] = [_legacy_detect(s, "bench") for s in series]
+            else:
+                outputs[mode] = starkregen_events.detect_events_batch(series, source="bench")
+            timings.append(time.perf_counter() - t0)
+        best = min(timings)
+        results[mode] = {
+            "seconds": round(best, 4),
+            "point_years_per_s": round(point_years / best, 1),
+            "events": sum(len(evs) for evs in outputs[mode]),
+        }
+
+    t0 = time.perf_counter()
+    # Points on a ~5 km grid, keyed like the API ("lat,lon").
+    side = int(np.ceil(np.sqrt(args.points)))
+    keys = [f"{51.0 + (i // side) * 0.045:.5f},{11.0 + (i % side) * 0.07:.5f}" for i in range(args.points)]
+    flat = [dict(ev, point=keys[i]) for i, evs in enumerate(outputs["matrix"]) for ev in evs]
+    clusters = starkregen_events.cluster_across_points(flat)
+    results["clusters"] = {
+        "count": len(clusters),
+        "max_points": max((c["point_count"] for c in clusters), default=0),
+        "max_span_h": int(np.max(parse_hours([c["end"] for c in clusters]) - parse_hours([c["start"] for c in clusters]), initial=0)),
+        "seconds": round(time.perf_counter() - t0, 4),
+    }
+
+    if "legacy" in outputs:
+        results["speedup"] = round(results["legacy"]["seconds"] / results["matrix"]["seconds"], 1)
+        results["identical"] = outputs["legacy"] == outputs["matrix"]
+    print(json.dumps(results, indent=2))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Benchmark Starkregen event detection (per-series loop vs points x hours matrix).")
+    p.add_argument("--points", type=int, default=200)
+    p.add_argument("--years", type=float, default=1.0, help="Hourly series length in years")
+    p.add_argument("--seed", type=int, default=7)
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--legacy-max-point-years", type=float, default=500.0, help="Skip the loop reference above this size")
+    return p
+
+
+if __name__ == "__main__":
+    run(build_parser().parse_args())
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import rasterio
+from rasterio.io import MemoryFile
+from rasterio.transform import from_origin
+
+import wcs_client
+
+
+def _synthetic_tiles(grid: int, tile_px: int, res: float) -> list[tuple[tuple[float, float, float, float], bytes]]:
+    # GeoTIFF bytes on an aligned EPSG:25832 grid, as a WCS would return them.
+    x_origin, y_origin = 360_000.0, 5_650_000.0
+    tiles = []
+    for ix in range(grid):
+        for iy in range(grid):
+            x0 = x_origin + ix * tile_px * res
+            y0 = y_origin + iy * tile_px * res
+            cols = np.arange(tile_px)[None, :] + ix * tile_px
+            rows = np.arange(tile_px)[:, None] - iy * tile_px
+            arr = (np.sin(cols / 70.0) * 20.0 + np.cos(rows / 50.0) * 15.0 + 100.0).astype("float32")
+            with MemoryFile() as mf:
+                with mf.open(
+                    driver="GTiff",
+                    width=tile_px,
+                    height=tile_px,
+                    count=1,
+                    dtype="float32",
+                    crs="EPSG:25832",
+                    nodata=-9999.0,
+                    transform=from_origin(x0, y0 + tile_px * res, res, res),
+                ) as dst:
+                    dst.write(arr, 1)
+                tiles.append(((x0, y0, x0 + tile_px * res, y0 + tile_px * res), mf.read()))
+    return tiles
+
+
+def _as_temp_files(tiles, tmp_dir: str) -> list[tuple[str, bool]]:
+    out = []
+    for idx, (_extent, data) in enumerate(tiles):
+        path = os.path.join(tmp_dir, f"tile_{idx}.tif")
+        with open(path, "wb") as fh:
+            fh.write(data)
+        out.append((path, True))
+    return out
+
+
+def run(args: argparse.Namespace) -> None:
+    tiles = _synthetic_tiles(args.grid, args.tile_px, args.res)
+    min_x = min(t[0][0] for t in tiles)
+    min_y = min(t[0][1] for t in tiles)
+    max_x = max(t[0][2] for t in tiles)
+    max_y = max(t[0][3] for t in tiles)
+    # AOI slightly inside the tile union, like a snapped-grid request.
+    margin = args.tile_px * args.res * 0.3
+    bounds = (min_x + margin, min_y + margin, max_x - margin, max_y - margin)
+
+    results = {}
+    arrays = {}
+    for mode in ("legacy", "memory"):
+        timings = []
+        for _ in range(args.repeat):
+            tmp_dir = tempfile.mkdtemp(prefix="bench_wcs_")
+            try:
+                # legacy: tiles arrive as temp files (no tile cache); memory: tiles stay as bytes.
+                sources = _as_temp_files(tiles, tmp_dir) if mode == "legacy" else [(d, False) for _e, d in tiles]
+                stats: dict = {}
+                t0 = time.perf_counter()
+                path, count = wcs_client._merge_tiles(iter(sources), bounds=bounds, stats=stats, mode=mode)
+                wall_ms = (time.perf_counter() - t0) * 1000.0
+                with rasterio.open(path) as src:
+                    arrays[mode] = (src.read(1), src.transform)
+                os.remove(path)
+                timings.append({**stats, "wall_ms": round(wall_ms, 1), "tiles": count})
+            finally:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        results[mode] = {
+            "merge_ms_median": float(np.median([t["merge_ms"] for t in timings])),
+            "temp_bytes_peak": max(t["temp_bytes_peak"] for t in timings),
+            "tiles": timings[0]["tiles"],
+        }
+
+    legacy_arr, legacy_tf = arrays["legacy"]
+    memory_arr, memory_tf = arrays["memory"]
+    results["output"] = {
+        "legacy_shape": list(legacy_arr.shape),
+        "memory_shape": list(memory_arr.shape),
+        "legacy_origin": [legacy_tf.c, legacy_tf.f],
+        "memory_origin": [memory_tf.c, memory_tf.f],
+    }
+    if legacy_arr.shape == memory_arr.shape:
+        results["output"]["max_abs_diff"] = float(np.max(np.abs(legacy_arr - memory_arr)))
+    print(json.dumps(results, indent=2))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Benchmark WCS tile mosaicking (legacy rasterio.merge vs in-memory).")
+    p.add_argument("--grid", type=int, default=6, help="Tiles per side")
+    p.add_argument("--tile-px", type=int, default=1000, help="Pixels per tile side")
+    p.add_argument("--res", type=float, default=1.0, help="Pixel size in meters")
+    p.add_argument("--repeat", type=int, default=3)
+    return p
+
+
+if __name__ == "__main__":
+    run(build_parser().parse_args())
@@ -0,0 +1,206 @@
+"""
+Spatially indexed catalog of local COG DEM tiles (sqlite + R-tree).
+
+Replaces the one-shot VRT over all *_cog.tif files: each tile's bounds, resolution,
+CRS, size and mtime are stored in a sqlite table with an R-tree index, so a request
+only opens the tiles that intersect its bbox. refresh() rescans the directory
+incrementally (only new/changed files are opened; deleted files are dropped), so
+new tiles become visible without a restart.
+
+Configuration:
+- COG_CATALOG_REFRESH_S: minimum seconds between automatic directory rescans (default 60)
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+COG_CATALOG_REFRESH_S = float(os.getenv("COG_CATALOG_REFRESH_S", "60") or 0)
+COG_TILE_PATTERN = "*_cog.tif"
+
+
+@dataclass(frozen=True)
+class CogTile:
+    path: str
+    min_x: float
+    min_y: float
+    max_x: float
+    max_y: float
+    res_x: float
+    res_y: float
+    crs: str
+
+
+class CogCatalog:
+    def __init__(self, cog_dir: Path, db_path: Path, pattern: str = COG_TILE_PATTERN):
+        self.cog_dir = cog_dir
+        self.db_path = db_path
+        self.pattern = pattern
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._last_refresh = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), timeout=10.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            cols = {row[1] for row in conn.execute("PRAGMA table_info(tiles)")}
+            if cols and "min_x" not in cols:
+                # Catalogs without exact bounds are rebuilt by the next refresh.
+                conn.execute("DROP TABLE IF EXISTS tiles_rtree")
+                conn.execute("DROP TABLE tiles")
+            # Exact float64 bounds live in tiles; the R-tree (float32, rounded outward)
+            # is only used as a filter.
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS tiles ("
+                " id INTEGER PRIMARY KEY, path TEXT NOT NULL UNIQUE, mtime REAL NOT NULL,"
+                " size INTEGER NOT NULL, res_x REAL NOT NULL, res_y REAL NOT NULL, crs TEXT NOT NULL,"
+                " min_x REAL NOT NULL, min_y REAL NOT NULL, max_x REAL NOT NULL, max_y REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS tiles_rtree USING rtree(id, min_x, max_x, min_y, max_y)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def refresh(self, progress_callback=None, force: bool = False) -> dict[str, int]:
+        """
+        Rescan the directory and update changed entries; returns counts per change type.
+
+        Without force, rescans are skipped within COG_CATALOG_REFRESH_S of the last one.
+        """
+        with self._lock:
+            now = time.time()
+            if not force and self._last_refresh and now - self._last_refresh < COG_CATALOG_REFRESH_S:
+                return {"skipped": 1}
+            counts = self._refresh_locked(progress_callback)
+            self._last_refresh = time.time()
+            return counts
+
+    def _refresh_locked(self, progress_callback) -> dict[str, int]:
+        try:
+            import rasterio
+        except Exception as exc:
+            raise RuntimeError(
+                "COG-Katalog benoetigt 'rasterio'. Bitte OSGeo4W-Umgebung nutzen oder rasterio installieren."
+            ) from exc
+
+        if not self.cog_dir.exists():
+            raise RuntimeError(f"COG dir not found: {self.cog_dir}")
+
+        conn = self._connect()
+        known = {
+            row[0]: (row[1], row[2], row[3])
+            for row in conn.execute("SELECT path, id, mtime, size FROM tiles")
+        }
+        seen: set[str] = set()
+        counts = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0, "failed": 0}
+
+        for p in self.cog_dir.rglob(self.pattern):
+            if not p.is_file():
+                continue
+            path = str(p)
+            seen.add(path)
+            st = p.stat()
+            entry = known.get(path)
+            if entry is not None and entry[1] == st.st_mtime and entry[2] == st.st_size:
+                counts["unchanged"] += 1
+                continue
+            try:
+                with rasterio.open(path) as src:
+                    b = src.bounds
+                    res_x, res_y = src.res
+                    crs = str(src.crs) if src.crs else ""
+            except Exception as exc:
+                print(f"[COG] Tile {path} unreadable: {exc}")
+                counts["failed"] += 1
+                continue
+            if entry is not None:
+                conn.execute("DELETE FROM tiles_rtree WHERE id=?", (entry[0],))
+                conn.execute(
+                    "UPDATE tiles SET mtime=?, size=?, res_x=?, res_y=?, crs=?,"
+                    " min_x=?, min_y=?, max_x=?, max_y=? WHERE id=?",
+                    (st.st_mtime, st.st_size, res_x, res_y, crs, b.left, b.bottom, b.right, b.top, entry[0]),
+                )
+                tile_id = entry[0]
+                counts["updated"] += 1
+            else:
+                cur = conn.execute(
+                    "INSERT INTO tiles (path, mtime, size, res_x, res_y, crs, min_x, min_y, max_x, max_y)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (path, st.st_mtime, st.st_size, res_x, res_y, crs, b.left, b.bottom, b.right, b.top),
+                )
+                tile_id = cur.lastrowid
+                counts["added"] += 1
+            conn.execute(
+                "INSERT INTO tiles_rtree (id, min_x, max_x, min_y, max_y) VALUES (?, ?, ?, ?, ?)",
+                (tile_id, b.left, b.right, b.bottom, b.top),
+            )
+            if progress_callback and (counts["added"] + counts["updated"]) % 500 == 0:
+                progress_callback("vrt", f"Tile-Katalog: {counts['added'] + counts['updated']} Tiles indiziert...")
+
+        for path, (tile_id, _mtime, _size) in known.items():
+            if path not in seen:
+                conn.execute("DELETE FROM tiles_rtree WHERE id=?", (tile_id,))
+                conn.execute("DELETE FROM tiles WHERE id=?", (tile_id,))
+                counts["removed"] += 1
+        conn.commit()
+        if counts["added"] or counts["updated"] or counts["removed"]:
+            print(
+                f"[COG] Catalog {self.cog_dir}: +{counts['added']} ~{counts['updated']} "
+                f"-{counts['removed']} ({counts['unchanged']} unchanged)"
+            )
+        return counts
+
+    def query(self, min_x: float, min_y: float, max_x: float, max_y: float) -> list[CogTile]:
+        """Return all tiles whose bounds intersect the given box (catalog CRS units)."""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT t.path, t.min_x, t.min_y, t.max_x, t.max_y, t.res_x, t.res_y, t.crs"
+                " FROM tiles_rtree r JOIN tiles t ON t.id = r.id"
+                " WHERE r.max_x > ? AND r.min_x < ? AND r.max_y > ? AND r.min_y < ?"
+                " AND t.max_x > ? AND t.min_x < ? AND t.max_y > ? AND t.min_y < ?"
+                " ORDER BY t.path",
+                (min_x, max_x, min_y, max_y) * 2,
+            ).fetchall()
+        return [CogTile(*row) for row in rows]
+
+    def generation(self) -> str:
+        """
+        Content version of the indexed tile set (count, newest mtime, total size).
+
+        Changes whenever refresh() adds, replaces or removes tiles; independent of the
+        directory path, so host and container catalogs of one folder agree.
+        """
+        with self._lock:
+            count, max_mtime, total = self._connect().execute(
+                "SELECT COUNT(*), MAX(mtime), SUM(size) FROM tiles"
+            ).fetchone()
+        return f"{int(count)}-{int(max_mtime or 0)}-{int(total or 0)}"
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            count = self._connect().execute("SELECT COUNT(*) FROM tiles").fetchone()[0]
+        return {"cog_dir": str(self.cog_dir), "tiles": int(count), "last_refresh": self._last_refresh or None}
+
+
+_REGISTRY_LOCK = threading.Lock()
+_REGISTRY: dict[tuple[str, str, str], CogCatalog] = {}
+
+
+def get_catalog(cog_dir: str | Path, db_path: str | Path, pattern: str = COG_TILE_PATTERN) -> CogCatalog:
+    """Return the process-wide catalog for a tile directory (created on first use)."""
+    key = (str(Path(cog_dir).expanduser().resolve()), str(db_path), pattern)
+    with _REGISTRY_LOCK:
+        catalog = _REGISTRY.get(key)
+        if catalog is None:
+            catalog = CogCatalog(Path(key[0]), Path(db_path), pattern)
+            _REGISTRY[key] = catalog
+        return catalog
@@ -0,0 +1,106 @@
+"""
+Long-lived pool of open rasterio dataset handles.
+
+Opening a GeoTIFF/COG/VRT costs header parsing (and for VRTs, parsing every source)
+on each request. The pool keeps handles open across requests. A rasterio dataset
+must not be read from two threads at once, so handles are checked out exclusively:
+a thread gets an idle handle for the path or a freshly opened one, and returns it
+when the with-block ends. Idle handles are bounded (least recently used are closed)
+and dropped when the file's mtime/size changes.
+
+Configuration:
+- DATASET_POOL_MAX_IDLE: maximum idle open handles over all paths (default 64, 0 disables pooling)
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+DATASET_POOL_MAX_IDLE = int(os.getenv("DATASET_POOL_MAX_IDLE", "64") or 0)
+
+
+def _file_sig(path: str) -> tuple[float, int] | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime, st.st_size
+
+
+class DatasetPool:
+    def __init__(self, max_idle: int = DATASET_POOL_MAX_IDLE):
+        self.max_idle = max(0, int(max_idle))
+        self._lock = threading.Lock()
+        # (path, signature) -> idle handles; ordered by last use for LRU closing
+        self._idle: OrderedDict[tuple[str, Any], list] = OrderedDict()
+        self._idle_count = 0
+        self._stats = {"hits": 0, "opens": 0, "closed": 0}
+
+    @contextmanager
+    def dataset(self, path: str) -> Iterator[Any]:
+        """Check out an open dataset for path; it is returned to the pool afterwards."""
+        import rasterio
+
+        key = (str(path), _file_sig(str(path)))
+        src = None
+        with self._lock:
+            handles = self._idle.get(key)
+            if handles:
+                src = handles.pop()
+                self._idle_count -= 1
+                if not handles:
+                    del self._idle[key]
+                self._stats["hits"] += 1
+        if src is None:
+            src = rasterio.open(path)
+            with self._lock:
+                self._stats["opens"] += 1
+        ok = False
+        try:
+            yield src
+            ok = True
+        finally:
+            if ok and not src.closed and self.max_idle > 0:
+                self._checkin(key, src)
+            else:
+                src.close()
+
+    def _checkin(self, key: tuple[str, Any], src) -> None:
+        to_close = []
+        with self._lock:
+            self._idle.setdefault(key, []).append(src)
+            self._idle.move_to_end(key)
+            self._idle_count += 1
+            # Drop handles of older versions of the same file.
+            for other in [k for k in self._idle if k[0] == key[0] and k != key]:
+                stale = self._idle.pop(other)
+                self._idle_count -= len(stale)
+                to_close.extend(stale)
+            while self._idle_count > self.max_idle:
+                old_key, handles = next(iter(self._idle.items()))
+                to_close.append(handles.pop(0))
+                self._idle_count -= 1
+                if not handles:
+                    del self._idle[old_key]
+            self._stats["closed"] += len(to_close)
+        for h in to_close:
+            h.close()
+
+    def close_all(self) -> None:
+        with self._lock:
+            handles = [h for hs in self._idle.values() for h in hs]
+            self._idle.clear()
+            self._idle_count = 0
+        for h in handles:
+            h.close()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {"idle": self._idle_count, "max_idle": self.max_idle, **self._stats}
+
+
+DATASET_POOL = DatasetPool()
@@ -0,0 +1,420 @@
+"""
+Shared, content-addressed cache of clipped DEM windows on disk.
+
+The FastAPI backend and the compute-service worker both fetch DEMs for bboxes.
+With this cache they share the results: a request's identity (source, provider,
+rounded bbox, source options) maps to a ref file, and the ref points to the raster
+stored under the SHA-256 of its content, so identical rasters requested under
+different identities (e.g. provider=auto vs. the detected key) are stored once.
+
+Layout (DEM_SHARED_CACHE_DIR):
+- objects/<sha[:2]>/<sha>.tif   raster content
+- refs/<identity-hash>.json     identity -> object
+- locks/<key[:2]>/<key>.lock    per-identity fetch locks; .global.lock guards eviction
+
+Concurrent writers (threads and processes, also across containers on a shared
+volume) are serialized per identity with file locks, so an AOI is fetched once and
+the other writers read the result. The disk budget is global: after each store the
+least recently used objects (mtime, bumped on every hit) are evicted.
+
+COG identities use the folder name, not the absolute path, so the API on a Windows
+host and the worker container share entries for the same bind-mounted folder. They
+also carry the tile catalog generation (count, newest mtime, total size), and public
+DGM1 identities the archive version (size/ETag), so new or replaced tiles are not
+served from windows cut before the change; stale entries age out via LRU eviction.
+Lock limitation: msvcrt locks (Windows host) and fcntl locks (Linux container) do
+not exclude each other on a bind mount. Between such processes an AOI may be
+fetched twice (the second store is deduplicated by content hash) and an eviction
+may remove an object while the other side stores it; callers still get their own
+copy of the fetched raster (see get_or_fetch).
+
+Configuration:
+- DEM_SHARED_CACHE_DIR: cache directory (default: DEM_CACHE_DIR/dem_windows)
+- DEM_SHARED_CACHE_MAX_MB: disk budget in MB (default 4096, 0 disables the cache)
+- DEM_COG_SOURCE_ID: id of the COG folder in cache identities (default: folder name)
+
+Stats: python dem_cache.py stats
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+DEM_SHARED_CACHE_MAX_MB = float(os.getenv("DEM_SHARED_CACHE_MAX_MB", "4096") or 0)
+# Bump when the fetch pipeline changes the produced rasters for the same identity.
+DEM_CACHE_IDENTITY_VERSION = 1
+# Per-identity lock files untouched for this long are removed during eviction.
+_LOCK_FILE_MAX_AGE_S = 24 * 3600
+
+
+def _default_dir() -> Path:
+    raw = os.getenv("DEM_SHARED_CACHE_DIR")
+    if raw:
+        return Path(raw).expanduser()
+    dem_cache = os.getenv("DEM_CACHE_DIR")
+    if dem_cache:
+        return Path(dem_cache).expanduser() / "dem_windows"
+    return Path(__file__).resolve().parent.parent / "data" / "dem_cache" / "dem_windows"
+
+
+def dem_identity(
+    *,
+    dem_source: str,
+    provider: str,
+    south: float,
+    west: float,
+    north: float,
+    east: float,
+    st_parts: list[int] | str | None = None,
+    st_cog_dir: str | None = None,
+    max_cells: int | None = None,
+    dem_cache_dir: str | None = None,
+) -> dict[str, Any]:
+    """
+    Normalized identity of a DEM window request (same for backend and worker).
+
+    cog/public identities carry the source version (catalog generation / DGM1 archive
+    version), so refreshed tiles are not served from windows cut before the change.
+    """
+    source = (dem_source or "wcs").strip().lower()
+    ident: dict[str, Any] = {
+        "v": DEM_CACHE_IDENTITY_VERSION,
+        "dem_source": source,
+        "bbox": [round(float(v), 6) for v in (south, west, north, east)],
+    }
+    if source == "wcs":
+        ident["provider"] = (provider or "auto").strip().lower()
+    else:
+        ident["max_cells"] = int(max_cells) if max_cells else None
+    if source == "public":
+        if isinstance(st_parts, str):
+            parts = [int(x) for x in st_parts.split(",") if x.strip()]
+        else:
+            parts = [int(x) for x in (st_parts or [1])]
+        ident["st_parts"] = sorted(set(parts)) or [1]
+        ident["source_version"] = _public_source_version(ident["st_parts"], dem_cache_dir)
+    if source == "cog":
+        ident["cog_source"] = cog_source_id(st_cog_dir)
+        ident["source_version"] = _cog_generation(st_cog_dir, dem_cache_dir)
+    return ident
+
+
+def _cog_generation(st_cog_dir: str | None, dem_cache_dir: str | None) -> str | None:
+    if not st_cog_dir:
+        return None
+    try:
+        from st_cog_dem import cog_catalog_for_dir
+
+        catalog = cog_catalog_for_dir(cog_dir=st_cog_dir, cache_dir=dem_cache_dir)
+        # Throttled rescan (COG_CATALOG_REFRESH_S); the fetch itself then skips it.
+        catalog.refresh()
+        return catalog.generation()
+    except Exception as exc:
+        print(f"[DEM-CACHE] COG catalog generation unavailable: {exc}")
+        return None
+
+
+def _public_source_version(parts: list[int], dem_cache_dir: str | None) -> str | None:
+    try:
+        from st_public_dem import source_version
+
+        return source_version(parts, cache_dir=dem_cache_dir)
+    except Exception as exc:
+        print(f"[DEM-CACHE] DGM1 source version unavailable: {exc}")
+        return None
+
+
+def cog_source_id(st_cog_dir: str | None) -> str | None:
+    """
+    Stable id of a COG folder: its basename (DEM_COG_SOURCE_ID overrides).
+
+    The absolute path differs between the host (D:/data/st_dgm1_cog) and the worker
+    container (/data/st_dgm1_cog); the folder name is the same on both sides.
+    """
+    override = (os.getenv("DEM_COG_SOURCE_ID") or "").strip()
+    if override:
+        return override
+    if not st_cog_dir:
+        return None
+    return str(st_cog_dir).replace("\\", "/").rstrip("/").rsplit("/", 1)[-1].lower() or None
+
+
+class _FileLock:
+    """Exclusive inter-process lock on a small lock file (fcntl/msvcrt)."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._fh = None
+
+    def __enter__(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fh = open(self.path, "a+b")
+        if fcntl is not None:
+            fcntl.flock(self._fh.fileno(), fcntl.LOCK_EX)
+        else:
+            self._fh.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(self._fh.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK gives up after ~10 s; keep waiting for the holder.
+                    continue
+        try:
+            # Last use, for pruning idle lock files.
+            os.utime(self.path)
+        except OSError:
+            pass
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fh.fileno(), fcntl.LOCK_UN)
+            else:
+                self._fh.seek(0)
+                msvcrt.locking(self._fh.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._fh.close()
+            self._fh = None
+
+
+def _sha256_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class DemWindowCache:
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = root
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stored": 0, "deduplicated": 0, "evicted": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _ref_path(self, key: str) -> Path:
+        return self.root / "refs" / f"{key}.json"
+
+    def _object_path(self, digest: str) -> Path:
+        return self.root / "objects" / digest[:2] / f"{digest}.tif"
+
+    def _lock_path(self, key: str) -> Path:
+        # One lock file per identity: unrelated AOIs never wait for each other's fetch.
+        return self.root / "locks" / key[:2] / f"{key}.lock"
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._stats[name] += n
+
+    def _lookup(self, key: str) -> str | None:
+        """Return a caller-owned copy of the cached raster for key, or None."""
+        try:
+            ref = json.loads(self._ref_path(key).read_text(encoding="utf-8"))
+            obj = self._object_path(str(ref["object"]))
+            now = time.time()
+            os.utime(obj, (now, now))
+            return self._materialize(obj)
+        except (OSError, ValueError, KeyError):
+            # Missing ref, or object evicted between ref read and copy.
+            return None
+
+    def _materialize(self, obj: Path) -> str:
+        fd, out = tempfile.mkstemp(suffix=".tif")
+        os.close(fd)
+        try:
+            os.remove(out)
+            os.link(obj, out)
+        except OSError:
+            try:
+                shutil.copyfile(obj, out)
+            except OSError:
+                if os.path.exists(out):
+                    os.remove(out)
+                raise
+        return out
+
+    def _store(self, key: str, identity: dict[str, Any], src_path: str) -> Path:
+        digest = _sha256_file(src_path)
+        obj = self._object_path(digest)
+        obj.parent.mkdir(parents=True, exist_ok=True)
+        if obj.exists():
+            os.remove(src_path)
+            self._count("deduplicated")
+        else:
+            tmp = obj.with_suffix(f".{os.getpid()}.{threading.get_ident()}.part")
+            shutil.move(src_path, tmp)
+            os.replace(tmp, obj)
+            self._count("stored")
+        ref = self._ref_path(key)
+        ref.parent.mkdir(parents=True, exist_ok=True)
+        tmp_ref = ref.with_suffix(f".{os.getpid()}.{threading.get_ident()}.part")
+        tmp_ref.write_text(
+            json.dumps({"object": digest, "identity": identity, "created": time.time()}),
+            encoding="utf-8",
+        )
+        os.replace(tmp_ref, ref)
+        return obj
+
+    def get_or_fetch(self, identity: dict[str, Any], fetch_fn: Callable[[], str], stats: dict | None = None) -> str:
+        """
+        Return a temp GeoTIFF for identity (caller owns and deletes it).
+
+        On a miss fetch_fn() is called under the identity's lock and its result is
+        stored; concurrent callers for the same identity wait and then hit.
+        """
+        if not self.enabled:
+            return fetch_fn()
+        key = hashlib.sha256(json.dumps(identity, sort_keys=True).encode("utf-8")).hexdigest()
+        path = self._lookup(key)
+        if path is None:
+            with _FileLock(self._lock_path(key)):
+                path = self._lookup(key)
+                if path is None:
+                    src = fetch_fn()
+                    # Hand the caller its own link/copy before the file moves into the
+                    # store: eviction in another process only holds .global.lock and may
+                    # delete the object right after it is stored.
+                    path = self._materialize(Path(src))
+                    try:
+                        self._store(key, identity, src)
+                    except OSError as exc:
+                        print(f"[DEM-CACHE] Store failed, result not cached: {exc}")
+                        if os.path.exists(src):
+                            os.remove(src)
+                    self._count("misses")
+                    if stats is not None:
+                        stats["shared_cache"] = "miss"
+                    self.evict()
+                    return path
+        self._count("hits")
+        if stats is not None:
+            stats["shared_cache"] = "hit"
+        return path
+
+    def _prune_lock_files(self) -> None:
+        # A lock file deleted while a late opener waits on it only risks one duplicate
+        # fetch (deduplicated by content hash); after a day nobody is waiting anymore.
+        cutoff = time.time() - _LOCK_FILE_MAX_AGE_S
+        locks = self.root / "locks"
+        if not locks.exists():
+            return
+        for f in locks.glob("*/*.lock"):
+            try:
+                if f.stat().st_mtime < cutoff:
+                    f.unlink()
+            except OSError:
+                pass
+
+    def _scan_objects(self) -> list[tuple[float, int, Path]]:
+        entries = []
+        objects = self.root / "objects"
+        if objects.exists():
+            for f in objects.rglob("*.tif"):
+                try:
+                    st = f.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, f))
+        return entries
+
+    def evict(self, max_bytes: int | None = None) -> int:
+        """Evict least recently used objects down to 90% of the budget; returns the count."""
+        budget = self.max_bytes if max_bytes is None else int(max_bytes)
+        with _FileLock(self.root / "locks" / ".global.lock"):
+            self._prune_lock_files()
+            entries = self._scan_objects()
+            total = sum(e[1] for e in entries)
+            if total <= budget:
+                return 0
+            entries.sort()
+            target = int(budget * 0.9)
+            removed = 0
+            for _mtime, size, f in entries:
+                if total <= target:
+                    break
+                try:
+                    f.unlink()
+                    total -= size
+                    removed += 1
+                except OSError:
+                    pass
+            # Refs to evicted objects are dropped lazily on lookup; remove them here as well.
+            refs = self.root / "refs"
+            if removed and refs.exists():
+                for r in refs.glob("*.json"):
+                    try:
+                        digest = json.loads(r.read_text(encoding="utf-8"))["object"]
+                        if not self._object_path(str(digest)).exists():
+                            r.unlink()
+                    except (OSError, ValueError, KeyError):
+                        pass
+        self._count("evicted", removed)
+        print(f"[DEM-CACHE] Evicted {removed} raster(s), {total / 1e6:.0f} MB in use")
+        return removed
+
+    def stats(self, scan: bool = False) -> dict[str, Any]:
+        with self._lock:
+            out: dict[str, Any] = {
+                "dir": str(self.root),
+                "enabled": self.enabled,
+                "max_mb": round(self.max_bytes / (1024 * 1024), 1),
+                **self._stats,
+            }
+        if scan:
+            entries = self._scan_objects()
+            refs = self.root / "refs"
+            out["objects"] = len(entries)
+            out["refs"] = len(list(refs.glob("*.json"))) if refs.exists() else 0
+            out["used_mb"] = round(sum(e[1] for e in entries) / (1024 * 1024), 1)
+            out["oldest_access"] = min((e[0] for e in entries), default=None)
+        return out
+
+
+_CACHE_LOCK = threading.Lock()
+_CACHE: DemWindowCache | None = None
+
+
+def get_dem_cache() -> DemWindowCache:
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = DemWindowCache(_default_dir(), int(DEM_SHARED_CACHE_MAX_MB * 1024 * 1024))
+        return _CACHE
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Shared DEM window cache: stats and pruning.")
+    p.add_argument("command", choices=("stats", "prune"))
+    p.add_argument("--dir", default=None, help="Cache directory (default DEM_SHARED_CACHE_DIR)")
+    p.add_argument("--max-mb", type=float, default=None, help="prune: budget in MB (default DEM_SHARED_CACHE_MAX_MB)")
+    return p
+
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    cache = get_dem_cache() if not args.dir else DemWindowCache(Path(args.dir), int(DEM_SHARED_CACHE_MAX_MB * 1024 * 1024))
+    if args.command == "prune":
+        budget = int(args.max_mb * 1024 * 1024) if args.max_mb is not None else cache.max_bytes
+        print(f"[DEM-CACHE] Pruned {cache.evict(max_bytes=budget)} raster(s)")
+    print(json.dumps(cache.stats(scan=True), indent=2))
@@ -0,0 +1,204 @@
+"""
+DEM prefetch ahead of batch analyses.
+
+Batch runners know which fields come next. They post the upcoming bboxes to
+/dem/prefetch; the DEMs are fetched in background threads while the current fields
+are analysed, so network/disk latency overlaps with compute. A later analysis of the
+same bbox + source takes the prefetched GeoTIFF (hardlink) instead of fetching
+again, or waits for a prefetch that is already queued or running.
+
+Bounds:
+- DEM_PREFETCH_WORKERS: concurrent background fetches (default 2, 0 disables prefetching)
+- DEM_PREFETCH_MAX_PENDING: queued + running jobs; further submissions are rejected (default 64)
+- DEM_PREFETCH_MAX_MB: disk budget for ready DEMs, least recently used are dropped (default 1024)
+
+Ready DEMs live in a per-process temp folder. With several uvicorn workers a request
+may land on a worker without the prefetched file; the fetch then still profits from
+the shared on-disk caches (DEM window cache, WCS tiles, extracted DGM1 tiles, pyramid levels).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+DEM_PREFETCH_WORKERS = int(os.getenv("DEM_PREFETCH_WORKERS", "2") or 0)
+DEM_PREFETCH_MAX_PENDING = int(os.getenv("DEM_PREFETCH_MAX_PENDING", "64") or 0)
+DEM_PREFETCH_MAX_MB = float(os.getenv("DEM_PREFETCH_MAX_MB", "1024") or 0)
+
+# Parameters that identify a DEM; everything else (progress callbacks, confirmations) is not part of the key.
+_KEY_PARAMS = ("south", "west", "north", "east", "provider", "dem_source", "st_parts", "dem_cache_dir", "st_cog_dir")
+
+
+def prefetch_key(params: dict[str, Any]) -> str:
+    ident = {}
+    for name in _KEY_PARAMS:
+        value = params.get(name)
+        ident[name] = round(float(value), 7) if isinstance(value, float) else value
+    return hashlib.sha1(json.dumps(ident, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class DemPrefetcher:
+    def __init__(
+        self,
+        fetch_fn: Callable[..., str],
+        workers: int = DEM_PREFETCH_WORKERS,
+        max_pending: int = DEM_PREFETCH_MAX_PENDING,
+        max_mb: float = DEM_PREFETCH_MAX_MB,
+    ):
+        self.fetch_fn = fetch_fn
+        self.workers = max(0, int(workers))
+        self.max_pending = max(0, int(max_pending))
+        self.max_bytes = int(max(0.0, max_mb) * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._executor: ThreadPoolExecutor | None = None
+        self._root: str | None = None
+        self._pending: dict[str, Future] = {}
+        # key -> (path, size, acquisition stats); ordered by last use
+        self._ready: OrderedDict[str, tuple[str, int, dict]] = OrderedDict()
+        self._ready_bytes = 0
+        self._stats = {"submitted": 0, "rejected": 0, "fetched": 0, "failed": 0, "hits": 0, "joined": 0, "evicted": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0 and self.max_pending > 0 and self.max_bytes > 0
+
+    def submit(self, params: dict[str, Any]) -> str:
+        """Queue a background fetch; returns 'queued', 'ready', 'pending', 'full' or 'disabled'."""
+        if not self.enabled:
+            return "disabled"
+        key = prefetch_key(params)
+        with self._lock:
+            if key in self._ready:
+                self._ready.move_to_end(key)
+                return "ready"
+            if key in self._pending:
+                return "pending"
+            if len(self._pending) >= self.max_pending:
+                self._stats["rejected"] += 1
+                return "full"
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="dem-prefetch")
+                self._root = tempfile.mkdtemp(prefix="dem_prefetch_")
+            self._pending[key] = self._executor.submit(self._run, key, dict(params))
+            self._stats["submitted"] += 1
+        return "queued"
+
+    def _run(self, key: str, params: dict[str, Any]) -> None:
+        acquisition: dict = {}
+        t0 = time.perf_counter()
+        try:
+            path = self.fetch_fn(acquisition=acquisition, **params)
+            target = os.path.join(self._root or tempfile.gettempdir(), f"{key}.tif")
+            shutil.move(path, target)
+            size = os.path.getsize(target)
+            acquisition["prefetch_fetch_ms"] = round((time.perf_counter() - t0) * 1000.0, 1)
+            to_remove = []
+            with self._lock:
+                self._ready[key] = (target, size, acquisition)
+                self._ready_bytes += size
+                self._stats["fetched"] += 1
+                while self._ready_bytes > self.max_bytes and len(self._ready) > 1:
+                    _old_key, (old_path, old_size, _acq) = self._ready.popitem(last=False)
+                    self._ready_bytes -= old_size
+                    self._stats["evicted"] += 1
+                    to_remove.append(old_path)
+            for p in to_remove:
+                _remove_quiet(p)
+        except Exception as exc:
+            with self._lock:
+                self._stats["failed"] += 1
+            print(f"[PREFETCH] DEM fetch failed: {exc}")
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def acquire(self, params: dict[str, Any], acquisition: dict | None = None) -> str | None:
+        """
+        Return a private path to the prefetched DEM for params, or None (caller fetches itself).
+
+        A prefetch that is queued or running is awaited, so the look-ahead still pays
+        off when the batch catches up with it. The returned path is a hardlink (a copy
+        if linking fails) that the caller owns and removes.
+        """
+        if not self.enabled:
+            return None
+        key = prefetch_key(params)
+        with self._lock:
+            future = self._pending.get(key)
+        if future is not None:
+            try:
+                future.result()
+            except CancelledError:
+                return None
+            joined = True
+        else:
+            joined = False
+        with self._lock:
+            entry = self._ready.get(key)
+            if entry is None:
+                return None
+            self._ready.move_to_end(key)
+            self._stats["joined" if joined else "hits"] += 1
+            path, _size, prefetch_stats = entry
+            out = os.path.join(os.path.dirname(path), f"{key}.{uuid.uuid4().hex[:12]}.tif")
+            try:
+                # O(1) under the lock; eviction only unlinks the ready entry's own name.
+                os.link(path, out)
+                src = None
+            except OSError:
+                src = open(path, "rb")
+        if src is not None:
+            # Copy outside the lock from the open handle (survives a concurrent eviction).
+            with src, open(out, "wb") as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+        if acquisition is not None:
+            acquisition.update(prefetch_stats)
+            acquisition["prefetch"] = "joined" if joined else "hit"
+        return out
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "workers": self.workers,
+                "pending": len(self._pending),
+                "max_pending": self.max_pending,
+                "ready": len(self._ready),
+                "ready_mb": round(self._ready_bytes / (1024 * 1024), 1),
+                "max_mb": round(self.max_bytes / (1024 * 1024), 1),
+                **self._stats,
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+            for future in self._pending.values():
+                future.cancel()
+        if executor is not None:
+            executor.shutdown(wait=True)
+        with self._lock:
+            paths = [entry[0] for entry in self._ready.values()]
+            self._ready.clear()
+            self._ready_bytes = 0
+            root, self._root = self._root, None
+        for p in paths:
+            _remove_quiet(p)
+        if root:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+def _remove_quiet(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
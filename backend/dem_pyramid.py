@@ -0,0 +1,269 @@
+"""
+Overview pyramid (2/4/8/16 m) for local DEM tiles (ST COG folder, extracted public DGM1).
+
+Large AOIs used to be read at full 1 m resolution and then bilinearly resampled in
+_prepare_analysis_dem. pick_level() chooses the finest pyramid level whose grid for
+the bbox fits MAX_ANALYSIS_CELLS, and pyramid_tiles() maps catalog tiles to that
+level, so the clip is read directly at the analysis resolution.
+
+Per tile and level the pyramid is either the tile's own internal overview (COGs
+usually have them; GDAL serves out_shape reads from it) or a downsampled copy
+(average resampling) in DEM_CACHE_DIR/dem_pyramid, built on first use. Source
+directories are never written to.
+
+Configuration:
+- DEM_PYRAMID_LEVELS_M: comma list of levels in meters (default 2,4,8,16; empty disables)
+- MAX_ANALYSIS_CELLS: cell budget of one analysis (single definition; processing.py
+  and the compute-service import it from here)
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import math
+import os
+import tempfile
+import threading
+from dataclasses import replace
+from pathlib import Path
+
+from cog_catalog import CogTile
+
+MAX_ANALYSIS_CELLS = int(os.getenv("MAX_ANALYSIS_CELLS", "4000000") or 4_000_000)
+
+
+def _levels_from_env() -> tuple[float, ...]:
+    raw = os.getenv("DEM_PYRAMID_LEVELS_M", "2,4,8,16")
+    return tuple(sorted(float(x) for x in (raw or "").split(",") if x.strip()))
+
+
+DEM_PYRAMID_LEVELS_M = _levels_from_env()
+_BUILD_LOCK = threading.Lock()
+
+
+def _pyramid_root() -> Path:
+    raw = os.getenv("DEM_CACHE_DIR")
+    base = Path(raw).expanduser() if raw else Path(__file__).resolve().parent.parent / "data" / "dem_cache"
+    return base / "dem_pyramid"
+
+
+class DemTooLargeError(RuntimeError):
+    """Raised when the bbox does not fit max_cells even at the coarsest pyramid level."""
+
+
+def snapped_cells(
+    min_x: float,
+    min_y: float,
+    max_x: float,
+    max_y: float,
+    res: float,
+    anchor_x: float = 0.0,
+    anchor_y: float = 0.0,
+) -> int:
+    """Cell count of the bbox on the res grid through (anchor_x, anchor_y), snapped outward."""
+    left = anchor_x + math.floor((min_x - anchor_x) / res) * res
+    top = anchor_y - math.floor((anchor_y - max_y) / res) * res
+    width = max(1, math.ceil((max_x - left) / res))
+    height = max(1, math.ceil((top - min_y) / res))
+    return width * height
+
+
+def pick_level(
+    min_x: float,
+    min_y: float,
+    max_x: float,
+    max_y: float,
+    native_res_m: float,
+    max_cells: int = MAX_ANALYSIS_CELLS,
+    anchor: tuple[float, float] = (0.0, 0.0),
+) -> float | None:
+    """
+    Return the finest pyramid level (m) whose grid fits max_cells, or None if the
+    native resolution already fits. Cells are counted on the outward-snapped grid the
+    mosaic builds (anchored at the first tile's top-left corner). Raises
+    DemTooLargeError if no level fits.
+    """
+
+    def cells(res: float) -> int:
+        return snapped_cells(min_x, min_y, max_x, max_y, res, *anchor)
+
+    if cells(native_res_m) <= max_cells:
+        return None
+    levels = [lvl for lvl in DEM_PYRAMID_LEVELS_M if lvl > native_res_m]
+    for lvl in levels:
+        if cells(lvl) <= max_cells:
+            return lvl
+    coarsest = levels[-1] if levels else native_res_m
+    raise DemTooLargeError(
+        f"Auswahl zu gross: {cells(coarsest)} Zellen bei {coarsest:g} m "
+        f"(max {max_cells}). Bitte Bereich verkleinern."
+    )
+
+
+def _overview_path(tile_path: str, level_m: float) -> Path:
+    digest = hashlib.sha1(str(Path(tile_path).resolve()).encode("utf-8")).hexdigest()[:12]
+    return _pyramid_root() / f"{level_m:g}m" / f"{digest}_{Path(tile_path).stem}.tif"
+
+
+def _has_internal_overview(src, factor: float) -> bool:
+    return any(abs(ov - factor) < 1e-6 for ov in src.overviews(1))
+
+
+def _build_overview_tile(tile_path: str, level_m: float, out_path: Path) -> tuple[float, float, float, float]:
+    """Write the tile downsampled to level_m on the global level grid; returns its bounds."""
+    import rasterio
+    from rasterio.enums import Resampling
+    from rasterio.transform import from_origin
+    from rasterio.windows import from_bounds
+
+    with rasterio.open(tile_path) as src:
+        b = src.bounds
+        # Snap to multiples of level_m so tiles of one level share a pixel grid.
+        left = math.floor(b.left / level_m) * level_m
+        bottom = math.floor(b.bottom / level_m) * level_m
+        right = math.ceil(b.right / level_m) * level_m
+        top = math.ceil(b.top / level_m) * level_m
+        width = max(1, int(round((right - left) / level_m)))
+        height = max(1, int(round((top - bottom) / level_m)))
+        nodata = src.nodata if src.nodata is not None else -9999.0
+        data = src.read(
+            1,
+            window=from_bounds(left, bottom, right, top, transform=src.transform),
+            out_shape=(height, width),
+            boundless=True,
+            fill_value=nodata,
+            resampling=Resampling.average,
+        )
+        profile = {
+            "driver": "GTiff",
+            "count": 1,
+            "dtype": src.dtypes[0],
+            "crs": src.crs,
+            "nodata": nodata,
+            "width": width,
+            "height": height,
+            "transform": from_origin(left, top, level_m, level_m),
+            "tiled": width >= 256 and height >= 256,
+        }
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(suffix=".tif", dir=str(out_path.parent))
+    os.close(fd)
+    try:
+        with rasterio.open(tmp, "w", **profile) as dst:
+            dst.write(data, 1)
+        os.replace(tmp, out_path)
+    except Exception:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    return left, bottom, right, top
+
+
+def _snapped_bounds(tile: CogTile, level_m: float) -> tuple[float, float, float, float]:
+    return (
+        math.floor(tile.min_x / level_m) * level_m,
+        math.floor(tile.min_y / level_m) * level_m,
+        math.ceil(tile.max_x / level_m) * level_m,
+        math.ceil(tile.max_y / level_m) * level_m,
+    )
+
+
+def pyramid_tiles(tiles: list[CogTile], level_m: float) -> tuple[list[CogTile], dict[str, int]]:
+    """
+    Map catalog tiles to the given level; returns (tiles, counts).
+
+    Tiles with a matching internal overview are returned unchanged (the reader uses
+    out_shape). Others are replaced by their cached downsampled copy, built if
+    missing or older than the tile.
+    """
+    from dataset_pool import DATASET_POOL
+
+    out: list[CogTile] = []
+    counts = {"internal": 0, "cached": 0, "built": 0}
+    for tile in tiles:
+        factor = level_m / tile.res_x
+        with DATASET_POOL.dataset(tile.path) as src:
+            internal = _has_internal_overview(src, factor)
+        if internal:
+            out.append(tile)
+            counts["internal"] += 1
+            continue
+        ov_path = _overview_path(tile.path, level_m)
+        fresh = ov_path.exists() and ov_path.stat().st_mtime >= os.path.getmtime(tile.path)
+        if not fresh:
+            with _BUILD_LOCK:
+                fresh = ov_path.exists() and ov_path.stat().st_mtime >= os.path.getmtime(tile.path)
+                if not fresh:
+                    _build_overview_tile(tile.path, level_m, ov_path)
+                    counts["built"] += 1
+        if fresh:
+            counts["cached"] += 1
+        min_x, min_y, max_x, max_y = _snapped_bounds(tile, level_m)
+        out.append(
+            replace(tile, path=str(ov_path), min_x=min_x, min_y=min_y, max_x=max_x, max_y=max_y, res_x=level_m, res_y=level_m)
+        )
+    return out, counts
+
+
+def select_pyramid(
+    tiles: list[CogTile],
+    min_x: float,
+    min_y: float,
+    max_x: float,
+    max_y: float,
+    max_cells: int | None,
+    stats: dict | None = None,
+) -> tuple[list[CogTile], float | None]:
+    """
+    Pick the level for the bbox (see pick_level) and map the tiles to it.
+
+    Returns (tiles, resolution_m); resolution_m is None when the native grid fits or
+    max_cells is None. Raises DemTooLargeError when no level fits. stats (optional) receives pyramid_level_m and tile counts.
+    """
+    if not tiles or not max_cells or not DEM_PYRAMID_LEVELS_M:
+        return tiles, None
+    native = min(t.res_x for t in tiles)
+    level = pick_level(min_x, min_y, max_x, max_y, native, max_cells, anchor=(tiles[0].min_x, tiles[0].max_y))
+    if stats is not None:
+        stats["pyramid_level_m"] = level
+    if level is None:
+        return tiles, None
+    mapped, counts = pyramid_tiles(tiles, level)
+    if stats is not None:
+        stats["pyramid_tiles"] = counts
+    print(f"[PYRAMID] bbox {max_x - min_x:.0f}x{max_y - min_y:.0f} m -> {level:g} m level {counts}")
+    return mapped, level
+
+
+def build_pyramid_for_dir(tile_dir: str, pattern: str = "*_cog.tif", levels: tuple[float, ...] | None = None) -> dict:
+    """Prebuild all pyramid levels for every tile in tile_dir (CLI / batch preparation)."""
+    from cog_catalog import get_catalog
+
+    levels = tuple(levels or DEM_PYRAMID_LEVELS_M)
+    root = Path(tile_dir).expanduser()
+    catalog = get_catalog(root, _pyramid_root() / f"catalog_{hashlib.sha1(str(root.resolve()).encode()).hexdigest()[:12]}.sqlite", pattern)
+    catalog.refresh(force=True)
+    tiles = catalog.query(-math.inf, -math.inf, math.inf, math.inf)
+    summary = {}
+    for lvl in levels:
+        _, counts = pyramid_tiles(tiles, lvl)
+        summary[f"{lvl:g}m"] = counts
+        print(f"[PYRAMID] {lvl:g} m: {counts}")
+    return {"tiles": len(tiles), "levels": summary}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Build DEM overview pyramid levels for a tile folder.")
+    p.add_argument("tile_dir", help="Folder with DEM tiles (e.g. ST_COG_DIR or extracted DGM1 part)")
+    p.add_argument("--pattern", default="*_cog.tif", help="Tile file pattern (default *_cog.tif; public DGM1: *.tif)")
+    p.add_argument("--levels", default=None, help="Comma list in meters (default DEM_PYRAMID_LEVELS_M)")
+    return p
+
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    lv = tuple(float(x) for x in args.levels.split(",")) if args.levels else None
+    print(build_pyramid_for_dir(args.tile_dir, pattern=args.pattern, levels=lv))
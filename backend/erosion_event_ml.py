@@ -5,6 +5,7 @@ import json
 import math
 import os
 import re
+import threading
 from typing import Any
 
 import numpy as np
@@ -48,6 +49,41 @@ def _normalize(arr: np.ndarray) -> np.ndarray:
     return np.clip(out, 0.0, 1.0)
 
 
+_ARTIFACT_LOCK = threading.Lock()
+_ARTIFACT_CACHE: dict[str, tuple[float, Any]] = {}
+
+
+def load_joblib_artifact(artifact_path: str) -> Any:
+    """joblib.load with a per-process cache (invalidated when the file mtime changes)."""
+    try:
+        import joblib  # type: ignore
+    except Exception as exc:
+        raise RuntimeError(f"joblib artifact requires joblib package: {exc}")
+
+    mtime = os.path.getmtime(artifact_path)
+    with _ARTIFACT_LOCK:
+        hit = _ARTIFACT_CACHE.get(artifact_path)
+        if hit and hit[0] == mtime:
+            return hit[1]
+        model = joblib.load(artifact_path)
+        _ARTIFACT_CACHE[artifact_path] = (mtime, model)
+        return model
+
+
+def configured_artifact_paths() -> list[str]:
+    """All model artifacts reachable via env vars or models/event_ml (for warm-up)."""
+    paths: list[str] = []
+    for key, val in os.environ.items():
+        if key.startswith("EROSION_EVENT_ML_ARTIFACT") and val and os.path.exists(val):
+            paths.append(val)
+    base = os.path.join(os.path.dirname(__file__), "models", "event_ml")
+    if os.path.isdir(base):
+        for name in sorted(os.listdir(base)):
+            if name.lower().endswith((".joblib", ".pkl", ".pickle")):
+                paths.append(os.path.join(base, name))
+    return sorted(set(paths))
+
+
 def _sanitize_key(key: str) -> str:
     return re.sub(r"[^A-Za-z0-9]+", "_", str(key or "")).strip("_").upper()
 
@@ -167,12 +203,7 @@ def _predict_linear_json(features: dict[str, np.ndarray], artifact: dict[str, An
 
 
 def _predict_joblib(features: dict[str, np.ndarray], valid_mask: np.ndarray, artifact_path: str) -> np.ndarray:
-    try:
-        import joblib  # type: ignore
-    except Exception as exc:
-        raise RuntimeError(f"joblib artifact requires joblib package: {exc}")
-
-    model = joblib.load(artifact_path)
+    model = load_joblib_artifact(artifact_path)
     order = getattr(model, "feature_names_in_", None)
     if order is None:
         order = FEATURE_CONTRACT
@@ -320,9 +351,7 @@ def infer_erosion_event_ml(
     severity_error = None
     if severity_artifact_path and severity_artifact_path.lower().endswith((".joblib", ".pkl", ".pickle")):
         try:
-            import joblib  # type: ignore
-
-            model_s = joblib.load(severity_artifact_path)
+            model_s = load_joblib_artifact(severity_artifact_path)
             order = getattr(model_s, "feature_names_in_", None)
             if order is None:
                 order = FEATURE_CONTRACT
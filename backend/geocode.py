@@ -7,6 +7,7 @@ from typing import Any
 
 import requests
 
+from tiered_cache import get_cache
 
 NOMINATIM_URL = os.getenv("NOMINATIM_URL", "https://nominatim.openstreetmap.org/search")
 NOMINATIM_USER_AGENT = os.getenv(
@@ -17,28 +18,17 @@ NOMINATIM_USER_AGENT = os.getenv(
 # Keep request rate bounded; interval is configurable via GEOCODE_MIN_INTERVAL_S.
 _LOCK = threading.Lock()
 _LAST_CALL = 0.0
-_CACHE: dict[tuple, tuple[float, list[dict[str, Any]]]] = {}
 _CACHE_TTL_S = float(os.getenv("GEOCODE_CACHE_TTL_S", str(24 * 3600)))
+_CACHE = get_cache(
+    "geocode",
+    ttl_s=_CACHE_TTL_S,
+    max_items=int(os.getenv("GEOCODE_CACHE_MAX_ITEMS", "2000") or 2000),
+    disk=True,
+)
 _MIN_INTERVAL_S = float(os.getenv("GEOCODE_MIN_INTERVAL_S", "0.25"))
 _REQUEST_TIMEOUT_S = float(os.getenv("GEOCODE_TIMEOUT_S", "6"))
 
 
-def _cache_get(key: tuple) -> list[dict[str, Any]] | None:
-    now = time.time()
-    item = _CACHE.get(key)
-    if not item:
-        return None
-    ts, data = item
-    if now - ts > _CACHE_TTL_S:
-        _CACHE.pop(key, None)
-        return None
-    return data
-
-
-def _cache_set(key: tuple, data: list[dict[str, Any]]) -> None:
-    _CACHE[key] = (time.time(), data)
-
-
 def geocode(
     q: str,
     limit: int = 6,
@@ -50,11 +40,10 @@ def geocode(
     if not q:
         return []
 
-    cache_key = (q.lower(), int(limit), countrycodes or "", tuple(viewbox) if viewbox else None)
-    with _LOCK:
-        cached = _cache_get(cache_key)
-        if cached is not None:
-            return cached
+    cache_key = (q.lower(), int(limit), countrycodes or "", list(viewbox) if viewbox else None)
+    cached = _CACHE.get(cache_key)
+    if cached is not None:
+        return cached
 
     global _LAST_CALL
     wait_s = 0.0
@@ -107,6 +96,5 @@ def geocode(
             )
         except Exception:
             continue
-    with _LOCK:
-        _cache_set(cache_key, out)
+    _CACHE.set(cache_key, out)
     return out
@@ -2,33 +2,42 @@ import csv
 import json
 import math
 import os
-import queue
 import shutil
 import tempfile
 import threading
+import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 
 import datetime as dt
 from pathlib import Path
 
-from fastapi import FastAPI, File, HTTPException, Query, UploadFile
+from fastapi import FastAPI, File, HTTPException, Query, Request, UploadFile
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from starlette.concurrency import run_in_threadpool
 
-from processing import analyze_dem, delineate_catchment_dem
-from weather_dwd import compute_precip_metrics, default_last_years_range, find_nearest_station, load_hourly_series
+from analysis_pool import ANALYSIS_POOL, AnalysisTicket, PoolBusyError
+from singleflight import Flight, SingleFlight, canonical_key
+from starkregen_events import cluster_across_points, detect_events, detect_events_batch, merge_point_events
 from weather_window import compute_window_safe
-from abflussatlas_weather import fetch_batch, parse_points
+from abflussatlas_weather import fetch_batch, parse_points, prefetch_hourly, weather_fetch_stats
+from weather_series import bundle_to_json
 from weather_stats import build_weather_stats
-from weather_radar import fetch_radar_events
+from weather_http import CLIENT as WEATHER_HTTP
 from wcs_client import detect_provider, fetch_dem_from_wcs
-from wms_utils import list_wms_layers
+from tiered_cache import cache_stats
+from dataset_pool import DATASET_POOL
+import warmup
 from geocode import geocode
-from wcs_selftest import run_wcs_selftest
-from st_public_dem import fetch_dem_from_st_public_download
 from st_cog_dem import fetch_dem_from_st_cog_dir
+from dem_pyramid import MAX_ANALYSIS_CELLS
+from dem_prefetch import DemPrefetcher
+from dem_cache import dem_identity, get_dem_cache
+
+_PROCESS_STARTED_AT = time.time()
 
 app = FastAPI(title="Hydrowatch Berlin API")
 
@@ -81,6 +90,16 @@ class BboxRequest(BaseModel):
     polygon: list[list[float]] | None = None
 
 
+class DemPrefetchRequest(BaseModel):
+    bboxes: list[BboxRequest]
+    provider: str = "auto"
+    dem_source: str = "wcs"
+    st_parts: str | None = None
+    public_confirm: bool = False
+    dem_cache_dir: str | None = None
+    st_cog_dir: str | None = None
+
+
 class CatchmentPoint(BaseModel):
     lat: float
     lon: float
@@ -90,6 +109,12 @@ class CatchmentRequest(BboxRequest):
     point: CatchmentPoint
 
 
+class FieldsRequest(BaseModel):
+    # GeoJSON FeatureCollection of field polygons (Polygon/MultiPolygon, lon/lat).
+    type: str = "FeatureCollection"
+    features: list[dict]
+
+
 class WeatherRequest(BaseModel):
     south: float
     west: float
@@ -99,6 +124,14 @@ class WeatherRequest(BaseModel):
     end: str | None = None  # YYYY-MM-DD
 
 
+class WeatherPrefetchRequest(BaseModel):
+    points: list[CatchmentPoint]
+    hours: int = 24 * 30
+    daysAgo: int = 0
+    start: str | None = None  # YYYY-MM-DD
+    end: str | None = None  # YYYY-MM-DD
+
+
 ALLOWED_ANALYSIS_TYPES = {"starkregen", "erosion", "abag", "erosion_events_ml"}
 
 
@@ -242,209 +275,10 @@ def _compute_weather_window(
     return start_iso, end_iso, end_clamped
 
 
-def _event_level(max_1h: float, max_6h: float) -> tuple[str, int]:
-    # DWD-style thresholds (screening-oriented, simplified):
-    # Starkregen: >=15 mm/1h or >=20 mm/6h
-    # Unwetter: >25 mm/1h or >35 mm/6h
-    # Extrem: >40 mm/1h or >60 mm/6h
-    if max_1h > 40.0 or max_6h > 60.0:
-        return "extrem", 3
-    if max_1h > 25.0 or max_6h > 35.0:
-        return "unwetter", 2
-    if max_1h >= 15.0 or max_6h >= 20.0:
-        return "starkregen", 1
-    return "none", 0
-
-
-def _rolling_6h_max(mm: list[float], end_idx: int) -> float:
-    if end_idx < 0:
-        return 0.0
-    s = max(0, end_idx - 5)
-    return float(sum(mm[s : end_idx + 1]))
-
-
 def _point_key(lat: float, lon: float) -> str:
     return f"{float(lat):.5f},{float(lon):.5f}"
 
 
-def _parse_iso_z(ts: str | None) -> dt.datetime | None:
-    if not ts:
-        return None
-    try:
-        return dt.datetime.fromisoformat(str(ts).replace("Z", "+00:00")).astimezone(dt.timezone.utc)
-    except Exception:
-        return None
-
-
-def _merge_events_clustered(events: list[dict], *, point: str) -> list[dict]:
-    xs = []
-    for ev in events or []:
-        t = _parse_iso_z(ev.get("peak_ts"))
-        if t is None:
-            continue
-        xs.append((t, ev))
-    xs.sort(key=lambda x: x[0])
-    if not xs:
-        return []
-
-    out: list[dict] = []
-    cur = None
-    for t, ev in xs:
-        if cur is None:
-            cur = {
-                "start": ev.get("start") or ev.get("peak_ts"),
-                "end": ev.get("end") or ev.get("peak_ts"),
-                "peak_ts": ev.get("peak_ts"),
-                "max_1h_mm": float(ev.get("max_1h_mm") or 0.0),
-                "max_6h_mm": float(ev.get("max_6h_mm") or 0.0),
-                "sum_mm": float(ev.get("sum_mm") or 0.0),
-                "warnstufe": ev.get("warnstufe") or "none",
-                "severity": int(ev.get("severity") or 0),
-                "sources": {str(ev.get("source") or "unknown")},
-                "_peak_dt": t,
-            }
-            continue
-
-        if abs((t - cur["_peak_dt"]).total_seconds()) <= 12 * 3600:
-            s0 = _parse_iso_z(cur.get("start")) or cur["_peak_dt"]
-            e0 = _parse_iso_z(cur.get("end")) or cur["_peak_dt"]
-            cur["start"] = min(s0, _parse_iso_z(ev.get("start")) or t).isoformat().replace("+00:00", "Z")
-            cur["end"] = max(e0, _parse_iso_z(ev.get("end")) or t).isoformat().replace("+00:00", "Z")
-            cur["max_1h_mm"] = max(float(cur["max_1h_mm"]), float(ev.get("max_1h_mm") or 0.0))
-            cur["max_6h_mm"] = max(float(cur["max_6h_mm"]), float(ev.get("max_6h_mm") or 0.0))
-            cur["sum_mm"] = max(float(cur["sum_mm"]), float(ev.get("sum_mm") or 0.0))
-            sev = int(ev.get("severity") or 0)
-            if sev > int(cur["severity"]):
-                cur["severity"] = sev
-                cur["warnstufe"] = ev.get("warnstufe") or cur["warnstufe"]
-            # prefer the strongest peak timestamp as representative
-            cur_peak = float(cur["max_1h_mm"]) + 0.25 * float(cur["max_6h_mm"])
-            ev_peak = float(ev.get("max_1h_mm") or 0.0) + 0.25 * float(ev.get("max_6h_mm") or 0.0)
-            if ev_peak >= cur_peak:
-                cur["peak_ts"] = ev.get("peak_ts") or cur["peak_ts"]
-                cur["_peak_dt"] = t
-            cur["sources"].add(str(ev.get("source") or "unknown"))
-        else:
-            out.append(
-                {
-                    "start": cur["start"],
-                    "end": cur["end"],
-                    "peak_ts": cur["peak_ts"],
-                    "max_1h_mm": round(float(cur["max_1h_mm"]), 2),
-                    "max_6h_mm": round(float(cur["max_6h_mm"]), 2),
-                    "sum_mm": round(float(cur["sum_mm"]), 2),
-                    "warnstufe": cur["warnstufe"],
-                    "severity": int(cur["severity"]),
-                    "source": "+".join(sorted(cur["sources"])),
-                    "point": point,
-                }
-            )
-            cur = {
-                "start": ev.get("start") or ev.get("peak_ts"),
-                "end": ev.get("end") or ev.get("peak_ts"),
-                "peak_ts": ev.get("peak_ts"),
-                "max_1h_mm": float(ev.get("max_1h_mm") or 0.0),
-                "max_6h_mm": float(ev.get("max_6h_mm") or 0.0),
-                "sum_mm": float(ev.get("sum_mm") or 0.0),
-                "warnstufe": ev.get("warnstufe") or "none",
-                "severity": int(ev.get("severity") or 0),
-                "sources": {str(ev.get("source") or "unknown")},
-                "_peak_dt": t,
-            }
-
-    if cur is not None:
-        out.append(
-            {
-                "start": cur["start"],
-                "end": cur["end"],
-                "peak_ts": cur["peak_ts"],
-                "max_1h_mm": round(float(cur["max_1h_mm"]), 2),
-                "max_6h_mm": round(float(cur["max_6h_mm"]), 2),
-                "sum_mm": round(float(cur["sum_mm"]), 2),
-                "warnstufe": cur["warnstufe"],
-                "severity": int(cur["severity"]),
-                "source": "+".join(sorted(cur["sources"])),
-                "point": point,
-            }
-        )
-
-    out.sort(key=lambda ev: (ev.get("severity", 0), ev.get("max_1h_mm", 0.0), ev.get("max_6h_mm", 0.0)), reverse=True)
-    return out
-
-
-def _detect_starkregen_events_for_series(series: list[dict], *, source: str = "icon2d") -> list[dict]:
-    rows: list[tuple[dt.datetime, float]] = []
-    for r in series or []:
-        t = r.get("t")
-        if not t:
-            continue
-        try:
-            ts = dt.datetime.fromisoformat(str(t).replace("Z", "+00:00")).astimezone(dt.timezone.utc)
-        except Exception:
-            continue
-        try:
-            p = float(r.get("precip_mm", 0.0))
-        except Exception:
-            p = 0.0
-        if not math.isfinite(p):
-            p = 0.0
-        rows.append((ts, max(0.0, p)))
-    rows.sort(key=lambda x: x[0])
-    if not rows:
-        return []
-
-    ts = [x[0] for x in rows]
-    mm = [x[1] for x in rows]
-    trig = []
-    for i in range(len(rows)):
-        m1 = mm[i]
-        m6 = _rolling_6h_max(mm, i)
-        trig.append((m1 >= 15.0) or (m6 >= 20.0))
-
-    events: list[dict] = []
-    i = 0
-    while i < len(rows):
-        if not trig[i]:
-            i += 1
-            continue
-        s = i
-        e = i
-        while e + 1 < len(rows):
-            # keep event contiguous, allow one weak hour if still rainy.
-            if trig[e + 1] or mm[e + 1] >= 0.2:
-                e += 1
-                continue
-            break
-
-        max_1h = max(mm[s : e + 1]) if e >= s else 0.0
-        peak_idx = s + max(range(e - s + 1), key=lambda k: mm[s + k])
-        max_6h = 0.0
-        for j in range(s, e + 1):
-            m6 = _rolling_6h_max(mm, j)
-            if m6 > max_6h:
-                max_6h = m6
-        total_mm = float(sum(mm[s : e + 1]))
-        level, severity = _event_level(max_1h, max_6h)
-        if level != "none":
-            events.append(
-                {
-                    "start": ts[s].isoformat().replace("+00:00", "Z"),
-                    "end": ts[e].isoformat().replace("+00:00", "Z"),
-                    "peak_ts": ts[peak_idx].isoformat().replace("+00:00", "Z"),
-                    "max_1h_mm": round(float(max_1h), 2),
-                    "max_6h_mm": round(float(max_6h), 2),
-                    "sum_mm": round(total_mm, 2),
-                    "warnstufe": level,
-                    "severity": severity,
-                    "source": source,
-                }
-            )
-        i = e + 1
-
-    events.sort(key=lambda ev: (ev.get("severity", 0), ev.get("max_1h_mm", 0.0), ev.get("max_6h_mm", 0.0)), reverse=True)
-    return events
-
-
 def _local_radar_events_for_point(lat: float, lon: float, start_iso: str, end_iso: str) -> list[dict]:
     """
     Local radar adapter (MVP):
@@ -454,8 +288,7 @@ def _local_radar_events_for_point(lat: float, lon: float, start_iso: str, end_is
     series_bundle = fetch_batch([(float(lat), float(lon))], start_iso, end_iso, "hourly")
     if not series_bundle:
         return []
-    series = (series_bundle[0] or {}).get("series") or []
-    return _detect_starkregen_events_for_series(series, source="radar")
+    return detect_events((series_bundle[0] or {}).get("series"), source="radar")
 
 
 def _coerce_time_to_iso_window(start: str, end: str) -> tuple[str, str]:
@@ -485,7 +318,7 @@ def _coerce_time_to_iso_window(start: str, end: str) -> tuple[str, str]:
     )
 
 
-async def _compute_weather_context_for_bbox(
+def _build_weather_context_for_bbox(
     *,
     south: float,
     west: float,
@@ -509,8 +342,8 @@ async def _compute_weather_context_for_bbox(
     points = _sample_points_from_bbox(south, west, north, east, mode=sampling_mode, inset_frac=0.10)
 
     startISO, endISO = compute_window_safe(hours=hours, days_ago=days_ago)
-    bundle = await run_in_threadpool(fetch_batch, points, startISO, endISO, "hourly")
-    stats = await run_in_threadpool(build_weather_stats, bundle, quantiles=[0.9, 0.95, 0.99])
+    bundle = fetch_batch(points, startISO, endISO, "hourly")
+    stats = build_weather_stats(bundle, quantiles=[0.9, 0.95, 0.99])
     per = (stats or {}).get("perPoint") or []
     if not isinstance(per, list) or not per:
         raise RuntimeError("Keine Wetterdaten im Zeitfenster gefunden.")
@@ -611,6 +444,22 @@ async def _compute_weather_context_for_bbox(
     }
 
 
+async def _compute_weather_context_for_bbox(**kwargs) -> dict:
+    return await run_in_threadpool(lambda: _build_weather_context_for_bbox(**kwargs))
+
+
+def _analysis_weather_context(ctx: dict) -> dict:
+    """Reduce a weather preset context to the weather_context input of analyze_dem."""
+    integration = ctx.get("analysis_integration") or {}
+    return {
+        "source": "weather_preset_auto",
+        "mode_used": (ctx.get("mode") or {}).get("used"),
+        "moisture_class": (ctx.get("moisture") or {}).get("class") or "normal",
+        "rain_proxy": integration.get("rain_proxy"),
+        "scenario_mm_per_h": integration.get("scenario_mm_per_h"),
+    }
+
+
 @app.post("/detect-provider")
 async def detect_provider_endpoint(bbox: BboxRequest):
     try:
@@ -620,23 +469,104 @@ async def detect_provider_endpoint(bbox: BboxRequest):
         raise HTTPException(status_code=400, detail=str(exc))
 
 
+_STARTUP_STATE: dict = {"import_s": None, "started_at": None}
+_FIRST_REQUEST_MS: dict[str, float] = {}
+_FIRST_REQUEST_MAX_PATHS = 64
+
+
+@app.on_event("startup")
+def _start_warmup():
+    _STARTUP_STATE["started_at"] = time.time()
+    _STARTUP_STATE["import_s"] = round(_STARTUP_STATE["started_at"] - _PROCESS_STARTED_AT, 3)
+    warmup.start_background_warmup(ANALYSIS_POOL)
+
+
+@app.on_event("shutdown")
+def _shutdown_analysis_pool():
+    ANALYSIS_POOL.shutdown()
+    DEM_PREFETCH.shutdown()
+    DATASET_POOL.close_all()
+    WEATHER_HTTP.close()
+
+
+@app.middleware("http")
+async def _record_first_request_latency(request: Request, call_next):
+    t0 = time.perf_counter()
+    response = await call_next(request)
+    path = request.url.path
+    if path not in _FIRST_REQUEST_MS and len(_FIRST_REQUEST_MS) < _FIRST_REQUEST_MAX_PATHS:
+        # Time until response start (streaming endpoints keep sending afterwards).
+        _FIRST_REQUEST_MS[path] = round((time.perf_counter() - t0) * 1000.0, 1)
+    return response
+
+
+@app.get("/health")
+def health():
+    """Liveness + readiness (warm-up progress), first-request latency and pool load."""
+    state = warmup.readiness()
+    started = _STARTUP_STATE.get("started_at")
+    return {
+        "status": "ok",
+        "ready": bool(state.get("ready")),
+        "uptime_s": round(time.time() - started, 1) if started else None,
+        "startup": {"import_s": _STARTUP_STATE.get("import_s")},
+        "warmup": state,
+        "first_request_ms": dict(_FIRST_REQUEST_MS),
+        "analysis_pool": ANALYSIS_POOL.stats(),
+        "singleflight": {"in_flight": FLIGHTS.in_flight(), **FLIGHTS.stats},
+        "caches": cache_stats(),
+        "dataset_pool": DATASET_POOL.stats(),
+        "dem_prefetch": DEM_PREFETCH.stats(),
+        "dem_shared_cache": get_dem_cache().stats(),
+        "weather": weather_fetch_stats(),
+    }
+
+
 @app.get("/")
 def root():
     return {"status": "ok", "message": "Hydrowatch Berlin API"}
 
 
-def _stream_threaded(run_fn):
-    """Run blocking work in a background thread and stream NDJSON events live."""
+def _admit_analysis() -> AnalysisTicket:
+    """Reserve an analysis slot or reject immediately with 429 + Retry-After."""
+    try:
+        return ANALYSIS_POOL.admit()
+    except PoolBusyError as exc:
+        raise HTTPException(
+            status_code=429,
+            detail=str(exc),
+            headers={"Retry-After": str(exc.retry_after_s)},
+        )
+
+
+def _queue_progress(emit, step: int, total: int):
+    def on_queue(position: int):
+        emit({
+            "type": "progress",
+            "step": step,
+            "total": total,
+            "message": f"Warteschlange: Position {position}",
+            "queue_position": position,
+        })
 
-    q: queue.Queue[dict | object] = queue.Queue()
-    sentinel = object()
+    return on_queue
+
+
+FLIGHTS = SingleFlight()
+
+
+def _start_flight(flight: Flight, run_fn, ticket: AnalysisTicket | None = None) -> None:
+    """Run blocking work in a background thread; events are published to the flight."""
+
+    def emit(event):
+        flight.publish(json.dumps(event) + "\n")
 
     def worker():
         try:
-            result = run_fn(lambda event: q.put(event))
-            q.put({"type": "result", "data": result})
+            result = run_fn(emit)
+            emit({"type": "result", "data": result})
         except Exception as exc:
-            q.put(
+            emit(
                 {
                     "type": "error",
                     "detail": str(exc),
@@ -644,15 +574,276 @@ def _stream_threaded(run_fn):
                 }
             )
         finally:
-            q.put(sentinel)
+            if ticket is not None:
+                ticket.release()
+            flight.finish()
+            FLIGHTS.forget(flight)
 
     threading.Thread(target=worker, daemon=True).start()
 
-    while True:
-        item = q.get()
-        if item is sentinel:
-            break
-        yield json.dumps(item) + "\n"
+
+def _stream_threaded(run_fn, ticket: AnalysisTicket | None = None):
+    """Run blocking work in a background thread and stream NDJSON events live."""
+
+    flight = Flight("")
+    _start_flight(flight, run_fn, ticket=ticket)
+    return flight.subscribe()
+
+
+def _stream_coalesced(namespace: str, params: dict, run_fn):
+    """
+    Like _stream_threaded, but identical in-flight requests (same canonical parameter
+    hash) attach to the running computation and receive the same event stream.
+    Only the leader takes an analysis slot; run_fn is called as run_fn(emit, ticket).
+    """
+
+    key = canonical_key(namespace, jsonable_encoder(params))
+    flight, leader = FLIGHTS.join_or_start(key)
+    if not leader:
+        print(f"[Singleflight] {namespace}: attach to running request {key[:12]}")
+        return flight.subscribe()
+    try:
+        ticket = _admit_analysis()
+    except HTTPException as exc:
+        # Followers that joined in the meantime get the same rejection.
+        flight.publish(json.dumps({"type": "error", "detail": str(exc.detail)}) + "\n")
+        flight.finish()
+        FLIGHTS.forget(flight)
+        raise
+    _start_flight(flight, lambda emit: run_fn(emit, ticket), ticket=ticket)
+    return flight.subscribe()
+
+
+def _dem_step_offset(dem_source: str) -> int:
+    # public/cog acquisition uses steps 1..4, wcs acquisition uses step 1.
+    return 4 if dem_source in ("public", "cog") else 1
+
+
+def _fetch_dem_for_bbox(
+    *,
+    south: float,
+    west: float,
+    north: float,
+    east: float,
+    provider: str,
+    dem_source: str,
+    st_parts: str | None,
+    public_confirm: bool,
+    dem_cache_dir: str | None,
+    st_cog_dir: str | None,
+    emit_step=None,
+    acquisition: dict | None = None,
+) -> str:
+    """
+    Fetch a DEM GeoTIFF for a WGS84 bbox from wcs/public/cog and return a temp path.
+
+    A DEM prefetched via /dem/prefetch is taken from DEM_PREFETCH when available,
+    otherwise the shared DEM window cache is consulted before fetching.
+    acquisition (optional dict) is filled with fetch metrics (e.g. WCS tile cache hits,
+    DEM pyramid level for large cog/public bboxes).
+    """
+    params = {
+        "south": south,
+        "west": west,
+        "north": north,
+        "east": east,
+        "provider": provider,
+        "dem_source": dem_source,
+        "st_parts": st_parts,
+        "public_confirm": public_confirm,
+        "dem_cache_dir": dem_cache_dir,
+        "st_cog_dir": st_cog_dir,
+    }
+    path = DEM_PREFETCH.acquire(params, acquisition=acquisition)
+    if path is not None:
+        if emit_step:
+            emit_step(1, "DEM aus Prefetch geladen")
+        return path
+    return _acquire_dem_for_bbox(emit_step=emit_step, acquisition=acquisition, **params)
+
+
+def _require_public_confirm(public_confirm: bool) -> None:
+    if not public_confirm:
+        raise HTTPException(
+            status_code=400,
+            detail="Public DEM Download erfordert public_confirm=true (grosses Download-Volumen).",
+        )
+
+
+def _acquire_dem_for_bbox(
+    *,
+    south: float,
+    west: float,
+    north: float,
+    east: float,
+    provider: str,
+    dem_source: str,
+    st_parts: str | None,
+    public_confirm: bool,
+    dem_cache_dir: str | None,
+    st_cog_dir: str | None,
+    emit_step=None,
+    acquisition: dict | None = None,
+) -> str:
+    """Fetch through the shared DEM window cache (dem_cache), shared with the compute-service."""
+    if dem_source == "public":
+        _require_public_confirm(public_confirm)
+    identity = dem_identity(
+        dem_source=dem_source,
+        provider=provider,
+        south=south,
+        west=west,
+        north=north,
+        east=east,
+        st_parts=st_parts,
+        st_cog_dir=st_cog_dir or os.getenv("ST_COG_DIR"),
+        max_cells=MAX_ANALYSIS_CELLS,
+        dem_cache_dir=dem_cache_dir,
+    )
+    path = get_dem_cache().get_or_fetch(
+        identity,
+        lambda: _fetch_dem_from_source(
+            south=south,
+            west=west,
+            north=north,
+            east=east,
+            provider=provider,
+            dem_source=dem_source,
+            st_parts=st_parts,
+            public_confirm=public_confirm,
+            dem_cache_dir=dem_cache_dir,
+            st_cog_dir=st_cog_dir,
+            emit_step=emit_step,
+            acquisition=acquisition,
+        ),
+        stats=acquisition,
+    )
+    if emit_step and acquisition is not None and acquisition.get("shared_cache") == "hit":
+        emit_step(1, "DEM aus Cache geladen")
+    return path
+
+
+def _fetch_dem_from_source(
+    *,
+    south: float,
+    west: float,
+    north: float,
+    east: float,
+    provider: str,
+    dem_source: str,
+    st_parts: str | None,
+    public_confirm: bool,
+    dem_cache_dir: str | None,
+    st_cog_dir: str | None,
+    emit_step=None,
+    acquisition: dict | None = None,
+) -> str:
+
+    def step(n: int, msg: str):
+        if emit_step:
+            emit_step(n, msg)
+
+    def emit_public(phase: str, msg: str):
+        phase = (phase or "").strip().lower()
+        label = "COG" if dem_source == "cog" else "Public DGM1"
+        n = {"download": 1, "extract": 2, "vrt": 3, "clip": 4}.get(phase, 1)
+        step(n, f"{label}: {msg}")
+
+    if dem_source == "public":
+        _require_public_confirm(public_confirm)
+        # Public download option is currently only wired for Sachsen-Anhalt DGM1.
+        # Use provider=auto to detect first, but validate.
+        p = detect_provider(south, west, north, east) if provider == "auto" else None
+        key = p.key if p else provider.strip().lower()
+        if key != "sachsen-anhalt":
+            raise HTTPException(
+                status_code=400,
+                detail="dem_source=public ist aktuell nur fuer Sachsen-Anhalt verfuegbar.",
+            )
+        from st_public_dem import fetch_dem_from_st_public_download
+
+        parts = [1]
+        if st_parts:
+            parts = [int(x) for x in st_parts.split(",") if x.strip()]
+        step(1, "Public DGM1: Download/Cache wird vorbereitet...")
+        path = fetch_dem_from_st_public_download(
+            south=south,
+            west=west,
+            north=north,
+            east=east,
+            parts=parts,
+            progress_callback=emit_public if emit_step else None,
+            cache_dir=dem_cache_dir,
+            max_cells=MAX_ANALYSIS_CELLS,
+            stats=acquisition,
+        )
+        step(4, "Public DGM1: DEM-Ausschnitt geladen")
+        return path
+
+    if dem_source == "cog":
+        # Sachsen-Anhalt local COG folder clip (fast local fallback).
+        cog_dir = st_cog_dir or os.getenv("ST_COG_DIR")
+        if not cog_dir:
+            raise HTTPException(
+                status_code=400,
+                detail="dem_source=cog braucht st_cog_dir oder ST_COG_DIR.",
+            )
+        step(1, "COG: VRT/Cache wird vorbereitet...")
+        path = fetch_dem_from_st_cog_dir(
+            south=south,
+            west=west,
+            north=north,
+            east=east,
+            cog_dir=cog_dir,
+            progress_callback=emit_public if emit_step else None,
+            cache_dir=dem_cache_dir,
+            max_cells=MAX_ANALYSIS_CELLS,
+            stats=acquisition,
+        )
+        step(4, "COG: DEM-Ausschnitt geladen")
+        return path
+
+    step(1, "WCS-Abruf gestartet")
+    path = fetch_dem_from_wcs(
+        south,
+        west,
+        north,
+        east,
+        progress_callback=(lambda msg: step(1, msg)) if emit_step else None,
+        provider_key=provider,
+        stats=acquisition,
+    )
+    step(1, "WCS-DGM geladen")
+    return path
+
+
+DEM_PREFETCH = DemPrefetcher(_acquire_dem_for_bbox)
+
+
+@app.post("/dem/prefetch")
+def dem_prefetch_endpoint(req: DemPrefetchRequest):
+    """Queue background DEM fetches for upcoming bboxes (batch look-ahead); returns immediately."""
+    dem_source = (req.dem_source or "wcs").strip().lower()
+    if dem_source == "public":
+        _require_public_confirm(req.public_confirm)
+    counts: dict[str, int] = {}
+    for b in req.bboxes:
+        status = DEM_PREFETCH.submit(
+            {
+                "south": b.south,
+                "west": b.west,
+                "north": b.north,
+                "east": b.east,
+                "provider": req.provider,
+                "dem_source": dem_source,
+                "st_parts": req.st_parts,
+                "public_confirm": req.public_confirm,
+                "dem_cache_dir": req.dem_cache_dir,
+                "st_cog_dir": req.st_cog_dir,
+            }
+        )
+        counts[status] = counts.get(status, 0) + 1
+    return {"submitted": counts, "prefetch": DEM_PREFETCH.stats()}
 
 
 @app.post("/analyze")
@@ -669,13 +860,6 @@ async def analyze_endpoint(
 ):
     """Accept a GeoTIFF DEM, return streamed progress + GeoJSON."""
 
-    suffix = os.path.splitext(file.filename or ".tif")[1]
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-        shutil.copyfileobj(file.file, tmp)
-        tmp_path = tmp.name
-
-    total_steps = 7
-
     analysis_type = _normalize_analysis_type(analysis_type)
     event_start_iso, event_end_iso = _validate_event_ml_window(
         analysis_type=analysis_type,
@@ -683,6 +867,18 @@ async def analyze_endpoint(
         event_end_iso=event_end_iso,
     )
 
+    ticket = _admit_analysis()
+    try:
+        suffix = os.path.splitext(file.filename or ".tif")[1]
+        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+            shutil.copyfileobj(file.file, tmp)
+            tmp_path = tmp.name
+    except Exception:
+        ticket.release()
+        raise
+
+    total_steps = 7
+
     def run(emit):
         def on_progress(step, _total, msg):
             emit({
@@ -693,10 +889,13 @@ async def analyze_endpoint(
             })
 
         try:
-            return analyze_dem(
+            return ANALYSIS_POOL.run(
+                ticket,
+                "processing:analyze_dem",
                 tmp_path,
                 threshold=threshold,
                 progress_callback=on_progress,
+                on_queue=_queue_progress(emit, 0, total_steps),
                 analysis_type=analysis_type,
                 abag_p_factor=abag_p_factor,
                 event_start_iso=event_start_iso,
@@ -712,7 +911,7 @@ async def analyze_endpoint(
                 pass
 
     return StreamingResponse(
-        _stream_threaded(run),
+        _stream_threaded(run, ticket=ticket),
         media_type="application/x-ndjson",
     )
 
@@ -743,6 +942,7 @@ async def analyze_bbox_endpoint(
 ):
     """Fetch DEM from WCS (or public download fallback) and return streamed progress + GeoJSON."""
 
+    request_params = dict(locals())
     analysis_type = _normalize_analysis_type(analysis_type)
     event_start_iso, event_end_iso = _validate_event_ml_window(
         analysis_type=analysis_type,
@@ -758,8 +958,9 @@ async def analyze_bbox_endpoint(
     weather_enabled = (is_starkregen and weather_auto) or (is_starkregen and weather_event_mm_h is not None)
     total_steps = (11 if dem_source in ("public", "cog") else 8) + (1 if weather_enabled else 0)
 
-    def run(emit):
+    def run(emit, ticket):
         tmp_path = None
+        acquisition: dict = {}
         weather_ctx_for_analysis = None
 
         def emit_step(step: int, msg: str):
@@ -770,22 +971,6 @@ async def analyze_bbox_endpoint(
                 "message": msg,
             })
 
-        def emit_wcs(msg: str):
-            emit_step(1, msg)
-
-        def emit_public(phase: str, msg: str):
-            phase = (phase or "").strip().lower()
-            if phase == "download":
-                emit_step(1, f"Public DGM1: {msg}")
-            elif phase == "extract":
-                emit_step(2, f"Public DGM1: {msg}")
-            elif phase == "vrt":
-                emit_step(3, f"Public DGM1: {msg}")
-            elif phase == "clip":
-                emit_step(4, f"Public DGM1: {msg}")
-            else:
-                emit_step(1, f"Public DGM1: {msg}")
-
         try:
             if is_starkregen and weather_event_mm_h is not None:
                 emit_step(1, "Wetterkontext (aus gewaehltem Ereignis) wird gesetzt...")
@@ -798,165 +983,85 @@ async def analyze_bbox_endpoint(
                     "rain_proxy": rain_proxy,
                     "scenario_mm_per_h": [max(1, int(round(mm_h)))],
                 }
-            elif weather_enabled:
-                emit_step(1, "Wetterkontext wird berechnet...")
-                try:
-                    # Keep robust fallback: if any weather error occurs, analysis continues with baseline.
-                    startISO, endISO = compute_window_safe(hours=weather_hours, days_ago=weather_days_ago)
-                    area_km2 = _bbox_area_km2(bbox.south, bbox.west, bbox.north, bbox.east)
-                    mode_in = (weather_mode or "auto").strip().lower()
-                    if mode_in not in ("auto", "standard", "genauer"):
-                        mode_in = "auto"
-                    inferred_mode = "genauer" if (mode_in == "auto" and area_km2 >= float(weather_large_aoi_km2)) else mode_in
-                    if inferred_mode == "auto":
-                        inferred_mode = "standard"
-                    sampling_mode = "standard" if inferred_mode == "standard" else "genauer"
-                    points = _sample_points_from_bbox(
-                        bbox.south,
-                        bbox.west,
-                        bbox.north,
-                        bbox.east,
-                        mode=sampling_mode,
-                        inset_frac=0.10,
-                    )
-                    bundle = fetch_batch(points, startISO, endISO, "hourly")
-                    stats = build_weather_stats(bundle, quantiles=[0.9, 0.95, 0.99])
-                    per = (stats or {}).get("perPoint") or []
-                    qmap = []
-                    for qkey in ("0.9", "0.95", "0.99"):
-                        vals = []
-                        for it in per:
-                            qm = (((it or {}).get("precip_hourly") or {}).get("quantiles_mm")) or {}
-                            try:
-                                v = float(qm.get(qkey))
-                            except Exception:
-                                continue
-                            if math.isfinite(v):
-                                vals.append(v)
-                        qmap.append(_median(vals) if vals else None)
-                    classes = []
-                    for it in per:
-                        c = ((it or {}).get("antecedent_moisture") or {}).get("class")
-                        if isinstance(c, str):
-                            classes.append(c)
-                    majority = None
-                    if classes:
-                        counts = {}
-                        for c in classes:
-                            counts[c] = counts.get(c, 0) + 1
-                        majority = max(counts.keys(), key=lambda k: counts[k])
-                    moisture_base = {"trocken": 0.45, "normal": 0.60, "nass": 0.75}.get(majority or "normal", 0.60)
-                    q95 = qmap[1]
-                    intensity_base = 0.60 if q95 is None else max(0.35, min(1.0, float(q95) / 20.0))
-                    rain_proxy = float(max(0.35, min(0.95, 0.5 * moisture_base + 0.5 * intensity_base)))
-                    scen = sorted(
-                        {
-                            max(1, int(round(float(qmap[0])))) if qmap[0] is not None else 30,
-                            max(1, int(round(float(qmap[1])))) if qmap[1] is not None else 50,
-                            max(1, int(round(float(qmap[2])))) if qmap[2] is not None else 100,
-                        }
-                    )
-                    weather_ctx_for_analysis = {
-                        "source": "weather_preset_auto",
-                        "mode_used": inferred_mode,
-                        "moisture_class": majority or "normal",
-                        "rain_proxy": rain_proxy,
-                        "scenario_mm_per_h": scen,
-                    }
-                except Exception:
-                    weather_ctx_for_analysis = None
+            # Weather context, DEM fetch and external layer windows are independent
+            # network/disk steps: run them concurrently, analyse once all are ready.
+            from processing import prefetch_external_layers
 
-            if dem_source == "public":
-                if not public_confirm:
-                    raise HTTPException(
-                        status_code=400,
-                        detail="Public DEM Download erfordert public_confirm=true (grosses Download-Volumen).",
-                    )
-                # Public download option is currently only wired for Sachsen-Anhalt DGM1.
-                # Use provider=auto to detect first, but validate.
-                p = detect_provider(bbox.south, bbox.west, bbox.north, bbox.east) if provider == "auto" else None
-                key = p.key if p else provider.strip().lower()
-                if key != "sachsen-anhalt":
-                    raise HTTPException(
-                        status_code=400,
-                        detail="dem_source=public ist aktuell nur fuer Sachsen-Anhalt verfuegbar.",
+            inputs = ThreadPoolExecutor(max_workers=3, thread_name_prefix="analyze-inputs")
+            try:
+                weather_future = None
+                if weather_ctx_for_analysis is None and weather_enabled:
+                    emit_step(1, "Wetterkontext wird berechnet...")
+                    weather_future = inputs.submit(
+                        _build_weather_context_for_bbox,
+                        south=bbox.south,
+                        west=bbox.west,
+                        north=bbox.north,
+                        east=bbox.east,
+                        mode=weather_mode,
+                        days_ago=weather_days_ago,
+                        hours=weather_hours,
+                        large_aoi_km2=weather_large_aoi_km2,
                     )
-                parts = [1]
-                if st_parts:
-                    parts = [int(x) for x in st_parts.split(",") if x.strip()]
-                emit_step(1, "Public DGM1: Download/Cache wird vorbereitet...")
-                tmp_path = fetch_dem_from_st_public_download(
-                    south=bbox.south,
-                    west=bbox.west,
-                    north=bbox.north,
-                    east=bbox.east,
-                    parts=parts,
-                    progress_callback=emit_public,
-                    cache_dir=dem_cache_dir,
+                layers_future = inputs.submit(
+                    prefetch_external_layers,
+                    bbox.south,
+                    bbox.west,
+                    bbox.north,
+                    bbox.east,
+                    layers=None if analysis_type == "abag" else ("soil", "impervious"),
                 )
-                emit_step(4, "Public DGM1: DEM-Ausschnitt geladen")
-
-                def on_progress(step, _total, msg):
-                    emit({
-                        "type": "progress",
-                        "step": step + 4,
-                        "total": total_steps,
-                        "message": msg,
-                    })
-            elif dem_source == "cog":
-                # Sachsen-Anhalt local COG folder clip (fast local fallback).
-                cog_dir = st_cog_dir or os.getenv("ST_COG_DIR")
-                if not cog_dir:
-                    raise HTTPException(
-                        status_code=400,
-                        detail="dem_source=cog braucht st_cog_dir oder ST_COG_DIR.",
-                    )
-                emit_step(1, "COG: VRT/Cache wird vorbereitet...")
-                tmp_path = fetch_dem_from_st_cog_dir(
+                dem_future = inputs.submit(
+                    _fetch_dem_for_bbox,
+                    acquisition=acquisition,
                     south=bbox.south,
                     west=bbox.west,
                     north=bbox.north,
                     east=bbox.east,
-                    cog_dir=cog_dir,
-                    progress_callback=emit_public,  # reuse phase mapping
-                    cache_dir=dem_cache_dir,
+                    provider=provider,
+                    dem_source=dem_source,
+                    st_parts=st_parts,
+                    public_confirm=public_confirm,
+                    dem_cache_dir=dem_cache_dir,
+                    st_cog_dir=st_cog_dir,
+                    emit_step=emit_step,
                 )
-                emit_step(4, "COG: DEM-Ausschnitt geladen")
-
-                def on_progress(step, _total, msg):
-                    emit({
-                        "type": "progress",
-                        "step": step + 4,
-                        "total": total_steps,
-                        "message": msg,
-                    })
-            else:
-                emit_wcs("WCS-Abruf gestartet")
-                tmp_path = fetch_dem_from_wcs(
-                    bbox.south,
-                    bbox.west,
-                    bbox.north,
-                    bbox.east,
-                    progress_callback=emit_wcs,
-                    provider_key=provider,
-                )
-                emit_wcs("WCS-DGM geladen")
-
-                def on_progress(step, _total, msg):
-                    emit({
-                        "type": "progress",
-                        "step": step + 1,
-                        "total": total_steps,
-                        "message": msg,
-                    })
-            return analyze_dem(
+                tmp_path = dem_future.result()
+                if weather_future is not None:
+                    try:
+                        # Keep robust fallback: if any weather error occurs, analysis continues with baseline.
+                        weather_ctx_for_analysis = _analysis_weather_context(weather_future.result())
+                    except Exception:
+                        weather_ctx_for_analysis = None
+                try:
+                    preloaded_layers = layers_future.result()
+                except Exception:
+                    preloaded_layers = None
+            finally:
+                inputs.shutdown(wait=False)
+            step_offset = _dem_step_offset(dem_source)
+
+            def on_progress(step, _total, msg):
+                emit({
+                    "type": "progress",
+                    "step": step + step_offset,
+                    "total": total_steps,
+                    "message": msg,
+                })
+
+            return ANALYSIS_POOL.run(
+                ticket,
+                "processing:analyze_dem",
                 tmp_path,
                 threshold=threshold,
                 progress_callback=on_progress,
+                on_queue=_queue_progress(emit, step_offset, total_steps),
                 analysis_type=analysis_type,
                 abag_p_factor=abag_p_factor,
                 aoi_polygon=bbox.polygon,
                 weather_context=weather_ctx_for_analysis,
+                preloaded_layers=preloaded_layers,
+                dem_acquisition=acquisition,
                 event_start_iso=event_start_iso,
                 event_end_iso=event_end_iso,
                 ml_model_key=ml_model_key,
@@ -971,7 +1076,192 @@ async def analyze_bbox_endpoint(
                     pass
 
     return StreamingResponse(
-        _stream_threaded(run),
+        _stream_coalesced("analyze-bbox", request_params, run),
+        media_type="application/x-ndjson",
+    )
+
+
+def _field_zones_from_features(features: list[dict]) -> list[dict]:
+    zones: list[dict] = []
+    for idx, feat in enumerate(features or [], start=1):
+        if not isinstance(feat, dict):
+            continue
+        geom = feat.get("geometry") or {}
+        if geom.get("type") not in ("Polygon", "MultiPolygon") or not geom.get("coordinates"):
+            continue
+        props = feat.get("properties") or {}
+        zid = feat.get("id") or props.get("field_id") or props.get("id") or f"field_{idx}"
+        zones.append({"id": str(zid), "geometry": geom, "properties": props})
+    return zones
+
+
+def _zones_bbox_wgs84(zones: list[dict], buffer_m: float) -> tuple[float, float, float, float]:
+    """Return (south, west, north, east) of all zone coordinates plus a metric buffer."""
+    lons: list[float] = []
+    lats: list[float] = []
+
+    def walk(coords):
+        if coords and isinstance(coords[0], (int, float)):
+            lons.append(float(coords[0]))
+            lats.append(float(coords[1]))
+            return
+        for c in coords or []:
+            walk(c)
+
+    for z in zones:
+        walk((z.get("geometry") or {}).get("coordinates"))
+    if not lons:
+        raise HTTPException(status_code=400, detail="Keine gueltigen Feld-Polygone gefunden.")
+    south, north = min(lats), max(lats)
+    west, east = min(lons), max(lons)
+    lat_mid_rad = ((south + north) / 2.0) * (math.pi / 180.0)
+    d_lat = float(buffer_m) / 111_320.0
+    d_lon = float(buffer_m) / (111_320.0 * max(0.01, abs(math.cos(lat_mid_rad))))
+    return south - d_lat, west - d_lon, north + d_lat, east + d_lon
+
+
+MAX_ZONAL_FIELDS = int(os.getenv("MAX_ZONAL_FIELDS", "2000") or 2000)
+# Union bbox limit: beyond this the shared DEM is downsampled (or WCS tiling fails) until
+# small fields lose their cells. Default = MAX_ANALYSIS_CELLS at 5 m (100 km2).
+MAX_ZONAL_BBOX_KM2 = float(
+    os.getenv("MAX_ZONAL_BBOX_KM2", str(MAX_ANALYSIS_CELLS * 25.0 / 1_000_000.0))
+    or MAX_ANALYSIS_CELLS * 25.0 / 1_000_000.0
+)
+
+
+@app.post("/analyze-fields")
+async def analyze_fields_endpoint(
+    fields: FieldsRequest,
+    threshold: int = Query(200, ge=10, le=5000),
+    provider: str = Query("auto"),
+    dem_source: str = Query("wcs"),
+    analysis_type: str = Query("starkregen"),
+    abag_p_factor: float | None = Query(None, ge=0.1, le=1.5),
+    buffer_m: float = Query(100.0, ge=0.0, le=2000.0),
+    weather_event_mm_h: float | None = Query(None, ge=1.0, le=300.0),
+    event_start_iso: str | None = Query(None),
+    event_end_iso: str | None = Query(None),
+    ml_model_key: str | None = Query(None),
+    ml_severity_model_key: str | None = Query(None),
+    ml_threshold: float = Query(0.50, ge=0.05, le=0.95),
+    st_parts: str | None = Query(None),
+    public_confirm: bool = Query(False),
+    dem_cache_dir: str | None = Query(None),
+    st_cog_dir: str | None = Query(None),
+):
+    """
+    Multi-field zonal analysis: one DEM over the union of all field polygons (+buffer),
+    one flow routing/scoring pass, then per-field statistics from a label raster.
+    """
+
+    request_params = dict(locals())
+    analysis_type = _normalize_analysis_type(analysis_type)
+    event_start_iso, event_end_iso = _validate_event_ml_window(
+        analysis_type=analysis_type,
+        event_start_iso=event_start_iso,
+        event_end_iso=event_end_iso,
+    )
+    zones = _field_zones_from_features(fields.features)
+    if not zones:
+        raise HTTPException(status_code=400, detail="FeatureCollection enthaelt keine Polygone.")
+    if len(zones) > MAX_ZONAL_FIELDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Zu viele Felder ({len(zones)}). Maximal {MAX_ZONAL_FIELDS} pro Anfrage.",
+        )
+    south, west, north, east = _zones_bbox_wgs84(zones, buffer_m)
+    union_km2 = _bbox_area_km2(south, west, north, east)
+    if union_km2 > MAX_ZONAL_BBOX_KM2:
+        raise HTTPException(
+            status_code=400,
+            detail=(
+                f"Felder liegen zu weit auseinander (Gesamt-BBox {union_km2:.1f} km2, "
+                f"max {MAX_ZONAL_BBOX_KM2:.0f} km2). Bitte raeumlich getrennte Felder "
+                "in mehreren Anfragen analysieren."
+            ),
+        )
+    dem_source = (dem_source or "wcs").strip().lower()
+    step_offset = _dem_step_offset(dem_source)
+    total_steps = 7 + step_offset
+
+    weather_ctx_for_analysis = None
+    if analysis_type == "starkregen" and weather_event_mm_h is not None:
+        mm_h = float(weather_event_mm_h)
+        weather_ctx_for_analysis = {
+            "source": "weather_event_selected",
+            "mode_used": "event",
+            "moisture_class": "normal",
+            "rain_proxy": float(max(0.35, min(0.95, mm_h / 20.0))),
+            "scenario_mm_per_h": [max(1, int(round(mm_h)))],
+        }
+
+    def run(emit, ticket):
+        tmp_path = None
+        acquisition: dict = {}
+
+        def emit_step(step: int, msg: str):
+            emit({
+                "type": "progress",
+                "step": step,
+                "total": total_steps,
+                "message": msg,
+            })
+
+        def on_progress(step, _total, msg):
+            emit_step(step + step_offset, msg)
+
+        try:
+            tmp_path = _fetch_dem_for_bbox(
+                south=south,
+                west=west,
+                north=north,
+                east=east,
+                provider=provider,
+                dem_source=dem_source,
+                st_parts=st_parts,
+                public_confirm=public_confirm,
+                dem_cache_dir=dem_cache_dir,
+                st_cog_dir=st_cog_dir,
+                emit_step=emit_step,
+                acquisition=acquisition,
+            )
+            result = ANALYSIS_POOL.run(
+                ticket,
+                "processing:analyze_dem",
+                tmp_path,
+                threshold=threshold,
+                progress_callback=on_progress,
+                on_queue=_queue_progress(emit, step_offset, total_steps),
+                analysis_type=analysis_type,
+                abag_p_factor=abag_p_factor,
+                weather_context=weather_ctx_for_analysis,
+                event_start_iso=event_start_iso,
+                event_end_iso=event_end_iso,
+                ml_model_key=ml_model_key,
+                ml_severity_model_key=ml_severity_model_key,
+                ml_threshold=ml_threshold,
+                zones=zones,
+                dem_acquisition=acquisition,
+            )
+            result.setdefault("analysis", {})["union_bbox"] = {
+                "south": south,
+                "west": west,
+                "north": north,
+                "east": east,
+                "buffer_m": float(buffer_m),
+                "area_km2": round(float(union_km2), 3),
+                "field_count": len(zones),
+            }
+            return result
+        finally:
+            if tmp_path:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+    return StreamingResponse(
+        _stream_coalesced("analyze-fields", request_params, run),
         media_type="application/x-ndjson",
     )
 
@@ -997,58 +1287,22 @@ async def catchment_bbox_endpoint(
     def run():
         tmp_path = None
         try:
-            if dem_source == "public":
-                if not public_confirm:
-                    raise HTTPException(
-                        status_code=400,
-                        detail="Public DEM Download erfordert public_confirm=true (grosses Download-Volumen).",
-                    )
-                p = detect_provider(req.south, req.west, req.north, req.east) if provider == "auto" else None
-                key = p.key if p else provider.strip().lower()
-                if key != "sachsen-anhalt":
-                    raise HTTPException(
-                        status_code=400,
-                        detail="dem_source=public ist aktuell nur fuer Sachsen-Anhalt verfuegbar.",
-                    )
-                parts = [1]
-                if st_parts:
-                    parts = [int(x) for x in st_parts.split(",") if x.strip()]
-                tmp_path = fetch_dem_from_st_public_download(
-                    south=req.south,
-                    west=req.west,
-                    north=req.north,
-                    east=req.east,
-                    parts=parts,
-                    progress_callback=None,
-                    cache_dir=dem_cache_dir,
-                )
-            elif dem_source == "cog":
-                cog_dir = st_cog_dir or os.getenv("ST_COG_DIR")
-                if not cog_dir:
-                    raise HTTPException(
-                        status_code=400,
-                        detail="dem_source=cog braucht st_cog_dir oder ST_COG_DIR.",
-                    )
-                tmp_path = fetch_dem_from_st_cog_dir(
-                    south=req.south,
-                    west=req.west,
-                    north=req.north,
-                    east=req.east,
-                    cog_dir=cog_dir,
-                    progress_callback=None,
-                    cache_dir=dem_cache_dir,
-                )
-            else:
-                tmp_path = fetch_dem_from_wcs(
-                    req.south,
-                    req.west,
-                    req.north,
-                    req.east,
-                    progress_callback=None,
-                    provider_key=provider,
-                )
+            tmp_path = _fetch_dem_for_bbox(
+                south=req.south,
+                west=req.west,
+                north=req.north,
+                east=req.east,
+                provider=provider,
+                dem_source=dem_source,
+                st_parts=st_parts,
+                public_confirm=public_confirm,
+                dem_cache_dir=dem_cache_dir,
+                st_cog_dir=st_cog_dir,
+            )
 
-            return delineate_catchment_dem(
+            return ANALYSIS_POOL.run(
+                ticket,
+                "processing:delineate_catchment_dem",
                 tmp_path,
                 lat=req.point.lat,
                 lon=req.point.lon,
@@ -1062,7 +1316,11 @@ async def catchment_bbox_endpoint(
                 except OSError:
                     pass
 
-    return run()
+    ticket = _admit_analysis()
+    try:
+        return await run_in_threadpool(run)
+    finally:
+        ticket.release()
 
 
 @app.post("/weather-metrics")
@@ -1072,6 +1330,8 @@ async def weather_metrics(req: WeatherRequest):
 
     Returns: nearest station + precipitation metrics for the requested date range.
     """
+    from weather_dwd import compute_precip_metrics, default_last_years_range, find_nearest_station
+
     try:
         if req.start and req.end:
             start = dt.date.fromisoformat(req.start)
@@ -1164,7 +1424,7 @@ async def abflussatlas_weather(
                 "points": len(pts),
                 "endClampedToToday": bool(end_clamped),
             },
-            "data": data,
+            "data": bundle_to_json(data),
         }
     except HTTPException:
         raise
@@ -1172,6 +1432,22 @@ async def abflussatlas_weather(
         raise HTTPException(status_code=502, detail=str(exc))
 
 
+@app.post("/abflussatlas/weather/prefetch")
+async def abflussatlas_weather_prefetch(req: WeatherPrefetchRequest):
+    """Fill the local hourly store for upcoming batch points in coalesced multi-location calls."""
+    if not req.points:
+        raise HTTPException(status_code=400, detail="Keine Punkte angegeben.")
+    startISO, endISO, _end_clamped = _compute_weather_window(
+        start=req.start, end=req.end, hours=int(req.hours), days_ago=int(req.daysAgo)
+    )
+    pts = [(float(p.lat), float(p.lon)) for p in req.points]
+    try:
+        result = await run_in_threadpool(prefetch_hourly, pts, startISO, endISO)
+    except Exception as exc:
+        raise HTTPException(status_code=502, detail=str(exc))
+    return {"startISO": startISO, "endISO": endISO, **result, "totals": weather_fetch_stats()}
+
+
 @app.get("/abflussatlas/weather/stats")
 async def abflussatlas_weather_stats(
     points: str = Query(..., min_length=3),
@@ -1250,6 +1526,8 @@ async def abflussatlas_weather_events(
         if use_icon:
             try:
                 bundle = await run_in_threadpool(fetch_batch, pts, startISO, endISO, agg)
+                icon_keys: list[str] = []
+                icon_series: list = []
                 for item in bundle or []:
                     p = str(item.get("point") or "")
                     pkey = p if p in by_point else None
@@ -1267,31 +1545,39 @@ async def abflussatlas_weather_events(
                         # instead of aborting the whole request with KeyError.
                         notes.append(f"ICON2D point mismatch ignored: {pkey}")
                         continue
-                    evs = _detect_starkregen_events_for_series(item.get("series") or [], source="icon2d")
+                    icon_keys.append(pkey)
+                    icon_series.append(item.get("series"))
+                icon_events = await run_in_threadpool(detect_events_batch, icon_series, source="icon2d")
+                for pkey, evs in zip(icon_keys, icon_events):
                     by_point[pkey].extend(evs)
                 sources_used.append("icon2d")
             except Exception as exc:
                 notes.append(f"ICON2D nicht verfuegbar: {exc}")
 
         if use_dwd:
+            from weather_dwd import find_nearest_station, load_hourly_series
+
             start_dt = dt.datetime.fromisoformat(startISO.replace("Z", "+00:00")).astimezone(dt.timezone.utc).date()
             end_dt = dt.datetime.fromisoformat(endISO.replace("Z", "+00:00")).astimezone(dt.timezone.utc).date()
-            dwd_ok = 0
+            dwd_keys: list[str] = []
+            dwd_series: list = []
             for lat, lon in pts:
                 pkey = _point_key(lat, lon)
                 try:
                     st, _dist_km = find_nearest_station(float(lat), float(lon), start_dt, end_dt)
-                    series = load_hourly_series(st, startISO, endISO)
-                    evs = _detect_starkregen_events_for_series(series, source="dwd")
-                    by_point[pkey].extend(evs)
-                    dwd_ok += 1
+                    dwd_series.append(load_hourly_series(st, startISO, endISO))
+                    dwd_keys.append(pkey)
                 except Exception as exc:
                     notes.append(f"DWD fuer {pkey}: {exc}")
-            if dwd_ok > 0:
+            for pkey, evs in zip(dwd_keys, detect_events_batch(dwd_series, source="dwd")):
+                by_point[pkey].extend(evs)
+            if dwd_keys:
                 sources_used.append("dwd")
 
         radar_meta = {"available": False, "reason": None}
         if use_radar:
+            from weather_radar import fetch_radar_events
+
             try:
                 radar = await run_in_threadpool(fetch_radar_events, pts, startISO, endISO)
                 radar_meta["available"] = bool(radar.get("available"))
@@ -1315,7 +1601,7 @@ async def abflussatlas_weather_events(
         per_point: list[dict] = []
         merged: list[dict] = []
         for pkey, evs in by_point.items():
-            fused = _merge_events_clustered(evs, point=pkey)
+            fused = merge_point_events(evs, point=pkey)
             per_point.append({"point": pkey, "events": fused, "count": len(fused)})
             merged.extend(fused)
 
@@ -1341,6 +1627,7 @@ async def abflussatlas_weather_events(
             "events": {
                 "perPoint": per_point,
                 "mergedTop": merged[:200],
+                "clusters": cluster_across_points(merged)[:200],
             },
         }
     except HTTPException:
@@ -1443,6 +1730,8 @@ async def ops_quickcheck_latest(limit: int = Query(10, ge=1, le=50)):
 
 @app.get("/wms/layers")
 async def wms_layers(url: str = Query(..., min_length=8)):
+    from wms_utils import list_wms_layers
+
     try:
         return {"layers": list_wms_layers(url)}
     except Exception as exc:
@@ -1533,6 +1822,8 @@ async def wcs_selftest(
         # generic UTM32 bbox; may be outside for Sachsen -> caller should upload or configure endpoint later.
         test_bbox = (400000.0, 5650000.0, 400200.0, 5650200.0)
 
+    from wcs_selftest import run_wcs_selftest
+
     try:
         result = run_wcs_selftest(
             provider_key=p.key,
@@ -12,7 +12,9 @@ from typing import Any
 
 import requests
 
+import weather_http
 from run_field_event_batch import (
+    _configure_events_limiter,
     _events_cache_key,
     _events_cache_path,
     _field_centroid_latlon,
@@ -67,6 +69,7 @@ def _looks_backend_down(note: str) -> bool:
         "winerror 10061",
         "target machine actively refused",
         "newconnectionerror",
+        "connecterror",
         "connection aborted",
     )
     return any(m in t for m in markers)
@@ -289,7 +292,6 @@ def main() -> int:
     ok = 0
     err = 0
     empty = 0
-    last_call_ts = 0.0
     cell_fetch_cache: dict[str, dict[str, Any]] = {}
     backend_down_streak = 0
 
@@ -320,6 +322,7 @@ def main() -> int:
             params["daysAgo"] = int(args.days_ago)
 
         url = f"{args.api_base_url.rstrip('/')}/abflussatlas/weather/events"
+        _configure_events_limiter(float(args.min_interval_s))
         retries = max(1, int(args.request_retries))
         backoff = max(0.1, float(args.retry_backoff_initial_s))
         backoff_cap = max(backoff, float(args.retry_backoff_max_s))
@@ -328,24 +331,20 @@ def main() -> int:
         http_status: int | None = None
 
         def _fetch_one(p: dict[str, Any]) -> dict[str, Any]:
-            nonlocal backoff, last_call_ts, http_status, last_error
+            nonlocal backoff, http_status, last_error
             cooldowns = 0
             while True:
                 exhausted_throttle = False
                 for attempt in range(1, retries + 1):
-                    now = time.monotonic()
-                    wait_s = max(0.0, float(args.min_interval_s)) - (now - last_call_ts)
-                    if wait_s > 0:
-                        time.sleep(wait_s)
-                    last_call_ts = time.monotonic()
-
                     try:
-                        resp = requests.get(url, params=p, timeout=max(1.0, float(args.request_timeout_s)))
-                        http_status = int(resp.status_code)
-                        if http_status == 429:
-                            raise RuntimeError("HTTP 429")
-                        resp.raise_for_status()
-                        pl = resp.json() if resp.content else {}
+                        try:
+                            pl = weather_http.get_json(
+                                "hydro-api", url, params=p, timeout_s=max(1.0, float(args.request_timeout_s)), retries=1
+                            )
+                            http_status = 200
+                        except weather_http.WeatherHttpError as exc:
+                            http_status = exc.status if exc.status is not None else http_status
+                            raise
                         notes = ((pl.get("meta") or {}).get("notes") or [])
                         note_text = " | ".join(str(x) for x in notes) if isinstance(notes, list) else str(notes)
                         if _is_throttle(note_text):
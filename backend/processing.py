@@ -24,6 +24,7 @@ import os
 import tempfile
 import threading
 import zipfile
+from functools import lru_cache
 from urllib.parse import unquote, urlparse
 from typing import Any
 
@@ -38,11 +39,11 @@ from rasterio.transform import rowcol, xy
 from rasterio.warp import reproject, transform_bounds
 from rasterio.windows import from_bounds
 
+from dem_pyramid import MAX_ANALYSIS_CELLS
 from erosion_abag import compute_abag_index
 from erosion_event_ml import infer_erosion_event_ml
 
 
-MAX_ANALYSIS_CELLS = 4_000_000
 MAX_OUTPUT_FEATURES = 4_000
 MAX_LINE_POINTS = 80
 DEFAULT_LAYER_CACHE_DIR = os.path.join(os.path.dirname(__file__), ".layer_cache")
@@ -52,6 +53,12 @@ DEFAULT_IMPERVIOUS_LAYER_PATH = os.path.join(os.path.dirname(__file__), "data",
 DEFAULT_LAYER_AOI_BUFFER_M = 100.0
 
 
+@lru_cache(maxsize=64)
+def _transformer(src_crs: str, dst_crs: str) -> Transformer:
+    # Transformer construction (PROJ db lookup) is costly; pyproj transformers are thread-safe.
+    return Transformer.from_crs(src_crs, dst_crs, always_xy=True)
+
+
 def _to_float_array(arr) -> np.ndarray:
     """Convert ndarray/masked array to float ndarray with NaN for nodata."""
     if np.ma.isMaskedArray(arr):
@@ -81,8 +88,14 @@ def _load_layer_to_dem_grid(
     dem_transform,
     dem_crs: str | None,
     aoi_buffer_m: float = DEFAULT_LAYER_AOI_BUFFER_M,
+    preloaded: dict[str, dict[str, Any]] | None = None,
 ) -> np.ndarray | None:
-    """Load external raster (windowed by DEM AOI) and reproject it to DEM grid."""
+    """
+    Load external raster (windowed by DEM AOI) and reproject it to DEM grid.
+
+    preloaded: optional result of prefetch_external_layers(); if it holds a window of
+    this layer that covers the required bounds, the disk read is skipped.
+    """
     if not layer_path:
         return None
     if not os.path.exists(layer_path):
@@ -115,7 +128,11 @@ def _load_layer_to_dem_grid(
                 return None
 
             window = from_bounds(ix_left, ix_bottom, ix_right, ix_top, transform=src.transform)
-            src_data = src.read(1, window=window).astype(np.float32)
+            src_data = _slice_preloaded_window((preloaded or {}).get(layer_path), window)
+            if src_data is None:
+                src_data = src.read(1, window=window).astype(np.float32)
+            else:
+                window = window.round_offsets().round_lengths()
             src_transform = src.window_transform(window)
 
             src_nodata = src.nodata
@@ -139,6 +156,88 @@ def _load_layer_to_dem_grid(
         return None
 
 
+def _slice_preloaded_window(entry: dict[str, Any] | None, window) -> np.ndarray | None:
+    if not entry:
+        return None
+    win = window.round_offsets().round_lengths()
+    r0 = int(win.row_off) - int(entry["row_off"])
+    c0 = int(win.col_off) - int(entry["col_off"])
+    data = entry["data"]
+    h, w = int(win.height), int(win.width)
+    if r0 < 0 or c0 < 0 or h <= 0 or w <= 0 or r0 + h > data.shape[0] or c0 + w > data.shape[1]:
+        return None
+    return data[r0:r0 + h, c0:c0 + w].astype(np.float32, copy=True)
+
+
+def _layer_aoi_buffer_m() -> float:
+    try:
+        return float(os.getenv("LAYER_AOI_BUFFER_M", str(DEFAULT_LAYER_AOI_BUFFER_M)))
+    except ValueError:
+        return DEFAULT_LAYER_AOI_BUFFER_M
+
+
+def _external_layer_paths() -> dict[str, str | None]:
+    """Resolve (and download if configured) all optional external layer rasters."""
+    soil_path_cfg = os.getenv("SOIL_RASTER_PATH") or os.path.abspath(DEFAULT_SOIL_LAYER_PATH)
+    impervious_path_cfg = os.getenv("IMPERVIOUS_RASTER_PATH") or os.path.abspath(DEFAULT_IMPERVIOUS_LAYER_PATH)
+    return {
+        "soil": _download_layer_if_missing(soil_path_cfg, os.getenv("SOIL_RASTER_URL"), "soil"),
+        "impervious": _download_layer_if_missing(
+            impervious_path_cfg, os.getenv("IMPERVIOUS_RASTER_URL"), "impervious"
+        ),
+        "abag_k": os.getenv("ABAG_K_FACTOR_RASTER_PATH") or os.getenv("SOIL_RASTER_PATH"),
+        "abag_r": os.getenv("ABAG_R_FACTOR_RASTER_PATH"),
+        "abag_s": os.getenv("ABAG_S_FACTOR_RASTER_PATH"),
+        "abag_c": os.getenv("ABAG_C_FACTOR_RASTER_PATH"),
+        "abag_p": os.getenv("ABAG_P_FACTOR_RASTER_PATH"),
+    }
+
+
+def prefetch_external_layers(
+    south: float,
+    west: float,
+    north: float,
+    east: float,
+    *,
+    layers: tuple[str, ...] | None = None,
+) -> dict[str, dict[str, Any]]:
+    """
+    Download missing external layers and read their AOI windows into memory.
+
+    Only needs the WGS84 bbox, so it can run concurrently with the DEM fetch. The
+    window is padded by 2x LAYER_AOI_BUFFER_M so it also covers the DEM grid extent
+    (tile/pixel snapping). Returns {layer_path: {data, row_off, col_off}} for
+    analyze_dem(preloaded_layers=...).
+    """
+    pad = 2.0 * _layer_aoi_buffer_m()
+    out: dict[str, dict[str, Any]] = {}
+    for key, path in _external_layer_paths().items():
+        if layers is not None and key not in layers:
+            continue
+        if not path or path in out or not os.path.exists(path):
+            continue
+        try:
+            with rasterio.open(path) as src:
+                left, bottom, right, top = transform_bounds(
+                    "EPSG:4326", src.crs, west, south, east, north, densify_pts=21
+                )
+                b = src.bounds
+                ix = (
+                    max(left - pad, b.left),
+                    max(bottom - pad, b.bottom),
+                    min(right + pad, b.right),
+                    min(top + pad, b.top),
+                )
+                if ix[0] >= ix[2] or ix[1] >= ix[3]:
+                    continue
+                window = from_bounds(*ix, transform=src.transform).round_offsets().round_lengths()
+                data = src.read(1, window=window).astype(np.float32)
+            out[path] = {"data": data, "row_off": int(window.row_off), "col_off": int(window.col_off)}
+        except Exception as exc:
+            print(f"[LAYER] Prefetch {key} failed: {exc}")
+    return out
+
+
 def _looks_like_http_url(value: str | None) -> bool:
     return bool(value and value.lower().startswith(("http://", "https://")))
 
@@ -296,6 +395,7 @@ def _resolve_external_factors(
     dem_crs: str | None,
     slope_norm: np.ndarray,
     acc_norm: np.ndarray,
+    preloaded: dict[str, dict[str, Any]] | None = None,
 ) -> tuple[np.ndarray, np.ndarray, dict[str, Any]]:
     """
     Build soil/impervious risk factors from external rasters if available.
@@ -304,23 +404,16 @@ def _resolve_external_factors(
     - SOIL_RASTER_PATH: soil-related raster (higher value = better infiltration)
     - IMPERVIOUS_RASTER_PATH: imperviousness raster (higher value = more sealed)
     """
-    soil_path_cfg = os.getenv("SOIL_RASTER_PATH") or os.path.abspath(DEFAULT_SOIL_LAYER_PATH)
-    impervious_path_cfg = os.getenv("IMPERVIOUS_RASTER_PATH") or os.path.abspath(DEFAULT_IMPERVIOUS_LAYER_PATH)
-    soil_url = os.getenv("SOIL_RASTER_URL")
-    impervious_url = os.getenv("IMPERVIOUS_RASTER_URL")
-    try:
-        aoi_buffer_m = float(os.getenv("LAYER_AOI_BUFFER_M", str(DEFAULT_LAYER_AOI_BUFFER_M)))
-    except ValueError:
-        aoi_buffer_m = DEFAULT_LAYER_AOI_BUFFER_M
-
-    soil_path = _download_layer_if_missing(soil_path_cfg, soil_url, "soil")
-    impervious_path = _download_layer_if_missing(impervious_path_cfg, impervious_url, "impervious")
+    aoi_buffer_m = _layer_aoi_buffer_m()
+    layer_paths = _external_layer_paths()
+    soil_path = layer_paths["soil"]
+    impervious_path = layer_paths["impervious"]
 
     soil_raw = _load_layer_to_dem_grid(
-        soil_path, dem_shape, dem_transform, dem_crs, aoi_buffer_m=aoi_buffer_m
+        soil_path, dem_shape, dem_transform, dem_crs, aoi_buffer_m=aoi_buffer_m, preloaded=preloaded
     )
     impervious_raw = _load_layer_to_dem_grid(
-        impervious_path, dem_shape, dem_transform, dem_crs, aoi_buffer_m=aoi_buffer_m
+        impervious_path, dem_shape, dem_transform, dem_crs, aoi_buffer_m=aoi_buffer_m, preloaded=preloaded
     )
 
     if soil_raw is not None:
@@ -356,6 +449,7 @@ def _resolve_abag_raster_factors(
     dem_transform,
     dem_crs: str | None,
     aoi_buffer_m: float = DEFAULT_LAYER_AOI_BUFFER_M,
+    preloaded: dict[str, dict[str, Any]] | None = None,
 ) -> tuple[dict[str, np.ndarray | None], dict[str, str | None]]:
     """
     Resolve optional ABAG factor rasters from env paths and reproject them to DEM grid.
@@ -374,11 +468,21 @@ def _resolve_abag_raster_factors(
     p_path = os.getenv("ABAG_P_FACTOR_RASTER_PATH")
 
     factors = {
-        "k_factor_raster": _load_layer_to_dem_grid(k_path, dem_shape, dem_transform, dem_crs, aoi_buffer_m=aoi_buffer_m),
-        "r_factor_raster": _load_layer_to_dem_grid(r_path, dem_shape, dem_transform, dem_crs, aoi_buffer_m=aoi_buffer_m),
-        "s_factor_raster": _load_layer_to_dem_grid(s_path, dem_shape, dem_transform, dem_crs, aoi_buffer_m=aoi_buffer_m),
-        "c_factor_raster": _load_layer_to_dem_grid(c_path, dem_shape, dem_transform, dem_crs, aoi_buffer_m=aoi_buffer_m),
-        "p_factor_raster": _load_layer_to_dem_grid(p_path, dem_shape, dem_transform, dem_crs, aoi_buffer_m=aoi_buffer_m),
+        "k_factor_raster": _load_layer_to_dem_grid(
+            k_path, dem_shape, dem_transform, dem_crs, aoi_buffer_m=aoi_buffer_m, preloaded=preloaded
+        ),
+        "r_factor_raster": _load_layer_to_dem_grid(
+            r_path, dem_shape, dem_transform, dem_crs, aoi_buffer_m=aoi_buffer_m, preloaded=preloaded
+        ),
+        "s_factor_raster": _load_layer_to_dem_grid(
+            s_path, dem_shape, dem_transform, dem_crs, aoi_buffer_m=aoi_buffer_m, preloaded=preloaded
+        ),
+        "c_factor_raster": _load_layer_to_dem_grid(
+            c_path, dem_shape, dem_transform, dem_crs, aoi_buffer_m=aoi_buffer_m, preloaded=preloaded
+        ),
+        "p_factor_raster": _load_layer_to_dem_grid(
+            p_path, dem_shape, dem_transform, dem_crs, aoi_buffer_m=aoi_buffer_m, preloaded=preloaded
+        ),
     }
     sources = {
         "k_factor_raster_path": k_path if factors["k_factor_raster"] is not None else None,
@@ -496,7 +600,7 @@ def _reproject_geojson(geojson: dict, src_crs_str: str) -> dict:
     if src_crs == dst_crs:
         return geojson
 
-    transformer = Transformer.from_crs(src_crs, dst_crs, always_xy=True)
+    transformer = _transformer(src_crs_str, "EPSG:4326")
 
     def transform_xy(pt):
         x, y = pt
@@ -557,7 +661,7 @@ def _build_hotspots(
     if src_crs_str:
         src_crs = CRS(src_crs_str)
         if src_crs != CRS("EPSG:4326"):
-            to_wgs = Transformer.from_crs(src_crs, "EPSG:4326", always_xy=True)
+            to_wgs = _transformer(src_crs_str, "EPSG:4326")
 
     selected: list[tuple[int, int]] = []
     min_dist_px = 25
@@ -652,7 +756,7 @@ def _build_hotspots_abag(
     if src_crs_str:
         src_crs = CRS(src_crs_str)
         if src_crs != CRS("EPSG:4326"):
-            to_wgs = Transformer.from_crs(src_crs, "EPSG:4326", always_xy=True)
+            to_wgs = _transformer(src_crs_str, "EPSG:4326")
 
     selected: list[tuple[int, int]] = []
     min_dist_px = 25
@@ -757,7 +861,7 @@ def _build_ponding_hotspots(
     if src_crs_str:
         src_crs = CRS(src_crs_str)
         if src_crs != CRS("EPSG:4326"):
-            to_wgs = Transformer.from_crs(src_crs, "EPSG:4326", always_xy=True)
+            to_wgs = _transformer(src_crs_str, "EPSG:4326")
 
     selected: list[tuple[int, int]] = []
     min_dist_px = 28
@@ -922,6 +1026,138 @@ def _measures_for_hotspot(h: dict[str, Any]) -> list[dict[str, Any]]:
     return measures[:6]
 
 
+def _transform_polygon_geometry(geom: dict, transformer: Transformer) -> dict | None:
+    """Transform a GeoJSON Polygon/MultiPolygon (lon/lat) into the DEM CRS."""
+    gtype = (geom or {}).get("type")
+    coords = (geom or {}).get("coordinates")
+    if not coords:
+        return None
+
+    def ring_xy(ring):
+        out = []
+        for pt in ring:
+            if not isinstance(pt, (list, tuple)) or len(pt) < 2:
+                continue
+            x, y = transformer.transform(float(pt[0]), float(pt[1]))
+            out.append([x, y])
+        return out
+
+    if gtype == "Polygon":
+        rings = [ring_xy(r) for r in coords]
+        rings = [r for r in rings if len(r) >= 3]
+        return {"type": "Polygon", "coordinates": rings} if rings else None
+    if gtype == "MultiPolygon":
+        polys = []
+        for poly in coords:
+            rings = [ring_xy(r) for r in poly]
+            rings = [r for r in rings if len(r) >= 3]
+            if rings:
+                polys.append(rings)
+        return {"type": "MultiPolygon", "coordinates": polys} if polys else None
+    return None
+
+
+def _zonal_field_stats(
+    *,
+    zones: list[dict[str, Any]],
+    risk_score: np.ndarray,
+    valid_mask: np.ndarray,
+    transform,
+    src_crs_str: str | None,
+    pixel_area_m2: float,
+    abag_index: np.ndarray | None = None,
+    event_probability: np.ndarray | None = None,
+) -> list[dict[str, Any]]:
+    """
+    Per-field zonal statistics on the shared analysis grid.
+
+    Fields are burned into one label raster (0 = outside, i = zones[i-1]); all sums/counts
+    are then computed in a single pass with np.bincount instead of one mask per field.
+    Each item carries a status: "ok", "no_valid_cells" or "no_cells" (field smaller than
+    one grid cell or outside the DEM).
+    """
+    if not zones or not src_crs_str:
+        return []
+
+    tr = _transformer("EPSG:4326", src_crs_str)
+    shapes = []
+    for idx, zone in enumerate(zones, start=1):
+        geom = _transform_polygon_geometry(zone.get("geometry") or {}, tr)
+        if geom is not None:
+            shapes.append((geom, idx))
+
+    n = len(zones)
+    if shapes:
+        labels = rio_features.rasterize(
+            shapes,
+            out_shape=risk_score.shape,
+            transform=transform,
+            fill=0,
+            dtype="int32",
+            all_touched=False,
+        ).ravel()
+    else:
+        labels = np.zeros(risk_score.size, dtype=np.int32)
+
+    total_counts = np.bincount(labels, minlength=n + 1)
+    valid = valid_mask.ravel() & np.isfinite(risk_score.ravel()) & (labels > 0)
+    lab_v = labels[valid]
+    score_v = risk_score.ravel()[valid]
+
+    counts = np.bincount(lab_v, minlength=n + 1)
+    sums = np.bincount(lab_v, weights=score_v, minlength=n + 1)
+    maxs = np.full(n + 1, np.nan)
+    if lab_v.size:
+        maxs_acc = np.full(n + 1, -np.inf)
+        np.maximum.at(maxs_acc, lab_v, score_v)
+        maxs = np.where(np.isfinite(maxs_acc), maxs_acc, np.nan)
+
+    # Class index per cell, same thresholds as _risk_class (niedrig/mittel/hoch/sehr_hoch).
+    cls = np.digitize(score_v, [45.0, 70.0, 85.0])
+    class_counts = np.bincount(lab_v * 4 + cls, minlength=(n + 1) * 4).reshape(n + 1, 4)
+    class_names = ("niedrig", "mittel", "hoch", "sehr_hoch")
+
+    def masked_means(arr: np.ndarray | None) -> tuple[np.ndarray, np.ndarray] | None:
+        if not isinstance(arr, np.ndarray) or arr.shape != risk_score.shape:
+            return None
+        vals = arr.ravel()[valid]
+        ok = np.isfinite(vals)
+        c = np.bincount(lab_v[ok], minlength=n + 1)
+        s = np.bincount(lab_v[ok], weights=vals[ok], minlength=n + 1)
+        return s, c
+
+    abag_sc = masked_means(abag_index)
+    prob_sc = masked_means(event_probability)
+
+    out: list[dict[str, Any]] = []
+    for idx, zone in enumerate(zones, start=1):
+        c = int(counts[idx])
+        total = int(total_counts[idx])
+        item: dict[str, Any] = {
+            "id": zone.get("id"),
+            "properties": zone.get("properties") or {},
+            "status": "ok" if c > 0 else ("no_valid_cells" if total > 0 else "no_cells"),
+            "cell_count": total,
+            "valid_cell_count": c,
+            "area_ha": round(float(total) * float(pixel_area_m2) / 10_000.0, 4),
+            "valid_cell_share": round(float(c) / float(total), 6) if total > 0 else 0.0,
+            "risk_score_mean": round(float(sums[idx]) / float(c), 2) if c > 0 else None,
+            "risk_score_max": int(round(float(maxs[idx]))) if c > 0 and np.isfinite(maxs[idx]) else None,
+            "class_share_percent": {
+                name: (round(float(class_counts[idx, k]) / float(c) * 100.0, 1) if c > 0 else 0.0)
+                for k, name in enumerate(class_names)
+            },
+        }
+        if abag_sc is not None:
+            s, cc = abag_sc
+            item["abag_index_mean"] = round(float(s[idx]) / float(cc[idx]), 3) if cc[idx] > 0 else None
+        if prob_sc is not None:
+            s, cc = prob_sc
+            item["event_probability_mean"] = round(float(s[idx]) / float(cc[idx]), 3) if cc[idx] > 0 else None
+        out.append(item)
+    return out
+
+
 def _scenario_summary(risk_norm: np.ndarray, valid_mask: np.ndarray, rain_mm_per_h: int) -> dict[str, Any]:
     scale = rain_mm_per_h / 50.0
     scenario_score = np.clip(risk_norm * scale, 0.0, 1.0) * 100.0
@@ -959,8 +1195,22 @@ def analyze_dem(
     ml_severity_model_key: str | None = None,
     ml_threshold: float = 0.50,
     abag_p_factor: float | None = None,
+    zones: list[dict[str, Any]] | None = None,
+    preloaded_layers: dict[str, dict[str, Any]] | None = None,
+    dem_acquisition: dict[str, Any] | None = None,
 ) -> dict:
-    """Run full flow accumulation analysis and return enriched GeoJSON."""
+    """
+    Run full flow accumulation analysis and return enriched GeoJSON.
+
+    preloaded_layers: optional prefetch_external_layers() result (AOI windows read
+    while the DEM was being fetched).
+
+    dem_acquisition: optional DEM fetch metrics (e.g. WCS tile cache hits), reported
+    as analysis["performance"]["dem_acquisition"].
+
+    zones: optional field polygons ({"id", "geometry" (GeoJSON, WGS84), "properties"}); when set,
+    per-field zonal statistics are added as analysis["field_stats"].
+    """
 
     def progress(step, total, msg):
         print(f"  [{step}/{total}] {msg}")
@@ -1035,6 +1285,7 @@ def analyze_dem(
         dem_crs=src_crs,
         slope_norm=slope_norm,
         acc_norm=acc_norm,
+        preloaded=preloaded_layers,
     )
     print(
         "[RISK] Sources: "
@@ -1081,6 +1332,7 @@ def analyze_dem(
             dem_transform=transform,
             dem_crs=src_crs,
             aoi_buffer_m=layer_info.get("layer_aoi_buffer_m") or DEFAULT_LAYER_AOI_BUFFER_M,
+            preloaded=preloaded_layers,
         )
         abag_bundle = compute_abag_index(
             acc_cells=acc_arr,
@@ -1457,6 +1709,8 @@ def analyze_dem(
             "max_line_points": MAX_LINE_POINTS,
         },
     }
+    if dem_acquisition:
+        branches["analysis"]["performance"]["dem_acquisition"] = dict(dem_acquisition)
     if analysis_type == "abag" and abag_bundle is not None:
         branches["analysis"]["sources"] = {
             "soil": layer_info["soil_source"],
@@ -1475,6 +1729,27 @@ def analyze_dem(
             "cover": layer_info["impervious_source"],
         }
         branches["analysis"]["feature_contract"] = (event_ml_bundle.get("meta") or {}).get("feature_contract") or []
+    if zones:
+        abag_index_arr = None
+        if analysis_type == "abag" and abag_bundle is not None:
+            abag_index_arr = (abag_bundle.get("factors") or {}).get("a_index")
+        event_prob_arr = None
+        if analysis_type == "erosion_events_ml" and event_ml_bundle is not None:
+            event_prob_arr = np.asarray(event_ml_bundle.get("risk_norm"), dtype=float)
+        branches["analysis"]["field_stats"] = _zonal_field_stats(
+            zones=zones,
+            risk_score=risk_score,
+            valid_mask=valid_mask,
+            transform=transform,
+            src_crs_str=src_crs,
+            pixel_area_m2=pixel_area_m2,
+            abag_index=abag_index_arr,
+            event_probability=event_prob_arr,
+        )
+        # Fields too small for the analysis grid (or outside the DEM) get no label cell.
+        branches["analysis"]["fields_without_cells"] = [
+            f["id"] for f in branches["analysis"]["field_stats"] if f["cell_count"] == 0
+        ]
 
     print(f"  Features: {full_feature_count} (output: {len(reduced_features)})")
     if temp_created:
@@ -1526,7 +1801,7 @@ def delineate_catchment_dem(
         raise ValueError("DEM hat kein CRS.")
 
     # Project pour point to DEM CRS
-    tr = Transformer.from_crs("EPSG:4326", src_crs, always_xy=True)
+    tr = _transformer("EPSG:4326", src_crs.to_string())
     x, y = tr.transform(float(lon), float(lat))
 
     progress("Senken werden gefuellt...")
@@ -0,0 +1,313 @@
+"""
+Memory-mapped RADOLAN RW month cubes.
+
+The DWD CDC archive ships one tar per month with one tar.gz per day and one
+ASCII grid per hour. build_month_cube() parses every hour of a month once and
+writes to RADOLAN_CUBE_DIR:
+  RW-YYYYMM.npy   (hours x rows x cols) raw grid values, int16 (float32 when
+                  the grids are not integral), rows top-down as in the ASC
+  RW-YYYYMM.json  grid header (ncols, nrows, xllcorner, yllcorner, cellsize,
+                  nodata_value), first hour (epoch hours) and missing slots
+Slot i is hour i after the first of the month 00:00 UTC; the product
+RW_YYYYMMDD-HH50 is stored at HH:00 like the on-the-fly reader did. Absent
+hours are filled with FILL (int16) or NaN (float32).
+
+open_month_cube() maps a cube read-only; point and window queries are array
+slices instead of tar/gzip/ASCII parsing per request. weather_radar only reads
+cubes that already exist and falls back to the month tar otherwise; cubes are
+built by the CLI below (about 1.2 GB per month as int16), serialized across
+processes with a per-month lock file (RADOLAN_CUBE_DIR/locks).
+
+CLI (preconversion):
+  python radolan_cube.py 2023-05 2023-09
+
+Configuration:
+- RADOLAN_CUBE: 1 = weather_radar reads months that have a cube from it (default 1)
+- RADOLAN_CUBE_DIR: cube folder (default RADAR_CACHE_DIR/cube)
+- RADOLAN_KEEP_TARS: 1 = keep month tars after conversion (default 1)
+"""
+
+from __future__ import annotations
+
+import argparse
+import calendar
+import datetime as dt
+import gzip
+import io
+import json
+import os
+import re
+import tarfile
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterator
+
+import numpy as np
+
+from dem_cache import _FileLock
+
+RADOLAN_CUBE = os.getenv("RADOLAN_CUBE", "1").strip().lower() in ("1", "true", "yes")
+RADOLAN_CUBE_DIR = Path(
+    os.getenv("RADOLAN_CUBE_DIR", "")
+    or Path(os.getenv("RADAR_CACHE_DIR", ".cache/radolan") or ".cache/radolan") / "cube"
+)
+RADOLAN_KEEP_TARS = os.getenv("RADOLAN_KEEP_TARS", "1").strip().lower() in ("1", "true", "yes")
+
+FILL = int(np.iinfo(np.int16).min)
+_GRID_KEYS = ("ncols", "nrows", "xllcorner", "yllcorner", "cellsize", "nodata_value")
+_DAY_RE = re.compile(r"RW-(\d{8})\.tar\.gz$")
+_HOUR_RE = re.compile(r"RW_(\d{8})-(\d{2})50\.asc$")
+
+_BUILD_LOCK = threading.Lock()
+_OPEN_LOCK = threading.Lock()
+_OPEN: dict[str, tuple[float, "MonthCube"]] = {}
+
+
+class _NotIntegral(Exception):
+    pass
+
+
+def _stem(year: int, month: int) -> str:
+    return f"RW-{year:04d}{month:02d}"
+
+
+def _read_asc(data: bytes) -> tuple[dict[str, float], np.ndarray]:
+    lines = data.decode("ascii", errors="replace").split("\n", 6)
+    if len(lines) < 7:
+        raise RuntimeError("RADOLAN ASC Header unvollstaendig.")
+    header: dict[str, float] = {}
+    for line in lines[:6]:
+        parts = line.strip().split()
+        if len(parts) >= 2:
+            header[parts[0].lower()] = float(parts[-1])
+    ncols = int(header.get("ncols", 0))
+    nrows = int(header.get("nrows", 0))
+    if ncols <= 0 or nrows <= 0:
+        raise RuntimeError("RADOLAN ASC Rasterheader ungueltig.")
+    grid = np.fromstring(lines[6], dtype=np.float64, sep=" ")
+    if grid.size < ncols * nrows:
+        raise RuntimeError("RADOLAN ASC Raster unvollstaendig.")
+    return header, grid[: ncols * nrows].reshape(nrows, ncols)
+
+
+def _iter_month_hours(tar_path: Path) -> Iterator[tuple[str, int, bytes]]:
+    """(YYYYMMDD, hour, asc bytes) for every hourly grid in a month tar."""
+    with tarfile.open(tar_path, "r") as month_tar:
+        for member in month_tar:
+            m = _DAY_RE.search(member.name)
+            if not m or not member.isfile():
+                continue
+            day_bytes = month_tar.extractfile(member).read()
+            with tarfile.open(fileobj=gzip.GzipFile(fileobj=io.BytesIO(day_bytes)), mode="r:") as day_tar:
+                for inner in day_tar:
+                    h = _HOUR_RE.search(inner.name)
+                    if not h or not inner.isfile():
+                        continue
+                    yield h.group(1), int(h.group(2)), day_tar.extractfile(inner).read()
+
+
+def _write_cube(tar_path: Path, year: int, month: int, out_dir: Path, dtype) -> Path:
+    stem = _stem(year, month)
+    first_hour = int(dt.datetime(year, month, 1, tzinfo=dt.timezone.utc).timestamp() // 3600)
+    n_slots = calendar.monthrange(year, month)[1] * 24
+    fill = FILL if dtype == np.int16 else np.nan
+    # Unique per builder; a concurrent builder must never write or unlink our temp files.
+    tag = f"{os.getpid()}.{threading.get_ident()}"
+    tmp_npy = out_dir / f"{stem}.npy.{tag}.tmp"
+    tmp_json = out_dir / f"{stem}.json.{tag}.tmp"
+    present = np.zeros(n_slots, dtype=bool)
+    grid_header: dict[str, float] | None = None
+    cube = None
+    try:
+        for day_key, hour, data in _iter_month_hours(tar_path):
+            if not day_key.startswith(f"{year:04d}{month:02d}"):
+                continue
+            slot = (int(day_key[6:8]) - 1) * 24 + hour
+            if not 0 <= slot < n_slots:
+                continue
+            header, grid = _read_asc(data)
+            geo = {k: header.get(k) for k in _GRID_KEYS}
+            if cube is None:
+                grid_header = geo
+                cube = np.lib.format.open_memmap(tmp_npy, mode="w+", dtype=dtype, shape=(n_slots,) + grid.shape)
+                cube[:] = fill
+            elif geo != grid_header:
+                print(f"[RADOLAN] {stem}: Raster {day_key}-{hour:02d} weicht vom Monatsraster ab, uebersprungen")
+                continue
+            if dtype == np.int16:
+                raw = np.rint(grid)
+                if not np.array_equal(raw, grid) or raw.min() <= FILL or raw.max() > np.iinfo(np.int16).max:
+                    raise _NotIntegral()
+            cube[slot] = grid
+            present[slot] = True
+        if cube is None:
+            raise RuntimeError(f"Keine RADOLAN-Stunden in {tar_path.name}.")
+        cube.flush()
+        del cube
+        meta = {
+            **grid_header,
+            "first_hour": first_hour,
+            "hours": n_slots,
+            "dtype": np.dtype(dtype).name,
+            "fill": FILL if dtype == np.int16 else None,
+            "missing_slots": np.flatnonzero(~present).tolist(),
+            "source": tar_path.name,
+        }
+        tmp_json.write_text(json.dumps(meta), encoding="utf-8")
+        os.replace(tmp_npy, out_dir / f"{stem}.npy")
+        os.replace(tmp_json, out_dir / f"{stem}.json")
+    finally:
+        for p in (tmp_npy, tmp_json):
+            if p.exists():
+                p.unlink()
+    return out_dir / f"{stem}.json"
+
+
+def build_month_cube(tar_path: str | Path, year: int, month: int, out_dir: str | Path | None = None) -> Path:
+    """Convert one RADOLAN RW month tar into a cube; returns the header path."""
+    out = Path(out_dir) if out_dir else RADOLAN_CUBE_DIR
+    out.mkdir(parents=True, exist_ok=True)
+    t0 = time.perf_counter()
+    try:
+        path = _write_cube(Path(tar_path), year, month, out, np.int16)
+    except _NotIntegral:
+        path = _write_cube(Path(tar_path), year, month, out, np.float32)
+    meta = json.loads(path.read_text(encoding="utf-8"))
+    print(
+        f"[RADOLAN] {_stem(year, month)}: {meta['hours'] - len(meta['missing_slots'])}/{meta['hours']} h "
+        f"{int(meta['nrows'])}x{int(meta['ncols'])} {meta['dtype']} in {time.perf_counter() - t0:.1f}s"
+    )
+    return path
+
+
+@dataclass
+class MonthCube:
+    first_hour: int
+    data: np.ndarray
+    present: np.ndarray
+    ncols: int
+    nrows: int
+    xll: float
+    yll: float
+    cellsize: float
+    nodata: float
+
+    def cells(self, point_xy: list[tuple[float, float]]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Grid (row, col) per projected point and an inside-grid mask."""
+        xy = np.asarray(point_xy, dtype=np.float64).reshape(-1, 2)
+        col = np.floor((xy[:, 0] - self.xll) / self.cellsize).astype(np.int64)
+        row = self.nrows - 1 - np.floor((xy[:, 1] - self.yll) / self.cellsize).astype(np.int64)
+        inside = (row >= 0) & (row < self.nrows) & (col >= 0) & (col < self.ncols)
+        return np.where(inside, row, 0), np.where(inside, col, 0), inside
+
+    def sample(self, point_xy: list[tuple[float, float]], h0: int, h1: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Raw values for epoch hours h0..h1 (inclusive) at the points.
+        Returns (hours of present slots, values hours x points); nodata and
+        points outside the grid are NaN.
+        """
+        a = max(int(h0) - self.first_hour, 0)
+        b = min(int(h1) - self.first_hour + 1, self.data.shape[0])
+        if b <= a:
+            return np.zeros(0, dtype=np.int64), np.zeros((0, len(point_xy)), dtype=np.float64)
+        row, col, inside = self.cells(point_xy)
+        keep = np.flatnonzero(self.present[a:b])
+        vals = np.asarray(self.data[a:b, row, col], dtype=np.float64)[keep]
+        vals[:, ~inside] = np.nan
+        vals[vals <= self.nodata] = np.nan
+        return self.first_hour + a + keep.astype(np.int64), vals
+
+
+def open_month_cube(year: int, month: int, cube_dir: str | Path | None = None) -> MonthCube | None:
+    """Read-only memory map of a converted month, or None if not converted yet."""
+    root = Path(cube_dir) if cube_dir else RADOLAN_CUBE_DIR
+    head = root / f"{_stem(year, month)}.json"
+    try:
+        mtime = head.stat().st_mtime
+    except OSError:
+        return None
+    key = str(head)
+    with _OPEN_LOCK:
+        hit = _OPEN.get(key)
+        if hit and hit[0] == mtime:
+            return hit[1]
+    meta = json.loads(head.read_text(encoding="utf-8"))
+    data = np.load(root / f"{_stem(year, month)}.npy", mmap_mode="r")
+    present = np.ones(int(meta["hours"]), dtype=bool)
+    present[np.asarray(meta.get("missing_slots") or [], dtype=np.int64)] = False
+    cube = MonthCube(
+        first_hour=int(meta["first_hour"]),
+        data=data,
+        present=present,
+        ncols=int(meta["ncols"]),
+        nrows=int(meta["nrows"]),
+        xll=float(meta["xllcorner"]),
+        yll=float(meta["yllcorner"]),
+        cellsize=float(meta.get("cellsize") or 1000.0),
+        nodata=float(meta["nodata_value"]) if meta.get("nodata_value") is not None else -1.0,
+    )
+    with _OPEN_LOCK:
+        _OPEN[key] = (mtime, cube)
+    return cube
+
+
+def ensure_month_cube(
+    year: int,
+    month: int,
+    fetch_tar: Callable[[int, int], Path],
+    *,
+    force: bool = False,
+) -> MonthCube:
+    """
+    Open the month cube, converting the month tar (fetch_tar) first if needed.
+
+    Fetch, build and tar removal run under a per-month file lock, so several API
+    workers and the CLI never build the same month or delete a tar in use.
+    """
+    cube = None if force else open_month_cube(year, month)
+    if cube is not None:
+        return cube
+    stem = _stem(year, month)
+    with _BUILD_LOCK, _FileLock(RADOLAN_CUBE_DIR / "locks" / f"{stem}.lock"):
+        cube = None if force else open_month_cube(year, month)
+        if cube is not None:
+            return cube
+        tar_path = Path(fetch_tar(year, month))
+        build_month_cube(tar_path, year, month)
+        if not RADOLAN_KEEP_TARS:
+            tar_path.unlink(missing_ok=True)
+    cube = open_month_cube(year, month)
+    if cube is None:
+        raise RuntimeError(f"RADOLAN-Cube {_stem(year, month)} konnte nicht erstellt werden.")
+    return cube
+
+
+def _month_range(first: str, last: str) -> list[tuple[int, int]]:
+    y, m = (int(x) for x in first.split("-")[:2])
+    y1, m1 = (int(x) for x in last.split("-")[:2])
+    out = []
+    while (y, m) <= (y1, m1):
+        out.append((y, m))
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+    return out
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Convert RADOLAN RW month archives into memory-mapped cubes.")
+    p.add_argument("first", help="First month YYYY-MM")
+    p.add_argument("last", nargs="?", default=None, help="Last month YYYY-MM (default: first)")
+    p.add_argument("--force", action="store_true", help="Rebuild months that are already converted")
+    return p
+
+
+if __name__ == "__main__":
+    import weather_radar
+
+    args = build_parser().parse_args()
+    for year, month in _month_range(args.first, args.last or args.first):
+        try:
+            ensure_month_cube(year, month, weather_radar._ensure_month_tar, force=args.force)
+        except Exception as exc:
+            print(f"[RADOLAN] {_stem(year, month)}: {exc}")
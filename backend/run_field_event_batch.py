@@ -7,7 +7,6 @@ import hashlib
 import json
 import math
 import re
-import threading
 import time
 from dataclasses import dataclass
 from pathlib import Path
@@ -16,6 +15,8 @@ from typing import Any
 import concurrent.futures
 import requests
 
+import weather_http
+
 FIELDNAMES = [
     "field_id",
     "event_id",
@@ -50,8 +51,11 @@ FIELDNAMES = [
     "error",
 ]
 
-_EVENT_FETCH_LOCK = threading.Lock()
-_LAST_EVENT_FETCH_TS = 0.0
+
+def _configure_events_limiter(min_interval_s: float) -> None:
+    """Map the legacy minimum request interval onto the shared 'hydro-api' token bucket."""
+    interval = max(0.0, float(min_interval_s))
+    weather_http.configure("hydro-api", rate=(1.0 / interval) if interval > 0 else 0.0, burst=1)
 
 
 @dataclass
@@ -443,18 +447,6 @@ def _load_or_fetch_auto_events_for_field(
             return True
         return False
 
-    def _throttle_requests() -> None:
-        global _LAST_EVENT_FETCH_TS
-        interval = max(0.0, float(min_interval_s))
-        if interval <= 0.0:
-            return
-        with _EVENT_FETCH_LOCK:
-            now = time.monotonic()
-            wait_s = interval - (now - _LAST_EVENT_FETCH_TS)
-            if wait_s > 0:
-                time.sleep(wait_s)
-            _LAST_EVENT_FETCH_TS = time.monotonic()
-
     cache_path: Path | None = None
     cache_key = _events_cache_key(
         source=source,
@@ -537,6 +529,7 @@ def _load_or_fetch_auto_events_for_field(
         params["daysAgo"] = int(days_ago)
 
     url = f"{base_url.rstrip('/')}/abflussatlas/weather/events"
+    _configure_events_limiter(min_interval_s)
     retries = max(1, int(request_retries))
     backoff_s = max(0.1, float(retry_backoff_initial_s))
     backoff_cap_s = max(backoff_s, float(retry_backoff_max_s))
@@ -552,12 +545,9 @@ def _load_or_fetch_auto_events_for_field(
             q.pop("daysAgo", None)
         for attempt in range(1, retries + 1):
             try:
-                _throttle_requests()
-                resp = requests.get(url, params=q, timeout=timeout_s)
-                if int(resp.status_code) == 429:
-                    raise RuntimeError("auto-events provider throttled: HTTP 429")
-                resp.raise_for_status()
-                pl = resp.json() if resp.content else {}
+                # Rate limit + Retry-After pauses are shared through the weather HTTP client;
+                # retries stay here so throttle notes in HTTP 200 payloads are handled alike.
+                pl = weather_http.get_json("hydro-api", url, params=q, timeout_s=timeout_s, retries=1)
 
                 # Guard against silent upstream throttling:
                 # Some providers return HTTP 200 plus a note containing "429 Too Many Requests".
@@ -744,6 +734,59 @@ def _call_analyze_bbox(
     raise RuntimeError(str(last_err) if last_err else "Request fehlgeschlagen")
 
 
+def _post_dem_prefetch(
+    *,
+    base_url: str,
+    aois: list[FieldAOI],
+    provider: str,
+    dem_source: str,
+    timeout_s: int = 30,
+) -> dict[str, Any] | None:
+    """Ask the backend to fetch DEMs for upcoming fields in the background (best effort)."""
+    body = {
+        "bboxes": [{"south": a.south, "west": a.west, "north": a.north, "east": a.east} for a in aois],
+        "provider": provider,
+        "dem_source": dem_source,
+    }
+    url = f"{base_url.rstrip('/')}/dem/prefetch"
+    try:
+        resp = requests.post(url, json=body, timeout=timeout_s)
+        resp.raise_for_status()
+        return resp.json()
+    except Exception as exc:
+        print(f"  [dem-prefetch] {exc}")
+        return None
+
+
+def _post_weather_prefetch(
+    *,
+    base_url: str,
+    aois: list[FieldAOI],
+    start: str | None,
+    end: str | None,
+    hours: int,
+    days_ago: int,
+    timeout_s: int = 300,
+) -> dict[str, Any] | None:
+    """Fill the backend's hourly weather store for upcoming fields in multi-location calls (best effort)."""
+    body: dict[str, Any] = {
+        "points": [dict(zip(("lat", "lon"), _field_centroid_latlon(a))) for a in aois],
+        "hours": int(hours),
+        "daysAgo": int(days_ago),
+    }
+    if start and end:
+        body["start"] = start
+        body["end"] = end
+    url = f"{base_url.rstrip('/')}/abflussatlas/weather/prefetch"
+    try:
+        resp = requests.post(url, json=body, timeout=timeout_s)
+        resp.raise_for_status()
+        return resp.json()
+    except Exception as exc:
+        print(f"  [weather-prefetch] {exc}")
+        return None
+
+
 def _extract_metrics(result: dict[str, Any]) -> tuple[dict[str, Any], dict[str, Any]]:
     analysis = (result or {}).get("analysis") or {}
     metrics = analysis.get("metrics") or {}
@@ -819,7 +862,49 @@ def run(args: argparse.Namespace) -> int:
     since_checkpoint = 0
     started = dt.datetime.now(tz=dt.timezone.utc)
 
-    for fld in fields:
+    prefetch_ahead = max(0, int(args.dem_prefetch_ahead))
+    prefetched_upto = 0  # fields[:prefetched_upto] were already submitted
+
+    weather_prefetch_ahead = max(0, int(args.weather_prefetch_ahead))
+    if events_source != "auto" or str(args.events_auto_source).strip().lower() not in ("icon2d", "hybrid", "hybrid_radar"):
+        weather_prefetch_ahead = 0
+    weather_prefetched_upto = 0
+    weather_prefetch_stats = {"requests": 0, "points": 0, "upstream_calls": 0}
+
+    for fld_idx, fld in enumerate(fields):
+        # Keep the backend's DEM prefetch queue filled up to N fields ahead of the cursor;
+        # refill in batches once half of the look-ahead is used up.
+        if prefetch_ahead and prefetched_upto - fld_idx <= prefetch_ahead // 2:
+            upto = min(len(fields), fld_idx + 1 + prefetch_ahead)
+            start = max(prefetched_upto, fld_idx + 1)
+            if start < upto:
+                _post_dem_prefetch(
+                    base_url=args.api_base_url,
+                    aois=fields[start:upto],
+                    provider=args.provider,
+                    dem_source=args.dem_source,
+                )
+            prefetched_upto = upto
+
+        if weather_prefetch_ahead and weather_prefetched_upto - fld_idx <= weather_prefetch_ahead // 2:
+            upto = min(len(fields), fld_idx + weather_prefetch_ahead)
+            start = max(weather_prefetched_upto, fld_idx)
+            if start < upto:
+                res = _post_weather_prefetch(
+                    base_url=args.api_base_url,
+                    aois=fields[start:upto],
+                    start=args.events_auto_start,
+                    end=args.events_auto_end,
+                    hours=int(args.events_auto_hours),
+                    days_ago=int(args.events_auto_days_ago),
+                    timeout_s=int(args.timeout_s),
+                )
+                if res and res.get("status") == "ok":
+                    weather_prefetch_stats["requests"] += 1
+                    weather_prefetch_stats["points"] += int(res.get("points") or 0)
+                    weather_prefetch_stats["upstream_calls"] += int(res.get("upstream_calls") or 0)
+            weather_prefetched_upto = upto
+
         field_events: list[FieldEvent]
         if events_source == "csv":
             field_events = events
@@ -1086,6 +1171,16 @@ def run(args: argparse.Namespace) -> int:
         "row_count": len(rows_out),
         "out_csv": str(out_csv),
     }
+    if weather_prefetch_stats["points"]:
+        weather_prefetch_stats["upstream_calls_per_1000_fields"] = round(
+            weather_prefetch_stats["upstream_calls"] * 1000.0 / weather_prefetch_stats["points"], 2
+        )
+        meta["weather_prefetch"] = weather_prefetch_stats
+        print(
+            f"[OK] Weather prefetch: {weather_prefetch_stats['points']} fields, "
+            f"{weather_prefetch_stats['upstream_calls']} upstream calls "
+            f"({weather_prefetch_stats['upstream_calls_per_1000_fields']} per 1000 fields)"
+        )
     out_meta.write_text(json.dumps(meta, indent=2), encoding="utf-8")
     print(f"[OK] CSV:  {out_csv}")
     print(f"[OK] META: {out_meta}")
@@ -1128,6 +1223,18 @@ def build_parser() -> argparse.ArgumentParser:
     p.add_argument("--request-retries", type=int, default=3)
     p.add_argument("--checkpoint-every", type=int, default=20, help="Write partial CSV every N rows.")
     p.add_argument("--continue-on-error", action=argparse.BooleanOptionalAction, default=True)
+    p.add_argument(
+        "--dem-prefetch-ahead",
+        type=int,
+        default=0,
+        help="Prefetch DEMs for the next N fields via /dem/prefetch while analysing (0=off).",
+    )
+    p.add_argument(
+        "--weather-prefetch-ahead",
+        type=int,
+        default=0,
+        help="Fill the backend weather store for the next N fields via /abflussatlas/weather/prefetch (0=off).",
+    )
     return p
 
 
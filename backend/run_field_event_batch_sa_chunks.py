@@ -84,6 +84,18 @@ def _parse_args() -> argparse.Namespace:
     p.add_argument("--request-retries", type=int, default=3)
     p.add_argument("--checkpoint-every", type=int, default=50)
     p.add_argument("--continue-on-error", action=argparse.BooleanOptionalAction, default=True)
+    p.add_argument(
+        "--dem-prefetch-ahead",
+        type=int,
+        default=0,
+        help="Forwarded to run_field_event_batch.py: prefetch DEMs for the next N fields (0=off).",
+    )
+    p.add_argument(
+        "--weather-prefetch-ahead",
+        type=int,
+        default=0,
+        help="Forwarded to run_field_event_batch.py: fill the weather store for the next N fields (0=off).",
+    )
     p.add_argument(
         "--min-field-area-ha",
         type=float,
@@ -363,6 +375,10 @@ def _run_batch(args: argparse.Namespace, chunk_geojson: Path, out_csv: Path) ->
         "--checkpoint-every",
         str(args.checkpoint_every),
         "--continue-on-error" if bool(args.continue_on_error) else "--no-continue-on-error",
+        "--dem-prefetch-ahead",
+        str(args.dem_prefetch_ahead),
+        "--weather-prefetch-ahead",
+        str(args.weather_prefetch_ahead),
     ]
     if args.events_auto_start:
         cmd.extend(["--events-auto-start", str(args.events_auto_start)])
@@ -0,0 +1,97 @@
+"""
+Singleflight deduplication for streamed computations.
+
+Identical requests (same canonical parameter hash) that arrive while a computation
+is still running attach to that computation: they replay the events emitted so far
+and then follow the live stream until the result/error event. The flight is removed
+from the registry when it finishes, so later requests compute fresh.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from typing import Any, Iterator
+
+
+def canonical_key(namespace: str, params: dict[str, Any]) -> str:
+    """Stable sha256 over namespace + JSON-normalized params (sorted keys)."""
+    payload = json.dumps(
+        {"ns": str(namespace), "params": params},
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class Flight:
+    """Append-only event log of one running computation with live subscribers."""
+
+    def __init__(self, key: str):
+        self.key = key
+        self._events: list[Any] = []
+        self._done = False
+        self._cond = threading.Condition()
+        self.followers = 0
+
+    def publish(self, event: Any) -> None:
+        with self._cond:
+            self._events.append(event)
+            self._cond.notify_all()
+
+    def finish(self) -> None:
+        with self._cond:
+            self._done = True
+            self._cond.notify_all()
+
+    @property
+    def done(self) -> bool:
+        with self._cond:
+            return self._done
+
+    def subscribe(self) -> Iterator[Any]:
+        """Yield all events from the start, then live events until finish()."""
+        idx = 0
+        while True:
+            with self._cond:
+                while idx >= len(self._events) and not self._done:
+                    self._cond.wait()
+                batch = self._events[idx:]
+                idx = len(self._events)
+                finished = self._done
+            for event in batch:
+                yield event
+            if finished and idx >= len(self._events):
+                return
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: dict[str, Flight] = {}
+        self.stats = {"leaders": 0, "followers": 0}
+
+    def join_or_start(self, key: str) -> tuple[Flight, bool]:
+        """Return (flight, is_leader). The leader must run the work and call forget()."""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None and not flight.done:
+                flight.followers += 1
+                self.stats["followers"] += 1
+                return flight, False
+            flight = Flight(key)
+            self._flights[key] = flight
+            self.stats["leaders"] += 1
+            return flight, True
+
+    def forget(self, flight: Flight) -> None:
+        with self._lock:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
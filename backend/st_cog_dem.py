@@ -9,6 +9,13 @@ from pathlib import Path
 
 from pyproj import Transformer
 
+from cog_catalog import get_catalog
+from dataset_pool import DATASET_POOL
+from dem_pyramid import select_pyramid
+
+# "catalog": sqlite/R-tree tile index, only intersecting tiles are opened per request.
+# "vrt": legacy one-shot gdalbuildvrt mosaic over all tiles.
+ST_COG_INDEX = (os.getenv("ST_COG_INDEX", "catalog") or "catalog").strip().lower()
 
 _to_utm = Transformer.from_crs("EPSG:4326", "EPSG:25832", always_xy=True)
 _VRT_LOCK = threading.Lock()
@@ -107,41 +114,159 @@ def build_vrt_for_cog_dir(
     return vrt_path
 
 
-def fetch_dem_from_st_cog_dir(
-    *,
-    south: float,
-    west: float,
-    north: float,
-    east: float,
-    cog_dir: str,
-    progress_callback=None,
-    cache_dir: str | None = None,
-) -> str:
-    """
-    Clip a DEM from a local folder of ST DGM1 COG tiles.
-
-    - input bbox: WGS84
-    - expected DEM CRS: EPSG:25832 (ST DGM1)
-    """
-    vrt = build_vrt_for_cog_dir(cog_dir=cog_dir, progress_callback=progress_callback, cache_dir=cache_dir)
+def cog_catalog_for_dir(*, cog_dir: str, cache_dir: str | None = None):
+    """Return the tile catalog for cog_dir (stored next to the VRT cache in DEM_CACHE_DIR)."""
+    cog_root = Path(cog_dir).expanduser()
+    if not cog_root.exists():
+        raise RuntimeError(f"COG dir not found: {cog_root}")
+    db_path = _cache_root(cache_dir) / "st_dgm1_cog" / "st_dgm1_cog_catalog.sqlite"
+    return get_catalog(cog_root, db_path)
 
-    try:
-        import rasterio
-        from rasterio.windows import from_bounds
-    except Exception as exc:
-        raise RuntimeError(
-            "Clipping benoetigt 'rasterio'. Bitte OSGeo4W-Umgebung nutzen oder rasterio installieren."
-        ) from exc
 
+def _bbox_to_utm(south: float, west: float, north: float, east: float) -> tuple[float, float, float, float]:
     min_x, min_y = _to_utm.transform(west, south)
     max_x, max_y = _to_utm.transform(east, north)
     if min_x > max_x:
         min_x, max_x = max_x, min_x
     if min_y > max_y:
         min_y, max_y = max_y, min_y
+    return min_x, min_y, max_x, max_y
+
+
+def mosaic_catalog_tiles(
+    tiles,
+    min_x: float,
+    min_y: float,
+    max_x: float,
+    max_y: float,
+    resolution_m: float | None = None,
+):
+    """
+    Read the bbox from the intersecting tiles into one array; returns (data, profile).
+
+    The output grid is aligned to the first tile's pixel grid; each tile contributes
+    only its intersecting window (first tile wins on overlaps). Handles come from the
+    shared dataset pool. Tiles finer than resolution_m are read with a reduced
+    out_shape, so GDAL serves them from the COG overviews; tiles may mix native and
+    pyramid resolutions (dem_pyramid.select_pyramid).
+    """
+    import numpy as np
+    from rasterio.enums import Resampling
+    from rasterio.transform import Affine
+    from rasterio.windows import from_bounds
+
+    first = tiles[0]
+    res_x = max(first.res_x, float(resolution_m or 0.0))
+    res_y = max(first.res_y, float(resolution_m or 0.0))
+    left = first.min_x + np.floor((min_x - first.min_x) / res_x) * res_x
+    top = first.max_y - np.floor((first.max_y - max_y) / res_y) * res_y
+    width = max(1, int(np.ceil((max_x - left) / res_x)))
+    height = max(1, int(np.ceil((top - min_y) / res_y)))
+    out_transform = Affine(res_x, 0.0, float(left), 0.0, -res_y, float(top))
+
+    data = None
+    filled = np.zeros((height, width), dtype=bool)
+    profile: dict = {}
+    for tile in tiles:
+        if "25832" not in tile.crs:
+            raise RuntimeError(f"COG-Tile muss EPSG:25832 sein (gefunden: {tile.crs or 'unknown'}): {tile.path}")
+        c0 = max(0, int(round((tile.min_x - left) / res_x)))
+        c1 = min(width, int(round((tile.max_x - left) / res_x)))
+        r0 = max(0, int(round((top - tile.max_y) / res_y)))
+        r1 = min(height, int(round((top - tile.min_y) / res_y)))
+        if c1 <= c0 or r1 <= r0:
+            continue
+        with DATASET_POOL.dataset(tile.path) as src:
+            if data is None:
+                nodata = src.nodata
+                data = np.full((height, width), 0 if nodata is None else nodata, dtype=src.dtypes[0])
+                profile = {
+                    "driver": "GTiff",
+                    "count": 1,
+                    "dtype": src.dtypes[0],
+                    "crs": src.crs,
+                    "nodata": nodata,
+                    "width": width,
+                    "height": height,
+                    "transform": out_transform,
+                }
+            window = from_bounds(
+                left + c0 * res_x,
+                top - r1 * res_y,
+                left + c1 * res_x,
+                top - r0 * res_y,
+                transform=src.transform,
+            )
+            block = src.read(
+                1,
+                window=window,
+                out_shape=(r1 - r0, c1 - c0),
+                boundless=True,
+                fill_value=0 if src.nodata is None else src.nodata,
+                resampling=Resampling.average if tile.res_x < res_x - 1e-9 else Resampling.nearest,
+            )
+            valid = ~filled[r0:r1, c0:c1]
+            if src.nodata is not None:
+                valid &= block != src.nodata
+            np.copyto(data[r0:r1, c0:c1], block, where=valid)
+            filled[r0:r1, c0:c1] |= valid
+    if data is None:
+        raise RuntimeError("Ausschnitt ist leer (BBox ausserhalb der COG-Tiles?).")
+    return data, profile
+
+
+def write_temp_gtiff(data, profile: dict) -> str:
+    import rasterio
+
+    out_tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".tif")
+    out_tmp.close()
+    with rasterio.open(out_tmp.name, "w", **profile) as dst:
+        dst.write(data, 1)
+    return out_tmp.name
+
+
+def _read_via_catalog(
+    *,
+    min_x: float,
+    min_y: float,
+    max_x: float,
+    max_y: float,
+    cog_dir: str,
+    progress_callback=None,
+    cache_dir: str | None = None,
+    resolution_m: float | None = None,
+    max_cells: int | None = None,
+    stats: dict | None = None,
+):
+    catalog = cog_catalog_for_dir(cog_dir=cog_dir, cache_dir=cache_dir)
+    _emit(progress_callback, "vrt", "Aktualisiere COG-Tile-Katalog...")
+    catalog.refresh(progress_callback=progress_callback)
+
+    tiles = catalog.query(min_x, min_y, max_x, max_y)
+    if not tiles:
+        raise RuntimeError("Ausschnitt ist leer (BBox ausserhalb der COG-Tiles?).")
+    if resolution_m is None:
+        tiles, resolution_m = select_pyramid(tiles, min_x, min_y, max_x, max_y, max_cells, stats)
+
+    _emit(progress_callback, "clip", f"Schneide DEM auf Auswahl zu ({len(tiles)} Tiles)...")
+    return mosaic_catalog_tiles(tiles, min_x, min_y, max_x, max_y, resolution_m=resolution_m)
+
+
+def _read_via_vrt(
+    *,
+    min_x: float,
+    min_y: float,
+    max_x: float,
+    max_y: float,
+    cog_dir: str,
+    progress_callback=None,
+    cache_dir: str | None = None,
+):
+    from rasterio.windows import from_bounds, transform as window_transform
 
+    vrt = build_vrt_for_cog_dir(cog_dir=cog_dir, progress_callback=progress_callback, cache_dir=cache_dir)
     _emit(progress_callback, "clip", "Schneide DEM auf Auswahl zu...")
-    with rasterio.open(vrt) as src:
+    with DATASET_POOL.dataset(str(vrt)) as src:
         src_crs = str(src.crs) if src.crs else ""
         if "25832" not in src_crs:
             raise RuntimeError(f"COG-VRT muss EPSG:25832 sein (gefunden: {src_crs or 'unknown'}).")
@@ -152,23 +277,96 @@ def fetch_dem_from_st_cog_dir(
             raise RuntimeError("Ausschnitt ist leer (BBox ausserhalb des Rasters?).")
 
         data = src.read(1, window=w, boundless=False)
-        profile = src.profile.copy()
-        # Source is a VRT; normalize output profile for reliable GTiff writes.
-        profile.pop("blockxsize", None)
-        profile.pop("blockysize", None)
-        profile.update(
-            driver="GTiff",
-            tiled=False,
-            count=1,
-            height=int(w.height),
-            width=int(w.width),
-            transform=rasterio.windows.transform(w, src.transform),
-        )
+        profile = {
+            "driver": "GTiff",
+            "count": 1,
+            "dtype": src.dtypes[0],
+            "crs": src.crs,
+            "nodata": src.nodata,
+            "height": int(w.height),
+            "width": int(w.width),
+            "transform": window_transform(w, src.transform),
+        }
+    return data, profile
+
+
+def read_dem_from_st_cog_dir(
+    *,
+    south: float,
+    west: float,
+    north: float,
+    east: float,
+    cog_dir: str,
+    progress_callback=None,
+    cache_dir: str | None = None,
+    resolution_m: float | None = None,
+    max_cells: int | None = None,
+    stats: dict | None = None,
+):
+    """
+    Read the bbox (WGS84) from the local COG folder into memory; returns (data, profile).
+
+    Dataset handles are pooled across requests; only the intersecting windows are read.
+    resolution_m (catalog mode) requests a coarser grid served from the COG overviews.
+    Without it, max_cells selects the finest overview pyramid level whose grid fits
+    (dem_pyramid); stats receives the chosen level.
+    """
+    try:
+        import rasterio  # noqa: F401
+    except Exception as exc:
+        raise RuntimeError(
+            "Clipping benoetigt 'rasterio'. Bitte OSGeo4W-Umgebung nutzen oder rasterio installieren."
+        ) from exc
+
+    min_x, min_y, max_x, max_y = _bbox_to_utm(south, west, north, east)
+    kwargs = {
+        "min_x": min_x,
+        "min_y": min_y,
+        "max_x": max_x,
+        "max_y": max_y,
+        "cog_dir": cog_dir,
+        "progress_callback": progress_callback,
+        "cache_dir": cache_dir,
+    }
+    if ST_COG_INDEX == "vrt":
+        return _read_via_vrt(**kwargs)
+    return _read_via_catalog(resolution_m=resolution_m, max_cells=max_cells, stats=stats, **kwargs)
 
-        out_tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".tif")
-        out_tmp.close()
-        with rasterio.open(out_tmp.name, "w", **profile) as dst:
-            dst.write(data, 1)
 
+def fetch_dem_from_st_cog_dir(
+    *,
+    south: float,
+    west: float,
+    north: float,
+    east: float,
+    cog_dir: str,
+    progress_callback=None,
+    cache_dir: str | None = None,
+    resolution_m: float | None = None,
+    max_cells: int | None = None,
+    stats: dict | None = None,
+) -> str:
+    """
+    Clip a DEM from a local folder of ST DGM1 COG tiles.
+
+    - input bbox: WGS84
+    - expected DEM CRS: EPSG:25832 (ST DGM1)
+
+    The clip is read into memory (read_dem_from_st_cog_dir) and written once as a temp
+    GeoTIFF, because the analysis runs in a worker process and takes a file path.
+    """
+    data, profile = read_dem_from_st_cog_dir(
+        south=south,
+        west=west,
+        north=north,
+        east=east,
+        cog_dir=cog_dir,
+        progress_callback=progress_callback,
+        cache_dir=cache_dir,
+        resolution_m=resolution_m,
+        max_cells=max_cells,
+        stats=stats,
+    )
+    path = write_temp_gtiff(data, profile)
     _emit(progress_callback, "clip", "DEM-Ausschnitt fertig.")
-    return out_tmp.name
+    return path
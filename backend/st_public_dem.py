@@ -1,24 +1,49 @@
 from __future__ import annotations
 
+import io
+import json
 import os
+import re
 import shutil
+import struct
 import subprocess
 import tempfile
+import threading
 import time
 import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
 from pathlib import Path
 
 import requests
 from pyproj import Transformer
 
+from dem_cache import _FileLock
+
 
 # Official LVermGeo Sachsen-Anhalt webshare download base (DGM1 ZIP parts).
 ST_DGM1_BASE_URL = (
     "https://www.geodatenportal.sachsen-anhalt.de/gfds_webshare/download/"
     "LVermGeo/Geodatenportal/Online-Bereitstellung-LVermGeo/DGM"
 )
+# Extract only the ZIP members intersecting the bbox (remote via HTTP Range if the
+# ZIP is not downloaded yet). 0 = legacy: full download + extractall + VRT.
+ST_DGM1_SELECTIVE = os.getenv("ST_DGM1_SELECTIVE", "1").strip().lower() not in ("0", "false", "no")
+# Parallel HTTP Range segments for full ZIP downloads / parallel member fetches
+ST_DGM1_DOWNLOAD_WORKERS = max(1, int(os.getenv("ST_DGM1_DOWNLOAD_WORKERS", "4") or 4))
+# Tile edge length in km if not encoded in the member name
+ST_DGM1_TILE_KM = float(os.getenv("ST_DGM1_TILE_KM", "1") or 1)
+ST_DGM1_TIMEOUT_S = int(os.getenv("ST_DGM1_TIMEOUT_S", "60") or 60)
+
+# Member names like dgm1_32_652_5714_1_st_2020.tif: lower-left corner in km (E, N), optional edge in km.
+_TILE_NAME_RE = re.compile(r"_(\d{3})_(\d{4})(?:_(\d{1,2}))?(?=[_.])")
+_RANGE_READAHEAD = 1024 * 1024
+_LOCAL_HEADER = struct.Struct("<4s5H3I2H")
 
 _to_utm = Transformer.from_crs("EPSG:4326", "EPSG:25832", always_xy=True)
+_PART_LOCKS_LOCK = threading.Lock()
+_PART_LOCKS: dict[tuple[str, int], threading.Lock] = {}
 
 
 def _repo_root() -> Path:
@@ -79,21 +104,69 @@ def _emit(progress_callback, phase: str, message: str):
         progress_callback(phase, message)
 
 
+def _probe_remote(url: str) -> tuple[int, bool, str]:
+    """HEAD the URL; returns (size, supports_ranges, etag)."""
+    r = requests.head(url, allow_redirects=True, timeout=ST_DGM1_TIMEOUT_S)
+    r.raise_for_status()
+    size = int(r.headers.get("content-length") or 0)
+    ranges = "bytes" in (r.headers.get("accept-ranges") or "").lower()
+    return size, ranges, (r.headers.get("etag") or "").strip()
+
+
+def _get_range(url: str, start: int, end: int) -> bytes:
+    """GET bytes [start, end] (inclusive)."""
+    r = requests.get(url, headers={"Range": f"bytes={start}-{end}"}, timeout=ST_DGM1_TIMEOUT_S)
+    r.raise_for_status()
+    if r.status_code != 206:
+        raise RuntimeError("Server ignoriert HTTP-Range-Anfragen.")
+    return r.content
+
+
 def _download_file(url: str, out_path: Path, progress_callback=None):
+    """
+    Download url to out_path, resumable and in parallel Range segments.
+
+    Progress of each segment is kept in <file>.part.json, so an interrupted download
+    continues where it stopped (as long as size/ETag are unchanged). Servers without
+    Range support get a plain streamed download. The finished file is checked against
+    the announced size and must have a readable ZIP central directory.
+    """
     out_path.parent.mkdir(parents=True, exist_ok=True)
     tmp = out_path.with_suffix(out_path.suffix + ".part")
-    if tmp.exists():
-        try:
-            tmp.unlink()
-        except OSError:
-            pass
+    state_path = out_path.with_suffix(out_path.suffix + ".part.json")
 
     _emit(progress_callback, "download", f"Download startet: {out_path.name}")
     t0 = time.time()
+    total, ranges_ok, etag = _probe_remote(url)
+
+    if not ranges_ok or total <= 0:
+        for p in (tmp, state_path):
+            if p.exists():
+                p.unlink()
+        got = _download_stream(url, tmp, out_path.name, progress_callback)
+    else:
+        got = _download_segments(url, tmp, state_path, total, etag, out_path.name, progress_callback)
+
+    if total > 0 and tmp.stat().st_size != total:
+        raise RuntimeError(f"Download unvollstaendig: {out_path.name} ({tmp.stat().st_size}/{total} Bytes).")
+    try:
+        with zipfile.ZipFile(tmp, "r") as z:
+            z.infolist()
+    except zipfile.BadZipFile as exc:
+        tmp.unlink()
+        state_path.unlink(missing_ok=True)
+        raise RuntimeError(f"Download beschaedigt (kein gueltiges ZIP): {out_path.name}") from exc
+
+    tmp.replace(out_path)
+    state_path.unlink(missing_ok=True)
+    dt = time.time() - t0
+    _emit(progress_callback, "download", f"Download fertig: {out_path.name} ({got/1e6:.0f} MB in {dt:.0f}s)")
+
+
+def _download_stream(url: str, tmp: Path, label: str, progress_callback) -> int:
     got = 0
     last_emit = 0.0
-
-    with requests.get(url, stream=True, timeout=60) as r:
+    with requests.get(url, stream=True, timeout=ST_DGM1_TIMEOUT_S) as r:
         r.raise_for_status()
         total = int(r.headers.get("content-length") or 0)
         with open(tmp, "wb") as f:
@@ -106,14 +179,381 @@ def _download_file(url: str, out_path: Path, progress_callback=None):
                 if now - last_emit > 1.5:
                     if total > 0:
                         pct = (got / total) * 100.0
-                        _emit(progress_callback, "download", f"{out_path.name}: {pct:.1f}% ({got/1e6:.0f}/{total/1e6:.0f} MB)")
+                        _emit(progress_callback, "download", f"{label}: {pct:.1f}% ({got/1e6:.0f}/{total/1e6:.0f} MB)")
                     else:
-                        _emit(progress_callback, "download", f"{out_path.name}: {got/1e6:.0f} MB")
+                        _emit(progress_callback, "download", f"{label}: {got/1e6:.0f} MB")
                     last_emit = now
+    return got
 
-    tmp.replace(out_path)
-    dt = time.time() - t0
-    _emit(progress_callback, "download", f"Download fertig: {out_path.name} ({got/1e6:.0f} MB in {dt:.0f}s)")
+
+def _download_segments(
+    url: str, tmp: Path, state_path: Path, total: int, etag: str, label: str, progress_callback
+) -> int:
+    state = None
+    if tmp.exists() and state_path.exists():
+        try:
+            state = json.loads(state_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            state = None
+        if not state or state.get("size") != total or state.get("etag") != etag:
+            state = None
+    if state is None:
+        seg = -(-total // ST_DGM1_DOWNLOAD_WORKERS)
+        state = {
+            "size": total,
+            "etag": etag,
+            # [start, end_inclusive, bytes_done]
+            "segments": [[s, min(total, s + seg) - 1, 0] for s in range(0, total, seg)],
+        }
+        with open(tmp, "wb") as f:
+            f.truncate(total)
+    else:
+        done = sum(s[2] for s in state["segments"])
+        _emit(progress_callback, "download", f"{label}: setze Download fort ({done/1e6:.0f}/{total/1e6:.0f} MB)")
+
+    lock = threading.Lock()
+
+    def save_state():
+        with lock:
+            state_path.write_text(json.dumps(state), encoding="utf-8")
+
+    def fetch_segment(seg):
+        start, end, _done = seg
+        if start + seg[2] > end:
+            return
+        headers = {"Range": f"bytes={start + seg[2]}-{end}"}
+        with requests.get(url, headers=headers, stream=True, timeout=ST_DGM1_TIMEOUT_S) as r:
+            r.raise_for_status()
+            if r.status_code != 206:
+                raise RuntimeError("Server ignoriert HTTP-Range-Anfragen.")
+            with open(tmp, "r+b") as f:
+                f.seek(start + seg[2])
+                for chunk in r.iter_content(chunk_size=1024 * 1024):
+                    if not chunk:
+                        continue
+                    f.write(chunk)
+                    with lock:
+                        seg[2] += len(chunk)
+
+    save_state()
+    pool = ThreadPoolExecutor(max_workers=ST_DGM1_DOWNLOAD_WORKERS, thread_name_prefix="st-dgm1-dl")
+    try:
+        futures = [pool.submit(fetch_segment, seg) for seg in state["segments"]]
+        pending = set(futures)
+        while pending:
+            _done, pending = wait(pending, timeout=1.5)
+            save_state()
+            with lock:
+                got = sum(s[2] for s in state["segments"])
+            _emit(progress_callback, "download", f"{label}: {got / total * 100.0:.1f}% ({got/1e6:.0f}/{total/1e6:.0f} MB)")
+        for fut in futures:
+            fut.result()
+    finally:
+        pool.shutdown(wait=True)
+        save_state()
+    return sum(s[2] for s in state["segments"])
+
+
+class _HttpRangeFile(io.RawIOBase):
+    """Seekable read-only file over HTTP Range requests (enough for zipfile's central directory)."""
+
+    def __init__(self, url: str, size: int):
+        self.url = url
+        self.size = size
+        self.pos = 0
+        self._buf_start = 0
+        self._buf = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self.pos = offset
+        elif whence == io.SEEK_CUR:
+            self.pos += offset
+        else:
+            self.pos = self.size + offset
+        return self.pos
+
+    def read(self, n: int = -1) -> bytes:
+        if self.pos >= self.size:
+            return b""
+        if n is None or n < 0:
+            n = self.size - self.pos
+        n = min(n, self.size - self.pos)
+        buf_end = self._buf_start + len(self._buf)
+        if not (self._buf_start <= self.pos and self.pos + n <= buf_end):
+            end = min(self.size, self.pos + max(n, _RANGE_READAHEAD)) - 1
+            self._buf = _get_range(self.url, self.pos, end)
+            self._buf_start = self.pos
+        off = self.pos - self._buf_start
+        out = self._buf[off:off + n]
+        self.pos += len(out)
+        return out
+
+
+def _member_bounds(name: str) -> tuple[float, float, float, float] | None:
+    """UTM32 bounds from a DGM1 tile name, or None if the name has no coordinates."""
+    m = _TILE_NAME_RE.search(Path(name).name)
+    if not m:
+        return None
+    x0 = int(m.group(1)) * 1000.0
+    y0 = int(m.group(2)) * 1000.0
+    edge = (int(m.group(3)) if m.group(3) else ST_DGM1_TILE_KM) * 1000.0
+    return x0, y0, x0 + edge, y0 + edge
+
+
+def _index_path(cache_root: Path, part: int) -> Path:
+    return _st_dir(cache_root) / f"DGM1_{part}_index.json"
+
+
+def _load_index(cache_root: Path, part: int) -> dict:
+    p = _index_path(cache_root, part)
+    if p.exists():
+        try:
+            return json.loads(p.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            pass
+    return {}
+
+
+def _save_index(cache_root: Path, part: int, index: dict) -> None:
+    p = _index_path(cache_root, part)
+    # Unique per writer; a concurrent writer must never replace our temp file.
+    tmp = p.with_suffix(f".json.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_text(json.dumps(index), encoding="utf-8")
+    tmp.replace(p)
+
+
+def source_version(parts: list[int], cache_dir: str | None = None) -> str | None:
+    """
+    Version of the locally known DGM1 source for parts (no network): remote size/ETag
+    from the part index, or size/mtime of a downloaded ZIP. None if nothing is known yet.
+    """
+    cache_root = _cache_root(cache_dir)
+    versions = []
+    for part in _validate_parts(parts):
+        index = _load_index(cache_root, part)
+        zp = _zip_path(cache_root, part)
+        if index.get("source") == "remote":
+            versions.append(f"{part}:{index.get('size')}:{index.get('etag')}")
+        elif zp.exists():
+            st = zp.stat()
+            versions.append(f"{part}:{st.st_size}:{int(st.st_mtime)}")
+        else:
+            versions.append(f"{part}:-")
+    return ",".join(versions) if any(not v.endswith(":-") for v in versions) else None
+
+
+def _zip_members(zf: zipfile.ZipFile) -> list[dict]:
+    return [
+        {
+            "name": zi.filename,
+            "offset": zi.header_offset,
+            "csize": zi.compress_size,
+            "size": zi.file_size,
+            "crc": zi.CRC,
+            "method": zi.compress_type,
+        }
+        for zi in zf.infolist()
+        if zi.filename.lower().endswith(".tif") and not zi.is_dir()
+    ]
+
+
+def _remote_members(url: str, size: int) -> list[dict]:
+    """Read only the ZIP central directory (end of the file) via HTTP Range."""
+    with zipfile.ZipFile(_HttpRangeFile(url, size), "r") as zf:
+        return _zip_members(zf)
+
+
+def _fetch_member_remote(url: str, member: dict) -> bytes:
+    """Fetch one member's compressed bytes via Range, inflate and verify its CRC32."""
+    head = _get_range(url, member["offset"], member["offset"] + _LOCAL_HEADER.size - 1)
+    sig, _ver, _flag, _method, _t, _d, _crc, _cs, _s, name_len, extra_len = _LOCAL_HEADER.unpack(head)
+    if sig != b"PK\x03\x04":
+        raise RuntimeError(f"Ungueltiger ZIP-Eintrag: {member['name']}")
+    start = member["offset"] + _LOCAL_HEADER.size + name_len + extra_len
+    raw = _get_range(url, start, start + member["csize"] - 1) if member["csize"] else b""
+    if member["method"] == zipfile.ZIP_STORED:
+        data = raw
+    elif member["method"] == zipfile.ZIP_DEFLATED:
+        data = zlib.decompressobj(-15).decompress(raw)
+    else:
+        raise RuntimeError(f"Nicht unterstuetzte ZIP-Kompression ({member['method']}): {member['name']}")
+    if (zlib.crc32(data) & 0xFFFFFFFF) != member["crc"] or len(data) != member["size"]:
+        raise RuntimeError(f"Pruefsumme falsch (CRC32): {member['name']}")
+    return data
+
+
+def _member_dest(out_dir: Path, name: str) -> Path:
+    # Member names come from a (remote) central directory: never trust their path
+    # part. Tiles are flat, so only the file name is used (no zip-slip).
+    base = Path(str(name).replace("\\", "/")).name
+    dest = (out_dir / base).resolve()
+    if not base or base in (".", "..") or dest.parent != out_dir.resolve():
+        raise RuntimeError(f"Ungueltiger ZIP-Eintrag: {name}")
+    return dest
+
+
+def _write_member(dest: Path, data: bytes) -> None:
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_suffix(f"{dest.suffix}.{os.getpid()}.{threading.get_ident()}.part")
+    tmp.write_bytes(data)
+    tmp.replace(dest)
+
+
+@contextmanager
+def _part_lock(cache_root: Path, part: int):
+    """
+    Exclusive access to one archive (ZIP, extract dir, index) across threads and
+    processes (uvicorn workers, compute-service on the shared cache). Requests for
+    other parts or cache roots do not wait.
+    """
+    with _PART_LOCKS_LOCK:
+        lock = _PART_LOCKS.setdefault((str(cache_root), int(part)), threading.Lock())
+    with lock, _FileLock(_st_dir(cache_root) / "locks" / f"DGM1_{int(part)}.lock"):
+        yield
+
+
+def _needed_members(index: dict, bbox: tuple[float, float, float, float]) -> list[dict]:
+    """Tile members intersecting bbox; members without tile coordinates are skipped."""
+    min_x, min_y, max_x, max_y = bbox
+    needed = []
+    for member in index.get("members") or []:
+        b = _member_bounds(member["name"])
+        if b is None or b[2] <= min_x or b[0] >= max_x or b[3] <= min_y or b[1] >= max_y:
+            continue
+        needed.append(member)
+    return needed
+
+
+def _missing_members(index: dict, needed: list[dict], out_dir: Path) -> list[dict]:
+    extracted = index.get("extracted") or {}
+    return [
+        m for m in needed
+        if extracted.get(m["name"]) != m["crc"] or not _member_dest(out_dir, m["name"]).exists()
+    ]
+
+
+def _selective_gap(cache_root: Path, parts: list[int], bbox: tuple[float, float, float, float]) -> str | None:
+    """
+    Reason why the selective tiles cannot serve bbox although the archive might, or None.
+
+    Selective mode relies on tile coordinates in member names: a part whose index has
+    no such names, or whose named tiles span bbox while the catalog found nothing,
+    needs the full extract.
+    """
+    min_x, min_y, max_x, max_y = bbox
+    for part in parts:
+        index = _load_index(cache_root, part)
+        members = index.get("members") or []
+        if not members:
+            continue
+        bounds = [b for b in (_member_bounds(m["name"]) for m in members) if b is not None]
+        if not bounds:
+            return f"DGM1_{part}: keine Kachelkoordinaten in den ZIP-Eintraegen"
+        if (
+            min(b[0] for b in bounds) <= min_x
+            and min(b[1] for b in bounds) <= min_y
+            and max(b[2] for b in bounds) >= max_x
+            and max(b[3] for b in bounds) >= max_y
+        ):
+            return f"DGM1_{part}: keine Kacheln fuer die BBox gefunden"
+    return None
+
+
+def _part_tiles_present(cache_root: Path, part: int, bbox: tuple[float, float, float, float]) -> int | None:
+    """Number of needed tiles if all are already extracted (no lock, no network), else None."""
+    index = _load_index(cache_root, part)
+    if not index.get("members"):
+        return None
+    needed = _needed_members(index, bbox)
+    if _missing_members(index, needed, _extract_dir(cache_root, part)):
+        return None
+    return len(needed)
+
+
+def _ensure_part_tiles(
+    *,
+    cache_root: Path,
+    part: int,
+    bbox: tuple[float, float, float, float],
+    progress_callback=None,
+) -> dict[str, int]:
+    """
+    Make sure all members of one DGM1 part that intersect bbox (UTM32) are extracted.
+
+    The member list (from the ZIP central directory) and the extracted members are kept
+    in DGM1_<part>_index.json. Members are read from the local ZIP if it was downloaded
+    earlier, otherwise fetched individually via HTTP Range (parallel, CRC-checked).
+    """
+    url = f"{ST_DGM1_BASE_URL}/DGM1_{part}.zip"
+    zp = _zip_path(cache_root, part)
+    out_dir = _extract_dir(cache_root, part)
+    local_zip = zp.exists() and zp.stat().st_size > 1024 * 1024
+    index = _load_index(cache_root, part)
+    counts = {"needed": 0, "present": 0, "extracted": 0}
+
+    if not index.get("members"):
+        if local_zip:
+            with zipfile.ZipFile(zp, "r") as zf:
+                index = {"source": "local", "members": _zip_members(zf), "extracted": {}}
+        else:
+            size, ranges_ok, etag = _probe_remote(url)
+            if not ranges_ok or size <= 0:
+                # No Range support: fall back to the full (resumable) download.
+                _download_file(url, zp, progress_callback=progress_callback)
+                return _ensure_part_tiles(cache_root=cache_root, part=part, bbox=bbox, progress_callback=progress_callback)
+            _emit(progress_callback, "download", f"Lese ZIP-Inhaltsverzeichnis: {zp.name}")
+            index = {"source": "remote", "size": size, "etag": etag, "members": _remote_members(url, size), "extracted": {}}
+        _save_index(cache_root, part, index)
+
+    needed = _needed_members(index, bbox)
+    counts["needed"] = len(needed)
+
+    extracted = index.setdefault("extracted", {})
+    missing = _missing_members(index, needed, out_dir)
+    counts["present"] = len(needed) - len(missing)
+    if not missing:
+        _emit(progress_callback, "extract", f"DGM1_{part}: {len(needed)} Kachel(n) bereits vorhanden")
+        return counts
+
+    if local_zip:
+        _emit(progress_callback, "extract", f"DGM1_{part}: entpacke {len(missing)} von {len(index['members'])} Kacheln")
+        with zipfile.ZipFile(zp, "r") as zf:
+            for m in missing:
+                # ZipFile.read verifies the CRC32.
+                _write_member(_member_dest(out_dir, m["name"]), zf.read(m["name"]))
+                extracted[m["name"]] = m["crc"]
+                counts["extracted"] += 1
+    else:
+        size, _ranges_ok, etag = _probe_remote(url)
+        if size != index.get("size") or etag != index.get("etag"):
+            # Remote ZIP changed: member offsets are stale, re-read the central directory.
+            _emit(progress_callback, "download", f"DGM1_{part}: ZIP auf dem Server geaendert, Index wird erneuert")
+            _index_path(cache_root, part).unlink(missing_ok=True)
+            return _ensure_part_tiles(cache_root=cache_root, part=part, bbox=bbox, progress_callback=progress_callback)
+        _emit(progress_callback, "download", f"DGM1_{part}: lade {len(missing)} von {len(index['members'])} Kacheln (HTTP Range)")
+        with ThreadPoolExecutor(max_workers=ST_DGM1_DOWNLOAD_WORKERS, thread_name_prefix="st-dgm1-member") as pool:
+            futures = {pool.submit(_fetch_member_remote, url, m): m for m in missing}
+            try:
+                for fut in futures:
+                    m = futures[fut]
+                    _write_member(_member_dest(out_dir, m["name"]), fut.result())
+                    extracted[m["name"]] = m["crc"]
+                    counts["extracted"] += 1
+                    _emit(progress_callback, "extract", f"DGM1_{part}: {counts['extracted']}/{len(missing)} Kacheln")
+            finally:
+                _save_index(cache_root, part, index)
+    _save_index(cache_root, part, index)
+    return counts
 
 
 def _extract_zip(zip_path: Path, out_dir: Path, progress_callback=None):
@@ -172,26 +612,103 @@ def _build_vrt(*, cache_root: Path, parts: list[int], progress_callback=None) ->
 
 
 def prepare_st_dgm1(parts: list[int], progress_callback=None, cache_dir: str | None = None) -> Path:
+    parts = _validate_parts(parts)
+
+    cache_root = _cache_root(cache_dir)
+    _st_dir(cache_root).mkdir(parents=True, exist_ok=True)
+
+    for p in parts:
+        url = f"{ST_DGM1_BASE_URL}/DGM1_{p}.zip"
+        zp = _zip_path(cache_root, p)
+        with _part_lock(cache_root, p):
+            if zp.exists() and zp.stat().st_size > 1024 * 1024:
+                _emit(progress_callback, "download", f"Download uebersprungen (cache): {zp.name}")
+            else:
+                _download_file(url, zp, progress_callback=progress_callback)
+            _extract_zip(zp, _extract_dir(cache_root, p), progress_callback=progress_callback)
+
+    return _build_vrt(cache_root=cache_root, parts=parts, progress_callback=progress_callback)
+
+
+def _validate_parts(parts: list[int]) -> list[int]:
     parts = sorted(set(int(p) for p in parts))
     if not parts:
         raise ValueError("parts darf nicht leer sein.")
     for p in parts:
         if p not in (1, 2, 3, 4):
             raise ValueError(f"Ungueltiger DGM1-Part: {p} (erwartet 1-4)")
+    return parts
+
+
+def prepare_st_dgm1_tiles(
+    parts: list[int],
+    bbox: tuple[float, float, float, float],
+    progress_callback=None,
+    cache_dir: str | None = None,
+) -> list[Path]:
+    """
+    Selective variant of prepare_st_dgm1: extract only tiles intersecting bbox (UTM32).
 
+    Returns the extract directories of the parts; later requests for the same area
+    find everything in the per-part index and extract nothing.
+    """
+    parts = _validate_parts(parts)
     cache_root = _cache_root(cache_dir)
     _st_dir(cache_root).mkdir(parents=True, exist_ok=True)
-
     for p in parts:
-        url = f"{ST_DGM1_BASE_URL}/DGM1_{p}.zip"
-        zp = _zip_path(cache_root, p)
-        if zp.exists() and zp.stat().st_size > 1024 * 1024:
-            _emit(progress_callback, "download", f"Download uebersprungen (cache): {zp.name}")
-        else:
-            _download_file(url, zp, progress_callback=progress_callback)
-        _extract_zip(zp, _extract_dir(cache_root, p), progress_callback=progress_callback)
+        present = _part_tiles_present(cache_root, p, bbox)
+        if present is not None:
+            _emit(progress_callback, "extract", f"DGM1_{p}: {present} Kachel(n) bereits vorhanden")
+            continue
+        with _part_lock(cache_root, p):
+            counts = _ensure_part_tiles(cache_root=cache_root, part=p, bbox=bbox, progress_callback=progress_callback)
+            print(
+                f"[ST-DGM1] DGM1_{p}: {counts['needed']} tile(s) needed, "
+                f"{counts['present']} present, {counts['extracted']} extracted"
+            )
+    return [_extract_dir(cache_root, p) for p in parts]
 
-    return _build_vrt(cache_root=cache_root, parts=parts, progress_callback=progress_callback)
+
+class _SelectiveUnavailable(RuntimeError):
+    """The archive's member names do not support selective extraction for this bbox."""
+
+
+def _clip_selective(
+    *,
+    parts: list[int],
+    min_x: float,
+    min_y: float,
+    max_x: float,
+    max_y: float,
+    progress_callback=None,
+    cache_dir: str | None = None,
+    max_cells: int | None = None,
+    stats: dict | None = None,
+) -> str:
+    from cog_catalog import get_catalog
+    from dem_pyramid import select_pyramid
+    from st_cog_dem import mosaic_catalog_tiles, write_temp_gtiff
+
+    bbox = (min_x, min_y, max_x, max_y)
+    dirs = prepare_st_dgm1_tiles(parts, bbox, progress_callback=progress_callback, cache_dir=cache_dir)
+    tiles = []
+    for d in dirs:
+        if not d.exists():
+            continue
+        catalog = get_catalog(d, d.parent / f"{d.name}_catalog.sqlite", pattern="*.tif")
+        # Directory content only changes through prepare_st_dgm1_tiles, so always rescan (cheap: mtimes only).
+        catalog.refresh(force=True)
+        tiles.extend(catalog.query(min_x, min_y, max_x, max_y))
+    if not tiles:
+        reason = _selective_gap(_cache_root(cache_dir), _validate_parts(parts), bbox)
+        if reason:
+            raise _SelectiveUnavailable(reason)
+        raise RuntimeError("Ausschnitt ist leer (BBox ausserhalb der DGM1-Kacheln?).")
+    tiles, resolution_m = select_pyramid(tiles, min_x, min_y, max_x, max_y, max_cells, stats)
+
+    _emit(progress_callback, "clip", f"Schneide DEM auf Auswahl zu ({len(tiles)} Tiles)...")
+    data, profile = mosaic_catalog_tiles(tiles, min_x, min_y, max_x, max_y, resolution_m=resolution_m)
+    return write_temp_gtiff(data, profile)
 
 
 def fetch_dem_from_st_public_download(
@@ -203,13 +720,18 @@ def fetch_dem_from_st_public_download(
     parts: list[int],
     progress_callback=None,
     cache_dir: str | None = None,
+    max_cells: int | None = None,
+    stats: dict | None = None,
 ) -> str:
     """
-    Download+prepare official ST DGM1 data (ZIP -> extracted -> VRT) and return a clipped GeoTIFF for the bbox.
+    Download+prepare official ST DGM1 data and return a clipped GeoTIFF for the bbox.
     bbox is WGS84; clipping happens in EPSG:25832.
-    """
-    vrt = prepare_st_dgm1(parts, progress_callback=progress_callback, cache_dir=cache_dir)
 
+    Default (ST_DGM1_SELECTIVE=1): only the tiles intersecting the bbox are extracted;
+    with max_cells, large bboxes are read from the overview pyramid (dem_pyramid).
+    Legacy: full ZIP -> extractall -> VRT; also used when member names carry no tile
+    coordinates or the named tiles leave the bbox empty.
+    """
     try:
         import rasterio
         from rasterio.windows import from_bounds
@@ -225,6 +747,28 @@ def fetch_dem_from_st_public_download(
     if min_y > max_y:
         min_y, max_y = max_y, min_y
 
+    if ST_DGM1_SELECTIVE:
+        try:
+            path = _clip_selective(
+                parts=parts,
+                min_x=min_x,
+                min_y=min_y,
+                max_x=max_x,
+                max_y=max_y,
+                progress_callback=progress_callback,
+                cache_dir=cache_dir,
+                max_cells=max_cells,
+                stats=stats,
+            )
+        except _SelectiveUnavailable as exc:
+            print(f"[ST-DGM1] Selective extraction not possible ({exc}), using full download")
+            _emit(progress_callback, "download", f"{exc}: lade vollstaendiges DGM1-Archiv")
+        else:
+            _emit(progress_callback, "clip", "DEM-Ausschnitt fertig.")
+            return path
+
+    vrt = prepare_st_dgm1(parts, progress_callback=progress_callback, cache_dir=cache_dir)
+
     _emit(progress_callback, "clip", "Schneide DEM auf Auswahl zu...")
     with rasterio.open(vrt) as src:
         src_crs = str(src.crs) if src.crs else ""
@@ -0,0 +1,405 @@
+"""
+Starkregen event detection on (points x hours) precipitation matrices.
+
+All points that share an hour axis are processed at once:
+  - rolling 6h sums from a cumulative sum along the hour axis
+  - trigger hours: >=15 mm/1h or >=20 mm/6h (DWD Starkregen thresholds)
+  - an event starts at a trigger hour and continues while the next hour
+    triggers or still rains (>=0.2 mm); events are found by run-length
+    grouping of that "continues" mask, per-event stats by reduceat
+  - events of one point from several sources are fused (merge_point_events),
+    events of neighbouring points that overlap in time are grouped into
+    regional clusters with a capped span (cluster_across_points)
+
+Values are handled as integer 0.001 mm, so window sums and threshold
+comparisons are exact for the 3-decimal series delivered by weather_series.
+
+Configuration:
+  STARKREGEN_CLUSTER_GAP_H       max hours between two linked point events (default 6)
+  STARKREGEN_CLUSTER_RADIUS_KM   max distance between two linked points (default 15)
+  STARKREGEN_CLUSTER_MAX_SPAN_H  max hours from a cluster's first event start to any member start (default 24)
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import os
+
+import numpy as np
+
+from weather_series import HourlySeries, as_series, parse_hours
+
+STARKREGEN_CLUSTER_GAP_H = int(os.getenv("STARKREGEN_CLUSTER_GAP_H", "6") or 6)
+STARKREGEN_CLUSTER_RADIUS_KM = float(os.getenv("STARKREGEN_CLUSTER_RADIUS_KM", "15") or 15)
+STARKREGEN_CLUSTER_MAX_SPAN_H = int(os.getenv("STARKREGEN_CLUSTER_MAX_SPAN_H", "24") or 24)
+
+WINDOW_H = 6
+# Thresholds in 0.001 mm.
+_TRIG_1H = 15_000
+_TRIG_6H = 20_000
+_RAIN_CONT = 200
+_LEVELS = ("none", "starkregen", "unwetter", "extrem")
+
+
+def event_level(max_1h: float, max_6h: float) -> tuple[str, int]:
+    # DWD-style thresholds (screening-oriented, simplified):
+    # Starkregen: >=15 mm/1h or >=20 mm/6h
+    # Unwetter: >25 mm/1h or >35 mm/6h
+    # Extrem: >40 mm/1h or >60 mm/6h
+    if max_1h > 40.0 or max_6h > 60.0:
+        return "extrem", 3
+    if max_1h > 25.0 or max_6h > 35.0:
+        return "unwetter", 2
+    if max_1h >= 15.0 or max_6h >= 20.0:
+        return "starkregen", 1
+    return "none", 0
+
+
+def _severity(max_1h: np.ndarray, max_6h: np.ndarray) -> np.ndarray:
+    """event_level() severities for arrays in 0.001 mm."""
+    return np.select(
+        [(max_1h > 40_000) | (max_6h > 60_000), (max_1h > 25_000) | (max_6h > 35_000), (max_1h >= _TRIG_1H) | (max_6h >= _TRIG_6H)],
+        [3, 2, 1],
+        default=0,
+    )
+
+
+def _iso(hours: np.ndarray) -> list[str]:
+    return [f"{t}:00:00Z" for t in np.asarray(hours, dtype=np.int64).astype("datetime64[h]").astype(str)]
+
+
+def _to_milli(mm: np.ndarray) -> np.ndarray:
+    mm = np.clip(np.nan_to_num(np.asarray(mm, dtype=np.float64), nan=0.0, posinf=0.0, neginf=0.0), 0.0, None)
+    return np.rint(mm * 1000.0).astype(np.int64)
+
+
+def rolling_sum(milli: np.ndarray, window: int = WINDOW_H) -> np.ndarray:
+    """Trailing window sums along the last axis (shorter windows at the start)."""
+    n = milli.shape[-1]
+    csum = np.zeros(milli.shape[:-1] + (n + 1,), dtype=np.int64)
+    np.cumsum(milli, axis=-1, out=csum[..., 1:])
+    lo = np.maximum(np.arange(n) - (window - 1), 0)
+    return csum[..., 1:] - csum[..., lo]
+
+
+def _sort_events(events: list[dict]) -> list[dict]:
+    events.sort(key=lambda ev: (ev.get("severity", 0), ev.get("max_1h_mm", 0.0), ev.get("max_6h_mm", 0.0)), reverse=True)
+    return events
+
+
+def detect_matrix(hours: np.ndarray, mm: np.ndarray, *, source: str) -> list[list[dict]]:
+    """
+    Events for every row of mm (points x hours) on the common hour axis
+    `hours` (int64 epoch hours, consecutive columns are consecutive samples).
+    Returns one event list per row, strongest first.
+    """
+    milli = _to_milli(np.atleast_2d(mm))
+    n_rows, n_hours = milli.shape
+    out: list[list[dict]] = [[] for _ in range(n_rows)]
+    if n_rows == 0 or n_hours == 0:
+        return out
+
+    r6 = rolling_sum(milli)
+    trig = (milli >= _TRIG_1H) | (r6 >= _TRIG_6H)
+    if not trig.any():
+        return out
+    cont = trig | (milli >= _RAIN_CONT)
+
+    # Flatten with one dry padding column per row so runs never cross points
+    # and every event end has a successor index (for reduceat).
+    width = n_hours + 1
+
+    def flat(a: np.ndarray, fill) -> np.ndarray:
+        f = np.full((n_rows, width), fill, dtype=a.dtype)
+        f[:, :n_hours] = a
+        return f.ravel()
+
+    m_f, r6_f, trig_f, cont_f = flat(milli, 0), flat(r6, 0), flat(trig, False), flat(cont, False)
+
+    prev = np.concatenate(([False], cont_f[:-1]))
+    nxt = np.concatenate((cont_f[1:], [False]))
+    run_id = np.cumsum(cont_f & ~prev) - 1
+    run_end = np.flatnonzero(cont_f & ~nxt)
+
+    # First trigger hour of each run starts the event, the run end closes it.
+    tpos = np.flatnonzero(trig_f)
+    truns = run_id[tpos]
+    first = np.concatenate(([True], truns[1:] != truns[:-1]))
+    s = tpos[first]
+    e = run_end[truns[first]]
+
+    bounds = np.empty(2 * s.size, dtype=np.int64)
+    bounds[0::2] = s
+    bounds[1::2] = e + 1
+    max_1h = np.maximum.reduceat(m_f, bounds)[0::2]
+    max_6h = np.maximum.reduceat(r6_f, bounds)[0::2]
+    total = np.add.reduceat(m_f, bounds)[0::2]
+
+    # Peak = first hour reaching max_1h inside the event.
+    lengths = e - s + 1
+    label = np.repeat(np.arange(s.size), lengths)
+    offsets = np.cumsum(lengths) - lengths
+    pos = np.arange(int(lengths.sum())) - np.repeat(offsets, lengths) + np.repeat(s, lengths)
+    hit = m_f[pos] == max_1h[label]
+    hit_label, hit_pos = label[hit], pos[hit]
+    peak = hit_pos[np.concatenate(([True], hit_label[1:] != hit_label[:-1]))]
+
+    sev = _severity(max_1h, max_6h)
+    rows = (s // width).tolist()
+    start_iso = _iso(hours[s % width])
+    end_iso = _iso(hours[e % width])
+    peak_iso = _iso(hours[peak % width])
+    max_1h_mm = (max_1h / 1000.0).round(2).tolist()
+    max_6h_mm = (max_6h / 1000.0).round(2).tolist()
+    sum_mm = (total / 1000.0).round(2).tolist()
+    for k, row in enumerate(rows):
+        if sev[k] == 0:
+            continue
+        out[row].append(
+            {
+                "start": start_iso[k],
+                "end": end_iso[k],
+                "peak_ts": peak_iso[k],
+                "max_1h_mm": max_1h_mm[k],
+                "max_6h_mm": max_6h_mm[k],
+                "sum_mm": sum_mm[k],
+                "warnstufe": _LEVELS[sev[k]],
+                "severity": int(sev[k]),
+                "source": source,
+            }
+        )
+    for evs in out:
+        _sort_events(evs)
+    return out
+
+
+def detect_events_batch(series_list: list[HourlySeries | list[dict] | None], *, source: str) -> list[list[dict]]:
+    """Events per series; series with the same hour axis are stacked into one matrix."""
+    series = [as_series(s) for s in series_list]
+    out: list[list[dict]] = [[] for _ in series]
+    groups: dict[bytes, list[int]] = {}
+    for i, s in enumerate(series):
+        if len(s):
+            groups.setdefault(s.hours.tobytes(), []).append(i)
+    for idx in groups.values():
+        hours = series[idx[0]].hours
+        mm = np.stack([series[i].mm for i in idx])
+        for i, evs in zip(idx, detect_matrix(hours, mm, source=source)):
+            out[i] = evs
+    return out
+
+
+def detect_events(series: HourlySeries | list[dict] | None, *, source: str) -> list[dict]:
+    return detect_events_batch([series], source=source)[0]
+
+
+def _parse_iso_z(ts: str | None) -> dt.datetime | None:
+    if not ts:
+        return None
+    try:
+        return dt.datetime.fromisoformat(str(ts).replace("Z", "+00:00")).astimezone(dt.timezone.utc)
+    except Exception:
+        return None
+
+
+def _new_fused(ev: dict, t: dt.datetime) -> dict:
+    return {
+        "start": ev.get("start") or ev.get("peak_ts"),
+        "end": ev.get("end") or ev.get("peak_ts"),
+        "peak_ts": ev.get("peak_ts"),
+        "max_1h_mm": float(ev.get("max_1h_mm") or 0.0),
+        "max_6h_mm": float(ev.get("max_6h_mm") or 0.0),
+        "sum_mm": float(ev.get("sum_mm") or 0.0),
+        "warnstufe": ev.get("warnstufe") or "none",
+        "severity": int(ev.get("severity") or 0),
+        "sources": {str(ev.get("source") or "unknown")},
+        "_peak_dt": t,
+    }
+
+
+def _fused_out(cur: dict, point: str) -> dict:
+    return {
+        "start": cur["start"],
+        "end": cur["end"],
+        "peak_ts": cur["peak_ts"],
+        "max_1h_mm": round(float(cur["max_1h_mm"]), 2),
+        "max_6h_mm": round(float(cur["max_6h_mm"]), 2),
+        "sum_mm": round(float(cur["sum_mm"]), 2),
+        "warnstufe": cur["warnstufe"],
+        "severity": int(cur["severity"]),
+        "source": "+".join(sorted(cur["sources"])),
+        "point": point,
+    }
+
+
+def merge_point_events(events: list[dict], *, point: str) -> list[dict]:
+    """Fuse events of one point (several sources) whose peaks lie within 12h of the cluster peak."""
+    xs = []
+    for ev in events or []:
+        t = _parse_iso_z(ev.get("peak_ts"))
+        if t is None:
+            continue
+        xs.append((t, ev))
+    xs.sort(key=lambda x: x[0])
+    if not xs:
+        return []
+
+    out: list[dict] = []
+    cur = None
+    for t, ev in xs:
+        if cur is None:
+            cur = _new_fused(ev, t)
+            continue
+
+        if abs((t - cur["_peak_dt"]).total_seconds()) <= 12 * 3600:
+            s0 = _parse_iso_z(cur.get("start")) or cur["_peak_dt"]
+            e0 = _parse_iso_z(cur.get("end")) or cur["_peak_dt"]
+            cur["start"] = min(s0, _parse_iso_z(ev.get("start")) or t).isoformat().replace("+00:00", "Z")
+            cur["end"] = max(e0, _parse_iso_z(ev.get("end")) or t).isoformat().replace("+00:00", "Z")
+            cur["max_1h_mm"] = max(float(cur["max_1h_mm"]), float(ev.get("max_1h_mm") or 0.0))
+            cur["max_6h_mm"] = max(float(cur["max_6h_mm"]), float(ev.get("max_6h_mm") or 0.0))
+            cur["sum_mm"] = max(float(cur["sum_mm"]), float(ev.get("sum_mm") or 0.0))
+            sev = int(ev.get("severity") or 0)
+            if sev > int(cur["severity"]):
+                cur["severity"] = sev
+                cur["warnstufe"] = ev.get("warnstufe") or cur["warnstufe"]
+            # prefer the strongest peak timestamp as representative
+            cur_peak = float(cur["max_1h_mm"]) + 0.25 * float(cur["max_6h_mm"])
+            ev_peak = float(ev.get("max_1h_mm") or 0.0) + 0.25 * float(ev.get("max_6h_mm") or 0.0)
+            if ev_peak >= cur_peak:
+                cur["peak_ts"] = ev.get("peak_ts") or cur["peak_ts"]
+                cur["_peak_dt"] = t
+            cur["sources"].add(str(ev.get("source") or "unknown"))
+        else:
+            out.append(_fused_out(cur, point))
+            cur = _new_fused(ev, t)
+
+    if cur is not None:
+        out.append(_fused_out(cur, point))
+    return _sort_events(out)
+
+
+def _point_coords(events: list[dict]) -> tuple[np.ndarray, np.ndarray]:
+    lat = np.full(len(events), np.nan)
+    lon = np.full(len(events), np.nan)
+    for i, ev in enumerate(events):
+        try:
+            la, lo = (float(x) for x in str(ev.get("point") or "").split(","))
+        except ValueError:
+            continue
+        lat[i], lon[i] = la, lo
+    return lat, lon
+
+
+def _components(n: int, left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    # Union-find over the linked pairs; returns a component label per event.
+    parent = list(range(n))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in zip(left.tolist(), right.tolist()):
+        ri, rj = find(i), find(j)
+        if ri != rj:
+            parent[max(ri, rj)] = min(ri, rj)
+    return np.array([find(i) for i in range(n)], dtype=np.int64)
+
+
+def cluster_across_points(
+    events: list[dict],
+    *,
+    gap_h: int | None = None,
+    radius_km: float | None = None,
+    max_span_h: int | None = None,
+) -> list[dict]:
+    """
+    Group point events (with "point" = "lat,lon", "start", "end") into regional
+    clusters. Two events are linked when their [start, end] windows overlap or
+    lie within gap_h hours and their points are at most radius_km apart;
+    clusters are the connected groups, split so that no cluster starts more
+    than max_span_h hours after its first event. Strongest cluster first.
+    """
+    gap = STARKREGEN_CLUSTER_GAP_H if gap_h is None else int(gap_h)
+    radius = STARKREGEN_CLUSTER_RADIUS_KM if radius_km is None else float(radius_km)
+    max_span = STARKREGEN_CLUSTER_MAX_SPAN_H if max_span_h is None else int(max_span_h)
+    evs = [ev for ev in events or [] if isinstance(ev, dict)]
+    if not evs:
+        return []
+    start = parse_hours([ev.get("start") or ev.get("peak_ts") for ev in evs])
+    end = parse_hours([ev.get("end") or ev.get("peak_ts") for ev in evs])
+    keep = np.flatnonzero((start >= 0) & (end >= 0))
+    if not keep.size:
+        return []
+    by_start = keep[np.argsort(start[keep], kind="stable")]
+    evs = [evs[i] for i in by_start]
+    start, end = start[by_start], np.maximum(end[by_start], start[by_start])
+    n = len(evs)
+
+    # Candidate pairs (i < j): j starts before i ends + gap (events sorted by start).
+    reach = np.searchsorted(start, end + gap, side="right")
+    counts = np.maximum(reach - np.arange(n) - 1, 0)
+    left = np.repeat(np.arange(n), counts)
+    right = np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts) + left + 1
+    # Spatial criterion (equirectangular distance, fine at cluster scale).
+    lat, lon = _point_coords(evs)
+    dy = (lat[left] - lat[right]) * 111.32
+    dx = (lon[left] - lon[right]) * 111.32 * np.cos(np.radians((lat[left] + lat[right]) / 2.0))
+    near = np.hypot(dx, dy) <= radius
+    comp = _components(n, left[near], right[near])
+
+    # Cap the span: within a component (in start order) a new cluster begins
+    # once an event starts more than max_span hours after the cluster start.
+    label = np.empty(n, dtype=np.int64)
+    next_label = 0
+    open_clusters: dict[int, tuple[int, int]] = {}
+    for i, c in enumerate(comp.tolist()):
+        cur = open_clusters.get(c)
+        if cur is None or start[i] - cur[1] > max_span:
+            cur = (next_label, int(start[i]))
+            open_clusters[c] = cur
+            next_label += 1
+        label[i] = cur[0]
+
+    order = np.argsort(label, kind="stable")
+    label_o = label[order]
+    bounds = np.flatnonzero(np.concatenate(([True], label_o[1:] != label_o[:-1])))
+    stops = np.append(bounds[1:], n)
+
+    max_1h = np.array([float(evs[i].get("max_1h_mm") or 0.0) for i in order])
+    max_6h = np.array([float(evs[i].get("max_6h_mm") or 0.0) for i in order])
+    sum_mm = np.array([float(evs[i].get("sum_mm") or 0.0) for i in order])
+    sev = np.array([int(evs[i].get("severity") or 0) for i in order])
+    score = max_1h + 0.25 * max_6h
+
+    c_start = _iso(np.minimum.reduceat(start[order], bounds))
+    c_end = _iso(np.maximum.reduceat(end[order], bounds))
+    c_1h = np.maximum.reduceat(max_1h, bounds).round(2).tolist()
+    c_6h = np.maximum.reduceat(max_6h, bounds).round(2).tolist()
+    c_sum = np.maximum.reduceat(sum_mm, bounds).round(2).tolist()
+    c_sev = np.maximum.reduceat(sev, bounds).tolist()
+
+    out: list[dict] = []
+    for k, (a, b) in enumerate(zip(bounds.tolist(), stops.tolist())):
+        members = [evs[i] for i in order[a:b]]
+        top = members[int(np.argmax(score[a:b]))]
+        points = sorted({str(ev.get("point") or "") for ev in members} - {""})
+        out.append(
+            {
+                "start": c_start[k],
+                "end": c_end[k],
+                "peak_ts": top.get("peak_ts"),
+                "peak_point": top.get("point"),
+                "max_1h_mm": c_1h[k],
+                "max_6h_mm": c_6h[k],
+                "sum_mm": c_sum[k],
+                "warnstufe": _LEVELS[c_sev[k]],
+                "severity": int(c_sev[k]),
+                "points": points,
+                "point_count": len(points),
+                "event_count": len(members),
+            }
+        )
+    return _sort_events(out)
@@ -0,0 +1,288 @@
+"""
+Small two-tier cache: bounded in-memory LRU + optional sqlite disk tier.
+
+One cache object per namespace (get_cache). Each namespace has its own default
+TTL, memory bound and disk flag; set() may override the TTL per entry
+(ttl_s=None on the namespace/entry = no expiry). Values in the disk tier are
+stored as JSON, so only JSON-serializable values are persisted across restarts.
+The disk tier is bounded by size: once it exceeds TIERED_CACHE_MAX_MB, expired
+rows and then the least recently used rows are purged down to 90% of the budget,
+so entries without TTL cannot grow the file without limit.
+
+Configuration:
+- TIERED_CACHE_DISK: 1/0, global switch for the disk tier (default 1)
+- TIERED_CACHE_PATH: sqlite file (default backend/.cache/tiered_cache.sqlite)
+- TIERED_CACHE_MAX_MB: size budget of the disk tier in MB (default 512, 0 = unbounded)
+- TIERED_CACHE_TTL_<NAMESPACE>: TTL override in seconds per namespace
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+
+TIERED_CACHE_DISK = os.getenv("TIERED_CACHE_DISK", "1").strip().lower() not in ("0", "false", "no")
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(__file__), ".cache", "tiered_cache.sqlite")
+TIERED_CACHE_MAX_MB = float(os.getenv("TIERED_CACHE_MAX_MB", "512") or 0)
+_PURGE_EVERY_SETS = 500
+
+_MISSING = object()
+
+
+def _cache_path() -> str:
+    return os.getenv("TIERED_CACHE_PATH", DEFAULT_CACHE_PATH)
+
+
+def _key_str(key: Any) -> str:
+    if isinstance(key, str):
+        return key
+    return json.dumps(key, sort_keys=True, separators=(",", ":"), default=str)
+
+
+class _DiskTier:
+    """Shared sqlite store (one table, namespaced rows); safe across threads and processes."""
+
+    def __init__(self, path: str, max_bytes: int = 0):
+        self.path = path
+        self.max_bytes = max(0, int(max_bytes))
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._sets = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " ns TEXT NOT NULL, key TEXT NOT NULL, expires_at REAL, value TEXT NOT NULL,"
+                " size INTEGER NOT NULL DEFAULT 0, accessed_at REAL NOT NULL DEFAULT 0,"
+                " PRIMARY KEY (ns, key))"
+            )
+            cols = {row[1] for row in conn.execute("PRAGMA table_info(entries)")}
+            if "size" not in cols:
+                # Files written before the size budget: backfill sizes, treat rows as oldest.
+                conn.execute("ALTER TABLE entries ADD COLUMN size INTEGER NOT NULL DEFAULT 0")
+                conn.execute("ALTER TABLE entries ADD COLUMN accessed_at REAL NOT NULL DEFAULT 0")
+                conn.execute("UPDATE entries SET size = length(value)")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+            self._purge_locked(conn)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _purge_locked(self, conn: sqlite3.Connection) -> None:
+        """Drop expired rows, then least recently used rows down to 90% of max_bytes."""
+        conn.execute("DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+        if not self.max_bytes:
+            return
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = int(self.max_bytes * 0.9)
+        victims = []
+        for ns, key, size in conn.execute("SELECT ns, key, size FROM entries ORDER BY accessed_at"):
+            if total <= target:
+                break
+            victims.append((ns, key))
+            total -= size
+        conn.executemany("DELETE FROM entries WHERE ns=? AND key=?", victims)
+        print(f"[CACHE] Disk tier over budget, evicted {len(victims)} entries")
+
+    def get(self, ns: str, key: str) -> tuple[Any, float | None] | None:
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value, expires_at FROM entries WHERE ns=? AND key=?", (ns, key)
+            ).fetchone()
+            if row is not None and (row[1] is None or row[1] > now):
+                conn.execute("UPDATE entries SET accessed_at=? WHERE ns=? AND key=?", (now, ns, key))
+                conn.commit()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at is not None and expires_at <= now:
+            self.delete(ns, key)
+            return None
+        return json.loads(value), expires_at
+
+    def set(self, ns: str, key: str, value: Any, expires_at: float | None) -> bool:
+        try:
+            payload = json.dumps(value, separators=(",", ":"))
+        except (TypeError, ValueError):
+            return False
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (ns, key, expires_at, value, size, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (ns, key, expires_at, payload, len(payload), time.time()),
+            )
+            self._sets += 1
+            if self._sets % _PURGE_EVERY_SETS == 0:
+                self._purge_locked(conn)
+            conn.commit()
+        return True
+
+    def delete(self, ns: str, key: str) -> None:
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM entries WHERE ns=? AND key=?", (ns, key))
+            conn.commit()
+
+    def clear(self, ns: str) -> None:
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM entries WHERE ns=?", (ns,))
+            conn.commit()
+
+
+_DISK_LOCK = threading.Lock()
+_DISK: _DiskTier | None = None
+
+
+def _disk_tier() -> _DiskTier:
+    global _DISK
+    with _DISK_LOCK:
+        if _DISK is None:
+            _DISK = _DiskTier(_cache_path(), max_bytes=int(TIERED_CACHE_MAX_MB * 1024 * 1024))
+        return _DISK
+
+
+class TieredCache:
+    def __init__(self, namespace: str, *, ttl_s: float | None, max_items: int = 1024, disk: bool = False):
+        self.namespace = namespace
+        env_ttl = os.getenv(f"TIERED_CACHE_TTL_{namespace.upper()}")
+        self.ttl_s = float(env_ttl) if env_ttl else ttl_s
+        self.max_items = max(1, int(max_items))
+        self.disk = bool(disk and TIERED_CACHE_DISK)
+        self._lock = threading.Lock()
+        self._mem: OrderedDict[str, tuple[float | None, Any]] = OrderedDict()
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "sets": 0,
+            "evictions": 0,
+            "expired": 0,
+            "disk_errors": 0,
+        }
+
+    def _expires_at(self, ttl_s: Any) -> float | None:
+        ttl = self.ttl_s if ttl_s is _MISSING else ttl_s
+        return None if ttl is None else time.time() + float(ttl)
+
+    def _mem_put(self, key: str, expires_at: float | None, value: Any) -> None:
+        self._mem[key] = (expires_at, value)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_items:
+            self._mem.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        k = _key_str(key)
+        now = time.time()
+        with self._lock:
+            hit = self._mem.get(k)
+            if hit is not None:
+                expires_at, value = hit
+                if expires_at is None or expires_at > now:
+                    self._mem.move_to_end(k)
+                    self._stats["memory_hits"] += 1
+                    return value
+                del self._mem[k]
+                self._stats["expired"] += 1
+        if self.disk:
+            try:
+                found = _disk_tier().get(self.namespace, k)
+            except Exception as exc:
+                found = None
+                with self._lock:
+                    self._stats["disk_errors"] += 1
+                print(f"[CACHE] {self.namespace}: disk read failed: {exc}")
+            if found is not None:
+                value, expires_at = found
+                with self._lock:
+                    self._mem_put(k, expires_at, value)
+                    self._stats["disk_hits"] += 1
+                return value
+        with self._lock:
+            self._stats["misses"] += 1
+        return default
+
+    def set(self, key: Any, value: Any, ttl_s: Any = _MISSING) -> None:
+        """Store value; ttl_s overrides the namespace TTL (None = never expires)."""
+        k = _key_str(key)
+        expires_at = self._expires_at(ttl_s)
+        with self._lock:
+            self._mem_put(k, expires_at, value)
+            self._stats["sets"] += 1
+        if self.disk:
+            try:
+                _disk_tier().set(self.namespace, k, value, expires_at)
+            except Exception as exc:
+                with self._lock:
+                    self._stats["disk_errors"] += 1
+                print(f"[CACHE] {self.namespace}: disk write failed: {exc}")
+
+    def get_or_set(self, key: Any, fn: Callable[[], Any], ttl_s: Any = _MISSING) -> Any:
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        value = fn()
+        self.set(key, value, ttl_s=ttl_s)
+        return value
+
+    def delete(self, key: Any) -> None:
+        k = _key_str(key)
+        with self._lock:
+            self._mem.pop(k, None)
+        if self.disk:
+            _disk_tier().delete(self.namespace, k)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+        if self.disk:
+            _disk_tier().clear(self.namespace)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            hits = self._stats["memory_hits"] + self._stats["disk_hits"]
+            lookups = hits + self._stats["misses"]
+            return {
+                "items": len(self._mem),
+                "max_items": self.max_items,
+                "ttl_s": self.ttl_s,
+                "disk": self.disk,
+                "hit_rate": round(hits / lookups, 4) if lookups else None,
+                **self._stats,
+            }
+
+
+_REGISTRY_LOCK = threading.Lock()
+_REGISTRY: dict[str, TieredCache] = {}
+
+
+def get_cache(namespace: str, *, ttl_s: float | None, max_items: int = 1024, disk: bool = False) -> TieredCache:
+    """Return the process-wide cache for a namespace (created on first use)."""
+    with _REGISTRY_LOCK:
+        cache = _REGISTRY.get(namespace)
+        if cache is None:
+            cache = TieredCache(namespace, ttl_s=ttl_s, max_items=max_items, disk=disk)
+            _REGISTRY[namespace] = cache
+        return cache
+
+
+def cache_stats() -> dict[str, dict[str, Any]]:
+    with _REGISTRY_LOCK:
+        caches = list(_REGISTRY.values())
+    return {c.namespace: c.stats() for c in caches}
@@ -0,0 +1,172 @@
+"""
+Warm-start preload of expensive, lazily initialized resources.
+
+The first analysis request used to pay for importing pysheds (numba), loading ML
+artifacts, indexing the local COG tiles, parsing the DWD station list, creating pyproj
+Transformers and opening layer rasters. run_warmup() does this up front; main.py
+starts it in a background thread at startup so the API answers immediately.
+
+Configuration:
+- WARMUP_ON_STARTUP: 1/0 (default 1)
+- WARMUP_STEPS: comma list to restrict steps (default: all)
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Any, Callable
+
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "1").strip().lower() not in ("0", "false", "no")
+ALL_STEPS = ("processing", "analysis_workers", "cog_catalog", "dwd_stations")
+
+# Common CRS pairs (WGS84 <-> UTM32/33 for NRW/ST/Berlin DEMs).
+_WARM_CRS_PAIRS = (
+    ("EPSG:4326", "EPSG:25832"),
+    ("EPSG:25832", "EPSG:4326"),
+    ("EPSG:4326", "EPSG:25833"),
+    ("EPSG:25833", "EPSG:4326"),
+)
+
+_LOCK = threading.Lock()
+_STATE: dict[str, Any] = {
+    "enabled": WARMUP_ON_STARTUP,
+    "started_at": None,
+    "finished_at": None,
+    "duration_ms": None,
+    "ready": False,
+    "steps": {},
+}
+
+
+def _configured_steps() -> list[str]:
+    raw = (os.getenv("WARMUP_STEPS", "") or "").strip()
+    if not raw:
+        return list(ALL_STEPS)
+    wanted = [s.strip().lower() for s in raw.split(",") if s.strip()]
+    return [s for s in ALL_STEPS if s in wanted]
+
+
+def warm_analysis_process() -> dict[str, Any]:
+    """
+    Preload analysis resources in the current process (API process or pool worker):
+    processing/pysheds import, pyproj Transformers, ML artifacts and layer raster headers.
+    """
+    timings: dict[str, Any] = {"pid": os.getpid()}
+
+    t0 = time.perf_counter()
+    import processing
+    from erosion_event_ml import configured_artifact_paths, load_joblib_artifact
+
+    timings["import_ms"] = round((time.perf_counter() - t0) * 1000.0, 1)
+
+    t0 = time.perf_counter()
+    for src_crs, dst_crs in _WARM_CRS_PAIRS:
+        processing._transformer(src_crs, dst_crs)
+    timings["transformers_ms"] = round((time.perf_counter() - t0) * 1000.0, 1)
+
+    t0 = time.perf_counter()
+    loaded = 0
+    for path in configured_artifact_paths():
+        try:
+            load_joblib_artifact(path)
+            loaded += 1
+        except Exception as exc:
+            print(f"[WARMUP] ML artifact {path} failed: {exc}")
+    timings["ml_artifacts"] = loaded
+    timings["ml_artifacts_ms"] = round((time.perf_counter() - t0) * 1000.0, 1)
+
+    t0 = time.perf_counter()
+    opened = 0
+    import rasterio
+
+    for path in processing._external_layer_paths().values():
+        if not path or not os.path.exists(path):
+            continue
+        try:
+            with rasterio.open(path) as src:
+                _ = src.profile
+            opened += 1
+        except Exception as exc:
+            print(f"[WARMUP] Layer {path} failed: {exc}")
+    timings["layers_opened"] = opened
+    timings["layers_ms"] = round((time.perf_counter() - t0) * 1000.0, 1)
+    return timings
+
+
+def _warm_cog_catalog() -> dict[str, Any]:
+    cog_dir = os.getenv("ST_COG_DIR")
+    if not cog_dir:
+        return {"skipped": "ST_COG_DIR nicht gesetzt"}
+    from st_cog_dem import ST_COG_INDEX, build_vrt_for_cog_dir, cog_catalog_for_dir
+
+    if ST_COG_INDEX == "vrt":
+        return {"vrt": str(build_vrt_for_cog_dir(cog_dir=cog_dir))}
+    catalog = cog_catalog_for_dir(cog_dir=cog_dir)
+    return {**catalog.refresh(force=True), **catalog.stats()}
+
+
+def _warm_dwd_stations() -> dict[str, Any]:
+    from weather_dwd import list_stations
+
+    return {"stations": len(list_stations())}
+
+
+def _run_step(name: str, fn: Callable[[], Any]) -> None:
+    with _LOCK:
+        _STATE["steps"][name] = {"status": "running"}
+    t0 = time.perf_counter()
+    try:
+        detail = fn()
+        entry = {"status": "ok", "detail": detail}
+    except Exception as exc:
+        print(f"[WARMUP] {name} failed: {exc}")
+        entry = {"status": "error", "detail": str(exc)}
+    entry["duration_ms"] = round((time.perf_counter() - t0) * 1000.0, 1)
+    with _LOCK:
+        _STATE["steps"][name] = entry
+
+
+def run_warmup(pool=None) -> dict[str, Any]:
+    """Run all configured warm-up steps sequentially and return the readiness state."""
+    with _LOCK:
+        _STATE["started_at"] = time.time()
+        _STATE["ready"] = False
+    t0 = time.perf_counter()
+    steps = _configured_steps()
+    for name in steps:
+        if name == "processing":
+            _run_step(name, warm_analysis_process)
+        elif name == "analysis_workers":
+            if pool is None or pool.workers <= 0:
+                continue
+            _run_step(name, lambda: pool.warm("warmup:warm_analysis_process"))
+        elif name == "cog_catalog":
+            _run_step(name, _warm_cog_catalog)
+        elif name == "dwd_stations":
+            _run_step(name, _warm_dwd_stations)
+    with _LOCK:
+        _STATE["finished_at"] = time.time()
+        _STATE["duration_ms"] = round((time.perf_counter() - t0) * 1000.0, 1)
+        _STATE["ready"] = True
+    print(f"[WARMUP] done in {_STATE['duration_ms']} ms ({', '.join(steps) or 'keine Schritte'})")
+    return readiness()
+
+
+def start_background_warmup(pool=None) -> threading.Thread | None:
+    if not WARMUP_ON_STARTUP:
+        with _LOCK:
+            _STATE["ready"] = True
+        return None
+    t = threading.Thread(target=run_warmup, kwargs={"pool": pool}, name="warmup", daemon=True)
+    t.start()
+    return t
+
+
+def readiness() -> dict[str, Any]:
+    with _LOCK:
+        return {
+            **{k: v for k, v in _STATE.items() if k != "steps"},
+            "steps": {k: dict(v) for k, v in _STATE["steps"].items()},
+        }
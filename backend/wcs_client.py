@@ -13,23 +13,51 @@ from __future__ import annotations
 
 import math
 import os
+import random
 import tempfile
+import threading
+import time
 import xml.etree.ElementTree as ET
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from dataclasses import dataclass
+from urllib.parse import urlparse
 
 import requests
+from requests.adapters import HTTPAdapter
 from pyproj import Transformer
 
+from tiered_cache import get_cache
+from wcs_tile_cache import get_tile_cache, tile_key
+
 # WCS configuration
 WCS_VERSION = "2.0.1"
 WCS_REQUEST_TIMEOUT_S = int(os.getenv("WCS_REQUEST_TIMEOUT_S", "60"))
+# Concurrent tile downloads over one keep-alive session
+WCS_FETCH_WORKERS = max(1, int(os.getenv("WCS_FETCH_WORKERS", "4") or 4))
+# Minimum spacing between request starts per host (politeness towards public WCS)
+WCS_HOST_MIN_INTERVAL_S = float(os.getenv("WCS_HOST_MIN_INTERVAL_S", "0.1") or 0.0)
+WCS_MAX_RETRIES = max(1, int(os.getenv("WCS_MAX_RETRIES", "3") or 3))
+WCS_BACKOFF_BASE_S = float(os.getenv("WCS_BACKOFF_BASE_S", "1.0") or 1.0)
+WCS_BACKOFF_CAP_S = float(os.getenv("WCS_BACKOFF_CAP_S", "15.0") or 15.0)
+# How long a probed working GetCoverage URL variant is reused per endpoint/coverage
+WCS_VARIANT_TTL_S = float(os.getenv("WCS_VARIANT_TTL_S", "86400") or 86400)
 
 # Maximum requested side length per WCS tile in meters
 MAX_TILE_SIDE_M = 5_000
 # If proxy still rejects a tile, recursively split until this size
 MIN_TILE_SIDE_M = 500
-# Safety cap to avoid accidental huge fan-out requests
+# Safety cap to avoid accidental huge fan-out requests. Counted in MAX_TILE_SIDE_M
+# cells of the AOI, i.e. an area limit independent of WCS_TILE_GRID_M.
 MAX_TILE_COUNT = 400
+# Fixed global tile grid (EPSG:25832 meters) so tiles are reusable across requests
+# and can be served from the on-disk tile cache. 0 = legacy AOI-relative tiling.
+WCS_TILE_GRID_M = float(os.getenv("WCS_TILE_GRID_M", "2000") or 0)
+# Finest grid level. Small AOIs use the finest power-of-two subdivision of
+# WCS_TILE_GRID_M whose cell still covers the AOI side, so a 100 m field does not
+# download a whole coarse grid cell.
+WCS_TILE_GRID_MIN_M = float(os.getenv("WCS_TILE_GRID_MIN_M", "250") or 0)
+# Tile mosaicking: "memory" (AOI-sized array, no per-tile temp files) or "legacy" (rasterio.merge)
+WCS_MERGE_MODE = (os.getenv("WCS_MERGE_MODE", "memory") or "memory").strip().lower()
 
 # Coverage bounds from DescribeCoverage(nw_dgm), EPSG:25832
 NRW_MIN_X = 278_000.0
@@ -259,11 +287,15 @@ def _iter_tiles(min_x: float, min_y: float, max_x: float, max_y: float):
     nx = max(1, math.ceil(width / MAX_TILE_SIDE_M))
     ny = max(1, math.ceil(height / MAX_TILE_SIDE_M))
 
+    # Limit by area (in MAX_TILE_SIDE_M cells) so a finer grid does not shrink the largest AOI.
     if nx * ny > MAX_TILE_COUNT:
         raise BboxTooLargeError(
             f"Auswahl erzeugt zu viele Kacheln ({nx * ny}). "
-            f"Bitte Bereich verkleinern (max {MAX_TILE_COUNT} Kacheln)."
+            f"Bitte Bereich verkleinern (max {MAX_TILE_COUNT} Kacheln von {MAX_TILE_SIDE_M // 1000}x{MAX_TILE_SIDE_M // 1000} km)."
         )
+    if WCS_TILE_GRID_M > 0:
+        yield from _iter_grid_tiles(min_x, min_y, max_x, max_y, _grid_size_for(width, height))
+        return
 
     step_x = width / nx
     step_y = height / ny
@@ -277,6 +309,107 @@ def _iter_tiles(min_x: float, min_y: float, max_x: float, max_y: float):
             yield tx0, ty0, tx1, ty1
 
 
+def _grid_levels() -> list[float]:
+    """Nested grid sizes from the base grid down to WCS_TILE_GRID_MIN_M (coarsest first)."""
+    size = min(WCS_TILE_GRID_M, MAX_TILE_SIDE_M)
+    levels = [size]
+    while size / 2 >= max(WCS_TILE_GRID_MIN_M, 1.0):
+        size /= 2
+        levels.append(size)
+    return levels
+
+
+def _grid_size_for(width: float, height: float) -> float:
+    """Finest grid level whose cell is at least the AOI's longer side (at most 4 cells)."""
+    side = max(width, height)
+    chosen = _grid_levels()[0]
+    for size in _grid_levels()[1:]:
+        if size < side:
+            break
+        chosen = size
+    return chosen
+
+
+def _iter_grid_tiles(min_x: float, min_y: float, max_x: float, max_y: float, grid_m: float):
+    """Yield the cells of the global grid_m grid that intersect the AOI."""
+    ix0 = math.floor(min_x / grid_m)
+    iy0 = math.floor(min_y / grid_m)
+    ix1 = max(ix0 + 1, math.ceil(max_x / grid_m))
+    iy1 = max(iy0 + 1, math.ceil(max_y / grid_m))
+    for ix in range(ix0, ix1):
+        for iy in range(iy0, iy1):
+            yield ix * grid_m, iy * grid_m, (ix + 1) * grid_m, (iy + 1) * grid_m
+
+
+_SESSION_LOCK = threading.Lock()
+_SESSION: requests.Session | None = None
+
+
+def _session() -> requests.Session:
+    """Shared keep-alive session; connection pool sized for the tile workers."""
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=max(4, WCS_FETCH_WORKERS * 2))
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            _SESSION = s
+        return _SESSION
+
+
+_HOST_LOCK = threading.Lock()
+_HOST_NEXT_SLOT: dict[str, float] = {}
+
+
+def _wait_for_host_slot(url: str) -> None:
+    # Reserve the next start slot per host so parallel workers keep a bounded request rate.
+    if WCS_HOST_MIN_INTERVAL_S <= 0:
+        return
+    host = urlparse(url).netloc
+    with _HOST_LOCK:
+        now = time.monotonic()
+        slot = max(now, _HOST_NEXT_SLOT.get(host, 0.0))
+        _HOST_NEXT_SLOT[host] = slot + WCS_HOST_MIN_INTERVAL_S
+    if slot > now:
+        time.sleep(slot - now)
+
+
+def _retry_delay_s(attempt: int, retry_after: str | None = None) -> float:
+    if retry_after:
+        try:
+            ra = float(retry_after)
+            if math.isfinite(ra) and ra > 0:
+                return min(ra, WCS_BACKOFF_CAP_S)
+        except ValueError:
+            pass
+    delay = min(WCS_BACKOFF_CAP_S, max(0.1, WCS_BACKOFF_BASE_S) * (2 ** max(0, attempt - 1)))
+    return min(WCS_BACKOFF_CAP_S, delay + random.uniform(0.0, delay * 0.25))
+
+
+def _http_get(url: str) -> requests.Response:
+    """GET with per-host rate limit and retry/backoff on transport errors, 429 and 502-504."""
+    last_exc: Exception | None = None
+    resp = None
+    for attempt in range(1, WCS_MAX_RETRIES + 1):
+        _wait_for_host_slot(url)
+        try:
+            resp = _session().get(url, timeout=WCS_REQUEST_TIMEOUT_S)
+        except (requests.ConnectionError, requests.Timeout) as exc:
+            last_exc = exc
+            if attempt < WCS_MAX_RETRIES:
+                time.sleep(_retry_delay_s(attempt))
+                continue
+            raise
+        if resp.status_code in (429, 502, 503, 504) and attempt < WCS_MAX_RETRIES:
+            time.sleep(_retry_delay_s(attempt, resp.headers.get("Retry-After")))
+            continue
+        return resp
+    if resp is not None:
+        return resp
+    raise last_exc or requests.ConnectionError("WCS request failed")
+
+
 def _split_tile(tile: tuple[float, float, float, float]):
     """Split one tile into four quadrants."""
     min_x, min_y, max_x, max_y = tile
@@ -386,97 +519,94 @@ def _build_wcs_url_wgs84_variant(
     )
 
 
-def _fetch_single_tile(
-    provider: WCSProvider,
-    min_x: float,
-    min_y: float,
-    max_x: float,
-    max_y: float,
-    notify=None,
-) -> str:
-    west, south = _to_wgs.transform(min_x, min_y)
-    east, north = _to_wgs.transform(max_x, max_y)
+_CRS_URI_25832 = "http://www.opengis.net/def/crs/EPSG/0/25832"
 
-    print(
-        f"[WCS] [{provider.key}] Fetching tile: x=[{min_x:.0f},{max_x:.0f}] "
-        f"y=[{min_y:.0f},{max_y:.0f}] (EPSG:25832)"
-    )
+# Named GetCoverage URL variants (version/axis/CRS quirks of the state WCS proxies).
+# Each builder gets (base, coverage, min_x, min_y, max_x, max_y, west, south, east, north).
+_URL_VARIANTS = {
+    "xy_uri": lambda b, c, x0, y0, x1, y1, w, s, e, n: _build_wcs_url(b, c, x0, y0, x1, y1),
+    "xy_uri_out": lambda b, c, x0, y0, x1, y1, w, s, e, n: _build_wcs_url_variant(
+        b, c, x0, y0, x1, y1, _CRS_URI_25832, _CRS_URI_25832
+    ),
+    "xy_epsg_out": lambda b, c, x0, y0, x1, y1, w, s, e, n: _build_wcs_url_variant(
+        b, c, x0, y0, x1, y1, "EPSG:25832", "EPSG:25832"
+    ),
+    "xy_epsg": lambda b, c, x0, y0, x1, y1, w, s, e, n: _build_wcs_url_variant(b, c, x0, y0, x1, y1, "EPSG:25832"),
+    "en_epsg_out": lambda b, c, x0, y0, x1, y1, w, s, e, n: _build_wcs_url_axis_variant(
+        b, c, x0, y0, x1, y1, "E", "N", "EPSG:25832", "EPSG:25832"
+    ),
+    "en_uri_out": lambda b, c, x0, y0, x1, y1, w, s, e, n: _build_wcs_url_axis_variant(
+        b, c, x0, y0, x1, y1, "E", "N", _CRS_URI_25832, _CRS_URI_25832
+    ),
+    "en_epsg": lambda b, c, x0, y0, x1, y1, w, s, e, n: _build_wcs_url_axis_variant(
+        b, c, x0, y0, x1, y1, "E", "N", "EPSG:25832"
+    ),
+    "wgs84_long_lat": lambda b, c, x0, y0, x1, y1, w, s, e, n: _build_wcs_url_wgs84_variant(
+        b, c, w, s, e, n, "Long", "Lat"
+    ),
+    "wgs84_lon_lat": lambda b, c, x0, y0, x1, y1, w, s, e, n: _build_wcs_url_wgs84_variant(
+        b, c, w, s, e, n, "lon", "lat"
+    ),
+}
 
-    if not provider.wcs_base or not provider.coverage_id:
-        raise WCSError(
-            f"Fuer {provider.name} ist noch kein WCS-Endpunkt konfiguriert. "
-            "Bitte vorerst GeoTIFF manuell hochladen."
-        )
 
-    base = provider.wcs_base
-    cov = provider.coverage_id
+def _variant_order(provider: WCSProvider) -> list[str]:
     # Provider-specific behavior:
     # - NRW is known to work with x/y + OGC CRS URI.
     # - Sachsen-Anhalt often behaves differently (axis labels and OUTPUTCRS quirks),
     #   so we prioritize E/N + OUTPUTCRS first to reduce retries.
     if provider.key == "sachsen-anhalt":
-        candidate_urls = [
-            _build_wcs_url_axis_variant(base, cov, min_x, min_y, max_x, max_y, "E", "N", "EPSG:25832", "EPSG:25832"),
-            _build_wcs_url_variant(base, cov, min_x, min_y, max_x, max_y, "EPSG:25832", "EPSG:25832"),
-            _build_wcs_url_axis_variant(
-                base,
-                cov,
-                min_x,
-                min_y,
-                max_x,
-                max_y,
-                "E",
-                "N",
-                "http://www.opengis.net/def/crs/EPSG/0/25832",
-                "http://www.opengis.net/def/crs/EPSG/0/25832",
-            ),
-            _build_wcs_url_variant(
-                base,
-                cov,
-                min_x,
-                min_y,
-                max_x,
-                max_y,
-                "http://www.opengis.net/def/crs/EPSG/0/25832",
-                "http://www.opengis.net/def/crs/EPSG/0/25832",
-            ),
-            _build_wcs_url_axis_variant(base, cov, min_x, min_y, max_x, max_y, "E", "N", "EPSG:25832"),
-            _build_wcs_url_variant(base, cov, min_x, min_y, max_x, max_y, "EPSG:25832"),
-            _build_wcs_url(base, cov, min_x, min_y, max_x, max_y),
-            _build_wcs_url_wgs84_variant(base, cov, west, south, east, north, "Long", "Lat"),
-            _build_wcs_url_wgs84_variant(base, cov, west, south, east, north, "lon", "lat"),
-        ]
-    else:
-        candidate_urls = [
-            _build_wcs_url(base, cov, min_x, min_y, max_x, max_y),
-            _build_wcs_url_variant(
-                base,
-                cov,
-                min_x,
-                min_y,
-                max_x,
-                max_y,
-                "http://www.opengis.net/def/crs/EPSG/0/25832",
-                "http://www.opengis.net/def/crs/EPSG/0/25832",
-            ),
-            _build_wcs_url_variant(base, cov, min_x, min_y, max_x, max_y, "EPSG:25832", "EPSG:25832"),
-            _build_wcs_url_variant(base, cov, min_x, min_y, max_x, max_y, "EPSG:25832"),
-            _build_wcs_url_axis_variant(base, cov, min_x, min_y, max_x, max_y, "E", "N", "EPSG:25832", "EPSG:25832"),
-            _build_wcs_url_axis_variant(base, cov, min_x, min_y, max_x, max_y, "E", "N", "EPSG:25832"),
-            _build_wcs_url_wgs84_variant(base, cov, west, south, east, north, "Long", "Lat"),
-            _build_wcs_url_wgs84_variant(base, cov, west, south, east, north, "lon", "lat"),
+        return [
+            "en_epsg_out",
+            "xy_epsg_out",
+            "en_uri_out",
+            "xy_uri_out",
+            "en_epsg",
+            "xy_epsg",
+            "xy_uri",
+            "wgs84_long_lat",
+            "wgs84_lon_lat",
         ]
+    return [
+        "xy_uri",
+        "xy_uri_out",
+        "xy_epsg_out",
+        "xy_epsg",
+        "en_epsg_out",
+        "en_epsg",
+        "wgs84_long_lat",
+        "wgs84_lon_lat",
+    ]
+
+
+# Working URL variant per (endpoint, coverage), so only the first tile probes.
+_VARIANT_MEMO = get_cache("wcs_variant", ttl_s=WCS_VARIANT_TTL_S, max_items=64, disk=True)
+_PROBE_LOCKS_LOCK = threading.Lock()
+_PROBE_LOCKS: dict[tuple[str, str], threading.Lock] = {}
 
+
+def _probe_lock(base: str, coverage_id: str) -> threading.Lock:
+    with _PROBE_LOCKS_LOCK:
+        return _PROBE_LOCKS.setdefault((base, coverage_id), threading.Lock())
+
+
+def _request_variants(provider: WCSProvider, names: list[str], coords: tuple, notify=None):
+    """
+    Try URL variants in order; returns (response, variant, last_status, last_detail).
+
+    response is None if no variant returned a GeoTIFF. Connection problems, timeouts
+    and 503 are raised immediately as WCSError (no point in trying other variants).
+    """
     last_status = None
     last_detail = ""
-    resp = None
 
-    for idx, url in enumerate(candidate_urls, start=1):
-        print(f"[WCS] Try {idx}/{len(candidate_urls)}")
+    for idx, name in enumerate(names, start=1):
+        url = _URL_VARIANTS[name](provider.wcs_base, provider.coverage_id, *coords)
+        print(f"[WCS] Try {idx}/{len(names)} ({name})")
         if notify:
-            notify(f"WCS: Anfrage {idx}/{len(candidate_urls)}")
+            notify(f"WCS: Anfrage {idx}/{len(names)}")
         try:
-            resp = requests.get(url, timeout=WCS_REQUEST_TIMEOUT_S)
+            resp = _http_get(url)
         except requests.ConnectionError as exc:
             raise WCSError(
                 "WCS-Dienst nicht erreichbar. Bitte manuellen Upload versuchen."
@@ -495,30 +625,89 @@ def _fetch_single_tile(
         if resp.status_code == 200:
             content_type = resp.headers.get("Content-Type", "")
             if "tiff" in content_type.lower() or "octet" in content_type.lower():
-                break
+                return resp, name, 200, ""
             last_status = 200
             last_detail = (
                 f"WCS hat kein GeoTIFF zurueckgegeben (Content-Type: {content_type}). "
                 f"Antwort: {_extract_ows_exception_text(resp.text)}"
             )
-            resp = None
             continue
 
         # Sachsen-Anhalt WCS currently tends to respond with a generic 500 for *any* GetCoverage.
         # Avoid hammering the service with many variants in that case; fall back to upload mode.
         if provider.key == "sachsen-anhalt" and resp.status_code == 500:
-            last_status = resp.status_code
             # Some servers return plain text; keep it as-is to preserve the "Internal Server Error" signal.
-            last_detail = (resp.text or "").strip() or "Internal Server Error"
-            resp = None
-            break
+            return None, None, resp.status_code, (resp.text or "").strip() or "Internal Server Error"
 
         last_status = resp.status_code
         last_detail = _extract_ows_exception_text(resp.text)
-        resp = None
+
+    return None, None, last_status, last_detail
+
+
+def _is_proxy_rejection(detail: str) -> bool:
+    return "InvalidParameterValue" in detail or "OGC Proxy" in detail
+
+
+def _download_tile(
+    provider: WCSProvider,
+    min_x: float,
+    min_y: float,
+    max_x: float,
+    max_y: float,
+    notify=None,
+) -> bytes:
+    """Fetch one GetCoverage tile and return the GeoTIFF bytes."""
+    west, south = _to_wgs.transform(min_x, min_y)
+    east, north = _to_wgs.transform(max_x, max_y)
+
+    print(
+        f"[WCS] [{provider.key}] Fetching tile: x=[{min_x:.0f},{max_x:.0f}] "
+        f"y=[{min_y:.0f},{max_y:.0f}] (EPSG:25832)"
+    )
+
+    if not provider.wcs_base or not provider.coverage_id:
+        raise WCSError(
+            f"Fuer {provider.name} ist noch kein WCS-Endpunkt konfiguriert. "
+            "Bitte vorerst GeoTIFF manuell hochladen."
+        )
+
+    coords = (min_x, min_y, max_x, max_y, west, south, east, north)
+    order = _variant_order(provider)
+    memo_key = [provider.wcs_base, provider.coverage_id]
+    tried: list[str] = []
+    resp = None
+    last_status = None
+    last_detail = ""
+
+    def try_memoized() -> None:
+        nonlocal resp, last_status, last_detail
+        known = _VARIANT_MEMO.get(memo_key)
+        if known in order and known not in tried:
+            tried.append(known)
+            resp, _, last_status, last_detail = _request_variants(provider, [known], coords, notify)
+
+    try_memoized()
+    st_down = provider.key == "sachsen-anhalt" and last_status == 500
+    # A working variant rejecting a splittable extent is a tile-level rejection: the caller
+    # splits the tile. Re-probing is reserved for failures that hit the whole coverage.
+    splittable = (max_x - min_x) > MIN_TILE_SIDE_M or (max_y - min_y) > MIN_TILE_SIDE_M
+    tile_rejected = bool(tried) and splittable and _is_proxy_rejection(last_detail)
+    if resp is None and not st_down and not tile_rejected:
+        # One full probe per endpoint at a time; parallel tile workers wait and reuse its result.
+        with _probe_lock(provider.wcs_base, provider.coverage_id):
+            try_memoized()
+            if resp is None:
+                remaining = [n for n in order if n not in tried]
+                if tried:
+                    print(f"[WCS] [{provider.key}] Memoized URL variant failed, probing {len(remaining)} variant(s)")
+                resp, used, last_status, last_detail = _request_variants(provider, remaining, coords, notify)
+                if resp is not None:
+                    _VARIANT_MEMO.set(memo_key, used)
+                    print(f"[WCS] [{provider.key}] Working URL variant: {used}")
 
     if resp is None:
-        if "InvalidParameterValue" in last_detail or "OGC Proxy" in last_detail:
+        if _is_proxy_rejection(last_detail):
             raise WCSError(
                 "WCS-Proxy lehnt die Anfrageparameter ab (InvalidParameterValue). "
                 "Bitte Auswahl etwas verschieben/verkleinern oder GeoTIFF manuell hochladen."
@@ -530,28 +719,254 @@ def _fetch_single_tile(
             )
         raise WCSError(f"WCS-Fehler (HTTP {last_status}): {last_detail}")
 
+    print(f"[WCS] Tile downloaded {len(resp.content) / 1024:.0f} KB")
+    return resp.content
+
+
+def _is_splittable_rejection(exc: WCSError, tile: tuple[float, float, float, float]) -> bool:
+    msg = str(exc)
+    tx0, ty0, tx1, ty1 = tile
+    can_split = (tx1 - tx0) > MIN_TILE_SIDE_M or (ty1 - ty0) > MIN_TILE_SIDE_M
+    return can_split and ("InvalidParameterValue" in msg or "Proxy lehnt" in msg)
+
+
+_STATS_LOCK = threading.Lock()
+
+
+def _fetch_tile_cached(provider: WCSProvider, tile: tuple[float, float, float, float], stats: dict | None):
+    """
+    Download one tile and return (source, owned).
+
+    source is the cached file path if the tile cache is enabled, the raw GeoTIFF bytes
+    in memory merge mode, or otherwise a temp file path owned by the caller.
+    """
+    data = _download_tile(provider, *tile)
+    if stats is not None:
+        with _STATS_LOCK:
+            stats["cache_misses"] = stats.get("cache_misses", 0) + 1
+            stats["bytes_downloaded"] = stats.get("bytes_downloaded", 0) + len(data)
+    cache = get_tile_cache()
+    if cache.enabled:
+        try:
+            return cache.put_bytes(tile_key(provider.key, provider.coverage_id or "", *tile), data), False
+        except OSError as exc:
+            print(f"[WCS] Tile cache write failed: {exc}")
+    if WCS_MERGE_MODE == "memory":
+        return data, False
     tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".tif")
-    tmp.write(resp.content)
+    tmp.write(data)
     tmp.close()
+    return tmp.name, True
 
-    size_kb = len(resp.content) / 1024
-    print(f"[WCS] Tile downloaded {size_kb:.0f} KB -> {tmp.name}")
-    return tmp.name
 
+def _iter_fetched_tiles(
+    provider: WCSProvider,
+    tiles: list[tuple[float, float, float, float]],
+    notify=None,
+    stats: dict | None = None,
+):
+    """
+    Download tiles with WCS_FETCH_WORKERS threads and yield (source, owned) in completion order.
+
+    Tiles present in the tile cache (or inside a cached coarser grid cell) are yielded
+    first without a network call (owned=False: the caller must not delete them).
+    Tiles rejected by the proxy (InvalidParameterValue) are split into quadrants and
+    resubmitted; the split is recorded in the cache so later requests skip the parent. On a fatal
+    error all outstanding work is cancelled and already downloaded but not yet
+    yielded temp files are removed.
+    """
+    def note(msg: str):
+        if notify:
+            notify(msg)
+
+    cache = get_tile_cache()
+    # The AOI size is already checked in _iter_tiles; this only bounds proxy splits.
+    max_tiles = max(MAX_TILE_COUNT, 2 * len(tiles))
+    submitted = 0
+    done_count = 0
+    ready: list[tuple[str | bytes, bool]] = []
+    pool = ThreadPoolExecutor(max_workers=WCS_FETCH_WORKERS, thread_name_prefix="wcs-tile")
+    futures: dict = {}
+
+    def key_of(tile) -> str:
+        return tile_key(provider.key, provider.coverage_id or "", *tile)
+
+    def cached_tile(tile) -> str | None:
+        hit = cache.get(key_of(tile))
+        if hit is not None or WCS_TILE_GRID_M <= 0:
+            return hit
+        # Grid levels are nested: a cached coarser cell containing the tile serves it too.
+        side = max(tile[2] - tile[0], tile[3] - tile[1])
+        for size in _grid_levels():
+            if size <= side:
+                break
+            x0 = math.floor(tile[0] / size) * size
+            y0 = math.floor(tile[1] / size) * size
+            hit = cache.get(key_of(_clamp_tile((x0, y0, x0 + size, y0 + size), provider.utm32_bounds)))
+            if hit is not None:
+                return hit
+        return None
+
+    def submit(tile):
+        nonlocal submitted
+        if cache.is_split(key_of(tile)):
+            for sub in _split_tile(tile):
+                submit(sub)
+            return
+        if submitted >= max_tiles:
+            raise BboxTooLargeError(
+                f"Auswahl erzeugt zu viele WCS-Kacheln ({submitted + 1}). "
+                "Bitte Bereich verkleinern oder GeoTIFF manuell hochladen."
+            )
+        submitted += 1
+        cached = cached_tile(tile)
+        if cached is not None:
+            if stats is not None:
+                with _STATS_LOCK:
+                    stats["cache_hits"] = stats.get("cache_hits", 0) + 1
+            ready.append((cached, False))
+            return
+        # Per-tile variant progress is too chatty with parallel workers; report completions instead.
+        futures[pool.submit(_fetch_tile_cached, provider, tile, stats)] = tile
 
-def _merge_tiles(tile_paths: list[str]) -> str:
+    try:
+        for tile in tiles:
+            submit(tile)
+        if ready:
+            print(f"[WCS] {len(ready)} tile(s) served from tile cache")
+            note(f"WCS: {len(ready)} Kachel(n) aus Cache")
+        while ready or futures:
+            while ready:
+                yield ready.pop(0)
+            if not futures:
+                break
+            finished, _ = wait(list(futures), return_when=FIRST_COMPLETED)
+            for fut in finished:
+                tile = futures.pop(fut)
+                try:
+                    item = fut.result()
+                except WCSError as exc:
+                    if not _is_splittable_rejection(exc, tile):
+                        raise
+                    dx = tile[2] - tile[0]
+                    dy = tile[3] - tile[1]
+                    print(
+                        f"[WCS] Splitting rejected tile ({dx:.0f}m x {dy:.0f}m) "
+                        f"due to proxy parameter error."
+                    )
+                    note(f"WCS: Kachel abgelehnt, splitte weiter ({dx:.0f}m x {dy:.0f}m)")
+                    if cache.enabled:
+                        try:
+                            cache.mark_split(key_of(tile))
+                        except OSError as exc:
+                            print(f"[WCS] Tile cache split marker failed: {exc}")
+                    for sub in _split_tile(tile):
+                        submit(sub)
+                    continue
+                done_count += 1
+                print(f"[WCS] Tile {done_count} done (in flight={len(futures)})")
+                note(f"WCS: Kachel {done_count} geladen (ausstehend: {len(futures)})")
+                ready.append(item)
+    finally:
+        for fut in futures:
+            fut.cancel()
+        pool.shutdown(wait=True)
+        # Remove temp results that completed after the failure but were never handed out.
+        leftovers = list(ready)
+        for fut in futures:
+            if fut.done() and not fut.cancelled() and fut.exception() is None:
+                leftovers.append(fut.result())
+        for path, owned in leftovers:
+            if owned:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+def _require_rasterio():
     try:
         import rasterio
-        from rasterio.merge import merge as rio_merge
     except Exception as exc:
         raise WCSError(
             "GeoTIFF-Kachelmerge benoetigt 'rasterio'. Bitte OSGeo4W-Umgebung nutzen "
             "oder rasterio in die Python-Umgebung installieren."
         ) from exc
+    return rasterio
+
+
+def _open_tile(source):
+    """Open a tile given as path or in-memory GeoTIFF bytes; returns (dataset, memfile)."""
+    rasterio = _require_rasterio()
+    if isinstance(source, (bytes, bytearray)):
+        from rasterio.io import MemoryFile
+
+        memfile = MemoryFile(bytes(source))
+        return memfile.open(), memfile
+    return rasterio.open(source), None
+
+
+def _merge_tiles(
+    tiles,
+    bounds: tuple[float, float, float, float] | None = None,
+    stats: dict | None = None,
+    mode: str | None = None,
+) -> tuple[str, int]:
+    """
+    Merge tiles into one GeoTIFF cropped to bounds; returns (path, tile_count).
+
+    tiles yields (source, owned) pairs (path or GeoTIFF bytes) and may be a generator
+    (e.g. _iter_fetched_tiles): each tile is processed as soon as it arrives, so the
+    merge overlaps the remaining downloads. Owned temp tiles are deleted afterwards,
+    cached tiles are left in place. The result is always a new temp file owned by
+    the caller.
+
+    mode "memory" (WCS_MERGE_MODE default, needs bounds) copies only the AOI window
+    of each tile into one preallocated array; "legacy" uses rasterio.merge over all
+    open tiles. merge_ms (CPU time outside the downloads) and temp_bytes_peak are
+    added to stats.
+    """
+    mode = (mode or WCS_MERGE_MODE).strip().lower()
+    if mode == "memory" and bounds is not None:
+        return _merge_tiles_memory(tiles, bounds, stats)
+    return _merge_tiles_legacy(tiles, bounds, stats)
+
 
-    srcs = [rasterio.open(p) for p in tile_paths]
+def _record_merge_stats(stats: dict | None, mode: str, merge_s: float, temp_bytes_peak: int) -> None:
+    if stats is None:
+        return
+    stats["merge_mode"] = mode
+    stats["merge_ms"] = round(merge_s * 1000.0, 1)
+    stats["temp_bytes_peak"] = int(temp_bytes_peak)
+
+
+def _merge_tiles_legacy(tiles, bounds, stats) -> tuple[str, int]:
+    rasterio = _require_rasterio()
+    from rasterio.merge import merge as rio_merge
+
+    owned_paths: list[str] = []
+    srcs = []
+    memfiles = []
+    merge_s = 0.0
+    temp_bytes = 0
     try:
-        mosaic, out_transform = rio_merge(srcs)
+        for source, owned in tiles:
+            t0 = time.perf_counter()
+            if owned:
+                owned_paths.append(source)
+                temp_bytes += os.path.getsize(source)
+            src, memfile = _open_tile(source)
+            srcs.append(src)
+            if memfile is not None:
+                memfiles.append(memfile)
+            merge_s += time.perf_counter() - t0
+        t0 = time.perf_counter()
+        if len(srcs) == 1 and owned_paths and bounds is None:
+            srcs[0].close()
+            srcs = []
+            _record_merge_stats(stats, "legacy", merge_s, temp_bytes)
+            return owned_paths.pop(), 1
+        mosaic, out_transform = rio_merge(srcs, bounds=bounds)
         profile = srcs[0].profile.copy()
         profile.update(
             height=mosaic.shape[1],
@@ -563,17 +978,166 @@ def _merge_tiles(tile_paths: list[str]) -> str:
         out_tmp.close()
         with rasterio.open(out_tmp.name, "w", **profile) as dst:
             dst.write(mosaic)
-        return out_tmp.name
+        merge_s += time.perf_counter() - t0
+        _record_merge_stats(stats, "legacy", merge_s, temp_bytes + os.path.getsize(out_tmp.name))
+        return out_tmp.name, len(srcs)
     finally:
         for src in srcs:
             src.close()
-        for p in tile_paths:
+        for memfile in memfiles:
+            memfile.close()
+        for p in owned_paths:
             try:
                 os.remove(p)
             except OSError:
                 pass
 
 
+def _merge_tiles_memory(tiles, bounds, stats) -> tuple[str, int]:
+    """
+    Incremental mosaic into one AOI-sized array.
+
+    The output grid is aligned to the first tile's pixel grid (no resampling for tiles
+    on the same grid); only the window of each tile that intersects the AOI is read.
+    Tiles on a different grid/CRS are reprojected into the output window.
+    """
+    import numpy as np
+
+    rasterio = _require_rasterio()
+    from rasterio.transform import Affine
+
+    min_x, min_y, max_x, max_y = bounds
+    out = None
+    filled = None
+    profile: dict = {}
+    out_transform = None
+    count = 0
+    merge_s = 0.0
+    owned_paths: list[str] = []
+    temp_bytes = 0
+    try:
+        for source, owned in tiles:
+            t0 = time.perf_counter()
+            count += 1
+            if owned:
+                owned_paths.append(source)
+                temp_bytes += os.path.getsize(source)
+            src, memfile = _open_tile(source)
+            try:
+                if out is None:
+                    res_x, res_y = src.res
+                    gt = src.transform
+                    left = gt.c + math.floor((min_x - gt.c) / res_x) * res_x
+                    top = gt.f - math.floor((gt.f - max_y) / res_y) * res_y
+                    width = max(1, math.ceil((max_x - left) / res_x))
+                    height = max(1, math.ceil((top - min_y) / res_y))
+                    out_transform = Affine(res_x, 0.0, left, 0.0, -res_y, top)
+                    nodata = src.nodata
+                    out = np.full((src.count, height, width), 0 if nodata is None else nodata, dtype=src.dtypes[0])
+                    filled = np.zeros((height, width), dtype=bool)
+                    profile = {
+                        "driver": "GTiff",
+                        "count": src.count,
+                        "dtype": src.dtypes[0],
+                        "crs": src.crs,
+                        "nodata": nodata,
+                        "width": width,
+                        "height": height,
+                        "transform": out_transform,
+                    }
+                _paste_tile(src, out, filled, out_transform, profile)
+            finally:
+                src.close()
+                if memfile is not None:
+                    memfile.close()
+            merge_s += time.perf_counter() - t0
+
+        if out is None:
+            raise WCSError("WCS lieferte keine Kacheln.")
+        t0 = time.perf_counter()
+        out_tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".tif")
+        out_tmp.close()
+        with rasterio.open(out_tmp.name, "w", **profile) as dst:
+            dst.write(out)
+        merge_s += time.perf_counter() - t0
+        _record_merge_stats(stats, "memory", merge_s, temp_bytes + os.path.getsize(out_tmp.name))
+        return out_tmp.name, count
+    finally:
+        for p in owned_paths:
+            try:
+                os.remove(p)
+            except OSError:
+                pass
+
+
+def _paste_tile(src, out, filled, out_transform, profile) -> None:
+    """Copy the AOI part of one tile into out where no earlier tile wrote (first wins)."""
+    import numpy as np
+    from rasterio.windows import Window
+
+    _, height, width = out.shape
+    same_grid = (
+        src.crs == profile["crs"]
+        and math.isclose(src.res[0], out_transform.a, rel_tol=1e-9)
+        and math.isclose(src.res[1], -out_transform.e, rel_tol=1e-9)
+    )
+    if same_grid:
+        col_f = (src.transform.c - out_transform.c) / out_transform.a
+        row_f = (out_transform.f - src.transform.f) / -out_transform.e
+        same_grid = abs(col_f - round(col_f)) < 1e-6 and abs(row_f - round(row_f)) < 1e-6
+    if not same_grid:
+        from rasterio.warp import Resampling, reproject
+
+        warped = np.zeros_like(out)
+        footprint = np.zeros(filled.shape, dtype="uint8")
+        common = {
+            "src_transform": src.transform,
+            "src_crs": src.crs,
+            "dst_transform": out_transform,
+            "dst_crs": profile["crs"],
+        }
+        reproject(
+            source=src.read(),
+            destination=warped,
+            src_nodata=src.nodata,
+            dst_nodata=src.nodata,
+            resampling=Resampling.bilinear,
+            **common,
+        )
+        reproject(
+            source=src.read_masks(1),
+            destination=footprint,
+            dst_nodata=0,
+            resampling=Resampling.nearest,
+            **common,
+        )
+        valid = ~filled & (footprint > 0)
+        np.copyto(out, warped, where=valid[None, :, :])
+        filled |= valid
+        return
+
+    c0_tile = int(round(col_f))
+    r0_tile = int(round(row_f))
+    c0 = max(0, c0_tile)
+    r0 = max(0, r0_tile)
+    c1 = min(width, c0_tile + src.width)
+    r1 = min(height, r0_tile + src.height)
+    if c1 <= c0 or r1 <= r0:
+        return
+    data = src.read(window=Window(c0 - c0_tile, r0 - r0_tile, c1 - c0, r1 - r0))
+    valid = ~filled[r0:r1, c0:c1]
+    if src.nodata is not None:
+        valid &= data[0] != src.nodata
+    np.copyto(out[:, r0:r1, c0:c1], data, where=valid[None, :, :])
+    filled[r0:r1, c0:c1] |= valid
+
+
+def _clamp_tile(tile, bounds):
+    if not bounds:
+        return tile
+    return (max(tile[0], bounds[0]), max(tile[1], bounds[1]), min(tile[2], bounds[2]), min(tile[3], bounds[3]))
+
+
 def fetch_dem_from_wcs(
     south: float,
     west: float,
@@ -581,8 +1145,13 @@ def fetch_dem_from_wcs(
     east: float,
     progress_callback=None,
     provider_key: str | None = "auto",
+    stats: dict | None = None,
 ) -> str:
-    """Download a DGM1 GeoTIFF for the given WGS84 bbox (tiling+merge for large AOIs)."""
+    """
+    Download a DGM1 GeoTIFF for the given WGS84 bbox (tiling+merge for large AOIs).
+
+    If stats is a dict it is filled with tile/cache counters for the performance report.
+    """
     def notify(msg: str):
         if progress_callback:
             progress_callback(msg)
@@ -592,51 +1161,35 @@ def fetch_dem_from_wcs(
     min_x, min_y, max_x, max_y = _validate_and_transform(south, west, north, east, provider)
 
     def fetch_via_wcs() -> str:
-        pending = list(_iter_tiles(min_x, min_y, max_x, max_y))
+        t0 = time.perf_counter()
+        pending = [_clamp_tile(t, provider.utm32_bounds) for t in _iter_tiles(min_x, min_y, max_x, max_y)]
         print(f"[WCS] [{provider.key}] AOI split into {len(pending)} tile(s)")
         notify(f"WCS: Bereich in {len(pending)} Kachel(n) aufgeteilt")
+        if stats is not None:
+            stats.update(
+                source="wcs",
+                provider=provider.key,
+                grid_m=_grid_size_for(max_x - min_x, max_y - min_y) if WCS_TILE_GRID_M > 0 else None,
+                tiles_total=len(pending),
+                cache_hits=0,
+                cache_misses=0,
+                bytes_downloaded=0,
+            )
 
-        tile_paths = []
-        processed = 0
-        while pending:
-            if processed > MAX_TILE_COUNT:
-                raise BboxTooLargeError(
-                    f"Auswahl erzeugt zu viele WCS-Kacheln ({processed}). "
-                    "Bitte Bereich verkleinern oder GeoTIFF manuell hochladen."
-                )
-
-            tx0, ty0, tx1, ty1 = pending.pop(0)
-            processed += 1
-            print(f"[WCS] Tile {processed} (queue={len(pending)})")
-            notify(f"WCS: Kachel {processed} (verbleibend: {len(pending)})")
-
-            try:
-                tile_paths.append(_fetch_single_tile(provider, tx0, ty0, tx1, ty1, notify=notify))
-            except WCSError as exc:
-                msg = str(exc)
-                dx = tx1 - tx0
-                dy = ty1 - ty0
-                can_split = dx > MIN_TILE_SIDE_M or dy > MIN_TILE_SIDE_M
-                is_param_issue = "InvalidParameterValue" in msg or "Proxy lehnt" in msg
-                if can_split and is_param_issue:
-                    print(
-                        f"[WCS] Splitting rejected tile ({dx:.0f}m x {dy:.0f}m) "
-                        f"due to proxy parameter error."
-                    )
-                    notify(
-                        f"WCS: Kachel abgelehnt, splitte weiter ({dx:.0f}m x {dy:.0f}m)"
-                    )
-                    pending = _split_tile((tx0, ty0, tx1, ty1)) + pending
-                    continue
-                raise
-
-        if len(tile_paths) == 1:
+        crop = (min_x, min_y, max_x, max_y) if WCS_TILE_GRID_M > 0 or WCS_MERGE_MODE == "memory" else None
+        merged, tile_count = _merge_tiles(
+            _iter_fetched_tiles(provider, pending, notify=notify, stats=stats),
+            bounds=crop,
+            stats=stats,
+        )
+        if stats is not None:
+            stats["fetch_ms"] = round((time.perf_counter() - t0) * 1000.0, 1)
+        if tile_count == 1:
             notify("WCS: Einzelkachel geladen")
-            return tile_paths[0]
+            return merged
 
-        merged = _merge_tiles(tile_paths)
-        print(f"[WCS] Merged {len(tile_paths)} tiles -> {merged}")
-        notify(f"WCS: {len(tile_paths)} Kacheln zusammengefuehrt")
+        print(f"[WCS] Merged {tile_count} tiles -> {merged}")
+        notify(f"WCS: {tile_count} Kacheln zusammengefuehrt")
         return merged
 
     # Sachsen-Anhalt fallback: If the official WCS GetCoverage is down, allow a local DEM.
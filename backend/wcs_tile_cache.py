@@ -0,0 +1,147 @@
+"""
+On-disk cache for WCS tiles on a snapped global grid.
+
+Tiles are keyed by provider, coverage and exact UTM extent, so overlapping or
+repeated bboxes reuse the same files. The cache keeps a byte budget and evicts
+least recently used tiles (file mtime is bumped on every hit). Tiles the WCS
+proxy rejected are recorded with an empty ".split" marker so later requests go
+straight to the cached quadrants.
+
+Configuration:
+- WCS_TILE_CACHE_DIR: cache directory (default: DEM_CACHE_DIR/wcs_tiles or backend/.wcs_tile_cache)
+- WCS_TILE_CACHE_MAX_MB: size budget in MB (0 disables the cache, default 2048)
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+WCS_TILE_CACHE_MAX_MB = float(os.getenv("WCS_TILE_CACHE_MAX_MB", "2048") or 0)
+
+
+def _default_dir() -> Path:
+    raw = os.getenv("WCS_TILE_CACHE_DIR")
+    if raw:
+        return Path(raw).expanduser()
+    dem_cache = os.getenv("DEM_CACHE_DIR")
+    if dem_cache:
+        return Path(dem_cache).expanduser() / "wcs_tiles"
+    return Path(__file__).resolve().parent / ".wcs_tile_cache"
+
+
+def tile_key(provider_key: str, coverage_id: str, min_x: float, min_y: float, max_x: float, max_y: float) -> str:
+    safe = re.sub(r"[^A-Za-z0-9_.-]+", "_", f"{provider_key}_{coverage_id}")
+    return f"{safe}/{min_x:.2f}_{min_y:.2f}_{max_x:.2f}_{max_y:.2f}.tif"
+
+
+class TileDiskCache:
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = root
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self._total_bytes: int | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _path(self, key: str) -> Path:
+        return self.root / key
+
+    def _scan_total(self) -> int:
+        total = 0
+        if self.root.exists():
+            for p in self.root.rglob("*.tif"):
+                try:
+                    total += p.stat().st_size
+                except OSError:
+                    pass
+        return total
+
+    def get(self, key: str) -> str | None:
+        if not self.enabled:
+            return None
+        p = self._path(key)
+        try:
+            now = time.time()
+            os.utime(p, (now, now))
+        except OSError:
+            return None
+        return str(p)
+
+    def is_split(self, key: str) -> bool:
+        return self.enabled and self._path(key).with_suffix(".split").exists()
+
+    def mark_split(self, key: str) -> None:
+        """Record that the tile is only served as quadrants (proxy rejects the full extent)."""
+        p = self._path(key).with_suffix(".split")
+        p.parent.mkdir(parents=True, exist_ok=True)
+        p.touch()
+
+    def _part_path(self, p: Path) -> Path:
+        return p.with_suffix(f".{os.getpid()}.{threading.get_ident()}.part")
+
+    def put_bytes(self, key: str, data: bytes) -> str:
+        """Write downloaded tile bytes into the cache and return the cached path."""
+        p = self._path(key)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self._part_path(p)
+        with open(tmp, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp, p)
+        self._account(p)
+        return str(p)
+
+    def _account(self, p: Path) -> None:
+        size = p.stat().st_size
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_total()
+            else:
+                self._total_bytes += size
+            if self._total_bytes > self.max_bytes:
+                self._evict_locked(keep=p)
+
+    def _evict_locked(self, keep: Path) -> None:
+        entries = []
+        for f in self.root.rglob("*.tif"):
+            try:
+                st = f.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, f))
+        entries.sort()
+        total = sum(e[1] for e in entries)
+        # Evict down to 90% of the budget to avoid evicting on every put.
+        target = int(self.max_bytes * 0.9)
+        removed = 0
+        for _mtime, size, f in entries:
+            if total <= target:
+                break
+            if f == keep:
+                continue
+            try:
+                f.unlink()
+                total -= size
+                removed += 1
+            except OSError:
+                pass
+        self._total_bytes = total
+        if removed:
+            print(f"[WCS] Tile cache: evicted {removed} tile(s), {total / 1e6:.0f} MB in use")
+
+
+_CACHE_LOCK = threading.Lock()
+_CACHE: TileDiskCache | None = None
+
+
+def get_tile_cache() -> TileDiskCache:
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = TileDiskCache(_default_dir(), int(WCS_TILE_CACHE_MAX_MB * 1024 * 1024))
+        return _CACHE
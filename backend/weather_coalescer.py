@@ -0,0 +1,113 @@
+"""
+Coalescing of concurrent multi-location weather requests.
+
+Requests for the same time window and host that arrive within
+WEATHER_COALESCE_WINDOW_MS are merged into one upstream call. The first caller
+(leader) waits for the window, sends the union of all locations (deduplicated; the
+store passes weather-cell centers, so points of one cell collapse), and every
+caller gets its own rows back in request order. A batch is closed early when
+adding locations would exceed the provider limit (WEATHER_STORE_MAX_LOCATIONS).
+
+Configuration:
+- WEATHER_COALESCE_WINDOW_MS: collection window in ms (default 50, 0 disables coalescing)
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Any, Callable
+
+from weather_series import HourlySeries
+from weather_store import WEATHER_STORE_MAX_LOCATIONS
+
+WEATHER_COALESCE_WINDOW_MS = float(os.getenv("WEATHER_COALESCE_WINDOW_MS", "50") or 0)
+
+
+class _Batch:
+    def __init__(self):
+        self.points: list[tuple[float, float]] = []
+        self.index: dict[tuple[float, float], int] = {}
+        self.done = threading.Event()
+        self.result: list[dict] | None = None
+        self.error: Exception | None = None
+        self.callers = 0
+
+    def add(self, points: list[tuple[float, float]]) -> list[int]:
+        idx = []
+        for lat, lon in points:
+            key = (round(float(lat), 6), round(float(lon), 6))
+            pos = self.index.get(key)
+            if pos is None:
+                pos = len(self.points)
+                self.index[key] = pos
+                self.points.append(key)
+            idx.append(pos)
+        self.callers += 1
+        return idx
+
+    def would_have(self, points: list[tuple[float, float]]) -> int:
+        new = {(round(float(lat), 6), round(float(lon), 6)) for lat, lon in points} - self.index.keys()
+        return len(self.points) + len(new)
+
+
+class RequestCoalescer:
+    def __init__(
+        self,
+        fetch_fn: Callable[..., list[dict]],
+        window_ms: float = WEATHER_COALESCE_WINDOW_MS,
+        max_locations: int = WEATHER_STORE_MAX_LOCATIONS,
+    ):
+        self.fetch_fn = fetch_fn
+        self.window_s = max(0.0, float(window_ms)) / 1000.0
+        self.max_locations = max(1, int(max_locations))
+        self._lock = threading.Lock()
+        self._open: dict[tuple, _Batch] = {}
+        self._stats = {"requests": 0, "locations_requested": 0, "upstream_calls": 0, "upstream_locations": 0}
+
+    def fetch(self, points: list[tuple[float, float]], start_iso: str, end_iso: str, *, live: bool) -> list[dict]:
+        """Same contract as fetch_fn(points, start_iso, end_iso, live=...), one row per point."""
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["locations_requested"] += len(points)
+        if self.window_s <= 0 or len(points) >= self.max_locations:
+            return self._call(points, start_iso, end_iso, live)
+
+        key = (start_iso, end_iso, live)
+        with self._lock:
+            batch = self._open.get(key)
+            leader = batch is None or batch.would_have(points) > self.max_locations
+            if leader:
+                batch = _Batch()
+                self._open[key] = batch
+            idx = batch.add(points)
+
+        if leader:
+            time.sleep(self.window_s)
+            with self._lock:
+                if self._open.get(key) is batch:
+                    del self._open[key]
+            try:
+                batch.result = self._call(batch.points, start_iso, end_iso, live)
+            except Exception as exc:
+                batch.error = exc
+            finally:
+                batch.done.set()
+        else:
+            batch.done.wait()
+
+        if batch.error is not None:
+            raise batch.error
+        rows = batch.result or []
+        return [rows[i] if i < len(rows) else {"series": HourlySeries.empty()} for i in idx]
+
+    def _call(self, points, start_iso: str, end_iso: str, live: bool) -> list[dict]:
+        with self._lock:
+            self._stats["upstream_calls"] += 1
+            self._stats["upstream_locations"] += len(points)
+        return self.fetch_fn(list(points), start_iso, end_iso, live=live)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {"window_ms": self.window_s * 1000.0, "max_locations": self.max_locations, **self._stats}
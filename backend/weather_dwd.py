@@ -8,6 +8,12 @@ MVP goal:
 Notes:
   - We use the "historical" station zips. For many stations these are updated up to today.
   - Parsing is intentionally lightweight (no pandas dependency).
+  - Station lookups use an in-process index (KD-tree on unit-sphere coordinates)
+    built once per station file; DWD_STATION_INDEX_CHECK_S sets how often the
+    file is checked for changes (default 10 s).
+  - Station products are parsed once (vectorized) into a dense hourly float32
+    series (<zip stem>.npz in WEATHER_CACHE_DIR); requests slice that by hour.
+    The ZIP is deleted after conversion unless DWD_KEEP_ZIPS=1.
 """
 
 from __future__ import annotations
@@ -18,11 +24,20 @@ import math
 import os
 import re
 import threading
+import time
 import zipfile
 from dataclasses import dataclass
 from typing import Iterable
 
-import requests
+import numpy as np
+
+import weather_http
+from weather_series import HourlySeries
+
+try:
+    from scipy.spatial import cKDTree
+except Exception:
+    cKDTree = None
 
 
 DWD_CDC_BASE = "https://opendata.dwd.de/climate_environment/CDC/observations_germany/climate/hourly/precipitation"
@@ -58,18 +73,6 @@ def _cache_path(name: str) -> str:
     return os.path.join(_cache_dir(), name)
 
 
-def _haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    r = 6371.0
-    p = math.pi / 180.0
-    dlat = (lat2 - lat1) * p
-    dlon = (lon2 - lon1) * p
-    a = (
-        math.sin(dlat / 2) ** 2
-        + math.cos(lat1 * p) * math.cos(lat2 * p) * math.sin(dlon / 2) ** 2
-    )
-    return 2 * r * math.asin(math.sqrt(a))
-
-
 def _parse_station_list(text: str) -> list[DwdStation]:
     lines = [ln.rstrip("\n") for ln in text.splitlines() if ln.strip()]
     out: list[DwdStation] = []
@@ -140,9 +143,7 @@ def _download_text_cached(
             return raw.decode("latin-1", errors="replace")
 
         try:
-            resp = requests.get(url, timeout=timeout_s)
-            resp.raise_for_status()
-            raw = resp.content
+            raw = weather_http.request("dwd", "GET", url, timeout_s=timeout_s, expect="bytes")
             with open(path, "wb") as f:
                 f.write(raw)
             return raw.decode("latin-1", errors="replace")
@@ -155,217 +156,413 @@ def _download_text_cached(
             raise
 
 
-def list_stations() -> list[DwdStation]:
-    text = _download_text_cached(
-        STATION_LIST_URL,
-        "RR_Stundenwerte_Beschreibung_Stationen.txt",
-        max_age_s=STATION_LIST_MAX_AGE_S,
-    )
-    return _parse_station_list(text)
+STATION_LIST_NAME = "RR_Stundenwerte_Beschreibung_Stationen.txt"
+# The station file is stat()ed at most this often to notice replacements on disk.
+STATION_INDEX_CHECK_S = float(os.getenv("DWD_STATION_INDEX_CHECK_S", "10") or 10)
+_EARTH_R_KM = 6371.0
 
 
-def _covers_range(st: DwdStation, start: _dt.date, end: _dt.date) -> bool:
+def _date_int(yyyymmdd: str, invalid: int) -> int:
     try:
-        s0 = _dt.datetime.strptime(st.from_date, "%Y%m%d").date()
-        s1 = _dt.datetime.strptime(st.to_date, "%Y%m%d").date()
+        return int(_dt.datetime.strptime(yyyymmdd, "%Y%m%d").strftime("%Y%m%d"))
     except Exception:
-        return False
-    # Station files include hours; treat range as inclusive by day.
-    return s0 <= start and s1 >= end
+        return invalid
+
+
+def _unit_xyz(lat, lon) -> np.ndarray:
+    la = np.radians(np.asarray(lat, dtype=np.float64))
+    lo = np.radians(np.asarray(lon, dtype=np.float64))
+    return np.stack([np.cos(la) * np.cos(lo), np.cos(la) * np.sin(lo), np.sin(la)], axis=-1)
+
+
+def _chord_to_km(chord):
+    return 2.0 * _EARTH_R_KM * np.arcsin(np.clip(np.asarray(chord) / 2.0, 0.0, 1.0))
+
+
+def _point_xyz(lat: float, lon: float) -> tuple[float, float, float]:
+    la, lo = math.radians(float(lat)), math.radians(float(lon))
+    return (math.cos(la) * math.cos(lo), math.cos(la) * math.sin(lo), math.sin(la))
+
+
+def _km_to_chord(km: float) -> float:
+    return float(2.0 * math.sin(min(math.pi / 2.0, max(0.0, km) / (2.0 * _EARTH_R_KM))))
+
+
+class StationIndex:
+    """
+    Nearest-station queries on unit-sphere coordinates.
+
+    Chord distance on the unit sphere is monotonic in great-circle distance, so a
+    Euclidean KD-tree (scipy cKDTree) gives exact nearest neighbours. Without scipy
+    the same queries run as a vectorized scan (a few thousand stations).
+    """
+
+    def __init__(self, stations: list[DwdStation], signature: tuple | None = None):
+        self.stations = stations
+        self.signature = signature
+        self.loaded_at = time.time()
+        self.checked_at = self.loaded_at
+        n = len(stations)
+        self._xyz = _unit_xyz([st.lat for st in stations], [st.lon for st in stations]).reshape(n, 3)
+        # Stations with unparsable dates never count as covering a period (as before).
+        self._from = np.array([_date_int(st.from_date, 99999999) for st in stations], dtype=np.int64)
+        self._to = np.array([_date_int(st.to_date, 0) for st in stations], dtype=np.int64)
+        self._state = np.array([st.state for st in stations], dtype=object)
+        self._tree = cKDTree(self._xyz) if (cKDTree is not None and n) else None
+
+    def __len__(self) -> int:
+        return len(self.stations)
+
+    def _mask(self, idx: np.ndarray, start: _dt.date | None, end: _dt.date | None, state: str | None) -> np.ndarray:
+        keep = np.ones(idx.shape, dtype=bool)
+        if start is not None and end is not None:
+            s_int = start.year * 10000 + start.month * 100 + start.day
+            e_int = end.year * 10000 + end.month * 100 + end.day
+            keep &= (self._from[idx] <= s_int) & (self._to[idx] >= e_int)
+        if state:
+            keep &= self._state[idx] == state
+        return keep
+
+    def nearest(
+        self,
+        lat: float,
+        lon: float,
+        k: int = 1,
+        *,
+        start: _dt.date | None = None,
+        end: _dt.date | None = None,
+        state: str | None = None,
+        max_km: float | None = None,
+    ) -> list[tuple[DwdStation, float]]:
+        """k nearest stations (optionally covering start..end, in state, within max_km), nearest first."""
+        n = len(self.stations)
+        if n == 0 or k <= 0:
+            return []
+        q = _point_xyz(lat, lon)
+        bound = _km_to_chord(max_km) if max_km is not None else np.inf
+        if self._tree is None:
+            chord = np.linalg.norm(self._xyz - q, axis=1)
+            idx = np.argsort(chord, kind="stable")
+            chord = chord[idx]
+        else:
+            # Query a few more than k and widen until enough stations pass the filters.
+            m = min(n, max(k, 8))
+            while True:
+                chord, idx = self._tree.query(q, k=m, distance_upper_bound=bound)
+                chord, idx = np.atleast_1d(chord), np.atleast_1d(idx)
+                valid = idx < n
+                chord, idx = chord[valid], idx[valid]
+                if m >= n or len(idx) < m or int(self._mask(idx, start, end, state).sum()) >= k:
+                    break
+                m = min(n, m * 4)
+        keep = self._mask(idx, start, end, state) & (chord <= bound)
+        idx, chord = idx[keep][:k], chord[keep][:k]
+        return [(self.stations[int(i)], float(d)) for i, d in zip(idx, _chord_to_km(chord))]
+
+    def within(
+        self,
+        lat: float,
+        lon: float,
+        radius_km: float,
+        *,
+        start: _dt.date | None = None,
+        end: _dt.date | None = None,
+        state: str | None = None,
+    ) -> list[tuple[DwdStation, float]]:
+        """All stations within radius_km (optionally filtered), nearest first."""
+        if not self.stations:
+            return []
+        q = _point_xyz(lat, lon)
+        bound = _km_to_chord(radius_km)
+        if self._tree is None:
+            idx = np.flatnonzero(np.linalg.norm(self._xyz - q, axis=1) <= bound)
+        else:
+            idx = np.asarray(self._tree.query_ball_point(q, bound), dtype=np.int64)
+        idx = idx[self._mask(idx, start, end, state)]
+        chord = np.linalg.norm(self._xyz[idx] - q, axis=1)
+        order = np.argsort(chord, kind="stable")
+        return [(self.stations[int(idx[i])], float(d)) for i, d in zip(order, _chord_to_km(chord[order]))]
+
+
+_INDEX: StationIndex | None = None
+_INDEX_LOCK = threading.Lock()
+
+
+def _file_signature(path: str) -> tuple | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def station_index() -> StationIndex:
+    """
+    Process-wide station index, built once from the cached station list.
+
+    Rebuilt when the station file changes on disk (checked every
+    STATION_INDEX_CHECK_S) or after STATION_LIST_MAX_AGE_S, when the list is
+    downloaded again.
+    """
+    global _INDEX
+    idx = _INDEX
+    now = time.time()
+    if idx is not None and now - idx.checked_at < STATION_INDEX_CHECK_S and now - idx.loaded_at < STATION_LIST_MAX_AGE_S:
+        return idx
+    with _INDEX_LOCK:
+        idx = _INDEX
+        path = _cache_path(STATION_LIST_NAME)
+        if idx is not None and now - idx.loaded_at < STATION_LIST_MAX_AGE_S:
+            if _file_signature(path) == idx.signature:
+                idx.checked_at = now
+                return idx
+        text = _download_text_cached(STATION_LIST_URL, STATION_LIST_NAME, max_age_s=STATION_LIST_MAX_AGE_S)
+        sig = _file_signature(path)
+        if idx is not None and sig is not None and sig == idx.signature:
+            idx.loaded_at = idx.checked_at = now
+            return idx
+        _INDEX = StationIndex(_parse_station_list(text), sig)
+        return _INDEX
+
+
+def list_stations() -> list[DwdStation]:
+    return station_index().stations
+
+
+def find_nearest_stations(
+    lat: float,
+    lon: float,
+    k: int = 5,
+    start: _dt.date | None = None,
+    end: _dt.date | None = None,
+    *,
+    state: str | None = None,
+    max_km: float | None = None,
+) -> list[tuple[DwdStation, float]]:
+    """k nearest stations with data for start..end (if given), nearest first."""
+    return station_index().nearest(lat, lon, k, start=start, end=end, state=state, max_km=max_km)
+
+
+def find_stations_within(
+    lat: float,
+    lon: float,
+    radius_km: float,
+    start: _dt.date | None = None,
+    end: _dt.date | None = None,
+    *,
+    state: str | None = None,
+) -> list[tuple[DwdStation, float]]:
+    """Stations within radius_km with data for start..end (if given), nearest first."""
+    return station_index().within(lat, lon, radius_km, start=start, end=end, state=state)
 
 
 def find_nearest_station(
     lat: float, lon: float, start: _dt.date, end: _dt.date, preferred_state: str | None = None
 ) -> tuple[DwdStation, float]:
-    stations = list_stations()
-    candidates: list[tuple[float, DwdStation]] = []
-    for st in stations:
-        if not _covers_range(st, start, end):
-            continue
-        if preferred_state and st.state != preferred_state:
-            continue
-        d = _haversine_km(lat, lon, st.lat, st.lon)
-        candidates.append((d, st))
-    if not candidates and preferred_state:
-        # fallback: ignore preferred state
-        for st in stations:
-            if not _covers_range(st, start, end):
-                continue
-            d = _haversine_km(lat, lon, st.lat, st.lon)
-            candidates.append((d, st))
-    if not candidates:
-        # Robust fallback: use nearest station even if listed coverage doesn't fully include the window.
-        # This avoids false negatives when station list metadata is stale but ZIP already has newer values.
-        for st in stations:
-            if preferred_state and st.state != preferred_state:
-                continue
-            d = _haversine_km(lat, lon, st.lat, st.lon)
-            candidates.append((d, st))
-        if not candidates and preferred_state:
-            for st in stations:
-                d = _haversine_km(lat, lon, st.lat, st.lon)
-                candidates.append((d, st))
-    if not candidates:
-        raise RuntimeError("Keine DWD-Station gefunden.")
-    candidates.sort(key=lambda x: x[0])
-    return candidates[0][1], float(candidates[0][0])
-
-
-def _download_zip_cached(url: str, cache_name: str, timeout_s: int = 180) -> bytes:
+    index = station_index()
+    # Same preference order as before: covering + state, covering, then (stale list
+    # metadata) any station in the state, any station at all.
+    attempts = [(start, end, preferred_state)]
+    if preferred_state:
+        attempts.append((start, end, None))
+    attempts.append((None, None, preferred_state))
+    if preferred_state:
+        attempts.append((None, None, None))
+    for s, e, state in attempts:
+        hit = index.nearest(lat, lon, 1, start=s, end=e, state=state)
+        if hit:
+            return hit[0]
+    raise RuntimeError("Keine DWD-Station gefunden.")
+
+
+def _station_cache_stem(station: DwdStation) -> str:
+    return f"stundenwerte_RR_{station.station_id}_{station.from_date}_{station.to_date}_hist"
+
+
+def _download_zip_cached(url: str, cache_name: str, timeout_s: int = 180) -> str:
+    """Download the station ZIP into the weather cache (once) and return its path."""
     os.makedirs(_cache_dir(), exist_ok=True)
     path = _cache_path(cache_name)
     if os.path.exists(path):
-        with open(path, "rb") as f:
-            return f.read()
-
+        return path
     with _FETCH_LOCK:
-        if os.path.exists(path):
-            with open(path, "rb") as f:
-                return f.read()
-        with requests.get(url, stream=True, timeout=timeout_s) as resp:
-            resp.raise_for_status()
-            buf = io.BytesIO()
-            for chunk in resp.iter_content(chunk_size=1024 * 256):
-                if chunk:
-                    buf.write(chunk)
-            raw = buf.getvalue()
-        with open(path, "wb") as f:
-            f.write(raw)
-        return raw
-
-
-def _iter_hourly_rr_mm(zf: zipfile.ZipFile, station_id: str) -> Iterable[tuple[_dt.datetime, float]]:
+        if not os.path.exists(path):
+            weather_http.download("dwd", url, path, timeout_s=timeout_s)
+    return path
+
+
+def _find_product(zf: zipfile.ZipFile, station_id: str) -> str:
     # Example file: produkt_rr_stunde_19950901_20110401_00003.txt
-    product = None
-    for name in zf.namelist():
-        low = name.lower()
-        if low.endswith(".txt") and "produkt_rr_stunde" in low and station_id in name:
-            product = name
-            break
-    if not product:
+    names = [n for n in zf.namelist() if n.lower().endswith(".txt") and "produkt_rr_stunde" in n.lower()]
+    for name in names:
+        if station_id in name:
+            return name
+    if names:
         # fallback: first product_rr_stunde file
-        for name in zf.namelist():
-            low = name.lower()
-            if low.endswith(".txt") and "produkt_rr_stunde" in low:
-                product = name
-                break
-    if not product:
-        raise RuntimeError("DWD ZIP: produkt_rr_stunde Datei nicht gefunden.")
-
-    raw = zf.read(product)
-    text = raw.decode("latin-1", errors="replace")
+        return names[0]
+    raise RuntimeError("DWD ZIP: produkt_rr_stunde Datei nicht gefunden.")
+
+
+def _iter_hourly_rr_mm(text: str) -> Iterable[tuple[int, float]]:
+    """Line parser (fallback for malformed products): yields (MESS_DATUM as YYYYMMDDHH, R1)."""
     for ln in text.splitlines():
         ln = ln.strip()
-        if not ln:
-            continue
-        if ln.startswith("STATIONS_ID;"):
+        if not ln or ln.startswith("STATIONS_ID;"):
             continue
         # Format: STATIONS_ID;MESS_DATUM;QN_8;R1;RS_IND;WRTR;eor
         parts = [p.strip() for p in ln.split(";")]
         if len(parts) < 4:
             continue
         try:
-            ts = _dt.datetime.strptime(parts[1], "%Y%m%d%H")
-            r1 = float(parts[3])
-            if r1 <= -900:
-                continue
-            yield ts, r1
+            _dt.datetime.strptime(parts[1], "%Y%m%d%H")
+            yield int(parts[1]), float(parts[3])
         except Exception:
             continue
 
 
-def _rolling_max(values: list[float], window: int) -> float | None:
-    if not values or window <= 0 or len(values) < window:
+def _parse_rr_product(text: str) -> tuple[int, np.ndarray]:
+    """
+    Parse a produkt_rr_stunde text into a dense hourly series.
+
+    Returns (first hour since epoch, float32 mm per hour with NaN for missing hours).
+    """
+    try:
+        cols = np.loadtxt(io.StringIO(text), delimiter=";", skiprows=1, usecols=(1, 3), dtype=np.float64, ndmin=2)
+        stamp = cols[:, 0].astype(np.int64)
+        rr = cols[:, 1]
+    except ValueError:
+        rows = list(_iter_hourly_rr_mm(text))
+        stamp = np.array([r[0] for r in rows], dtype=np.int64)
+        rr = np.array([r[1] for r in rows], dtype=np.float64)
+    keep = rr > -900
+    stamp, rr = stamp[keep], rr[keep]
+    if stamp.size == 0:
+        return 0, np.zeros(0, dtype=np.float32)
+
+    year, rest = np.divmod(stamp, 1_000_000)
+    month, rest = np.divmod(rest, 10_000)
+    day, hour = np.divmod(rest, 100)
+    days = (
+        (year - 1970).astype("datetime64[Y]").astype("datetime64[M]")
+        + (month - 1).astype("timedelta64[M]")
+    ).astype("datetime64[D]") + (day - 1).astype("timedelta64[D]")
+    hours = days.astype(np.int64) * 24 + hour
+
+    t0 = int(hours.min())
+    dense = np.full(int(hours.max()) - t0 + 1, np.nan, dtype=np.float32)
+    # Later lines win on duplicate timestamps.
+    dense[hours - t0] = rr.astype(np.float32)
+    return t0, dense
+
+
+# Parsed series of recently used stations: stem -> (t0 hour, values).
+_SERIES_MEMO: dict[str, tuple[int, np.ndarray]] = {}
+_SERIES_MEMO_MAX = int(os.getenv("DWD_SERIES_MEMO_MAX", "64") or 64)
+_SERIES_LOCK = threading.Lock()
+
+
+def load_station_series(station: DwdStation) -> tuple[int, np.ndarray]:
+    """
+    Dense hourly series (t0 hour since epoch UTC, float32 mm, NaN = missing) of a station.
+
+    The station ZIP is downloaded and parsed once into <stem>.npz in the weather
+    cache; the ZIP is removed afterwards unless DWD_KEEP_ZIPS=1. Later calls load
+    the .npz (or reuse the in-process copy) and never touch the ZIP again.
+    """
+    stem = _station_cache_stem(station)
+    memo = _SERIES_MEMO.get(stem)
+    if memo is not None:
+        return memo
+    npz_path = _cache_path(f"{stem}.npz")
+    if not os.path.exists(npz_path):
+        zip_path = _download_zip_cached(station.zip_url, f"{stem}.zip")
+        with _FETCH_LOCK:
+            if not os.path.exists(npz_path):
+                with zipfile.ZipFile(zip_path) as zf:
+                    text = zf.read(_find_product(zf, station.station_id)).decode("latin-1", errors="replace")
+                t0, vals = _parse_rr_product(text)
+                tmp = f"{npz_path}.tmp.npz"
+                np.savez(tmp, t0=np.int64(t0), rr=vals)
+                os.replace(tmp, npz_path)
+                if os.getenv("DWD_KEEP_ZIPS", "0").strip().lower() not in ("1", "true", "yes"):
+                    try:
+                        os.remove(zip_path)
+                    except OSError:
+                        pass
+    with np.load(npz_path) as data:
+        series = (int(data["t0"]), data["rr"])
+    with _SERIES_LOCK:
+        _SERIES_MEMO[stem] = series
+        while len(_SERIES_MEMO) > max(1, _SERIES_MEMO_MAX):
+            _SERIES_MEMO.pop(next(iter(_SERIES_MEMO)))
+    return series
+
+
+def _slice_hours(station: DwdStation, h0: int, h1: int) -> tuple[int, np.ndarray]:
+    """Values for hours h0..h1 (clipped to the station's range) and the first hour of the slice."""
+    t0, vals = load_station_series(station)
+    a = max(h0, t0)
+    b = min(h1, t0 + len(vals) - 1)
+    if b < a:
+        return a, vals[:0]
+    return a, vals[a - t0 : b - t0 + 1]
+
+
+def _hour_of(day: _dt.date, hour: int) -> int:
+    return int(_dt.datetime.combine(day, _dt.time(hour), tzinfo=_dt.timezone.utc).timestamp() // 3600)
+
+
+def _rolling_max(vals: np.ndarray, window: int) -> float | None:
+    """Max sum over `window` consecutive hours; missing hours (NaN) break windows."""
+    n = len(vals)
+    if window <= 0 or n < window:
+        return None
+    finite = np.isfinite(vals)
+    csum = np.concatenate(([0.0], np.cumsum(np.where(finite, vals, 0.0), dtype=np.float64)))
+    cvalid = np.concatenate(([0], np.cumsum(finite, dtype=np.int64)))
+    sums = csum[window:] - csum[:-window]
+    full = (cvalid[window:] - cvalid[:-window]) == window
+    if not full.any():
         return None
-    s = sum(values[:window])
-    best = s
-    for i in range(window, len(values)):
-        s += values[i] - values[i - window]
-        if s > best:
-            best = s
-    return float(best)
+    return float(sums[full].max())
 
 
 def compute_precip_metrics(
     station: DwdStation, start: _dt.date, end: _dt.date
 ) -> dict:
-    zip_bytes = _download_zip_cached(
-        station.zip_url,
-        f"stundenwerte_RR_{station.station_id}_{station.from_date}_{station.to_date}_hist.zip",
-    )
-    zf = zipfile.ZipFile(io.BytesIO(zip_bytes))
-
-    start_dt = _dt.datetime.combine(start, _dt.time(0, 0, 0))
-    end_dt = _dt.datetime.combine(end, _dt.time(23, 0, 0))
-
-    rows: list[tuple[_dt.datetime, float]] = []
-    for ts, rr in _iter_hourly_rr_mm(zf, station.station_id):
-        if ts < start_dt or ts > end_dt:
-            continue
-        rows.append((ts, rr))
-    rows.sort(key=lambda x: x[0])
-
-    if not rows:
+    h0 = _hour_of(start, 0)
+    h1 = _hour_of(end, 23)
+    first, window = _slice_hours(station, h0, h1)
+    vals = window.astype(np.float64)
+    idx = np.flatnonzero(np.isfinite(vals))
+    if idx.size == 0:
         raise RuntimeError("Keine Niederschlagsdaten im Zeitraum gefunden.")
-
-    # Build dense hourly series where possible; gaps break rolling windows.
-    values_dense: list[float] = []
-    times_dense: list[_dt.datetime] = []
-    last_ts = None
-    for ts, rr in rows:
-        if last_ts is not None:
-            delta_h = int((ts - last_ts).total_seconds() // 3600)
-            if delta_h != 1:
-                # gap: stop dense accumulation here
-                values_dense.append(math.nan)
-                times_dense.append(ts)
-        values_dense.append(rr)
-        times_dense.append(ts)
-        last_ts = ts
-
-    # For rolling windows, split into contiguous blocks (no NaNs)
-    blocks: list[list[float]] = []
-    cur: list[float] = []
-    for v in values_dense:
-        if not math.isfinite(v):
-            if cur:
-                blocks.append(cur)
-                cur = []
-            continue
-        cur.append(v)
-    if cur:
-        blocks.append(cur)
-
-    max_1h = max(rr for _, rr in rows)
-    max_6h = None
-    max_24h = None
-    for b in blocks:
-        r6 = _rolling_max(b, 6)
-        r24 = _rolling_max(b, 24)
-        if r6 is not None:
-            max_6h = r6 if max_6h is None else max(max_6h, r6)
-        if r24 is not None:
-            max_24h = r24 if max_24h is None else max(max_24h, r24)
-
-    total_mm = float(sum(rr for _, rr in rows))
-    count_hours = len(rows)
-    count_ge_10 = sum(1 for _, rr in rows if rr >= 10.0)
-    count_ge_25 = sum(1 for _, rr in rows if rr >= 25.0)
-    count_ge_40 = sum(1 for _, rr in rows if rr >= 40.0)
-
-    top_events = sorted(rows, key=lambda x: x[1], reverse=True)[:8]
-    top = [{"ts": ts.isoformat(timespec="minutes"), "mm_1h": float(mm)} for ts, mm in top_events]
+    rr = np.round(vals[idx], 3)
+
+    max_6h = _rolling_max(vals, 6)
+    max_24h = _rolling_max(vals, 24)
+
+    order = np.argsort(-rr, kind="stable")[:8]
+    top = [
+        {
+            "ts": _dt.datetime.fromtimestamp((first + int(idx[i])) * 3600, tz=_dt.timezone.utc)
+            .replace(tzinfo=None)
+            .isoformat(timespec="minutes"),
+            "mm_1h": float(rr[i]),
+        }
+        for i in order
+    ]
 
     return {
         "range": {"start": start.isoformat(), "end": end.isoformat()},
-        "count_hours": int(count_hours),
-        "total_mm": round(total_mm, 2),
-        "max_1h_mm": round(float(max_1h), 2),
+        "count_hours": int(rr.size),
+        "total_mm": round(float(rr.sum()), 2),
+        "max_1h_mm": round(float(rr.max()), 2),
         "max_6h_mm": None if max_6h is None else round(float(max_6h), 2),
         "max_24h_mm": None if max_24h is None else round(float(max_24h), 2),
-        "count_hours_ge_10mm": int(count_ge_10),
-        "count_hours_ge_25mm": int(count_ge_25),
-        "count_hours_ge_40mm": int(count_ge_40),
+        "count_hours_ge_10mm": int((rr >= 10.0).sum()),
+        "count_hours_ge_25mm": int((rr >= 25.0).sum()),
+        "count_hours_ge_40mm": int((rr >= 40.0).sum()),
         "top_hours": top,
     }
 
@@ -380,28 +577,16 @@ def load_hourly_series(
     station: DwdStation,
     start_iso_utc: str,
     end_iso_utc: str,
-) -> list[dict]:
-    """
-    Return a compact hourly precipitation series for a station in [start,end] (UTC).
-
-    Output: [{"t": "...Z", "precip_mm": float}, ...]
-    """
+) -> HourlySeries:
+    """Hourly precipitation series of a station in [start,end] (UTC)."""
     try:
         start_dt = _dt.datetime.fromisoformat(start_iso_utc.replace("Z", "+00:00")).astimezone(_dt.timezone.utc)
         end_dt = _dt.datetime.fromisoformat(end_iso_utc.replace("Z", "+00:00")).astimezone(_dt.timezone.utc)
     except Exception as exc:
         raise RuntimeError(f"Ungueltiges Zeitfenster: {exc}")
 
-    zip_bytes = _download_zip_cached(
-        station.zip_url,
-        f"stundenwerte_RR_{station.station_id}_{station.from_date}_{station.to_date}_hist.zip",
-    )
-    zf = zipfile.ZipFile(io.BytesIO(zip_bytes))
-
-    out: list[dict] = []
-    for ts, rr in _iter_hourly_rr_mm(zf, station.station_id):
-        ts_utc = ts.replace(tzinfo=_dt.timezone.utc)
-        if ts_utc < start_dt or ts_utc > end_dt:
-            continue
-        out.append({"t": ts_utc.isoformat().replace("+00:00", "Z"), "precip_mm": float(rr)})
-    return out
+    # Hours inside [start, end]; the station series is indexed by whole UTC hours.
+    h0 = -(-int(math.ceil(start_dt.timestamp())) // 3600)
+    h1 = int(end_dt.timestamp() // 3600)
+    first, window = _slice_hours(station, h0, h1)
+    return HourlySeries.from_dense(first, window)
@@ -0,0 +1,406 @@
+"""
+Shared async HTTP client for weather providers.
+
+All weather traffic (Open-Meteo, ICON-D2 proxy, DWD CDC, RADOLAN, radar connector
+and the batch scripts' calls into this API) goes through one process-wide event
+loop thread with an httpx.AsyncClient. Each provider has a token bucket (rate and
+burst) and a cap on in-flight requests, so concurrent API requests and batch
+threads share one budget instead of throttling separately.
+
+429/5xx responses and transport errors are retried with exponential backoff; a
+Retry-After header (seconds or HTTP date) takes precedence and also pauses the
+provider's bucket, so all other callers wait as well.
+
+Threads use request()/get_json()/download()/gather(); coroutines on another event
+loop await CLIENT.arequest_threadsafe().
+Without httpx installed, requests run via `requests` in the loop's thread pool
+(same limiter, same retry rules).
+
+Configuration:
+- WEATHER_HTTP_LIMITS: per provider "name=rate:burst:concurrency", comma separated
+  (default "open-meteo=5:10:4,icon2d-proxy=10:20:8,dwd=5:10:4,radar=5:10:4,hydro-api=5:5:4")
+- WEATHER_HTTP_DEFAULT_LIMIT: limit for other providers (default "10:20:4"; rate 0 = unlimited)
+- WEATHER_HTTP_MAX_RETRIES: attempts incl. the first one (default 5)
+- WEATHER_HTTP_BACKOFF_BASE_S / WEATHER_HTTP_BACKOFF_CAP_S: backoff (default 1.0 / 20.0)
+- WEATHER_HTTP_RETRY_AFTER_MAX_S: upper bound for honoured Retry-After (default 120)
+- WEATHER_HTTP_USER_AGENT: User-Agent header (default ICON2D_USER_AGENT or hydrowatch-berlin/1.0)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import email.utils
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Iterable
+
+try:
+    import httpx
+except Exception:  # pragma: no cover - optional dependency
+    httpx = None  # type: ignore
+
+import requests
+
+DEFAULT_LIMITS = "open-meteo=5:10:4,icon2d-proxy=10:20:8,dwd=5:10:4,radar=5:10:4,hydro-api=5:5:4"
+WEATHER_HTTP_MAX_RETRIES = int(os.getenv("WEATHER_HTTP_MAX_RETRIES", "5") or 5)
+WEATHER_HTTP_BACKOFF_BASE_S = float(os.getenv("WEATHER_HTTP_BACKOFF_BASE_S", "1.0") or 1.0)
+WEATHER_HTTP_BACKOFF_CAP_S = float(os.getenv("WEATHER_HTTP_BACKOFF_CAP_S", "20.0") or 20.0)
+WEATHER_HTTP_RETRY_AFTER_MAX_S = float(os.getenv("WEATHER_HTTP_RETRY_AFTER_MAX_S", "120") or 120)
+WEATHER_HTTP_USER_AGENT = (
+    os.getenv("WEATHER_HTTP_USER_AGENT") or os.getenv("ICON2D_USER_AGENT") or "hydrowatch-berlin/1.0"
+).strip()
+
+_RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class WeatherHttpError(RuntimeError):
+    def __init__(self, message: str, status: int | None = None, retry_after_s: float | None = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after_s = retry_after_s
+
+
+def _parse_limit(raw: str) -> tuple[float, float, int]:
+    parts = [p.strip() for p in raw.split(":")]
+    rate = float(parts[0]) if parts and parts[0] else 0.0
+    burst = float(parts[1]) if len(parts) > 1 and parts[1] else max(1.0, rate)
+    conc = int(parts[2]) if len(parts) > 2 and parts[2] else 4
+    return max(0.0, rate), max(1.0, burst), max(1, conc)
+
+
+def _parse_limits(raw: str) -> dict[str, tuple[float, float, int]]:
+    out = {}
+    for item in (raw or "").split(","):
+        if "=" not in item:
+            continue
+        name, spec = item.split("=", 1)
+        try:
+            out[name.strip().lower()] = _parse_limit(spec)
+        except ValueError:
+            print(f"[WEATHER-HTTP] Ungueltiges Limit ignoriert: {item.strip()}")
+    return out
+
+
+def _parse_retry_after(value: str | None) -> float | None:
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            when = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if when is None:
+            return None
+        seconds = when.timestamp() - time.time()
+    return min(max(0.0, seconds), WEATHER_HTTP_RETRY_AFTER_MAX_S)
+
+
+def _backoff_s(attempt: int, base_s: float, cap_s: float) -> float:
+    base = max(0.1, float(base_s))
+    cap = max(base, float(cap_s))
+    delay = min(cap, base * (2 ** max(0, attempt - 1)))
+    return min(cap, delay + random.uniform(0.0, max(0.05, delay * 0.25)))
+
+
+class _TokenBucket:
+    """Token bucket; only used from the client loop thread."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    async def acquire(self) -> float:
+        waited = 0.0
+        while True:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                delay = self.blocked_until - now
+            elif self.rate <= 0:
+                return waited
+            else:
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return waited
+                delay = (1.0 - self.tokens) / self.rate
+            await asyncio.sleep(delay)
+            waited += delay
+
+    def block(self, seconds: float) -> None:
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class _Provider:
+    def __init__(self, name: str, rate: float, burst: float, concurrency: int):
+        self.name = name
+        self.bucket = _TokenBucket(rate, burst)
+        self.concurrency = concurrency
+        self.slots = asyncio.Semaphore(concurrency)
+        self.stats = {"requests": 0, "retries": 0, "throttled": 0, "errors": 0, "in_flight": 0, "wait_s": 0.0}
+
+
+class WeatherHttpClient:
+    def __init__(self, limits: dict[str, tuple[float, float, int]] | None = None, default_limit: tuple[float, float, int] | None = None):
+        self._limits = dict(limits or {})
+        self._default_limit = default_limit or (10.0, 20.0, 4)
+        self._lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._client: Any = None
+        self._providers: dict[str, _Provider] = {}
+
+    # -- loop management -------------------------------------------------
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def _run() -> None:
+                    asyncio.set_event_loop(loop)
+                    loop.call_soon(ready.set)
+                    loop.run_forever()
+
+                self._thread = threading.Thread(target=_run, name="weather-http", daemon=True)
+                self._thread.start()
+                ready.wait()
+                self._loop = loop
+            return self._loop
+
+    def _submit(self, coro) -> Future:
+        loop = self._ensure_loop()
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("weather_http: synchroner Aufruf aus dem Client-Loop nicht moeglich.")
+        return asyncio.run_coroutine_threadsafe(coro, loop)
+
+    def _provider(self, name: str) -> _Provider:
+        key = (name or "default").strip().lower()
+        prov = self._providers.get(key)
+        if prov is None:
+            rate, burst, conc = self._limits.get(key, self._default_limit)
+            prov = _Provider(key, rate, burst, conc)
+            self._providers[key] = prov
+        return prov
+
+    async def _ahttp(self) -> Any:
+        if self._client is None and httpx is not None:
+            self._client = httpx.AsyncClient(
+                headers={"User-Agent": WEATHER_HTTP_USER_AGENT},
+                limits=httpx.Limits(max_connections=64, max_keepalive_connections=16),
+                follow_redirects=True,
+            )
+        return self._client
+
+    def configure(self, provider: str, *, rate: float | None = None, burst: float | None = None, concurrency: int | None = None) -> None:
+        """Override a provider's limit (e.g. from a batch script's CLI flags)."""
+        key = provider.strip().lower()
+        old = self._limits.get(key, self._default_limit)
+        new = (
+            max(0.0, float(rate)) if rate is not None else old[0],
+            max(1.0, float(burst)) if burst is not None else old[1],
+            max(1, int(concurrency)) if concurrency is not None else old[2],
+        )
+        if new == old and key in self._limits:
+            return
+        self._limits[key] = new
+
+        async def _apply() -> None:
+            self._providers.pop(key, None)
+
+        if self._loop is not None:
+            self._submit(_apply()).result()
+
+    # -- requests --------------------------------------------------------
+
+    async def _send(self, method: str, url: str, *, params, json_body, timeout_s: float, dest: str | None):
+        """One attempt; returns (status, headers, body bytes or None when streamed to dest)."""
+        client = await self._ahttp()
+        if client is None:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, _send_blocking, method, url, params, json_body, timeout_s, dest)
+        if dest is None:
+            resp = await client.request(method, url, params=params, json=json_body, timeout=timeout_s)
+            return resp.status_code, resp.headers, resp.content
+        async with client.stream(method, url, params=params, json=json_body, timeout=timeout_s) as resp:
+            if resp.status_code >= 400:
+                await resp.aread()
+                return resp.status_code, resp.headers, resp.content
+            tmp = f"{dest}.part"
+            with open(tmp, "wb") as f:
+                async for chunk in resp.aiter_bytes(1 << 20):
+                    f.write(chunk)
+            os.replace(tmp, dest)
+            return resp.status_code, resp.headers, None
+
+    async def arequest(
+        self,
+        provider: str,
+        method: str,
+        url: str,
+        *,
+        params: dict | None = None,
+        json_body: Any = None,
+        timeout_s: float = 60.0,
+        retries: int | None = None,
+        backoff_base_s: float | None = None,
+        backoff_cap_s: float | None = None,
+        expect: str = "json",
+        dest: str | None = None,
+    ) -> Any:
+        """Rate-limited request with retry; runs on the client loop. expect: json|bytes|text|file."""
+        prov = self._provider(provider)
+        attempts = max(1, int(WEATHER_HTTP_MAX_RETRIES if retries is None else retries))
+        base_s = WEATHER_HTTP_BACKOFF_BASE_S if backoff_base_s is None else backoff_base_s
+        cap_s = WEATHER_HTTP_BACKOFF_CAP_S if backoff_cap_s is None else backoff_cap_s
+        last_exc: Exception | None = None
+        for attempt in range(1, attempts + 1):
+            prov.stats["wait_s"] += await prov.bucket.acquire()
+            async with prov.slots:
+                prov.stats["requests"] += 1
+                prov.stats["in_flight"] += 1
+                try:
+                    status, headers, body = await self._send(
+                        method, url, params=params, json_body=json_body, timeout_s=timeout_s, dest=dest
+                    )
+                except Exception as exc:
+                    status, headers, body = None, {}, None
+                    last_exc = WeatherHttpError(f"{type(exc).__name__}: {exc} ({url})")
+                finally:
+                    prov.stats["in_flight"] -= 1
+
+            if status is not None and status < 400:
+                if expect == "file":
+                    return dest
+                if expect == "bytes":
+                    return body
+                if expect == "text":
+                    return (body or b"").decode("utf-8", errors="replace")
+                return _json_loads(body)
+
+            retry_after = None
+            if status is not None:
+                retry_after = _parse_retry_after(headers.get("Retry-After"))
+                reason = "Too Many Requests" if status == 429 else "Fehler"
+                last_exc = WeatherHttpError(f"HTTP {status} {reason} ({url})", status=status, retry_after_s=retry_after)
+                if status == 429:
+                    prov.stats["throttled"] += 1
+                    # Pause the whole provider: other in-flight callers would hit the same limit.
+                    prov.bucket.block(retry_after if retry_after is not None else _backoff_s(attempt, base_s, cap_s))
+                if status not in _RETRY_STATUS:
+                    break
+            if attempt >= attempts:
+                break
+            prov.stats["retries"] += 1
+            await asyncio.sleep(retry_after if retry_after is not None else _backoff_s(attempt, base_s, cap_s))
+
+        prov.stats["errors"] += 1
+        raise last_exc or WeatherHttpError(f"Request fehlgeschlagen ({url})")
+
+    def request(self, provider: str, method: str, url: str, **kwargs: Any) -> Any:
+        """Blocking wrapper around arequest() for threads (API threadpool, batch scripts)."""
+        return self._submit(self.arequest(provider, method, url, **kwargs)).result()
+
+    async def arequest_threadsafe(self, provider: str, method: str, url: str, **kwargs: Any) -> Any:
+        """Await arequest() from another event loop (e.g. an async FastAPI endpoint)."""
+        return await asyncio.wrap_future(self._submit(self.arequest(provider, method, url, **kwargs)))
+
+    def gather(self, provider: str, calls: Iterable[tuple[str, str, dict]]) -> list[Any]:
+        """Run (method, url, kwargs) calls concurrently; results in order, exceptions returned in place."""
+
+        async def _all():
+            return await asyncio.gather(
+                *(self.arequest(provider, m, u, **kw) for m, u, kw in calls), return_exceptions=True
+            )
+
+        return self._submit(_all()).result()
+
+    def stats(self) -> dict[str, Any]:
+        out = {"backend": "httpx" if httpx is not None else "requests", "providers": {}}
+        for name, prov in list(self._providers.items()):
+            rate, burst = prov.bucket.rate, prov.bucket.burst
+            out["providers"][name] = {
+                "rate_per_s": rate,
+                "burst": burst,
+                "concurrency": prov.concurrency,
+                **{k: (round(v, 2) if isinstance(v, float) else v) for k, v in prov.stats.items()},
+            }
+        return out
+
+    def close(self) -> None:
+        with self._lock:
+            loop, self._loop = self._loop, None
+            thread, self._thread = self._thread, None
+        if loop is None:
+            return
+        client, self._client = self._client, None
+        if client is not None:
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop).result(timeout=10)
+        self._providers.clear()
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None:
+            thread.join(timeout=10)
+        loop.close()
+
+
+def _json_loads(body: bytes | None) -> Any:
+    if not body:
+        return {}
+    return json.loads(body)
+
+
+def _send_blocking(method: str, url: str, params, json_body, timeout_s: float, dest: str | None):
+    headers = {"User-Agent": WEATHER_HTTP_USER_AGENT}
+    with requests.request(method, url, params=params, json=json_body, timeout=timeout_s, headers=headers, stream=dest is not None) as resp:
+        if dest is None or resp.status_code >= 400:
+            return resp.status_code, resp.headers, resp.content
+        tmp = f"{dest}.part"
+        with open(tmp, "wb") as f:
+            for chunk in resp.iter_content(chunk_size=1 << 20):
+                if chunk:
+                    f.write(chunk)
+        os.replace(tmp, dest)
+        return resp.status_code, resp.headers, None
+
+
+CLIENT = WeatherHttpClient(
+    _parse_limits(os.getenv("WEATHER_HTTP_LIMITS", DEFAULT_LIMITS)),
+    _parse_limit(os.getenv("WEATHER_HTTP_DEFAULT_LIMIT", "10:20:4")),
+)
+
+
+def request(provider: str, method: str, url: str, **kwargs: Any) -> Any:
+    return CLIENT.request(provider, method, url, **kwargs)
+
+
+def get_json(provider: str, url: str, *, params: dict | None = None, **kwargs: Any) -> Any:
+    return CLIENT.request(provider, "GET", url, params=params, **kwargs)
+
+
+def download(provider: str, url: str, dest: str, **kwargs: Any) -> str:
+    """Stream url to dest (atomic rename); returns dest."""
+    return CLIENT.request(provider, "GET", url, expect="file", dest=dest, **kwargs)
+
+
+def gather(provider: str, calls: Iterable[tuple[str, str, dict]]) -> list[Any]:
+    return CLIENT.gather(provider, calls)
+
+
+def configure(provider: str, **kwargs: Any) -> None:
+    CLIENT.configure(provider, **kwargs)
+
+
+def http_stats() -> dict[str, Any]:
+    return CLIENT.stats()
@@ -3,14 +3,18 @@ from __future__ import annotations
 import datetime as dt
 import gzip
 import io
-import math
 import os
 import tarfile
 from collections import defaultdict
 from pathlib import Path
 from typing import Any
 
-import requests
+import numpy as np
+
+import radolan_cube
+import weather_http
+from starkregen_events import detect_events_batch
+from weather_series import HourlySeries
 
 try:
     from pyproj import Transformer
@@ -34,85 +38,6 @@ RADOLAN_SCALE = float(os.getenv("RADOLAN_SCALE_MM", "0.1") or 0.1)
 RADOLAN_CRS = "+proj=stere +lat_0=90 +lat_ts=60 +lon_0=10 +a=6370040 +b=6370040 +units=m +no_defs"
 
 
-def _event_level(max_1h: float, max_6h: float) -> tuple[str, int]:
-    if max_1h > 40.0 or max_6h > 60.0:
-        return "extrem", 3
-    if max_1h > 25.0 or max_6h > 35.0:
-        return "unwetter", 2
-    if max_1h >= 15.0 or max_6h >= 20.0:
-        return "starkregen", 1
-    return "none", 0
-
-
-def _rolling_6h_max(mm: list[float], end_idx: int) -> float:
-    s = max(0, end_idx - 5)
-    return float(sum(mm[s : end_idx + 1]))
-
-
-def _detect_events(series: list[dict], source: str = "radar") -> list[dict]:
-    rows: list[tuple[dt.datetime, float]] = []
-    for r in series or []:
-        t = r.get("t")
-        if not t:
-            continue
-        try:
-            ts = dt.datetime.fromisoformat(str(t).replace("Z", "+00:00")).astimezone(dt.timezone.utc)
-            p = float(r.get("precip_mm", 0.0))
-        except Exception:
-            continue
-        if not math.isfinite(p):
-            p = 0.0
-        rows.append((ts, max(0.0, p)))
-
-    rows.sort(key=lambda x: x[0])
-    if not rows:
-        return []
-
-    ts = [x[0] for x in rows]
-    mm = [x[1] for x in rows]
-    trig = []
-    for i in range(len(rows)):
-        trig.append((mm[i] >= 15.0) or (_rolling_6h_max(mm, i) >= 20.0))
-
-    events: list[dict] = []
-    i = 0
-    while i < len(rows):
-        if not trig[i]:
-            i += 1
-            continue
-        s = i
-        e = i
-        while e + 1 < len(rows):
-            if trig[e + 1] or mm[e + 1] >= 0.2:
-                e += 1
-                continue
-            break
-
-        max_1h = max(mm[s : e + 1]) if e >= s else 0.0
-        peak_idx = s + max(range(e - s + 1), key=lambda k: mm[s + k])
-        max_6h = max(_rolling_6h_max(mm, j) for j in range(s, e + 1)) if e >= s else 0.0
-        total_mm = float(sum(mm[s : e + 1]))
-        lvl, sev = _event_level(max_1h, max_6h)
-        if lvl != "none":
-            events.append(
-                {
-                    "start": ts[s].isoformat().replace("+00:00", "Z"),
-                    "end": ts[e].isoformat().replace("+00:00", "Z"),
-                    "peak_ts": ts[peak_idx].isoformat().replace("+00:00", "Z"),
-                    "max_1h_mm": round(float(max_1h), 2),
-                    "max_6h_mm": round(float(max_6h), 2),
-                    "sum_mm": round(total_mm, 2),
-                    "warnstufe": lvl,
-                    "severity": sev,
-                    "source": source,
-                }
-            )
-        i = e + 1
-
-    events.sort(key=lambda ev: (ev.get("severity", 0), ev.get("max_1h_mm", 0.0), ev.get("max_6h_mm", 0.0)), reverse=True)
-    return events
-
-
 def _point_key(lat: float, lon: float) -> str:
     return f"{float(lat):.5f},{float(lon):.5f}"
 
@@ -145,12 +70,7 @@ def _ensure_month_tar(year: int, month: int) -> Path:
     if local.exists() and local.stat().st_size > 0:
         return local
     url = f"{RADOLAN_BASE}/{year:04d}/{fname}"
-    with requests.get(url, timeout=RADAR_TIMEOUT_S, stream=True) as r:
-        r.raise_for_status()
-        with local.open("wb") as f:
-            for chunk in r.iter_content(chunk_size=1 << 20):
-                if chunk:
-                    f.write(chunk)
+    weather_http.download("radar", url, str(local), timeout_s=RADAR_TIMEOUT_S)
     return local
 
 
@@ -233,7 +153,7 @@ def _parse_asc_point_values(
     return out
 
 
-def _fetch_radolan_series(points: list[tuple[float, float]], start_iso: str, end_iso: str) -> dict[str, list[dict]]:
+def _fetch_radolan_series(points: list[tuple[float, float]], start_iso: str, end_iso: str) -> dict[str, HourlySeries]:
     start = _parse_iso(start_iso)
     end = _parse_iso(end_iso)
     if end < start:
@@ -243,46 +163,69 @@ def _fetch_radolan_series(points: list[tuple[float, float]], start_iso: str, end
         raise RuntimeError(f"Radar-Zeitfenster zu gross ({hours}h). Limit: {RADAR_MAX_HOURS}h.")
 
     point_xy = _transform_points(points)
-    per_point: dict[str, list[dict]] = {_point_key(lat, lon): [] for lat, lon in points}
+    keys = list(point_xy.keys())
     hours_by_day = _build_hour_requests(start, end)
-    months = _month_iter(start, end)
-
-    for year, month in months:
-        month_tar_path = _ensure_month_tar(year, month)
-        with tarfile.open(month_tar_path, "r") as month_tar:
-            for day_key, hours_for_day in hours_by_day.items():
-                if not day_key.startswith(f"{year:04d}{month:02d}"):
-                    continue
-                day_member = f"RW-{day_key}.tar.gz"
-                try:
-                    day_bytes = month_tar.extractfile(day_member).read()
-                except Exception:
-                    continue
-                with tarfile.open(fileobj=gzip.GzipFile(fileobj=io.BytesIO(day_bytes)), mode="r:") as day_tar:
-                    for hh in sorted(set(hours_for_day)):
-                        asc_name = f"RW_{day_key}-{hh:02d}50.asc"
-                        try:
-                            asc_bytes = day_tar.extractfile(asc_name).read()
-                        except Exception:
-                            continue
-                        vals = _parse_asc_point_values(asc_bytes, point_xy)
-                        ts = dt.datetime(
-                            int(day_key[0:4]),
-                            int(day_key[4:6]),
-                            int(day_key[6:8]),
-                            int(hh),
-                            0,
-                            0,
-                            tzinfo=dt.timezone.utc,
-                        )
-                        t_iso = ts.isoformat().replace("+00:00", "Z")
-                        for pkey in per_point.keys():
-                            v = vals.get(pkey)
-                            per_point[pkey].append({"t": t_iso, "precip_mm": float(v) if v is not None else 0.0})
-
-    for pkey in per_point.keys():
-        per_point[pkey].sort(key=lambda r: r.get("t", ""))
-    return per_point
+    h0 = int(start.timestamp() // 3600)
+    h1 = int(end.timestamp() // 3600)
+    hour_parts: list[np.ndarray] = []
+    val_parts: list[np.ndarray] = []
+
+    for year, month in _month_iter(start, end):
+        # Converted months are read as cube slices; others fall back to the month tar.
+        # Cubes are only built by the radolan_cube CLI, never inside a request.
+        cube = radolan_cube.open_month_cube(year, month) if radolan_cube.RADOLAN_CUBE else None
+        if cube is not None:
+            hours, raw = cube.sample([point_xy[k] for k in keys], h0, h1)
+            vals = np.nan_to_num(raw * RADOLAN_SCALE, nan=0.0)
+        else:
+            hours, vals = _read_month_asc(year, month, hours_by_day, point_xy, keys)
+        hour_parts.append(hours)
+        val_parts.append(vals)
+
+    hour_arr = np.concatenate(hour_parts) if hour_parts else np.zeros(0, dtype=np.int64)
+    vals = np.concatenate(val_parts) if val_parts else np.zeros((0, len(keys)))
+    return {pkey: HourlySeries(hour_arr, vals[:, j].astype(np.float32)) for j, pkey in enumerate(keys)}
+
+
+def _read_month_asc(
+    year: int,
+    month: int,
+    hours_by_day: dict[str, list[int]],
+    point_xy: dict[str, tuple[float, float]],
+    keys: list[str],
+) -> tuple[np.ndarray, np.ndarray]:
+    hour_list: list[int] = []
+    rows: list[list[float]] = []
+    month_tar_path = _ensure_month_tar(year, month)
+    with tarfile.open(month_tar_path, "r") as month_tar:
+        for day_key, hours_for_day in hours_by_day.items():
+            if not day_key.startswith(f"{year:04d}{month:02d}"):
+                continue
+            day_member = f"RW-{day_key}.tar.gz"
+            try:
+                day_bytes = month_tar.extractfile(day_member).read()
+            except Exception:
+                continue
+            with tarfile.open(fileobj=gzip.GzipFile(fileobj=io.BytesIO(day_bytes)), mode="r:") as day_tar:
+                for hh in sorted(set(hours_for_day)):
+                    asc_name = f"RW_{day_key}-{hh:02d}50.asc"
+                    try:
+                        asc_bytes = day_tar.extractfile(asc_name).read()
+                    except Exception:
+                        continue
+                    vals = _parse_asc_point_values(asc_bytes, point_xy)
+                    ts = dt.datetime(
+                        int(day_key[0:4]),
+                        int(day_key[4:6]),
+                        int(day_key[6:8]),
+                        int(hh),
+                        0,
+                        0,
+                        tzinfo=dt.timezone.utc,
+                    )
+                    hour_list.append(int(ts.timestamp() // 3600))
+                    rows.append([float(vals[k]) if vals.get(k) is not None else 0.0 for k in keys])
+    return np.asarray(hour_list, dtype=np.int64), np.asarray(rows, dtype=np.float64).reshape(len(rows), len(keys))
 
 
 def _fetch_from_connector(points: list[tuple[float, float]], start_iso: str, end_iso: str) -> dict:
@@ -291,22 +234,27 @@ def _fetch_from_connector(points: list[tuple[float, float]], start_iso: str, end
     per_point: dict[str, list[dict]] = {}
     ok_any = False
     last_err: str | None = None
-    for lat, lon in points:
-        pkey = _point_key(lat, lon)
-        try:
-            resp = requests.get(
+    # One request per point, issued concurrently within the radar provider's limits.
+    results = weather_http.gather(
+        "radar",
+        [
+            (
+                "GET",
                 RADAR_EVENTS_URL,
-                params={"lat": lat, "lon": lon, "start": start_iso, "end": end_iso},
-                timeout=RADAR_TIMEOUT_S,
+                {"params": {"lat": lat, "lon": lon, "start": start_iso, "end": end_iso}, "timeout_s": RADAR_TIMEOUT_S, "retries": 2},
             )
-            resp.raise_for_status()
-            data = resp.json()
-            items = data.get("events") if isinstance(data, dict) else data
-            per_point[pkey] = [ev for ev in (items or []) if isinstance(ev, dict)]
-            ok_any = True
-        except Exception as exc:
-            last_err = str(exc)
+            for lat, lon in points
+        ],
+    )
+    for (lat, lon), data in zip(points, results):
+        pkey = _point_key(lat, lon)
+        if isinstance(data, Exception):
+            last_err = str(data)
             per_point[pkey] = []
+            continue
+        items = data.get("events") if isinstance(data, dict) else data
+        per_point[pkey] = [ev for ev in (items or []) if isinstance(ev, dict)]
+        ok_any = True
     return {
         "available": bool(ok_any),
         "reason": None if ok_any else (last_err or "Radar-Connector nicht erreichbar"),
@@ -338,14 +286,8 @@ def fetch_radar_events(
 
     try:
         per_series = _fetch_radolan_series(points, start_iso, end_iso)
-        out: dict[str, list[dict]] = {}
-        ok_any = False
-        for lat, lon in points:
-            pkey = _point_key(lat, lon)
-            evs = _detect_events(per_series.get(pkey) or [], source="radar")
-            out[pkey] = evs
-            if evs:
-                ok_any = True
+        keys = [_point_key(lat, lon) for lat, lon in points]
+        out = dict(zip(keys, detect_events_batch([per_series.get(k) for k in keys], source="radar")))
         # available=True means radar source reachable, not necessarily that events exist.
         if per_series:
             return {"available": True, "reason": None, "per_point": out}
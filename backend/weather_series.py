@@ -0,0 +1,196 @@
+"""
+Columnar hourly precipitation series.
+
+Weather sources (Open-Meteo, ICON-D2 proxy, local store, DWD stations, RADOLAN)
+return HourlySeries: sorted unique int64 epoch hours (UTC) plus float32 mm.
+Consumers (stats, event detection) work on the arrays directly. Lists of
+{"t": "...Z", "precip_mm": ...} dicts are produced only at the JSON boundary
+(bundle_to_json) and parsed only where external JSON comes in (as_series).
+
+Caches with a JSON disk tier store the compact form ({"h": [...], "v": [...]},
+see bundle_to_compact); as_series also accepts that form and legacy dict lists.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+from typing import Any, Iterable
+
+import numpy as np
+
+# float32 values are rounded to this many decimals when leaving the array form
+# (sources deliver 0.1 mm, RADOLAN 0.01 mm).
+_DECIMALS = 3
+
+
+def _epoch_hour(text: str) -> int | None:
+    try:
+        d = dt.datetime.fromisoformat(text.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if d.tzinfo is None:
+        d = d.replace(tzinfo=dt.timezone.utc)
+    return int(d.timestamp() // 3600)
+
+
+def parse_hours(times: Iterable[Any]) -> np.ndarray:
+    """ISO timestamps (naive = UTC, 'Z' or offsets) -> int64 epoch hours; unparsable -> -1 sentinel."""
+    txt = [str(t).strip() if t is not None else "" for t in times]
+    plain = [t[:-1] if t.endswith("Z") else t for t in txt]
+    if not any(("+" in t[10:]) or ("-" in t[10:]) for t in plain):
+        try:
+            sec = np.array(plain, dtype="datetime64[s]")
+            out = sec.astype(np.int64) // 3600
+            out[np.isnat(sec)] = -1
+            return out
+        except ValueError:
+            pass
+    return np.array([h if (h := _epoch_hour(t)) is not None else -1 for t in txt], dtype=np.int64)
+
+
+class HourlySeries:
+    __slots__ = ("hours", "values")
+
+    def __init__(self, hours: np.ndarray, values: np.ndarray, *, normalized: bool = False):
+        hours = np.asarray(hours, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float32)
+        if not normalized and hours.size:
+            keep = (hours >= 0) & np.isfinite(values)
+            hours, values = hours[keep], values[keep]
+            if hours.size > 1 and not np.all(np.diff(hours) > 0):
+                # Sort by hour; on duplicates the later entry wins.
+                order = np.argsort(hours, kind="stable")
+                hours, values = hours[order], values[order]
+                last = np.append(hours[1:] != hours[:-1], True)
+                hours, values = hours[last], values[last]
+        self.hours = hours
+        self.values = values
+
+    @classmethod
+    def empty(cls) -> "HourlySeries":
+        return cls(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32), normalized=True)
+
+    @classmethod
+    def from_iso(cls, times: Iterable[Any], values: Iterable[Any]) -> "HourlySeries":
+        times = list(times)
+        vals = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+        n = min(len(times), len(vals))
+        return cls(parse_hours(times[:n]), vals[:n])
+
+    @classmethod
+    def from_dense(cls, first_hour: int, values: np.ndarray) -> "HourlySeries":
+        """Dense hourly array starting at first_hour; NaN = missing hour."""
+        values = np.asarray(values, dtype=np.float32)
+        idx = np.flatnonzero(np.isfinite(values))
+        return cls(np.int64(first_hour) + idx.astype(np.int64), values[idx], normalized=True)
+
+    @classmethod
+    def from_records(cls, rows: Iterable[dict]) -> "HourlySeries":
+        times, vals = [], []
+        for r in rows or []:
+            if not isinstance(r, dict) or not r.get("t"):
+                continue
+            try:
+                vals.append(float(r.get("precip_mm", 0.0)))
+            except (TypeError, ValueError):
+                continue
+            times.append(r["t"])
+        return cls.from_iso(times, vals)
+
+    def __len__(self) -> int:
+        return int(self.hours.size)
+
+    def __repr__(self) -> str:
+        if not len(self):
+            return "HourlySeries(empty)"
+        return f"HourlySeries({len(self)} h, {self.iso(0)}..{self.iso(len(self) - 1)})"
+
+    def __getstate__(self):
+        return (self.hours, self.values)
+
+    def __setstate__(self, state) -> None:
+        self.hours, self.values = state
+
+    @property
+    def mm(self) -> np.ndarray:
+        """Values as float64, rounded like the source data (for sums, quantiles, thresholds)."""
+        return np.round(self.values.astype(np.float64), _DECIMALS)
+
+    def iso(self, i: int) -> str:
+        return _hour_iso(int(self.hours[i]))
+
+    def iso_times(self) -> list[str]:
+        return [f"{t}:00:00Z" for t in self.hours.astype("datetime64[h]").astype(str)]
+
+    def slice_hours(self, h0: int, h1: int) -> "HourlySeries":
+        """Hours h0..h1 inclusive."""
+        a = int(np.searchsorted(self.hours, h0, side="left"))
+        b = int(np.searchsorted(self.hours, h1, side="right"))
+        return HourlySeries(self.hours[a:b], self.values[a:b], normalized=True)
+
+    def merge(self, other: "HourlySeries") -> "HourlySeries":
+        """Union of both series; other wins on hours present in both."""
+        if not len(other):
+            return self
+        if not len(self):
+            return other
+        return HourlySeries(np.concatenate([self.hours, other.hours]), np.concatenate([self.values, other.values]))
+
+    def dense(self, h0: int, h1: int) -> np.ndarray:
+        """float32 array for hours h0..h1 with NaN where the series has no value."""
+        out = np.full(max(0, h1 - h0 + 1), np.nan, dtype=np.float32)
+        part = self.slice_hours(h0, h1)
+        out[part.hours - h0] = part.values
+        return out
+
+    def daily_sums(self) -> np.ndarray:
+        """Sum per UTC day (days with at least one value), oldest first."""
+        if not len(self):
+            return np.zeros(0, dtype=np.float64)
+        days = self.hours // 24
+        uniq, inv = np.unique(days, return_inverse=True)
+        return np.bincount(inv, weights=self.mm, minlength=len(uniq))
+
+    def to_records(self) -> list[dict]:
+        return [{"t": t, "precip_mm": v} for t, v in zip(self.iso_times(), self.mm.tolist())]
+
+    def to_compact(self) -> dict:
+        return {"h": self.hours.tolist(), "v": self.mm.tolist()}
+
+
+def _hour_iso(h: int) -> str:
+    return dt.datetime.fromtimestamp(h * 3600, tz=dt.timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def as_series(obj: Any) -> HourlySeries:
+    """HourlySeries from a series, its compact form, a list of {"t", "precip_mm"} dicts or None."""
+    if isinstance(obj, HourlySeries):
+        return obj
+    if isinstance(obj, dict) and "h" in obj and "v" in obj:
+        return HourlySeries(obj["h"], obj["v"])
+    if isinstance(obj, list):
+        return HourlySeries.from_records(obj)
+    return HourlySeries.empty()
+
+
+def _map_series(bundle: list[dict] | None, fn) -> list[dict]:
+    out = []
+    for item in bundle or []:
+        if isinstance(item, dict) and "series" in item:
+            item = {**item, "series": fn(as_series(item["series"]))}
+        out.append(item)
+    return out
+
+
+def bundle_to_json(bundle: list[dict] | None) -> list[dict]:
+    """Per-point items with series as [{"t", "precip_mm"}, ...] (API responses)."""
+    return _map_series(bundle, HourlySeries.to_records)
+
+
+def bundle_to_compact(bundle: list[dict] | None) -> list[dict]:
+    """JSON-serializable form for the tiered cache disk tier."""
+    return _map_series(bundle, HourlySeries.to_compact)
+
+
+def bundle_from_compact(bundle: list[dict] | None) -> list[dict]:
+    return _map_series(bundle, lambda s: s)
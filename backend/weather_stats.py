@@ -3,6 +3,10 @@ from __future__ import annotations
 import datetime as dt
 from dataclasses import dataclass
 
+import numpy as np
+
+from weather_series import HourlySeries, as_series
+
 
 def _quantile(sorted_vals: list[float], q: float) -> float | None:
     if not sorted_vals:
@@ -17,21 +21,8 @@ def _quantile(sorted_vals: list[float], q: float) -> float | None:
     return float(sorted_vals[base] + rest * (sorted_vals[base + 1] - sorted_vals[base]))
 
 
-def _daily_sums(series: list[dict]) -> list[float]:
-    # series item: {"t": "...Z", "precip_mm": float}
-    by_day: dict[str, float] = {}
-    for row in series or []:
-        t = row.get("t")
-        if not t:
-            continue
-        day = str(t)[:10]  # YYYY-MM-DD
-        p = row.get("precip_mm", 0.0)
-        try:
-            v = float(p)
-        except Exception:
-            v = 0.0
-        by_day[day] = by_day.get(day, 0.0) + (v if v == v else 0.0)  # NaN guard
-    return [by_day[k] for k in sorted(by_day.keys())]
+def _daily_sums(series: HourlySeries | list[dict] | None) -> list[float]:
+    return as_series(series).daily_sums().tolist()
 
 
 def compute_api14(daily_mm: list[float]) -> float:
@@ -69,16 +60,8 @@ def build_weather_stats(
     out: list[dict] = []
     for item in bundle or []:
         point = item.get("point")
-        series = item.get("series") or []
-        vals: list[float] = []
-        for s in series:
-            try:
-                v = float(s.get("precip_mm", 0.0))
-            except Exception:
-                continue
-            if v == v:
-                vals.append(v)
-        vals.sort()
+        series = as_series(item.get("series"))
+        vals = np.sort(series.mm).tolist()
 
         qmap: dict[str, float | None] = {}
         for q in qs:
@@ -0,0 +1,364 @@
+"""
+Local hourly precipitation store (sqlite) with gap-only incremental fetch.
+
+Events/preset requests used to re-download the full hourly series for the whole
+lookback window. Points are now snapped to weather cells (WEATHER_STORE_CELL_DEG);
+each (cell, month) row holds the month's hourly values as a float32 blob plus a
+per-hour state blob (0 = missing, 1 = live/forecast, 2 = final). A request reads
+its window from the store and fetches only the day ranges that contain missing
+hours, for all affected cells at once. Batch runs therefore touch the network
+once per cell-hour instead of once per field request.
+
+Hours fetched from the historical host with a value are final. Live hours
+expire WEATHER_LIVE_TTL_S after they were fetched (per-hour fetch times; the
+live host revises recent hours and forecasts) and are fetched again when a
+request needs them; hours upstream returned no value for are treated the same
+way instead of being stored as final.
+
+Reads never wait for fetches. Only cells with gaps are claimed for fetching; a
+request that needs a cell another request is fetching waits for that cell only.
+
+Configuration:
+- WEATHER_STORE: 1/0 (default 1)
+- WEATHER_STORE_PATH: sqlite file (default backend/.cache/weather_store.sqlite)
+- WEATHER_STORE_CELL_DEG: cell size in degrees (default 0.02, ~2 km)
+- WEATHER_STORE_MAX_LOCATIONS: cells per upstream call (default 100)
+"""
+
+from __future__ import annotations
+
+import calendar
+import datetime as dt
+import math
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable
+
+import numpy as np
+
+from weather_series import HourlySeries, as_series
+
+WEATHER_STORE = os.getenv("WEATHER_STORE", "1").strip().lower() not in ("0", "false", "no")
+WEATHER_STORE_CELL_DEG = float(os.getenv("WEATHER_STORE_CELL_DEG", "0.02") or 0.02)
+WEATHER_STORE_MAX_LOCATIONS = int(os.getenv("WEATHER_STORE_MAX_LOCATIONS", "100") or 100)
+DEFAULT_STORE_PATH = os.path.join(os.path.dirname(__file__), ".cache", "weather_store.sqlite")
+
+STATE_MISSING = 0
+STATE_LIVE = 1
+STATE_FINAL = 2
+
+
+def _store_path() -> str:
+    return os.getenv("WEATHER_STORE_PATH", DEFAULT_STORE_PATH)
+
+
+def cell_for(lat: float, lon: float, cell_deg: float = WEATHER_STORE_CELL_DEG) -> tuple[str, float, float]:
+    """Return (cell_id, center_lat, center_lon) of the weather cell containing the point."""
+    iy = math.floor(float(lat) / cell_deg)
+    ix = math.floor(float(lon) / cell_deg)
+    return f"{iy}_{ix}", round((iy + 0.5) * cell_deg, 6), round((ix + 0.5) * cell_deg, 6)
+
+
+def _hour_index(d: dt.datetime) -> int:
+    return int(d.timestamp() // 3600)
+
+
+def _months(h0: int, h1: int) -> list[tuple[str, int, int]]:
+    """(month key, first hour index, hours in month) for all months touching [h0, h1]."""
+    d = dt.datetime.fromtimestamp(h0 * 3600, tz=dt.timezone.utc)
+    y, m = d.year, d.month
+    out = []
+    while True:
+        start = _hour_index(dt.datetime(y, m, 1, tzinfo=dt.timezone.utc))
+        if start > h1:
+            break
+        n = calendar.monthrange(y, m)[1] * 24
+        out.append((f"{y:04d}-{m:02d}", start, n))
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+    return out
+
+
+class PrecipStore:
+    def __init__(self, path: str, model: str):
+        self.path = path
+        self.model = model
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        # cell -> event set when the request fetching that cell's gaps is done
+        self._inflight: dict[str, threading.Event] = {}
+        self._stats = {"requests": 0, "points_requested": 0, "cell_hours_served": 0, "cell_hours_fetched": 0, "upstream_calls": 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS precip ("
+                " model TEXT NOT NULL, cell TEXT NOT NULL, month TEXT NOT NULL,"
+                " vals BLOB NOT NULL, state BLOB NOT NULL, live_fetched_at REAL,"
+                " PRIMARY KEY (model, cell, month))"
+            )
+            cols = {row[1] for row in conn.execute("PRAGMA table_info(precip)")}
+            if "fetched_at" not in cols:
+                # Per-hour fetch time (uint32 epoch seconds); live_fetched_at is the
+                # fallback for rows written before.
+                conn.execute("ALTER TABLE precip ADD COLUMN fetched_at BLOB")
+            self._conn = conn
+        return self._conn
+
+    def read(self, cell: str, h0: int, h1: int, live_ttl_s: float) -> tuple[np.ndarray, np.ndarray]:
+        """Values and states for hours h0..h1 (inclusive); expired live hours count as missing."""
+        n = h1 - h0 + 1
+        vals = np.full(n, np.nan, dtype=np.float32)
+        state = np.zeros(n, dtype=np.uint8)
+        now = time.time()
+        for month, m0, mn in _months(h0, h1):
+            with self._lock:
+                row = self._connect().execute(
+                    "SELECT vals, state, live_fetched_at, fetched_at FROM precip"
+                    " WHERE model=? AND cell=? AND month=?",
+                    (self.model, cell, month),
+                ).fetchone()
+            if row is None:
+                continue
+            mv = np.frombuffer(row[0], dtype=np.float32)
+            ms = np.frombuffer(row[1], dtype=np.uint8).copy()
+            fa = _fetched_times(row[3], row[2], mn)
+            ms[(ms == STATE_LIVE) & (now - fa > live_ttl_s)] = STATE_MISSING
+            a, b = max(h0, m0), min(h1, m0 + mn - 1)
+            vals[a - h0 : b - h0 + 1] = mv[a - m0 : b - m0 + 1]
+            state[a - h0 : b - h0 + 1] = ms[a - m0 : b - m0 + 1]
+        return vals, state
+
+    def write(self, cell: str, h0: int, vals: np.ndarray, state: np.ndarray) -> None:
+        """Merge hours starting at h0 into the month rows (only hours with state > 0)."""
+        h1 = h0 + len(vals) - 1
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            for month, m0, mn in _months(h0, h1):
+                row = conn.execute(
+                    "SELECT vals, state, live_fetched_at, fetched_at FROM precip"
+                    " WHERE model=? AND cell=? AND month=?",
+                    (self.model, cell, month),
+                ).fetchone()
+                if row is None:
+                    mv = np.full(mn, np.nan, dtype=np.float32)
+                    ms = np.zeros(mn, dtype=np.uint8)
+                    live_at = None
+                    fa = np.zeros(mn, dtype=np.uint32)
+                else:
+                    mv = np.frombuffer(row[0], dtype=np.float32).copy()
+                    ms = np.frombuffer(row[1], dtype=np.uint8).copy()
+                    live_at = row[2]
+                    fa = _fetched_times(row[3], row[2], mn).astype(np.uint32)
+                a, b = max(h0, m0), min(h1, m0 + mn - 1)
+                src_v = vals[a - h0 : b - h0 + 1]
+                src_s = state[a - h0 : b - h0 + 1]
+                # Never downgrade final hours to live.
+                take = (src_s > STATE_MISSING) & ((src_s == STATE_FINAL) | (ms[a - m0 : b - m0 + 1] != STATE_FINAL))
+                np.copyto(mv[a - m0 : b - m0 + 1], src_v, where=take)
+                np.copyto(ms[a - m0 : b - m0 + 1], src_s, where=take)
+                # Only the hours written now get a new fetch time; older live hours of
+                # the month keep theirs and still expire on schedule.
+                fa[a - m0 : b - m0 + 1][take] = int(now)
+                if np.any(src_s[take] == STATE_LIVE):
+                    live_at = now
+                conn.execute(
+                    "INSERT OR REPLACE INTO precip (model, cell, month, vals, state, live_fetched_at, fetched_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (self.model, cell, month, mv.tobytes(), ms.tobytes(), live_at, fa.tobytes()),
+                )
+            conn.commit()
+
+    def _count(self, name: str, n: int) -> None:
+        with self._lock:
+            self._stats[name] += n
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {"path": self.path, "model": self.model, "cell_deg": WEATHER_STORE_CELL_DEG, **self._stats}
+
+    def fetch_hourly(
+        self,
+        points: list[tuple[float, float]],
+        start_iso: str,
+        end_iso: str,
+        *,
+        fetch_fn: Callable[..., list[dict]],
+        cutoff: dt.datetime,
+        live_ttl_s: float,
+        station: dict[str, Any],
+        point_key: Callable[[float, float], str],
+    ) -> list[dict]:
+        """
+        Hourly series per point (whole UTC days start..end, like the Open-Meteo API),
+        served from the store; missing hours are fetched via
+        fetch_fn(points, start_iso, end_iso, live=bool) in the Open-Meteo batch format.
+        """
+        start_d = dt.datetime.fromisoformat(start_iso.replace("Z", "+00:00")).astimezone(dt.timezone.utc).date()
+        end_d = dt.datetime.fromisoformat(end_iso.replace("Z", "+00:00")).astimezone(dt.timezone.utc).date()
+        h0 = _hour_index(dt.datetime.combine(start_d, dt.time(0), tzinfo=dt.timezone.utc))
+        h1 = _hour_index(dt.datetime.combine(end_d, dt.time(23), tzinfo=dt.timezone.utc))
+
+        cells: dict[str, tuple[float, float]] = {}
+        point_cells = []
+        for lat, lon in points:
+            cid, clat, clon = cell_for(lat, lon)
+            cells[cid] = (clat, clon)
+            point_cells.append(cid)
+
+        # Read without locks; claim only cells with gaps. Cells another request is
+        # fetching are awaited and checked again (its window may differ from ours).
+        fetched: set[str] = set()
+        while True:
+            gaps = [c for c in cells if c not in fetched and self._has_gap(c, h0, h1, live_ttl_s)]
+            if not gaps:
+                break
+            mine, waits = self._claim(gaps)
+            try:
+                if mine:
+                    self._fill_gaps(
+                        {c: cells[c] for c in mine}, h0, h1, fetch_fn=fetch_fn, cutoff=cutoff, live_ttl_s=live_ttl_s
+                    )
+            finally:
+                self._unclaim(mine)
+            fetched.update(mine)
+            if not waits:
+                break
+            for event in waits:
+                event.wait()
+
+        series_by_cell = {}
+        for cid in cells:
+            vals, _state = self.read(cid, h0, h1, live_ttl_s=float("inf"))
+            series_by_cell[cid] = HourlySeries.from_dense(h0, vals)
+
+        self._count("requests", 1)
+        self._count("points_requested", len(points))
+        self._count("cell_hours_served", len(cells) * (h1 - h0 + 1))
+        out = []
+        for (lat, lon), cid in zip(points, point_cells):
+            out.append(
+                {
+                    "point": point_key(lat, lon),
+                    "station": {**station, "host": "local-store", "cell": cid},
+                    "series": series_by_cell[cid],
+                }
+            )
+        return out
+
+    def _has_gap(self, cid: str, h0: int, h1: int, live_ttl_s: float) -> bool:
+        _vals, state = self.read(cid, h0, h1, live_ttl_s=live_ttl_s)
+        return bool(np.any(state == STATE_MISSING))
+
+    def _claim(self, cids: list[str]) -> tuple[list[str], list[threading.Event]]:
+        """Claim cells for fetching; returns (claimed cells, events of cells fetched elsewhere)."""
+        mine: list[str] = []
+        waits: list[threading.Event] = []
+        with self._lock:
+            for cid in cids:
+                event = self._inflight.get(cid)
+                if event is None:
+                    self._inflight[cid] = threading.Event()
+                    mine.append(cid)
+                else:
+                    waits.append(event)
+        return mine, waits
+
+    def _unclaim(self, cids: list[str]) -> None:
+        with self._lock:
+            events = [self._inflight.pop(cid) for cid in cids if cid in self._inflight]
+        for event in events:
+            event.set()
+
+    def _fill_gaps(
+        self,
+        cells: dict[str, tuple[float, float]],
+        h0: int,
+        h1: int,
+        *,
+        fetch_fn: Callable[..., list[dict]],
+        cutoff: dt.datetime,
+        live_ttl_s: float,
+    ) -> None:
+        # Group cells by the day range that covers their missing hours.
+        groups: dict[tuple[dt.date, dt.date], list[str]] = {}
+        for cid in cells:
+            _vals, state = self.read(cid, h0, h1, live_ttl_s=live_ttl_s)
+            missing = np.flatnonzero(state == STATE_MISSING)
+            if missing.size == 0:
+                continue
+            first = dt.datetime.fromtimestamp((h0 + int(missing[0])) * 3600, tz=dt.timezone.utc).date()
+            last = dt.datetime.fromtimestamp((h0 + int(missing[-1])) * 3600, tz=dt.timezone.utc).date()
+            groups.setdefault((first, last), []).append(cid)
+
+        cutoff_d = cutoff.date()
+        for (first, last), cids in groups.items():
+            segments = []
+            if first <= cutoff_d:
+                segments.append((first, min(last, cutoff_d), False))
+            if last > cutoff_d:
+                segments.append((max(first, cutoff_d + dt.timedelta(days=1)), last, True))
+            for i in range(0, len(cids), max(1, WEATHER_STORE_MAX_LOCATIONS)):
+                chunk = cids[i : i + WEATHER_STORE_MAX_LOCATIONS]
+                for seg_first, seg_last, live in segments:
+                    self._fetch_segment(chunk, cells, seg_first, seg_last, live, fetch_fn)
+
+    def _fetch_segment(
+        self,
+        cids: list[str],
+        cells: dict[str, tuple[float, float]],
+        first: dt.date,
+        last: dt.date,
+        live: bool,
+        fetch_fn: Callable[..., list[dict]],
+    ) -> None:
+        s0 = _hour_index(dt.datetime.combine(first, dt.time(0), tzinfo=dt.timezone.utc))
+        s1 = _hour_index(dt.datetime.combine(last, dt.time(23), tzinfo=dt.timezone.utc))
+        rows = fetch_fn(
+            [cells[c] for c in cids],
+            f"{first.isoformat()}T00:00:00Z",
+            f"{last.isoformat()}T23:00:00Z",
+            live=live,
+        )
+        self._count("upstream_calls", 1)
+        n = s1 - s0 + 1
+        for cid, row in zip(cids, rows):
+            vals = as_series(row.get("series")).dense(s0, s1)
+            # Only hours with a value become final. Holes (no hourly block, archive
+            # not ingested yet) are kept like live hours: negative-cached for
+            # WEATHER_LIVE_TTL_S, then fetched again.
+            state = np.where(np.isfinite(vals), STATE_LIVE if live else STATE_FINAL, STATE_LIVE).astype(np.uint8)
+            self.write(cid, s0, vals, state)
+            self._count("cell_hours_fetched", n)
+
+
+def _fetched_times(blob: bytes | None, legacy_at: float | None, n: int) -> np.ndarray:
+    """Per-hour fetch times of a month row (float seconds)."""
+    if blob is not None and len(blob) == n * 4:
+        return np.frombuffer(blob, dtype=np.uint32).astype(np.float64)
+    return np.full(n, float(legacy_at or 0.0))
+
+
+_STORE_LOCK = threading.Lock()
+_STORES: dict[str, PrecipStore] = {}
+
+
+def get_store(model: str) -> PrecipStore:
+    with _STORE_LOCK:
+        store = _STORES.get(model)
+        if store is None:
+            store = PrecipStore(_store_path(), model)
+            _STORES[model] = store
+        return store
+
+
+def store_stats() -> dict[str, dict[str, Any]]:
+    with _STORE_LOCK:
+        stores = list(_STORES.values())
+    return {s.model: s.stats() for s in stores}
@@ -1,9 +1,20 @@
 from __future__ import annotations
 
+import os
 import xml.etree.ElementTree as ET
 
 import requests
 
+from tiered_cache import get_cache
+
+# Parsed layer lists per capabilities URL (capabilities change rarely).
+_CAPS_CACHE = get_cache(
+    "wms_capabilities",
+    ttl_s=float(os.getenv("WMS_CAPS_CACHE_TTL_S", str(6 * 3600))),
+    max_items=256,
+    disk=True,
+)
+
 
 def list_wms_layers(url: str, timeout_s: int = 30) -> list[dict]:
     """
@@ -15,6 +26,10 @@ def list_wms_layers(url: str, timeout_s: int = 30) -> list[dict]:
         sep = "&" if "?" in url else "?"
         url = f"{url}{sep}SERVICE=WMS&REQUEST=GetCapabilities"
 
+    cached = _CAPS_CACHE.get(url)
+    if cached is not None:
+        return cached
+
     resp = requests.get(url, timeout=timeout_s)
     resp.raise_for_status()
     root = ET.fromstring(resp.content)
@@ -38,5 +53,6 @@ def list_wms_layers(url: str, timeout_s: int = 30) -> list[dict]:
 
     # stable output
     out.sort(key=lambda x: (x["title"].lower(), x["name"].lower()))
+    _CAPS_CACHE.set(url, out)
     return out
 
@@ -29,6 +29,8 @@ if LEGACY_BACKEND_PATH not in sys.path:
 
 try:
     from create_mock_dem import create_mock_dem
+    from dem_cache import dem_identity, get_dem_cache
+    from dem_pyramid import MAX_ANALYSIS_CELLS
     from processing import analyze_dem
     from st_public_dem import fetch_dem_from_st_public_download
     from st_cog_dem import fetch_dem_from_st_cog_dir
@@ -114,55 +116,60 @@ def resolve_dem_path(parameters: dict) -> tuple[str, str | None]:
     if bbox:
         dem_source = str(parameters.get("dem_source") or "wcs").strip().lower()
         provider = str(parameters.get("provider") or "auto").strip().lower()
-        tmp_dir = tempfile.mkdtemp(prefix="hydrowatch-dem-fetch-")
-
-        if dem_source == "public":
-            parts_raw = parameters.get("st_parts") or parameters.get("parts") or [1]
-            parts: list[int] = []
-            if isinstance(parts_raw, str):
-                parts = [int(x) for x in parts_raw.split(",") if x.strip()]
-            elif isinstance(parts_raw, list):
-                parts = [int(x) for x in parts_raw]
-            else:
-                parts = [int(parts_raw)]
-
-            cache_dir = parameters.get("dem_cache_dir")
-            dem_path = fetch_dem_from_st_public_download(
-                south=bbox["south"],
-                west=bbox["west"],
-                north=bbox["north"],
-                east=bbox["east"],
-                parts=parts,
-                cache_dir=cache_dir,
-            )
-            final_path = os.path.join(tmp_dir, "dem.tif")
-            shutil.move(dem_path, final_path)
-            return final_path, tmp_dir
-
-        if dem_source == "cog":
-            cog_dir = parameters.get("st_cog_dir") or os.getenv("ST_COG_DIR")
-            if not cog_dir:
-                raise RuntimeError("dem_source=cog braucht st_cog_dir oder ST_COG_DIR.")
-            cache_dir = parameters.get("dem_cache_dir")
-            dem_path = fetch_dem_from_st_cog_dir(
-                south=bbox["south"],
-                west=bbox["west"],
-                north=bbox["north"],
-                east=bbox["east"],
-                cog_dir=str(cog_dir),
-                cache_dir=cache_dir,
+        parts_raw = parameters.get("st_parts") or parameters.get("parts") or [1]
+        parts: list[int] = []
+        if isinstance(parts_raw, str):
+            parts = [int(x) for x in parts_raw.split(",") if x.strip()]
+        elif isinstance(parts_raw, list):
+            parts = [int(x) for x in parts_raw]
+        else:
+            parts = [int(parts_raw)]
+        cog_dir = parameters.get("st_cog_dir") or os.getenv("ST_COG_DIR")
+        cache_dir = parameters.get("dem_cache_dir")
+        if dem_source == "cog" and not cog_dir:
+            raise RuntimeError("dem_source=cog braucht st_cog_dir oder ST_COG_DIR.")
+
+        def fetch() -> str:
+            if dem_source == "public":
+                return fetch_dem_from_st_public_download(
+                    south=bbox["south"],
+                    west=bbox["west"],
+                    north=bbox["north"],
+                    east=bbox["east"],
+                    parts=parts,
+                    cache_dir=cache_dir,
+                    max_cells=MAX_ANALYSIS_CELLS,
+                )
+            if dem_source == "cog":
+                return fetch_dem_from_st_cog_dir(
+                    south=bbox["south"],
+                    west=bbox["west"],
+                    north=bbox["north"],
+                    east=bbox["east"],
+                    cog_dir=str(cog_dir),
+                    cache_dir=cache_dir,
+                    max_cells=MAX_ANALYSIS_CELLS,
+                )
+            return fetch_dem_from_wcs(
+                bbox["south"],
+                bbox["west"],
+                bbox["north"],
+                bbox["east"],
+                provider_key=provider,
             )
-            final_path = os.path.join(tmp_dir, "dem.tif")
-            shutil.move(dem_path, final_path)
-            return final_path, tmp_dir
-
-        dem_path = fetch_dem_from_wcs(
-            bbox["south"],
-            bbox["west"],
-            bbox["north"],
-            bbox["east"],
-            provider_key=provider,
+
+        # Shared with the API backend (DEM_SHARED_CACHE_DIR): repeated AOIs are fetched once.
+        identity = dem_identity(
+            dem_source=dem_source,
+            provider=provider,
+            st_parts=parts,
+            st_cog_dir=str(cog_dir) if cog_dir else None,
+            max_cells=MAX_ANALYSIS_CELLS,
+            dem_cache_dir=cache_dir,
+            **bbox,
         )
+        dem_path = get_dem_cache().get_or_fetch(identity, fetch)
+        tmp_dir = tempfile.mkdtemp(prefix="hydrowatch-dem-fetch-")
         final_path = os.path.join(tmp_dir, "dem.tif")
         shutil.move(dem_path, final_path)
         return final_path, tmp_dir